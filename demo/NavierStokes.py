@@ -35,8 +35,7 @@ K2 = np.sum(K*K, 0, dtype=int)
 K = np.array(T.local_wavenumbers(True, True, True))
 K_over_K2 = K.astype(float) / np.where(K2 == 0, 1, K2).astype(float)
 P_hat = Function(T)
-curl_hat = Function(TV)
-curl_ = Function(TV, False)
+H = NonlinearProduct(TV, 'cross')   # Dealiased u x curl(u) with the 3/2-rule
 X = T.local_mesh(True)
 
 def LinearRHS():
@@ -46,13 +45,8 @@ def LinearRHS():
     return L
 
 def NonlinearRHS(U, U_hat, dU):
-    global TV, curl_hat, curl_, P_hat, K, K_over_K2
-    dU.fill(0)
-    U = TV.backward(U_hat, U)
-    curl_hat = project(curl(U), TV, output_array=curl_hat, uh_hat=U_hat) # Linear. Does not actually use U, only U_hat
-    curl_ = TV.backward(curl_hat, curl_)
-    W = np.cross(U, curl_, axis=0)                  # Nonlinear term in physical space
-    dU = project(W, TV, output_array=dU)            # dU = TV.forward(W, dU)
+    global H, P_hat, K, K_over_K2
+    dU = H(U_hat, dU)                               # Transforms, curl and cross product
     P_hat = np.sum(dU*K_over_K2, 0, out=P_hat)
     dU -= P_hat*K
     return dU
@@ -69,6 +63,7 @@ if __name__ == '__main__':
         integ = integrator(TV, L=LinearRHS, N=NonlinearRHS)
         integ.setup(dt)
         U_hat = integ.solve(U, U_hat, dt, (0, end_time))
+        U = TV.backward(U_hat, U)
 
         k = comm.reduce(0.5*np.sum(U*U)/np.prod(np.array(N)))
         if comm.Get_rank() == 0:
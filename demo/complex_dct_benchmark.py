@@ -0,0 +1,59 @@
+r"""
+Benchmark Chebyshev transforms of complex data
+
+The complex transforms run one real DCT on a real view of the complex
+arrays. This is compared with transforming the real and imaginary parts
+separately, copying in and out of a real DCT, which is how complex data used
+to be handled.
+
+Call as
+
+    python complex_dct_benchmark.py N M
+
+to transform arrays of shape (N, M, M) along the first axis. Defaults to
+N=64, M=64.
+
+"""
+import sys
+from time import time
+import numpy as np
+from shenfun.chebyshev.bases import Basis
+
+N = int(sys.argv[1]) if len(sys.argv) > 1 else 64
+M = int(sys.argv[2]) if len(sys.argv) > 2 else 64
+shape = (N, M, M)
+repeat = 20
+
+# Complex transforms
+T = Basis(N, quad='GC')
+T.plan(shape, 0, np.complex, {})
+u = np.random.random(shape) + 1j*np.random.random(shape)
+u_hat = T.xfftn_fwd(u).copy()
+
+t0 = time()
+for i in range(repeat):
+    u_hat = T.xfftn_fwd(u)
+t_complex = (time()-t0)/repeat
+
+# Real and imaginary parts separately, through a real transform
+R = Basis(N, quad='GC')
+R.plan(shape, 0, np.float, {})
+
+def split_forward(u, u_hat):
+    R.xfftn_fwd.input_array[...] = u.real
+    R.xfftn_fwd()
+    u_hat.real[...] = R.xfftn_fwd.output_array
+    R.xfftn_fwd.input_array[...] = u.imag
+    R.xfftn_fwd()
+    u_hat.imag[...] = R.xfftn_fwd.output_array
+    return u_hat
+
+v_hat = np.zeros_like(u)
+t0 = time()
+for i in range(repeat):
+    v_hat = split_forward(u, v_hat)
+t_split = (time()-t0)/repeat
+
+assert np.allclose(u_hat, v_hat)
+print('Complex DCT {0:2.4e} s, split DCT {1:2.4e} s, speedup {2:2.2f}'.format(
+    t_complex, t_split, t_split/t_complex))
@@ -0,0 +1,78 @@
+r"""
+Benchmark pipelined parallel transforms
+
+The global redistributions of a TensorProductSpace created with chunks > 1
+are split into chunks and overlapped with the serial transforms, see
+shenfun.tensorproductspace.PipelinedTransform. The time of one forward and
+one backward transform is compared with the blocking transforms (chunks=1),
+and the overlap achieved is reported as the part of the time of the
+shortest of serial transforms and redistributions that is hidden.
+
+Call as
+
+    mpirun -np 4 python pipelined_transform_benchmark.py N
+
+to transform arrays of shape (N, N, N). Defaults to N=128.
+
+"""
+import sys
+from time import time
+import numpy as np
+from mpi4py import MPI
+from shenfun.fourier.bases import R2CBasis, C2CBasis
+from shenfun import TensorProductSpace, Function
+
+comm = MPI.COMM_WORLD
+N = int(sys.argv[1]) if len(sys.argv) > 1 else 128
+repeat = 10
+
+def get_space(chunks):
+    bases = (C2CBasis(N), C2CBasis(N), R2CBasis(N))
+    return TensorProductSpace(comm, bases, chunks=chunks, collapse=False)
+
+def timeit(func):
+    func()
+    comm.Barrier()
+    t0 = time()
+    for i in range(repeat):
+        func()
+    t = np.array((time()-t0)/repeat)
+    comm.Allreduce(MPI.IN_PLACE, t, op=MPI.MAX)
+    return float(t)
+
+T = get_space(1)
+u = Function(T, False)
+u[:] = np.random.random(u.shape)
+u_hat = Function(T)
+
+def transforms():
+    T.forward(u, u_hat)
+    T.backward(u_hat, u)
+
+def serial():
+    for transform in (T.forward, T.backward):
+        for xfftn in transform._xfftn:
+            xfftn()
+
+def transfers():
+    for transform in (T.forward, T.backward):
+        for i, transfer in enumerate(transform._transfer):
+            transfer(transform._xfftn[i].output_array,
+                     transform._xfftn[i+1].input_array)
+
+t_blocking = timeit(transforms)
+t_serial = timeit(serial)
+t_transfer = timeit(transfers)
+T.destroy()
+if comm.Get_rank() == 0:
+    print('Blocking {0:2.4e} s (serial {1:2.4e} s, redistribution {2:2.4e} s)'.format(
+        t_blocking, t_serial, t_transfer))
+
+for chunks in (2, 4, 8):
+    T = get_space(chunks)
+    t = timeit(transforms)
+    T.destroy()
+    overlap = (t_blocking-t)/min(t_serial, t_transfer)
+    if comm.Get_rank() == 0:
+        print('Chunks {0} {1:2.4e} s, speedup {2:2.2f}, overlap {3:2.0f}%'.format(
+            chunks, t, t_blocking/t, 100*overlap))
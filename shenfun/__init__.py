@@ -4,6 +4,8 @@ from . import legendre
 from . import fourier
 from . import matrixbase
 from .forms.project import *
+from .forms.matrixfree import *
+from .forms.nonlinear import *
 from .forms.inner import *
 from .forms.operators import *
 from .forms.arguments import *
@@ -12,10 +14,10 @@ from .utilities import *
 from .utilities.integrators import *
 from .utilities.h5py_writer import *
 from .utilities.generate_xdmf import *
+from .utilities.fftw_wisdom import *
+from .utilities.cache import *
 from .matrixbase import *
 
-from scipy.sparse.linalg import spsolve
-from scipy.linalg import solve as lasolve
 
 def energy_fourier(u, T):
     """Compute the energy of u using Parceval's theorem
@@ -78,6 +80,7 @@ def solve(A, b, u=None, axis=0):
     assert isinstance(A, matrixbase.SparseMatrix)
     s = A.testfunction[0].slice()
 
+    inplace = u is None or u is b
     if u is None:
         u = b
     else:
@@ -90,35 +93,18 @@ def solve(A, b, u=None, axis=0):
             b = np.moveaxis(b, axis, 0)
 
     assert A.shape[0] == b[s].shape[0]
-    if (isinstance(A.testfunction[0], chebyshev.bases.ShenNeumannBasis) or
-        isinstance(A.testfunction[0], legendre.bases.ShenNeumannBasis)):
-        # Handle level by using Dirichlet for dof=0
-        Aa = A.diags().toarray()
-        Aa[0] = 0
-        Aa[0,0] = 1
+    neumann = (isinstance(A.testfunction[0], chebyshev.bases.ShenNeumannBasis) or
+               isinstance(A.testfunction[0], legendre.bases.ShenNeumannBasis))
+    if neumann:
+        # Handle level by using Dirichlet for dof=0, see A.factorize
         b[0] = A.testfunction[0].mean
-        if b.ndim == 1:
-            u[s] = lasolve(Aa, b[s])
-        else:
-            N = b[s].shape[0]
-            P = np.prod(b[s].shape[1:])
-            u[s] = lasolve(Aa, b[s].reshape((N, P))).reshape(b[s].shape)
 
-    else:
-        if b.ndim == 1:
-            u[s] = spsolve(A.diags('csr'), b[s])
-        else:
-            N = b[s].shape[0]
-            P = np.prod(b[s].shape[1:])
-            br = b[s].reshape((N, P))
-
-            if b.dtype is np.dtype('complex'):
-                u.real[s] = spsolve(A.diags('csr'), br.real).reshape(u[s].shape)
-                u.imag[s] = spsolve(A.diags('csr'), br.imag).reshape(u[s].shape)
-            else:
-                u[s] = spsolve(A.diags('csr'), br).reshape(u[s].shape)
-        if hasattr(A.testfunction[0], 'bc'):
-            A.testfunction[0].bc.apply_after(u, True)
+    # Solve along axis of the unmoved arrays, which avoids copies
+    A.factorize()(np.moveaxis(b, 0, axis),
+                  None if inplace else np.moveaxis(u, 0, axis),
+                  axis=axis)
+    if not neumann and hasattr(A.testfunction[0], 'bc'):
+        A.testfunction[0].bc.apply_after(u, True)
 
     if axis > 0:
         u = np.moveaxis(u, 0, axis)
@@ -1,5 +1,6 @@
 from numpy.polynomial import chebyshev as n_cheb
 import functools
+from copy import copy
 import numpy as np
 import pyfftw
 from shenfun.spectralbase import SpectralBase, work, _func_wrap
@@ -12,6 +13,11 @@ __all__ = ['ChebyshevBase', 'Basis', 'ShenDirichletBasis',
 
 class _dct_wrap(object):
 
+    # Wrapper of real DCT for complex data. The DCT is planned on real views
+    # of the complex input and output arrays, with an additional trailing axis
+    # of length 2 holding the real and imaginary parts. One call to the
+    # planned DCT then transforms both parts, without any copies.
+
     # pylint: disable=too-few-public-methods
 
     __slots__ = ('_dct', '__doc__', '_input_array', '_output_array')
@@ -40,12 +46,7 @@ class _dct_wrap(object):
         if input_array is not None:
             self.input_array[...] = input_array
 
-        dct_obj.input_array[...] = self.input_array.real
-        dct_obj(None, None, **kw)
-        self.output_array.real[...] = dct_obj.output_array
-        dct_obj.input_array[...] = self.input_array.imag
         dct_obj(None, None, **kw)
-        self.output_array.imag[...] = dct_obj.output_array
 
         if output_array is not None:
             output_array[...] = self.output_array
@@ -61,12 +62,17 @@ class ChebyshevBase(SpectralBase):
     kwargs:
         N             int         Number of quadrature points
         quad        ('GL', 'GC')  Chebyshev-Gauss-Lobatto or Chebyshev-Gauss
+        domain   (float, float)   The computational domain
+        padding_factor  float     Factor for padding backward transforms.
+                                  Forward transforms and scalar products
+                                  are truncated accordingly
 
     """
 
-    def __init__(self, N=0, quad="GC", domain=(-1., 1.)):
+    def __init__(self, N=0, quad="GC", domain=(-1., 1.), padding_factor=1):
         assert quad in ('GC', 'GL')
-        SpectralBase.__init__(self, N, quad, domain=domain)
+        SpectralBase.__init__(self, N, quad, padding_factor=padding_factor,
+                              domain=domain)
 
     def points_and_weights(self, N, scaled=False):
         if self.quad == "GL":
@@ -128,15 +134,33 @@ class ChebyshevBase(SpectralBase):
         else:
             return 2./(b-a)
 
+    def _get_exact_mass_base(self):
+        if self.quad == 'GC':
+            return self
+        # Chebyshev-Gauss quadrature gives the exact mass matrix
+        base = copy(self)
+        base.quad = 'GC'
+        base._mass = None
+        return base
+
     def plan(self, shape, axis, dtype, options):
         if isinstance(axis, tuple):
             axis = axis[0]
+        # Nonnegative, since complex data are planned with an additional
+        # trailing axis
+        axis = axis % np.size(shape)
 
         if isinstance(self.forward, _func_wrap):
-            if self.forward.input_array.shape == shape and self.axis == axis:
+            if (self.forward.input_array.shape == shape and self.axis == axis and
+                    self.forward.input_array.dtype == np.dtype(dtype) and
+                    self.threads == options.get('threads', 1)):
                 # Already planned
                 return
 
+        if self.padding_factor > 1.+1e-8:
+            self._plan_padded(shape, axis, dtype, options)
+            return
+
         opts = dict(
             avoid_copy=True,
             overwrite_input=True,
@@ -146,36 +170,56 @@ class ChebyshevBase(SpectralBase):
             threads=1,
         )
         opts.update(options)
+        wisdom = opts.pop('wisdom', None)
 
         plan_fwd = self._xfftn_fwd
         plan_bck = self._xfftn_bck
         if isinstance(axis, tuple):
             axis = axis[0]
 
-        U = pyfftw.empty_aligned(shape, dtype=np.float)
-        xfftn_fwd = plan_fwd(U, axis=axis, **opts)
+        if wisdom is not None:
+            key = wisdom.key((self.__class__.__name__, self.quad), shape,
+                             dtype, axis, opts['threads'], opts['planner_effort'])
+            found = wisdom.load(key)
+
+        # Plan in the precision of dtype, single, double or long double
+        real_dtype = np.dtype(np.dtype(dtype).char.lower())
+        complex_data = np.dtype(dtype).char in 'FDG'
+        if complex_data:
+            # dct only works on real data, so plan for real views of the
+            # complex arrays, with real and imaginary parts in a trailing axis
+            Uc = pyfftw.empty_aligned(shape, dtype=dtype)
+            Vc = pyfftw.empty_aligned(shape, dtype=dtype)
+            U = Uc.view(real_dtype).reshape(tuple(shape)+(2,))
+            V = Vc.view(real_dtype).reshape(tuple(shape)+(2,))
+            xfftn_fwd = plan_fwd(U, axis=axis, **opts)
+            xfftn_bck = plan_bck(V, axis=axis, **opts)
+
+        else:
+            U = pyfftw.empty_aligned(shape, dtype=real_dtype)
+            xfftn_fwd = plan_fwd(U, axis=axis, **opts)
+            V = xfftn_fwd.output_array
+            xfftn_bck = plan_bck(V, axis=axis, **opts)
         U.fill(0)
-        V = xfftn_fwd.output_array
-        xfftn_bck = plan_bck(V, axis=axis, **opts)
         V.fill(0)
 
         xfftn_fwd.update_arrays(U, V)
         xfftn_bck.update_arrays(V, U)
 
-        self.axis = axis
-        if np.dtype(dtype) is np.dtype('float64'):
-            self.xfftn_fwd = xfftn_fwd
-            self.xfftn_bck = xfftn_bck
+        if wisdom is not None and not found:
+            wisdom.save(key)
 
-        else:
-            # dct only works on real data, so need to wrap it
-            U = pyfftw.empty_aligned(shape, dtype=np.complex)
-            V = pyfftw.empty_aligned(shape, dtype=np.complex)
-            U.fill(0)
-            V.fill(0)
+        self.axis = axis
+        self.threads = opts['threads']
+        if complex_data:
+            U, V = Uc, Vc
             self.xfftn_fwd = _dct_wrap(xfftn_fwd, U, V)
             self.xfftn_bck = _dct_wrap(xfftn_bck, V, U)
 
+        else:
+            self.xfftn_fwd = xfftn_fwd
+            self.xfftn_bck = xfftn_bck
+
         self.forward = _func_wrap(self.forward, self.xfftn_fwd, U, V)
         self.backward = _func_wrap(self.backward, self.xfftn_bck, V, U)
         self.scalar_product = _func_wrap(self.scalar_product, self.xfftn_fwd, U, V)
@@ -190,11 +234,14 @@ class Basis(ChebyshevBase):
         N             int         Number of quadrature points
         quad        ('GL', 'GC')  Chebyshev-Gauss-Lobatto or Chebyshev-Gauss
         plan         boolean      Execute plan assuming 1D
+        domain   (float, float)   The computational domain
+        padding_factor  float     Factor for padding backward transforms
 
     """
 
-    def __init__(self, N=0, quad="GC", plan=False, domain=(-1., 1.)):
-        ChebyshevBase.__init__(self, N, quad, domain)
+    def __init__(self, N=0, quad="GC", plan=False, domain=(-1., 1.),
+                 padding_factor=1):
+        ChebyshevBase.__init__(self, N, quad, domain, padding_factor)
         if quad == 'GC':
             self._xfftn_fwd = functools.partial(pyfftw.builders.dct, type=2)
             self._xfftn_bck = functools.partial(pyfftw.builders.dct, type=3)
@@ -202,7 +249,7 @@ class Basis(ChebyshevBase):
             self._xfftn_fwd = functools.partial(pyfftw.builders.dct, type=1)
             self._xfftn_bck = functools.partial(pyfftw.builders.dct, type=1)
         if plan:
-            self.plan(N, 0, np.float, {})
+            self.plan(int(np.round(N*self.padding_factor)), 0, np.float, {})
 
 
     def derivative_coefficients(self, fk, ck):
@@ -307,19 +354,21 @@ class ShenDirichletBasis(ChebyshevBase):
         N             int         Number of quadrature points
         quad        ('GL', 'GC')  Chebyshev-Gauss-Lobatto or Chebyshev-Gauss
         bc           (a, b)       Boundary conditions at x=(1,-1)
+        padding_factor  float     Factor for padding backward transforms
 
     """
 
     def __init__(self, N=0, quad="GC", bc=(0, 0), plan=False,
-                 domain=(-1., 1.), scaled=False):
-        ChebyshevBase.__init__(self, N, quad, domain=domain)
+                 domain=(-1., 1.), scaled=False, padding_factor=1):
+        ChebyshevBase.__init__(self, N, quad, domain=domain,
+                               padding_factor=padding_factor)
         from shenfun.tensorproductspace import BoundaryValues
         self.CT = Basis(N, quad, plan=plan)
         self._scaled = scaled
         self._factor = np.ones(1)
-        if plan:
-            self.plan(N, 0, np.float, {})
         self.bc = BoundaryValues(self, bc=bc)
+        if plan:
+            self.plan(int(np.round(N*self.padding_factor)), 0, np.float, {})
 
     def get_vandermonde_basis(self, V):
         P = np.zeros(V.shape)
@@ -400,14 +449,22 @@ class ShenDirichletBasis(ChebyshevBase):
     def plan(self, shape, axis, dtype, options):
         if isinstance(axis, tuple):
             axis = axis[0]
+        axis = axis % np.size(shape)
 
         if isinstance(self.forward, _func_wrap):
-            if self.forward.input_array.shape == shape and self.axis == axis:
+            if (self.forward.input_array.shape == shape and self.axis == axis and
+                    self.forward.input_array.dtype == np.dtype(dtype) and
+                    self.threads == options.get('threads', 1)):
                 # Already planned
                 return
 
+        if self.padding_factor > 1.+1e-8:
+            self._plan_padded(shape, axis, dtype, options)
+            return
+
         self.CT.plan(shape, axis, dtype, options)
         self.axis = self.CT.axis
+        self.threads = self.CT.threads
         self.xfftn_fwd = self.CT.xfftn_fwd
         self.xfftn_bck = self.CT.xfftn_bck
         U = self.CT.xfftn_fwd.input_array
@@ -427,16 +484,19 @@ class ShenNeumannBasis(ChebyshevBase):
         threads          1        Number of threads used by pyfftw
         planner_effort            Planner effort for FFTs.
         mean           float      Mean value
+        padding_factor  float     Factor for padding backward transforms
 
     """
 
-    def __init__(self, N=0, quad="GC", mean=0, plan=False, domain=(-1., 1.)):
-        ChebyshevBase.__init__(self, N, quad, domain=domain)
+    def __init__(self, N=0, quad="GC", mean=0, plan=False, domain=(-1., 1.),
+                 padding_factor=1):
+        ChebyshevBase.__init__(self, N, quad, domain=domain,
+                               padding_factor=padding_factor)
         self.mean = mean
         self.CT = Basis(N, quad)
         self._factor = np.zeros(0)
         if plan:
-            self.plan(N, 0, np.float, {})
+            self.plan(int(np.round(N*self.padding_factor)), 0, np.float, {})
 
     def get_vandermonde_basis(self, V):
         assert self.N == V.shape[1]
@@ -501,14 +561,22 @@ class ShenNeumannBasis(ChebyshevBase):
     def plan(self, shape, axis, dtype, options):
         if isinstance(axis, tuple):
             axis = axis[0]
+        axis = axis % np.size(shape)
 
         if isinstance(self.forward, _func_wrap):
-            if self.forward.input_array.shape == shape and self.axis == axis:
+            if (self.forward.input_array.shape == shape and self.axis == axis and
+                    self.forward.input_array.dtype == np.dtype(dtype) and
+                    self.threads == options.get('threads', 1)):
                 # Already planned
                 return
 
+        if self.padding_factor > 1.+1e-8:
+            self._plan_padded(shape, axis, dtype, options)
+            return
+
         self.CT.plan(shape, axis, dtype, options)
         self.axis = self.CT.axis
+        self.threads = self.CT.threads
         self.xfftn_fwd = self.CT.xfftn_fwd
         self.xfftn_bck = self.CT.xfftn_bck
         U = self.CT.xfftn_fwd.input_array
@@ -527,16 +595,17 @@ class ShenBiharmonicBasis(ChebyshevBase):
     kwargs:
         N             int         Number of quadrature points
         quad        ('GL', 'GC')  Chebyshev-Gauss-Lobatto or Chebyshev-Gauss
+        padding_factor  float     Factor for padding backward transforms
 
     """
 
-    def __init__(self, N=0, quad="GC", plan=False):
-        ChebyshevBase.__init__(self, N, quad)
+    def __init__(self, N=0, quad="GC", plan=False, padding_factor=1):
+        ChebyshevBase.__init__(self, N, quad, padding_factor=padding_factor)
         self.CT = Basis(N, quad)
         self._factor1 = np.zeros(0)
         self._factor2 = np.zeros(0)
         if plan:
-            self.plan(N, 0, np.float, {})
+            self.plan(int(np.round(N*self.padding_factor)), 0, np.float, {})
 
     def get_vandermonde_basis(self, V):
         P = np.zeros_like(V)
@@ -616,14 +685,22 @@ class ShenBiharmonicBasis(ChebyshevBase):
     def plan(self, shape, axis, dtype, options):
         if isinstance(axis, tuple):
             axis = axis[0]
+        axis = axis % np.size(shape)
 
         if isinstance(self.forward, _func_wrap):
-            if self.forward.input_array.shape == shape and self.axis == axis:
+            if (self.forward.input_array.shape == shape and self.axis == axis and
+                    self.forward.input_array.dtype == np.dtype(dtype) and
+                    self.threads == options.get('threads', 1)):
                 # Already planned
                 return
 
+        if self.padding_factor > 1.+1e-8:
+            self._plan_padded(shape, axis, dtype, options)
+            return
+
         self.CT.plan(shape, axis, dtype, options)
         self.axis = self.CT.axis
+        self.threads = self.CT.threads
         self.xfftn_fwd = self.CT.xfftn_fwd
         self.xfftn_bck = self.CT.xfftn_bck
         U = self.CT.xfftn_fwd.input_array
@@ -2,7 +2,59 @@ import numpy as np
 from copy import copy
 from shenfun.optimization import la, Matvec
 from . import bases
-from shenfun.la import TDMA as la_TDMA
+from shenfun.la import TDMA as la_TDMA, _view3D
+from shenfun.matrixbase import _strided_view3D
+
+
+def _scales_2D(axis, *scales):
+    """Return scales broadcasted against each other as 2D arrays
+
+    The scales must be of length one along axis. Returns the broadcasted
+    shape and the scales as contiguous arrays of shape (prod(shape[:axis]),
+    prod(shape[axis+1:])).
+    """
+    scales = np.broadcast_arrays(*[np.atleast_1d(s) for s in scales])
+    shape = scales[0].shape
+    assert shape[axis] == 1
+    return shape, [np.ascontiguousarray(s, dtype=float).reshape(
+        (int(np.prod(shape[:axis])), -1)) for s in scales]
+
+def _factor_view(lu, lead, shape, axis):
+    """Return factors lu broadcasted to an array of shape, viewed in 3D
+
+    The systems of lu are along axis+lead, where lead is the number of
+    leading axes of the factors. Returns an array of ndim lead+3, where
+    the last three axes match _strided_view3D of the array, but with length
+    lu.shape[axis+lead] along the middle axis. For solves along the last
+    axis the systems are instead put along the last axis of the view, see
+    _solve_3D. A copy is made only if the broadcasted factors cannot be
+    viewed like this.
+    """
+    shape = list(shape)
+    shape[axis] = lu.shape[axis+lead]
+    x = np.broadcast_to(lu, lu.shape[:lead]+tuple(shape))
+    pre = int(np.prod(shape[:axis]))
+    x = np.reshape(x, lu.shape[:lead]+(pre, shape[axis], -1))
+    if x.shape[-1] == 1 and pre > 1:
+        x = np.swapaxes(x, -1, -3)
+    return x
+
+def _solve_3D(solver, u, b, axis, lu, *args):
+    """Call Cython solver for 3D views of u and b, with axis in the middle
+
+    If there is only one system along the last axis of the views, then the
+    first and last axes are swapped, such that the solver can treat several
+    systems at the time.
+    """
+    b3 = _strided_view3D(b, axis)[0]
+    u3, copied = _strided_view3D(u, axis)
+    if u3.shape[2] == 1 and u3.shape[0] > 1:
+        solver(np.swapaxes(b3, 0, 2), np.swapaxes(u3, 0, 2), lu, *args)
+    else:
+        solver(b3, u3, lu, *args)
+    if copied:
+        u[...] = u3.reshape(u.shape)
+    return u
 
 class TDMA(la_TDMA):
 
@@ -24,7 +76,7 @@ class TDMA(la_TDMA):
             self.init(N)
 
         if len(u.shape) == 3:
-            la.TDMA_SymSolve3D(self.dd, self.ud, self.L, u, axis)
+            la.TDMA_SymSolve3D(self.dd, self.ud, self.L, u, axis, v.threads)
             #la.TDMA_SymSolve3D_ptr(self.dd[self.s], self.ud[self.s], self.L,
                                    #u[self.s], axis)
         elif len(u.shape) == 2:
@@ -34,7 +86,8 @@ class TDMA(la_TDMA):
             la.TDMA_SymSolve(self.dd, self.ud, self.L, u)
 
         else:
-            raise NotImplementedError
+            la.TDMA_SymSolve3D(self.dd, self.ud, self.L, _view3D(u, axis), 1,
+                               v.threads)
 
         bc.apply_after(u, False)
 
@@ -71,47 +124,32 @@ class Helmholtz(object):
         else:
             raise RuntimeError('Wrong input to Helmholtz solver')
 
-        #local_shape = A.testfunction[0].forward.input_array.shape
-        shape = list(B_scale.shape)
         B[2] = np.broadcast_to(B[2], A[2].shape)
         B[-2] = np.broadcast_to(B[-2], A[2].shape)
         neumann = self.neumann = isinstance(A.testfunction[0], bases.ShenNeumannBasis)
         if not self.neumann:
             self.bc = A.testfunction[0].bc
 
-        if len(shape) == 1:
-            N = A.shape[0]+2
-            self.u0 = np.zeros(N-2, float)     # Diagonal entries of U
-            self.u1 = np.zeros(N-4, float)     # Diagonal+1 entries of U
-            self.u2 = np.zeros(N-6, float)     # Diagonal+2 entries of U
-            self.L  = np.zeros(N-4, float)     # The single nonzero row of L
-            self.axis = 0
-            la.LU_Helmholtz_1D(A, B, A_scale, B_scale, neumann, self.u0,
-                               self.u1, self.u2, self.L)
-
-        else:
-            self.axis = A.axis
-            assert A_scale.shape[A.axis] == 1
-            assert B_scale.shape[A.axis] == 1
-
-            N = A.shape[0]+2
-            A_scale = np.broadcast_to(A_scale, shape).copy()
-            shape[A.axis] = N-2
-            self.u0 = np.zeros(shape, float)     # Diagonal entries of U
-            shape[A.axis] = N-4
-            self.u1 = np.zeros(shape, float)     # Diagonal+2 entries of U
-            self.L  = np.zeros(shape, float)     # The single nonzero row of L
-            shape[A.axis] = N-6
-            self.u2 = np.zeros(shape, float)     # Diagonal+4 entries of U
-            self.B_scale = B_scale.copy()
-
-            if len(shape) == 2:
-                la.LU_Helmholtz_2D(A, B, A.axis, A_scale, B_scale, neumann,
-                                   self.u0, self.u1, self.u2, self.L)
-
-            elif len(shape) == 3:
-                la.LU_Helmholtz_3D(A, B, A.axis, A_scale, B_scale, neumann,
-                                   self.u0, self.u1, self.u2, self.L)
+        # The LU decompositions are stored with the shape of the scales, with
+        # the systems along self.axis. The factors d0, d1, d2 and L are
+        # self.lu[0], ..., self.lu[3]
+        self.axis = A.axis if np.ndim(B_scale) > 1 else 0
+        shape, (A_s, B_s) = _scales_2D(self.axis, A_scale, B_scale)
+        self.threads = A.testfunction[0].threads
+        self._lu = {}
+        shape = list(shape)
+        shape[self.axis] = A.shape[0]
+        self.lu = np.zeros([4]+shape)
+        self.u0, self.u1, self.u2, self.L = self.lu
+        la.LU_Helmholtz_n(A, B, A_s, B_s, neumann,
+                          self.lu.reshape((4,)+A_s.shape[:1]+(shape[self.axis], -1)),
+                          self.threads)
+
+    def factors(self, shape):
+        """Return LU decomposition for all systems of array of shape"""
+        if shape not in self._lu:
+            self._lu[shape] = _factor_view(self.lu, 1, shape, self.axis)
+        return self._lu[shape]
 
     def __call__(self, u, b):
 
@@ -128,28 +166,8 @@ class Helmholtz(object):
                 #s[self.axis] = slice(1, 2)
                 #b[s] -= np.pi/4*(self.bc[0] - self.bc[1])*self.B_scale[s0]
 
-        if np.ndim(u) == 3:
-
-            #la.Solve_Helmholtz_3D(self.axis, b, u, self.neumann, self.u0, self.u1,
-                                  #self.u2, self.L)
-
-            la.Solve_Helmholtz_3D_ptr(self.axis, b, u, self.neumann, self.u0,
-                                      self.u1, self.u2, self.L)
-
-            #la.Solve_Helmholtz_3D_hc(self.axis, b, u, self.neumann, self.u0,
-                                      #self.u1, self.u2, self.L)
-
-
-        elif np.ndim(u) == 2:
-
-            la.Solve_Helmholtz_2D(self.axis, b, u, self.neumann, self.u0, self.u1,
-                                  self.u2, self.L)
-
-            #la.Solve_Helmholtz_2D_ptr(self.axis, b, u, self.neumann, self.u0,
-            #                          self.u1, self.u2, self.L)
-
-        else:
-            la.Solve_Helmholtz_1D(b, u, self.neumann, self.u0, self.u1, self.u2, self.L)
+        _solve_3D(la.Solve_Helmholtz_n, u, b, self.axis,
+                  self.factors(u.shape), self.neumann, self.threads)
 
         if not self.neumann:
             self.bc.apply_after(u, True)
@@ -196,59 +214,33 @@ class Biharmonic(object):
         else:
             raise RuntimeError('Wrong input to Biharmonic solver')
 
+        # The LU decompositions of even and odd coefficients are stored with
+        # the shape of the scales, with the systems along self.axis. The
+        # factors u0, u1, u2, l0, l1, ak and bk are self.lu[0], ...,
+        # self.lu[6], where ak and bk are multiplied by S_scale
+        self.axis = S.axis if np.ndim(B_scale) > 1 else 0
+        shape, scales = _scales_2D(self.axis, S_scale, A_scale, B_scale)
         self.S_scale = S_scale
-        sii, siu, siuu = S[0], S[2], S[4]
-        ail, aii, aiu = A[-2], A[0], A[2]
-        bill, bil, bii, biu, biuu = B[-4], B[-2], B[0], B[2], B[4]
-        M = sii[::2].shape[0]
-
-        if np.ndim(B_scale) > 1:
-            shape = list(B_scale.shape)
-            self.axis = S.axis
-            shape[S.axis] = M
-            ss = copy(shape)
-            ss.insert(0, 2)
-            S_scale = self.S_scale = np.broadcast_to(S_scale, shape)
-            A_scale = np.broadcast_to(A_scale, shape)
-            B_scale = np.broadcast_to(B_scale, shape)
-
-            self.u0 = np.zeros(ss)
-            self.u1 = np.zeros(ss)
-            self.u2 = np.zeros(ss)
-            self.l0 = np.zeros(ss)
-            self.l1 = np.zeros(ss)
-            self.ak = np.zeros(ss)
-            self.bk = np.zeros(ss)
-            if np.ndim(B_scale) == 3:
-                la.LU_Biharmonic_3D_n(S.axis, S_scale, A_scale, B_scale, sii, siu, siuu, ail, aii, aiu, bill, bil, bii, biu, biuu, self.u0, self.u1, self.u2, self.l0, self.l1)
-                la.Biharmonic_factor_pr_3D(S.axis, self.ak, self.bk, self.l0, self.l1)
-
-            elif np.ndim(B_scale) == 2:
-                la.LU_Biharmonic_2D_n(S.axis, S_scale, A_scale, B_scale, sii, siu, siuu, ail, aii, aiu, bill, bil, bii, biu, biuu, self.u0, self.u1, self.u2, self.l0, self.l1)
-                la.Biharmonic_factor_pr_2D(S.axis, self.ak, self.bk, self.l0, self.l1)
-
-        else:
-            self.u0 = np.zeros((2, M))
-            self.u1 = np.zeros((2, M))
-            self.u2 = np.zeros((2, M))
-            self.l0 = np.zeros((2, M))
-            self.l1 = np.zeros((2, M))
-            self.ak = np.zeros((2, M))
-            self.bk = np.zeros((2, M))
-            la.LU_Biharmonic_1D(S_scale, A_scale, B_scale, sii, siu, siuu, ail, aii, aiu, bill, bil, bii, biu, biuu, self.u0, self.u1, self.u2, self.l0, self.l1)
-            la.Biharmonic_factor_pr(self.ak, self.bk, self.l0, self.l1)
+        self.threads = S.testfunction[0].threads
+        self._lu = {}
+        self.Mo = S[0][1::2].shape[0]
+        shape = list(shape)
+        shape[self.axis] = S[0][::2].shape[0]
+        self.lu = np.zeros([7, 2]+shape)
+        self.u0, self.u1, self.u2, self.l0, self.l1, self.ak, self.bk = self.lu
+        la.LU_Biharmonic_n(S, A, B, scales[0], scales[1], scales[2],
+                           self.lu.reshape((7, 2)+scales[0].shape[:1]+(shape[self.axis], -1)),
+                           self.threads)
+
+    def factors(self, shape):
+        """Return LU decomposition for all systems of array of shape"""
+        if shape not in self._lu:
+            self._lu[shape] = _factor_view(self.lu, 2, shape, self.axis)
+        return self._lu[shape]
 
     def __call__(self, u, b):
-        if np.ndim(u) == 3:
-            la.Solve_Biharmonic_3D_n(self.axis, b, u, self.u0, self.u1, self.u2, self.l0, self.l1, self.ak, self.bk, self.S_scale)
-
-        elif np.ndim(u) == 2:
-            la.Solve_Biharmonic_2D_n(self.axis, b, u, self.u0, self.u1, self.u2, self.l0, self.l1, self.ak, self.bk, self.S_scale)
-
-        else:
-            la.Solve_Biharmonic_1D(b, u, self.u0, self.u1, self.u2, self.l0, self.l1, self.ak, self.bk, self.S_scale)
-
-        return u
+        return _solve_3D(la.Solve_Biharmonic_n, u, b, self.axis,
+                         self.factors(u.shape), self.Mo, self.threads)
 
     #def matvec(self, v, c):
         #N = v.shape[0]
@@ -386,7 +378,8 @@ class PDMA(object):
         if np.ndim(u) == 3:
 
             la.Solve_Helmholtz_Biharmonic_3D_ptr(self.A.axis, b, u, self.l2,
-                                                 self.l1, self.d, self.u1, self.u2)
+                                                 self.l1, self.d, self.u1, self.u2,
+                                                 self.A.testfunction[0].threads)
 
 
         else:
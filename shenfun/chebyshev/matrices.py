@@ -52,7 +52,8 @@ class BDDmat(SpectralMatrix):
         c.fill(0)
         if format == 'cython' and v.ndim == 3:
             ld = self[-2]*np.ones(M-2)
-            Tridiagonal_matvec3D(v, c, ld, self[0], ld, axis)
+            Tridiagonal_matvec3D(v, c, ld, self[0], ld, axis,
+                                 self.testfunction[0].threads)
 
         elif format == 'cython' and v.ndim == 1:
             ld = self[-2]*np.ones(M-2)
@@ -101,7 +102,7 @@ class BNDmat(SpectralMatrix):
               2: -np.pi/2*(k[:N-4]/(k[:N-4]+2))**2}
         SpectralMatrix.__init__(self, d, test, trial)
 
-    def matvec(self, v, c, format='csr', axis=0):
+    def matvec(self, v, c, format='cython', axis=0):
         c = super(SpectralMatrix, self).matvec(v, c, format=format, axis=axis)
         s = [slice(None),]*v.ndim
         s[axis] = 0
@@ -163,7 +164,7 @@ class BNTmat(SpectralMatrix):
         assert isinstance(trial[0], CB)
         SpectralMatrix.__init__(self, {}, test, trial)
 
-    def matvec(self, v, c, format='csr', axis=0):
+    def matvec(self, v, c, format='cython', axis=0):
         c = super(SpectralMatrix, self).matvec(v, c, format=format, axis=axis)
         s = [slice(None),]*v.ndim
         s[axis] = 0
@@ -190,7 +191,7 @@ class BNBmat(SpectralMatrix):
         assert isinstance(trial[0], SB)
         SpectralMatrix.__init__(self, {}, test, trial)
 
-    def matvec(self, v, c, format='csr', axis=0):
+    def matvec(self, v, c, format='cython', axis=0):
         c = super(SpectralMatrix, self).matvec(v, c, format=format, axis=axis)
         s = [slice(None),]*v.ndim
         s[axis] = 0
@@ -253,7 +254,7 @@ class BNNmat(SpectralMatrix):
         SpectralMatrix.__init__(self, d, test, trial)
         self.solve = TDMA(self)
 
-    def matvec(self, v, c, format='csr', axis=0):
+    def matvec(self, v, c, format='cython', axis=0):
         c = super(SpectralMatrix, self).matvec(v, c, format=format, axis=axis)
         s = [slice(None),]*v.ndim
         s[axis] = 0
@@ -540,7 +541,7 @@ class CNDmat(SpectralMatrix):
             d[i] = -(1-k[:-i]**2/(k[:-i]+2)**2)*2*np.pi
         SpectralMatrix.__init__(self, d, test, trial)
 
-    def matvec(self, v, c, format='csr', axis=0):
+    def matvec(self, v, c, format='cython', axis=0):
         c = super(SpectralMatrix, self).matvec(v, c, format=format, axis=axis)
         s = [slice(None),]*v.ndim
         s[axis] = 0
@@ -722,7 +723,8 @@ class ABBmat(SpectralMatrix):
                 v = np.moveaxis(v, 0, axis)
 
         elif format == 'cython' and v.ndim == 3:
-            Tridiagonal_matvec3D(v, c, self[-2], self[0], self[2], axis)
+            Tridiagonal_matvec3D(v, c, self[-2], self[0], self[2], axis,
+                                 self.testfunction[0].threads)
 
         elif format == 'cython' and v.ndim == 1:
             Tridiagonal_matvec(v, c, self[-2], self[0], self[2])
@@ -838,7 +840,7 @@ class ANNmat(SpectralMatrix):
             d[i] = -4*np.pi*(k[:-i]+i)**2*(k[:-i]+1)/(k[:-i]+2)**2
         SpectralMatrix.__init__(self, d, test, trial)
 
-    def matvec(self, v, c, format='csr', axis=0):
+    def matvec(self, v, c, format='cython', axis=0):
         c = super(SpectralMatrix, self).matvec(v, c, format=format, axis=axis)
         s = [slice(None),]*v.ndim
         s[axis] = 0
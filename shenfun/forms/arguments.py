@@ -393,6 +393,19 @@ class Function(np.ndarray, BasisFunction):
         fun = self.function_space()
         return Array(fun, forward_output=fun.is_forward_output(self), buffer=self)
 
+    def eval(self, x, output_array=None):
+        """Evaluate Function at points x
+
+        args:
+            x               (input)    Array of shape (ndim, N) with the
+                                       physical coordinates of N points
+
+        kwargs:
+            output_array    (output)   Array of shape (N,) for the result
+
+        """
+        return self.function_space().eval(x, self, output_array)
+
 
 class Array(np.ndarray):
     """Numpy array for TensorProductSpace
@@ -1,9 +1,12 @@
+import weakref
 import numpy as np
 import six
 from shenfun.fourier import FourierBase
 from shenfun.spectralbase import inner_product
+from shenfun.matrixbase import SpectralMatrix
 from shenfun.la import DiagonalMatrix
 from shenfun.tensorproductspace import MixedTensorProductSpace
+from shenfun.utilities.cache import LRUCache
 from .arguments import Expr, TestFunction, TrialFunction, Function, BasisFunction, Array
 
 __all__ = ('inner',)
@@ -31,6 +34,14 @@ def inner(expr0, expr1, output_array=None, uh_hat=None):
         uh_hat                        The transform of the Function/Array used
                                       for linear forms.
 
+    The form is assembled once for each structure of test and trial, i.e.,
+    the spaces, the terms with derivatives and the indices. The scalar
+    scales of the terms are applied for each call. The assembled form is
+    stored in the LRUCache _forms of the test space, and repeated calls
+    return copies of the cached matrices, that share diagonals but have
+    their own scale, or compute a linear form with only the matvecs and
+    multiplications that are needed.
+
     Example:
         Compute mass matrix of Shen's Chebyshev Dirichlet basis:
 
@@ -121,228 +132,322 @@ def inner(expr0, expr1, output_array=None, uh_hat=None):
     if isinstance(test, BasisFunction):
         test = Expr(test)
 
-    space = test.function_space()
-    trialspace = trial.function_space()
     assert test.num_components() == trial.num_components()
-    test_scale = test.scales()
-    trial_scale = trial.scales()
-    trial_indices = trial.indices()
+    form = _get_form(test, trial)
+    coefs = form.coefficients(test, trial)
+
+    if trial.argument() == 1:
+        return form.matrices(coefs)
 
     uh = uh_hat
-    if uh is None and trial.argument() == 2:
+    if uh is None:
+        trialspace = trial.function_space()
         uh = Array(trialspace, forward_output=True)
         uh = trialspace.forward(trial.basis(), uh)
 
-    if output_array is None and trial.argument() == 2:
+    if output_array is None:
         output_array = Array(trial.function_space())
 
-    A = []
-    S = []
-    vec = 0
-    for base_test, base_trial in zip(test.terms(), trial.terms()): # vector/scalar
-        for test_j, b0 in enumerate(base_test):              # second index test
-            for trial_j, b1 in enumerate(base_trial):        # second index trial
-                sc = test_scale[vec, test_j]*trial_scale[vec, trial_j]
-                A.append([])
-                assert len(b0) == len(b1)
-                for i, (a, b) in enumerate(zip(b0, b1)): # Third index, one inner for each dimension
-                    ts = trialspace[i]
-                    if isinstance(trialspace, MixedTensorProductSpace): # trial could operate on a vector, e.g., div(u), where u is vector
-                        ts = ts[i]
-                    AA = inner_product((space[i], a), (ts, b))
-                    A[-1].append(AA)
-                    # Take care of domains of not standard size
-                    if not space[i].domain_factor() == 1:
-                        sc *= space[i].domain_factor()**(a+b)
-                S.append(np.array([sc]))
-
-        vec += 1
-
-    # At this point A contains all matrices of the form. The length of A is
-    # the number of inner products. For each index into A there are ndim 1D
-    # inner products along, e.g., x, y and z-directions, or just x, y for 2D.
-    # The ndim matrices are multiplied with each other, and diagonal matrices
-    # can be eliminated and put in a scale array for the non-diagonal matrices
-    # E.g. (v, div(grad(u))) in 2D
-    #
-    # Here A = [[(v[0], u[0]'')_x, (v[1], u[1])_y,
-    #            (v[0], u[0])_x, (v[1], u[1]'')_y ]]
-    #
-    # where v[0], v[1] are the test functions in x- and y-directions, respectively
-    # For example, v[0] could be a ShenDirichletBasis and v[1] could be a
-    # FourierBasis. Same for u.
-    #
-    # There are now two possibilities, either a linear or a bilinear form.
-    # A linear form has trial.argument() == 2, whereas a bilinear form has
-    # trial.argument() == 1. A linear form should assemble to an array and
-    # return this array. A bilinear form, on the other hand, should return
-    # matrices. Which matrices, and how many, will of course depend on the
-    # form and the number of terms.
-    #
-    # Considering again the tensor product space with ShenDirichlet and Fourier,
-    # the list A will contain matrices as shown above. If Fourier is associated
-    # with index 1, then (v[1], u[1])_y and (v[1], u[1]'')_y will be diagonal
-    # whereas (v[0], u[0]'')_x and (v[0], u[0])_x will in general not. These
-    # two matrices are usually termed the stiffness and mass matrices, and they
-    # have been implemented in chebyshev/matrices.py or legendre/matrices.py,
-    # where they are called ADDmat and BDDmat, respectively.
-    #
-    # The inner product will return a dictionary of a type constructed from the
-    # matrices in A. In this case:
-    #
-    # B = (v[0], u[0]'')_x
-    # B.scale = (v[1], u[1])_y[local_shape]
-    # B.axis = 0
-    # C = (v[0], u[0])_x
-    # C.scale = (v[1], u[1])_y[local_shape]
-    # C.axis = 0
-    # return {'ADDmat': B,
-    #         'BDDmat': C}
-    #
-    # where the name 'ADDmat' is obtained from B.get_key()
-    #
-    # where local_shape is used to indicate that we are only returning the local
-    # values of the scale arrays.
-
-    # Strip off diagonal matrices, put contribution in scale array
-    B = []
-    for sc, matrices in zip(S, A):
-        scale = sc.reshape((1,)*space.ndim())
-        nonperiodic = {}
-        for axis, mat in enumerate(matrices):
-            if isinstance(space[axis], FourierBase):
-                mat = mat[0]    # get diagonal
-                if np.ndim(mat):
-                    mat = space[axis].broadcast_to_ndims(mat, space.ndim(), axis)
-
-                scale = scale*mat
+    return form(uh, output_array, coefs)
 
-            else:
-                mat.axis = axis
-                nonperiodic[axis] = mat
-
-        # Decomposition
-        if hasattr(space, 'local_slice'):
-            s = scale.shape
-            ss = [slice(None)]*space.ndim()
-            ls = space.local_slice()
-            for axis, shape in enumerate(s):
-                if shape > 1:
-                    ss[axis] = ls[axis]
-            scale = (scale[ss]).copy()
-
-        if len(nonperiodic) is 0:
-            # All diagonal matrices
-            B.append(scale)
 
-        else:
-            nonperiodic['scale'] = scale
-            B.append(nonperiodic)
+def _array_key(a):
+    a = np.asarray(a)
+    return (a.shape, a.dtype.str, a.tobytes())
 
-    # At this point assembled matrices are in the B list. One item per term, same
-    # as A. However, now the Fourier matrices have been contracted into the Numpy
-    # array 'scale', of shape determined by decomposition.
-    # The final step here is to add equal matrices together, and to compute the
-    # output for linear forms.
+def _get_form(test, trial):
+    """Return assembled form of test and trial from cache of test space"""
+    space = test.function_space()
+    trialspace = trial.function_space()
+    key = (id(space), id(trialspace), trial.argument())
+    for expr in (test, trial):
+        key += (_array_key(expr.terms()), _array_key(expr.indices()))
+    forms = getattr(space, '_forms', None)
+    if forms is None:
+        forms = space._forms = LRUCache(maxitems=_max_forms)
+    form = forms.get(key, lambda: _Form(test, trial))
+    if form.space() is not space or form.trialspace() is not trialspace:
+        # id of a space that has been deleted
+        forms.pop(key)
+        form = forms.get(key, lambda: _Form(test, trial))
+    return form
+
+# Maximum number of forms cached for each test space
+_max_forms = 32
+
+def _copy(mat):
+    """Return copy of assembled matrices with new scale arrays"""
+    if isinstance(mat, SpectralMatrix):
+        A = mat._shared_copy(mat.testfunction, mat.trialfunction)
+        A.scale = np.copy(mat.scale) if isinstance(mat.scale, np.ndarray) else mat.scale
+        return A
+    elif isinstance(mat, DiagonalMatrix):
+        return DiagonalMatrix(np.array(mat))
+    elif isinstance(mat, np.ndarray):
+        return mat.copy()
+    elif isinstance(mat, dict):
+        return {key: _copy(val) for key, val in six.iteritems(mat)}
+    return [_copy(m) for m in mat]
+
+def _transfer_nbytes(transfer):
+    """Return approximate size of the subarray datatypes of transfer"""
+    # Sizes, subsizes and starts of two datatypes for each rank
+    itemsize = np.dtype(np.intc).itemsize
+    return 6*len(transfer.shape)*transfer.comm.Get_size()*itemsize
+
+
+class _Form(object):
+    """Assembled inner product of test and trial
+
+    The one-dimensional matrices of all terms are assembled once, and the
+    diagonal Fourier matrices are contracted into scale arrays. The scalar
+    coefficients of the terms, i.e., the scales of test and trial, are not
+    part of the form. They are applied for each call, where terms with equal
+    matrices are merged by adding their scales. For linear forms the merged
+    scales are recomputed only when the coefficients change, and the work
+    arrays are allocated once.
 
-    if np.all([isinstance(b, np.ndarray) for b in B]):
+    args:
+        test      Expr    Expression of test function
+        trial     Expr    Expression of trial function or Function
 
-        # All Fourier
-        if space.ndim() == 1:
-            if trial.argument() == 1:
-                A[0][0].axis = 0
-                return A[0][0]
+    """
+    def __init__(self, test, trial):
+        space = test.function_space()
+        trialspace = trial.function_space()
+        self.space = weakref.ref(space)
+        self.trialspace = weakref.ref(trialspace)
+        self.work = {}
+        self.transfers = []
+        trial_indices = trial.indices()
+
+        A = []
+        S = []
+        self.coefs = []
+        vec = 0
+        for base_test, base_trial in zip(test.terms(), trial.terms()): # vector/scalar
+            for test_j, b0 in enumerate(base_test):              # second index test
+                for trial_j, b1 in enumerate(base_trial):        # second index trial
+                    self.coefs.append((vec, test_j, trial_j))
+                    sc = 1.0
+                    A.append([])
+                    assert len(b0) == len(b1)
+                    for i, (a, b) in enumerate(zip(b0, b1)): # Third index, one inner for each dimension
+                        ts = trialspace[i]
+                        if isinstance(trialspace, MixedTensorProductSpace): # trial could operate on a vector, e.g., div(u), where u is vector
+                            ts = ts[i]
+                        AA = inner_product((space[i], a), (ts, b))
+                        A[-1].append(AA)
+                        # Take care of domains of not standard size
+                        if not space[i].domain_factor() == 1:
+                            sc *= space[i].domain_factor()**(a+b)
+                    S.append(np.array([sc]))
+
+            vec += 1
+
+
+        # At this point A contains all matrices of the form. The length of A is
+        # the number of inner products. For each index into A there are ndim 1D
+        # inner products along, e.g., x, y and z-directions, or just x, y for 2D.
+        # The ndim matrices are multiplied with each other, and diagonal matrices
+        # can be eliminated and put in a scale array for the non-diagonal matrices
+        # E.g. (v, div(grad(u))) in 2D
+        #
+        # Here A = [[(v[0], u[0]'')_x, (v[1], u[1])_y,
+        #            (v[0], u[0])_x, (v[1], u[1]'')_y ]]
+        #
+        # where v[0], v[1] are the test functions in x- and y-directions, respectively
+        # For example, v[0] could be a ShenDirichletBasis and v[1] could be a
+        # FourierBasis. Same for u.
+        #
+        # There are now two possibilities, either a linear or a bilinear form.
+        # A linear form has trial.argument() == 2, whereas a bilinear form has
+        # trial.argument() == 1. A linear form should assemble to an array and
+        # return this array. A bilinear form, on the other hand, should return
+        # matrices. Which matrices, and how many, will of course depend on the
+        # form and the number of terms.
+        #
+        # Considering again the tensor product space with ShenDirichlet and Fourier,
+        # the list A will contain matrices as shown above. If Fourier is associated
+        # with index 1, then (v[1], u[1])_y and (v[1], u[1]'')_y will be diagonal
+        # whereas (v[0], u[0]'')_x and (v[0], u[0])_x will in general not. These
+        # two matrices are usually termed the stiffness and mass matrices, and they
+        # have been implemented in chebyshev/matrices.py or legendre/matrices.py,
+        # where they are called ADDmat and BDDmat, respectively.
+        #
+        # The inner product will return a dictionary of a type constructed from the
+        # matrices in A. In this case:
+        #
+        # B = (v[0], u[0]'')_x
+        # B.scale = (v[1], u[1])_y[local_shape]
+        # B.axis = 0
+        # C = (v[0], u[0])_x
+        # C.scale = (v[1], u[1])_y[local_shape]
+        # C.axis = 0
+        # return {'ADDmat': B,
+        #         'BDDmat': C}
+        #
+        # where the name 'ADDmat' is obtained from B.get_key()
+        #
+        # where local_shape is used to indicate that we are only returning the local
+        # values of the scale arrays.
+
+        # Strip off diagonal matrices, put contribution in scale array
+        B = []
+        for sc, matrices in zip(S, A):
+            scale = sc.reshape((1,)*space.ndim())
+            nonperiodic = {}
+            for axis, mat in enumerate(matrices):
+                if isinstance(space[axis], FourierBase):
+                    mat = mat[0]    # get diagonal
+                    if np.ndim(mat):
+                        mat = space[axis].broadcast_to_ndims(mat, space.ndim(), axis)
+
+                    scale = scale*mat
+
+                else:
+                    mat.axis = axis
+                    nonperiodic[axis] = mat
+
+            # Decomposition
+            if hasattr(space, 'local_slice'):
+                s = scale.shape
+                ss = [slice(None)]*space.ndim()
+                ls = space.local_slice()
+                for axis, shape in enumerate(s):
+                    if shape > 1:
+                        ss[axis] = ls[axis]
+                scale = (scale[ss]).copy()
+
+            if len(nonperiodic) is 0:
+                # All diagonal matrices
+                B.append(scale)
 
             else:
-                output_array[:] = B[0]*uh
-                return output_array
+                nonperiodic['scale'] = scale
+                B.append(nonperiodic)
+
+        # At this point assembled matrices are in the B list. One item per term, same
+        # as A. However, now the Fourier matrices have been contracted into the Numpy
+        # array 'scale', of shape determined by decomposition.
+        # The final step here is to add equal matrices together, and to compute the
+        # output for linear forms.
 
+        if trial.argument() == 1:
+            self._bilinear(A, B, space)
         else:
-            if trial.argument() == 1:
-                diagonal_array = B[0]
-                for ci in B[1:]:
-                    diagonal_array = diagonal_array + ci
+            self._linear(B, space, trial, self.coefficients(test, trial))
+
+    @property
+    def nbytes(self):
+        """Size in bytes of scale arrays, work arrays and transfers"""
+        if self.kind == 'bilinear':
+            arrays = [np.asarray(b if isinstance(b, np.ndarray) else b['scale'])
+                      for b in self.B]
+        else:
+            arrays = [scale for group in self.groups for k, scale in group]
+            arrays += self.scales + list(self.work.values())
+            if self.diagonal is not None:
+                arrays.append(self.diagonal)
+        return (sum(a.nbytes for a in arrays)
+                + sum(_transfer_nbytes(t) for t in self.transfers))
+
+    def coefficients(self, test, trial):
+        """Return scalar coefficient of each term of test and trial"""
+        test_scale = test.scales()
+        trial_scale = trial.scales()
+        return tuple(test_scale[vec, test_j]*trial_scale[vec, trial_j]
+                     for vec, test_j, trial_j in self.coefs)
+
+    def _bilinear(self, A, B, space):
+        self.kind = 'bilinear'
+        self.A = None
+        self.B = B
+        if np.all([isinstance(b, np.ndarray) for b in B]):
+            # All Fourier
+            self.npaxis = None
+            if space.ndim() == 1:
+                A[0][0].axis = 0
+                self.A = A[0][0]
 
-                return DiagonalMatrix(diagonal_array)
+        elif np.all([len(f) == 2 for f in B]):
+            # Only one nonperiodic direction
+            self.npaxis = [b for b in B[0].keys() if isinstance(b, int)][0]
 
-            else:
-                if uh.rank() == 2:
-                    for i, b in enumerate(B):
-                        output_array += b*uh[trial_indices[0, i]]
+        elif np.all([len(f) > 2 for f in B]):
+            # Two or more nonperiodic directions
+            self.npaxis = -1
 
-                else:
-                    diagonal_array = B[0]
-                    for ci in B[1:]:
-                        diagonal_array = diagonal_array + ci
-                    output_array[:] = diagonal_array*uh
-
-                return output_array
-
-    elif np.all([len(f) == 2 for f in B]):
-        # Only one nonperiodic direction
-
-        npaxis = [b for b in B[0].keys() if isinstance(b, int)][0]
-
-        ## 1D case for itself, because it is simpler
-        #if space.ndim() == 1:
-            #from IPython import embed; embed()
-            #if trial.argument() == 1:
-                #if len(B) == 1:
-                    #b = B[0][npaxis]
-                    #b.scale = B[0]['scale']
-                    #return b
-                #else:
-
-            #else:
-                #mat = B[0][npaxis]
-                #mat.scale = B[0]['scale']
-                #output_array = mat.matvec(uh, output_array, axis=npaxis)
-                #output_array *= mat.scale
-                #return output_array
-
-        if trial.argument() == 1:  # bilinear form
-            b = B[0][npaxis]
-            b.scale = B[0]['scale']
-            C = {b.get_key(): b}
-            for bb in B[1:]:
-                b = bb[npaxis]
-                b.scale = bb['scale']
-                name = b.get_key()
-                if name in C:
-                    C[name].scale = C[name].scale + b.scale
-                else:
-                    C[name] = b
+        else:
+            raise NotImplementedError
 
-            if len(C) == 1:
-                return C[b.get_key()]
-            else:
-                return C
+    def matrices(self, coefs):
+        """Return assembled matrices of bilinear form
 
-        else: # linear form
-            for i, bb in enumerate(B):
-                b = bb[npaxis]
-                b.scale = bb['scale']
-                if uh.rank() == 2:
-                    sp = uh.function_space()
-                    wh = Array(sp[npaxis], forward_output=True)
-                    wh = b.matvec(uh[trial_indices[0, i]], wh, axis=b.axis)
+        The returned matrices share diagonals with the cached matrices, but
+        have their own scale arrays
 
-                else:
-                    wh = Array(trialspace, forward_output=True)
-                    wh = b.matvec(uh, wh, axis=b.axis)
-                output_array += wh*b.scale
+        args:
+            coefs     tuple   Scalar coefficient of each term
 
-            return output_array
+        """
+        B = self.B
+        if self.npaxis is None:
+            if self.A is not None:
+                return _copy(self.A)
+            diagonal_array = coefs[0]*B[0]
+            for c, ci in zip(coefs[1:], B[1:]):
+                diagonal_array = diagonal_array + c*ci
+            return DiagonalMatrix(diagonal_array)
 
-    elif np.all([len(f) == 3 for f in B]):
-        # Two nonperiodic directions
+        elif self.npaxis == -1:
+            result = []
+            for c, bb in zip(coefs, B):
+                b = {key: _copy(val) for key, val in six.iteritems(bb)
+                     if isinstance(key, int)}
+                b['scale'] = c*bb['scale']
+                result.append(b)
+            return result
 
-        if trial.argument() == 1:  # bilinear form
-            return B
+        C = {}
+        for c, bb in zip(coefs, B):
+            b = bb[self.npaxis]
+            name = b.get_key()
+            if name in C:
+                C[name].scale = C[name].scale + c*bb['scale']
+            else:
+                C[name] = b._shared_copy(b.testfunction, b.trialfunction)
+                C[name].scale = c*bb['scale']
+
+        if len(C) == 1:
+            return C[name]
+        return C
+
+    def _linear(self, B, space, trial, coefs):
+        # Group terms with equal matrices and index into a vector Function
+        trial_indices = trial.indices()
+        terms = {}
+        if np.all([isinstance(b, np.ndarray) for b in B]):
+            # All Fourier
+            self.kind = 'diagonal'
+            for k, b in enumerate(B):
+                key = trial_indices[0, k]
+                terms.setdefault(key, ((), []))[1].append((k, b))
+
+        elif np.all([len(f) == 2 for f in B]):
+            # Only one nonperiodic direction
+            self.kind = 'one'
+            npaxis = [b for b in B[0].keys() if isinstance(b, int)][0]
+            for k, bb in enumerate(B):
+                b = bb[npaxis]
+                key = (b.get_key(), trial_indices[0, k])
+                terms.setdefault(key, ((b,), []))[1].append((k, bb['scale']))
 
-        else: # linear form
+        elif np.all([len(f) > 2 for f in B]):
+            # Two nonperiodic directions
+            assert np.all([len(f) == 3 for f in B])
+            self.kind = 'two'
             npaxes = [b for b in B[0].keys() if isinstance(b, int)]
-
             pencilA = space.forward.output_pencil
             subcomms = [c.Get_size() for c in pencilA.subcomm]
             axis = pencilA.axis
@@ -350,38 +455,102 @@ def inner(expr0, expr1, output_array=None, uh_hat=None):
             npaxes.remove(axis)
             second_axis = npaxes[0]
             pencilB = pencilA.pencil(second_axis)
-            transAB = pencilA.transfer(pencilB, 'd')
-
-            # Output data is aligned in axis, but may be distributed in all other directions
+            self.dtype = space.forward.output_array.dtype
+            self.transAB = pencilA.transfer(pencilB, self.dtype)
+            self.transfers.append(self.transAB)
+            self.axes = (axis, second_axis)
+            for k, bb in enumerate(B):
+                key = (bb[axis].get_key(), bb[second_axis].get_key(),
+                       trial_indices[0, k])
+                terms.setdefault(key, ((bb[axis], bb[second_axis]), []))[1].append(
+                    (k, bb['scale']))
 
+        else:
+            raise NotImplementedError
+
+        self.terms = []
+        self.groups = []
+        for key, (mats, group) in six.iteritems(terms):
+            self.terms.append((key if self.kind == 'diagonal' else key[-1],) + mats)
+            self.groups.append(group)
+        self._coefs = None
+        self.scales = []
+        self.diagonal = None
+        self._update(coefs)
+
+        # Work arrays of the same shape as the transformed trial function
+        output = getattr(space.forward, 'output_array', None)
+        if output is not None and (self.kind != 'diagonal' or trial.rank() == 2):
+            self.get_work('w', output.shape, output.dtype)
+            if self.kind == 'two':
+                self.get_work('wB', tuple(self.transAB.subshapeB), self.dtype)
+                self.get_work('wcB', tuple(self.transAB.subshapeB), self.dtype)
+
+    def _update(self, coefs):
+        """Merge scales of the terms of linear form for new coefficients"""
+        if self._coefs is not None and coefs == self._coefs:
+            return
+        self._coefs = coefs
+        self.scales = []
+        for group in self.groups:
+            k, scale = group[0]
+            scale = coefs[k]*scale
+            for k, s in group[1:]:
+                scale = scale + coefs[k]*s
+            self.scales.append(scale)
+        if self.kind == 'diagonal':
+            self.diagonal = self.scales[0]
+            for s in self.scales[1:]:
+                self.diagonal = self.diagonal + s
+
+    def get_work(self, name, shape, dtype):
+        w = self.work.get(name)
+        if w is None or w.shape != shape or w.dtype != dtype:
+            w = self.work[name] = np.zeros(shape, dtype=dtype)
+        return w
+
+    def __call__(self, uh, output_array, coefs):
+        """Add linear form of uh to output_array
+
+        args:
+            uh              Function    Transformed Function of trial
+            output_array    Array       Return array
+            coefs           tuple       Scalar coefficient of each term
+
+        """
+        self._update(coefs)
+        if self.kind == 'diagonal':
             if uh.rank() == 2:
-                sp = uh.function_space()
-                wh = Array(sp[axis], forward_output=True)
-                wc = Array(sp[axis], forward_output=True)
+                for (index,), scale in zip(self.terms, self.scales):
+                    w = self.get_work('w', uh[index].shape, output_array.dtype)
+                    w = np.multiply(scale, uh[index], out=w)
+                    output_array += w
 
             else:
-                wh = Array(trialspace, forward_output=True)
-                wc = Array(trialspace, forward_output=True)
+                output_array = np.multiply(self.diagonal, uh, out=output_array)
 
-            whB = np.zeros(transAB.subshapeB)
-            wcB = np.zeros(transAB.subshapeB)
+        elif self.kind == 'one':
+            for (index, mat), scale in zip(self.terms, self.scales):
+                v = uh[index] if uh.rank() == 2 else uh
+                w = self.get_work('w', v.shape, v.dtype)
+                w = mat.matvec(v, w, axis=mat.axis)
+                w *= scale
+                output_array += w
 
-            for i, bb in enumerate(B):
-                if uh.rank() == 2:
-                    wc[:] = uh[trial_indices[0, i]]
-                else:
-                    wc[:] = uh
-
-                b = bb[axis]
-                wh = b.matvec(wc, wh, axis=axis)
+        else:
+            axis, second_axis = self.axes
+            for (index, mat0, mat1), scale in zip(self.terms, self.scales):
+                v = uh[index] if uh.rank() == 2 else uh
+                w = self.get_work('w', v.shape, v.dtype)
+                wB = self.get_work('wB', tuple(self.transAB.subshapeB), self.dtype)
+                wcB = self.get_work('wcB', tuple(self.transAB.subshapeB), self.dtype)
+                w = mat0.matvec(v, w, axis=axis)
 
                 # align in second non-periodic axis
-                transAB.forward(wh, whB)
-                b = bb[second_axis]
-                wcB = b.matvec(whB, wcB, axis=second_axis)
-                transAB.backward(wcB, wh)
-                wh *= bb['scale']
-                output_array += wh
-
-            return output_array
+                self.transAB.forward(w, wB)
+                wcB = mat1.matvec(wB, wcB, axis=second_axis)
+                self.transAB.backward(wcB, w)
+                w *= scale
+                output_array += w
 
+        return output_array
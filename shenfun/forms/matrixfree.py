@@ -0,0 +1,80 @@
+import numpy as np
+from .arguments import Function, Array
+from .project import project
+
+__all__ = ('MatrixFreeOperator',)
+
+
+class MatrixFreeOperator(object):
+    """Matrix-free operator with variable coefficients
+
+    The operator is a sum of terms c_j(x)*L_j(u), where the c_j are arrays in
+    physical space and the L_j are linear forms of u, like div(grad(u)) or
+    Dx(u, 0, 1). It is applied to expansion coefficients u_hat of space T
+    pseudo-spectrally as
+
+        y = (v, sum_j c_j*L_j(u))
+
+    where each L_j(u) is projected to space TL and transformed to physical
+    space, multiplied with c_j, and then tested with v of T through a
+    scalar product. For example, -div(k grad(u)) is the sum of the terms
+    (-k, div(grad(u))) and (-dk/dx_i, Dx(u, i, 1)).
+
+    The operator is used with the Krylov solvers of shenfun.la, with the
+    constant-coefficient solvers as preconditioners. All work arrays are
+    allocated once.
+
+    args:
+        T         TensorProductSpace of u and v
+        terms     List of tuples (c, L), where c is a number or an array
+                  broadcastable to physical arrays of T, and L is a function
+                  that returns the linear form for a Function, e.g.,
+                  lambda u: div(grad(u))
+
+    kwargs:
+        TL        TensorProductSpace for the linear forms, e.g., with
+                  orthogonal bases instead of bases with boundary conditions.
+                  Must use the same quadrature points as T. Defaults to T
+
+    Example:
+
+        >>> A = MatrixFreeOperator(T, [(-k, lambda u: div(grad(u))),
+                                       (-kx, lambda u: Dx(u, 0, 1)),
+                                       (-ky, lambda u: Dx(u, 1, 1))], TL)
+        >>> y = A(u_hat, y)
+
+    """
+    def __init__(self, T, terms, TL=None):
+        self.T = T
+        self.TL = T if TL is None else TL
+        assert all(np.allclose(x, y) for x, y in zip(T.local_mesh(True),
+                                                     self.TL.local_mesh(True)))
+        u = Function(T, False)
+        self.terms = [(c, L(u)) for c, L in terms]
+        self.w_hat = Array(self.TL)
+        self.w = Array(self.TL, False)
+        self.work = Array(T, False)
+
+    def __call__(self, u_hat, output_array=None):
+        """Apply operator to u_hat and return result
+
+        args:
+            u_hat     Function(T, True)   Expansion coefficients
+
+        kwargs:
+            output_array  Function(T, True)  Return array
+
+        """
+        if output_array is None:
+            output_array = Array(self.T)
+        if not hasattr(u_hat, 'rank'):
+            u_hat = Function(self.T, buffer=u_hat)
+        self.work[:] = 0
+        for c, expr in self.terms:
+            self.w_hat = project(expr, self.TL, output_array=self.w_hat,
+                                 uh_hat=u_hat)
+            self.w = self.TL.backward(self.w_hat, self.w)
+            self.w *= c
+            self.work += self.w
+        output_array = self.T.scalar_product(self.work, output_array)
+        return output_array
@@ -0,0 +1,178 @@
+import numpy as np
+from shenfun.tensorproductspace import MixedTensorProductSpace
+from .arguments import Function, Array
+from .operators import Dx
+from .project import project
+
+__all__ = ('NonlinearProduct',)
+
+
+def _batched(T, n):
+    return T if n == 1 else MixedTensorProductSpace([T]*n, batched=True)
+
+
+class NonlinearProduct(object):
+    """Dealiased nonlinear product of Functions in spectral space
+
+    All the Functions of the product, including derivatives, are transformed
+    backward with one batched transform to the padded mesh of
+    T.get_dealiased(padding_factor). The product is computed in place on the
+    padded mesh, and transformed forward with one batched transform, that
+    truncates it to the spectral shape of T. Derivatives are computed in
+    spectral space by projection to TD. All work arrays are allocated once.
+
+    args:
+        T         VectorTensorProductSpace of u for 'cross' and 'convection',
+                  or TensorProductSpace of the factors for 'mul'
+        product   str   'cross'         u x curl(u)
+                        'convection'    (u . grad)u
+                        'mul'           Product of num_factors scalars
+
+    kwargs:
+        padding_factor  float   Factor for padding backward transforms.
+                                padding_factor=1.5 corresponds to a
+                                3/2-rule, which dealiases quadratic
+                                products. A product of n factors requires
+                                padding_factor=(n+1)/2
+        num_factors     int     Number of scalar factors for 'mul'
+        TD                      TensorProductSpace for derivatives of the
+                                components of u. Defaults to the space of
+                                the components. Derivatives are transformed
+                                together with u if TD is this space
+
+    Example:
+
+        >>> H = NonlinearProduct(TV, 'cross')
+        >>> H_hat = H(U_hat, H_hat)
+
+    """
+    def __init__(self, T, product, padding_factor=1.5, num_factors=2, TD=None):
+        assert product in ('cross', 'convection', 'mul')
+        self.T = T
+        self.product = product
+        if product == 'mul':
+            assert not isinstance(T, MixedTensorProductSpace)
+            assert num_factors > 1
+            T0 = T
+            nu, nd, nout = num_factors, 0, 1
+        else:
+            assert isinstance(T, MixedTensorProductSpace)
+            T0 = T[0]
+            assert all(space is T0 for space in T)
+            ndim = T0.ndim()
+            assert T.num_components() == ndim
+            if product == 'cross':
+                assert ndim in (2, 3)
+                nd = 1 if ndim == 2 else 3
+            else:
+                nd = ndim**2
+            nu, nout = ndim, ndim
+        self.TD = TD = T0 if TD is None else TD
+
+        Tp = T0.get_dealiased(padding_factor)
+        if TD is T0:
+            groups = [(Tp, nu+nd)]
+        else:
+            groups = [(Tp, nu), (TD.get_dealiased(padding_factor), nd)]
+
+        # Spectral and physical arrays of each group of Functions transformed
+        # together, and views of all Functions in each
+        self.groups = []
+        fields_hat = []
+        fields = []
+        for Tg, n in groups:
+            if n == 0:
+                continue
+            f_hat = np.zeros((n,)+tuple(Tg.local_shape(True)),
+                             dtype=Tg.forward.output_array.dtype)
+            f = np.zeros((n,)+tuple(Tg.local_shape(False)), dtype=Tg.dtype)
+            self.groups.append((_batched(Tg, n), f_hat, f))
+            fields_hat.extend(f_hat)
+            fields.extend(f)
+        self.u_hat = [Function(T0, buffer=f) for f in fields_hat[:nu]]
+        self.du_hat = [Function(TD, buffer=f) for f in fields_hat[nu:]]
+        self.fields = fields
+        self.work_hat = Array(TD)
+
+        # Derivatives du_i/dx_j as forms
+        self.D = {}
+        if product != 'mul':
+            for i in range(ndim):
+                for j in range(ndim):
+                    self.D[i, j] = Dx(self.u_hat[i], j, 1)
+
+        self.Bout = _batched(Tp, nout)
+        self.out = np.zeros((nout,)+tuple(Tp.local_shape(False)), dtype=Tp.dtype)
+        self.work = np.zeros(Tp.local_shape(False), dtype=Tp.dtype)
+
+    def derivative(self, i, j, output_array):
+        """Return spectral du_i/dx_j in output_array, a Function(TD)"""
+        return project(self.D[i, j], self.TD, output_array=output_array,
+                       uh_hat=self.u_hat[i])
+
+    def __call__(self, u_hat, output_array=None):
+        """Return dealiased product
+
+        args:
+            u_hat     Function(T, True) for 'cross' and 'convection', or
+                      sequence of num_factors Function(T, True) for 'mul'
+
+        kwargs:
+            output_array  Function(T, True)  Return array
+
+        """
+        if output_array is None:
+            output_array = Function(self.T)
+        for ui, vi in zip(self.u_hat, u_hat):
+            ui[:] = vi
+        ndim = len(self.u_hat)
+        if self.product == 'cross':
+            # Components of curl(u) in 3D, and the z-component in 2D
+            comps = ((1, 2), (2, 0), (0, 1)) if ndim == 3 else ((0, 1),)
+            for du, (i, j) in zip(self.du_hat, comps):
+                du = self.derivative(j, i, du)
+                self.work_hat = self.derivative(i, j, self.work_hat)
+                du -= self.work_hat
+        elif self.product == 'convection':
+            for i in range(ndim):
+                for j in range(ndim):
+                    self.derivative(i, j, self.du_hat[i*ndim+j])
+
+        for B, f_hat, f in self.groups:
+            if f_hat.shape[0] == 1:
+                B.backward(f_hat[0], f[0])
+            else:
+                f = B.backward(f_hat, f)
+
+        # Product on padded mesh
+        u = self.fields[:len(self.u_hat)]
+        du = self.fields[len(self.u_hat):]
+        out = self.out
+        w = self.work
+        if self.product == 'mul':
+            np.multiply(u[0], u[1], out=out[0])
+            for ui in u[2:]:
+                out[0] *= ui
+        elif self.product == 'cross':
+            if ndim == 2:
+                np.multiply(u[1], du[0], out=out[0])
+                np.multiply(u[0], du[0], out=out[1])
+                np.negative(out[1], out=out[1])
+            else:
+                for i in range(3):
+                    j, k = (i+1) % 3, (i+2) % 3
+                    np.multiply(u[j], du[k], out=out[i])
+                    np.multiply(u[k], du[j], out=w)
+                    out[i] -= w
+        else:
+            for i in range(ndim):
+                np.multiply(u[0], du[i*ndim], out=out[i])
+                for j in range(1, ndim):
+                    np.multiply(u[j], du[i*ndim+j], out=w)
+                    out[i] += w
+
+        if out.shape[0] == 1:
+            output_array = self.Bout.forward(out[0], output_array)
+        else:
+            output_array = self.Bout.forward(out, output_array)
+        return output_array
@@ -3,7 +3,7 @@ from shenfun.tensorproductspace import MixedTensorProductSpace
 from .arguments import Expr, TestFunction, TrialFunction, BasisFunction, Array
 from .inner import inner
 
-__all__ = ('project',)
+__all__ = ('project', 'Projector')
 
 
 def project(uh, T, output_array=None, uh_hat=None):
@@ -44,47 +44,108 @@ def project(uh, T, output_array=None, uh_hat=None):
 
     """
 
-    if output_array is None:
-        output_array = Array(T)
+    P = getattr(T, '_projector', None)
+    if P is None or P.T is not T:
+        P = T._projector = Projector(T)
+    return P(uh, output_array=output_array, uh_hat=uh_hat)
 
-    if isinstance(uh, np.ndarray):
-        # Just regular forward transform
-        output_array = T.forward(uh, output_array)
-        return output_array
 
-    assert isinstance(uh, (Expr, BasisFunction))
-
-    v = TestFunction(T)
-    u = TrialFunction(T)
-    output_array = inner(v, uh, output_array=output_array, uh_hat=uh_hat)
-    B = inner(v, u)
-    if isinstance(B, list) and not isinstance(T, MixedTensorProductSpace):
-        # Means we have two non-periodic directions
-        npaxes = [b for b in B[0].keys() if isinstance(b, int)]
-        assert len(npaxes) == 2
-
-        pencilA = T.forward.output_pencil
-        axis = pencilA.axis
-        npaxes.remove(axis)
-        second_axis = npaxes[0]
-        pencilB = pencilA.pencil(second_axis)
-        transAB = pencilA.transfer(pencilB, 'd')
-        output_arrayB = np.zeros(transAB.subshapeB)
-        output_arrayB2 = np.zeros(transAB.subshapeB)
-        b = B[0][axis]
-        output_array = b.solve(output_array, output_array, axis=axis)
-        transAB.forward(output_array, output_arrayB)
-        b = B[0][second_axis]
-        output_arrayB2 = b.solve(output_arrayB, output_arrayB2, axis=second_axis)
-        transAB.backward(output_arrayB2, output_array)
-
-    else:
-        # Just zero or one non-periodic direction
-        if v.rank() == 1:
-            axis = B.axis if hasattr(B, 'axis') else 0 # if periodic the solve is just an elementwise division not using axis
-            output_array = B.solve(output_array, output_array, axis=axis)
+class Projector(object):
+    """Projection to tensor product space T
+
+    The mass matrix of T, with its factorizations, and the transfer objects
+    and work arrays used for spaces with several non-periodic directions, are
+    created once and reused for all projections. Repeated projections then
+    only assemble the linear form and solve. The function project uses one
+    Projector for each space, which is destroyed with the space. The
+    transfer objects of other Projectors are freed with destroy.
+
+    args:
+        T         TensorProductSpace instance
+
+    Example:
+
+        P = Projector(T)
+        du_hat = P(Dx(uj, 0, 1), output_array=du_hat, uh_hat=u_hat)
+
+    """
+    def __init__(self, T):
+        self.T = T
+        self.v = TestFunction(T)
+        self.B = inner(self.v, TrialFunction(T))
+        self.axes = None
+        self.transfers = []
+        if isinstance(self.B, list) and not isinstance(T, MixedTensorProductSpace):
+            # Several non-periodic directions. Solve along each, with data
+            # aligned in pencils for each non-periodic axis in turn.
+            axes = [b for b in self.B[0].keys() if isinstance(b, int)]
+            pencil = T.forward.output_pencil
+            dtype = T.forward.output_array.dtype
+            if pencil.axis in axes:
+                axes.remove(pencil.axis)
+                axes.insert(0, pencil.axis)
+            pencils = [pencil]
+            self.axes = [axes[0] if pencil.axis == axes[0] else None]
+            for axis in axes[int(self.axes[0] is not None):]:
+                pencils.append(pencils[-1].pencil(axis))
+                self.axes.append(axis)
+            self.transfers = [p0.transfer(p1, dtype) for p0, p1 in
+                              zip(pencils[:-1], pencils[1:])]
+            self.work = [None]+[np.zeros(p.subshape, dtype=dtype)
+                                for p in pencils[1:]]
+
+    def destroy(self):
+        for trans in self.transfers:
+            trans.destroy()
+
+    def __call__(self, uh, output_array=None, uh_hat=None):
+        """Project uh to T and return spectral expansion coefficients
+
+        args:
+            uh        Expr or Function
+
+        kwargs:
+            output_array  Function(T, True)  Return array
+            uh_hat        Function(T, True)  The transform of uh in uh's
+                                             space, see project
+
+        """
+        T = self.T
+        if output_array is None:
+            output_array = Array(T)
+
+        if isinstance(uh, np.ndarray):
+            # Just regular forward transform
+            output_array = T.forward(uh, output_array)
+            return output_array
+
+        assert isinstance(uh, (Expr, BasisFunction))
+
+        v = self.v
+        B = self.B
+        # inner adds the terms of non-periodic spaces to output_array
+        output_array[...] = 0
+        output_array = inner(v, uh, output_array=output_array, uh_hat=uh_hat)
+        if self.axes is not None:
+            x = output_array
+            for i, axis in enumerate(self.axes):
+                if i > 0:
+                    self.transfers[i-1].forward(x, self.work[i])
+                    x = self.work[i]
+                if axis is not None:
+                    x = B[0][axis].solve(x, x, axis=axis)
+            for i in range(len(self.axes)-1, 0, -1):
+                y = output_array if i == 1 else self.work[i-1]
+                self.transfers[i-1].backward(x, y)
+                x = y
+
         else:
-            for i in range(v.function_space().ndim()):
-                axis = B[i].axis if hasattr(B[i], 'axis') else 0
-                output_array[i] = B[i].solve(output_array[i], output_array[i], axis=axis)
-    return output_array
+            # Just zero or one non-periodic direction
+            if v.rank() == 1:
+                axis = B.axis if hasattr(B, 'axis') else 0 # if periodic the solve is just an elementwise division not using axis
+                output_array = B.solve(output_array, output_array, axis=axis)
+            else:
+                for i in range(v.function_space().ndim()):
+                    axis = B[i].axis if hasattr(B[i], 'axis') else 0
+                    output_array[i] = B[i].solve(output_array[i], output_array[i], axis=axis)
+        return output_array
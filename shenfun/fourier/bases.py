@@ -116,10 +116,11 @@ class FourierBase(SpectralBase):
                                        use Vandermonde type
 
         If kwargs input_array/output_array are not given, then use predefined
-        arrays as planned with self.plan
+        arrays as planned with self.plan. Collapsed axes are always
+        transformed with the fast transform.
 
         """
-        if fast_transform is False:
+        if fast_transform is False and len(self.axes) == 1:
             return SpectralBase.forward(self, input_array, output_array, False)
 
         if input_array is not None:
@@ -128,7 +129,7 @@ class FourierBase(SpectralBase):
         output = self.xfftn_fwd()
         self._truncation_forward(self.xfftn_fwd.output_array,
                                  self.forward.output_array)
-        self.forward._output_array *= (1./self.N/self.padding_factor)
+        self.forward._output_array *= (1./self._size())
 
         if output_array is not None:
             output_array[...] = self.forward.output_array
@@ -136,6 +137,15 @@ class FourierBase(SpectralBase):
         else:
             return self.forward.output_array
 
+    def _size(self):
+        """Return number of points of planned transform
+
+        This is the padded number of points, multiplied with the number of
+        points along all other collapsed axes.
+        """
+        shape = self.xfftn_fwd.input_array.shape
+        return np.prod([shape[axis] for axis in self.axes[:-1]])*self.N*self.padding_factor
+
     def apply_inverse_mass(self, array):
         """Apply inverse mass, which is 2pi*identity for Fourier basis
 
@@ -154,9 +164,9 @@ class FourierBase(SpectralBase):
         if input_array is not None:
             self.xfftn_fwd.input_array[...] = input_array
 
-        if fast_transform:
+        if fast_transform or len(self.axes) > 1:
             output = self.xfftn_fwd()
-            output *= (2*np.pi/self.N/self.padding_factor)
+            output *= ((2*np.pi)**len(self.axes)/self._size())
 
         else:
             assert abs(self.padding_factor-1) < 1e-8
@@ -180,6 +190,8 @@ class R2CBasis(FourierBase):
         self.N = N
         self._xfftn_fwd = pyfftw.builders.rfft
         self._xfftn_bck = pyfftw.builders.irfft
+        self._xfftn_fwd_nd = pyfftw.builders.rfftn
+        self._xfftn_bck_nd = pyfftw.builders.irfftn
         if plan:
             self.plan((int(np.floor(padding_factor*N)),), 0, np.float, {})
 
@@ -221,10 +233,12 @@ class R2CBasis(FourierBase):
             output_array   (output)   Function values on quadrature mesh
 
         """
+        if len(self.axes) > 1:
+            # Collapsed axes are transformed together by the fast transform
+            return self.evaluate_expansion_all(input_array, output_array)
         assert abs(self.padding_factor-1) < 1e-8
         assert self.N == output_array.shape[self.axis]
-        points = self.points_and_weights(self.N)[0]
-        P = self.vandermonde(points)
+        P = self.cached_vandermonde_basis_derivative(0)
         if output_array.ndim == 1:
             output_array[:] = np.dot(P, input_array).real
             if self.N % 2 == 0:
@@ -285,6 +299,8 @@ class C2CBasis(FourierBase):
         self.N = N
         self._xfftn_fwd = pyfftw.builders.fft
         self._xfftn_bck = pyfftw.builders.ifft
+        self._xfftn_fwd_nd = pyfftw.builders.fftn
+        self._xfftn_bck_nd = pyfftw.builders.ifftn
         if plan:
             self.plan((int(np.floor(padding_factor*N)),), 0, np.complex, {})
 
@@ -320,11 +336,12 @@ class C2CBasis(FourierBase):
             output_array   (output)   Function values on quadrature mesh
 
         """
+        if len(self.axes) > 1:
+            # Collapsed axes are transformed together by the fast transform
+            return self.evaluate_expansion_all(input_array, output_array)
         assert abs(self.padding_factor-1) < 1e-8
         assert self.N == output_array.shape[self.axis]
-        points = self.points_and_weights(self.N)[0]
-        V = self.vandermonde(points)
-        P = self.get_vandermonde_basis(V)
+        P = self.cached_vandermonde_basis_derivative(0)
         if output_array.ndim == 1:
             output_array = np.dot(P, input_array, out=output_array)
         else:
@@ -1,6 +1,54 @@
+import os
+import hashlib
+import tempfile
 import numpy as np
+import scipy.linalg as scipy_la
+from scipy.linalg.lapack import dgbtrf
+from scipy.sparse.linalg import splu
+from mpi4py import MPI
 from shenfun.optimization import la
-from shenfun.matrixbase import SparseMatrix
+from shenfun.matrixbase import SparseMatrix, _strided_view3D, _get_threads
+from shenfun.utilities.cache import LRUCache
+
+
+def _view3D(u, axis):
+    """Return 3D view of array u, with axis in the middle
+
+    Used for solving along any axis of arrays with more than three
+    dimensions, e.g., batched vector components.
+    """
+    assert u.flags['C_CONTIGUOUS']
+    shape = u.shape
+    return u.reshape((int(np.prod(shape[:axis])), shape[axis],
+                      int(np.prod(shape[axis+1:]))))
+
+
+def _solve_view(b, u, axis, N):
+    """Return output array u and view of its first N items along axis
+
+    If u is provided, then the first N items of b are copied to u.
+    """
+    if u is None:
+        u = b
+    else:
+        assert u.shape == b.shape
+    s = [slice(None)]*u.ndim
+    s[axis] = slice(0, N)
+    s = tuple(s)
+    if not u is b:
+        u[s] = b[s]
+    return u, u[s]
+
+def _contiguous_view3D(u, x, axis):
+    """Return C-contiguous 3D array with axis in the middle
+
+    Returns a view of u if u is C-contiguous, and otherwise a copy of x, which
+    is a view of the first items of u along axis. Also returns whether the
+    array is a copy.
+    """
+    if u.flags['C_CONTIGUOUS']:
+        return _view3D(u, axis), False
+    return _view3D(np.ascontiguousarray(x), axis), True
 
 
 class TDMA(object):
@@ -40,7 +88,7 @@ class TDMA(object):
             self.init(N)
 
         if len(u.shape) == 3:
-            la.TDMA_SymSolve3D(self.dd, self.ud, self.L, u, axis)
+            la.TDMA_SymSolve3D(self.dd, self.ud, self.L, u, axis, v.threads)
             #la.TDMA_SymSolve3D_ptr(self.dd[self.s], self.ud[self.s], self.L,
                                    #u[self.s], axis)
         elif len(u.shape) == 2:
@@ -50,7 +98,8 @@ class TDMA(object):
             la.TDMA_SymSolve(self.dd, self.ud, self.L, u)
 
         else:
-            raise NotImplementedError
+            la.TDMA_SymSolve3D(self.dd, self.ud, self.L, _view3D(u, axis), 1,
+                               v.threads)
 
         u /= self.mat.scale
         return u
@@ -151,9 +200,10 @@ class PDMA(object):
         N = u.shape[0]
         if not N == self.N:
             self.init(N)
+        threads = self.mat.testfunction[0].threads
         if len(u.shape) == 3:
             #la.PDMA_Symsolve3D(self.d0, self.d1, self.d2, u, axis)
-            la.PDMA_Symsolve3D_ptr(self.d0, self.d1, self.d2, u, axis)
+            la.PDMA_Symsolve3D_ptr(self.d0, self.d1, self.d2, u, axis, threads)
 
         elif len(u.shape) == 2:
             la.PDMA_Symsolve2D(self.d0, self.d1, self.d2, u, axis)
@@ -162,11 +212,746 @@ class PDMA(object):
             la.PDMA_Symsolve(self.d0, self.d1, self.d2, u[:-4])
 
         else:
-            raise NotImplementedError
+            la.PDMA_Symsolve3D_ptr(self.d0, self.d1, self.d2, _view3D(u, axis), 1,
+                                   threads)
 
         u /= self.mat.scale
         return u
 
+class Banded(object):
+    """LU factorization of general sparse matrix
+
+    Real matrices with narrow bands are factorized with LAPACK's gbtrf in
+    compact banded storage, and solved along any axis without copying the
+    right hand side. Other matrices are factorized with
+    scipy.sparse.linalg.splu. The factorization is computed once and
+    reused for all subsequent solves.
+
+    Note that the scale of SpectralMatrices is not applied.
+
+    args:
+        mat    SparseMatrix
+
+    """
+
+    def __init__(self, mat):
+        assert isinstance(mat, SparseMatrix)
+        assert mat.shape[0] == mat.shape[1]
+        self.mat = mat
+        self.N = mat.shape[0]
+        self.kl = max(0, -min(mat.keys()))
+        self.ku = max(0, max(mat.keys()))
+        self.lu = None
+        self.piv = None
+        self.splu = None
+        self.init()
+
+    def init(self):
+        N, kl, ku = self.N, self.kl, self.ku
+        if (2*kl+ku+1 < N//2 and
+                not any(np.iscomplexobj(val) for val in self.mat.values())):
+            ab = np.zeros((2*kl+ku+1, N))
+            for key, val in self.mat.items():
+                ab[kl+ku-key, max(0, key):N+min(0, key)] = val
+            self.lu, self.piv, info = dgbtrf(ab, kl, ku, overwrite_ab=1)
+            assert info == 0, 'Matrix is singular'
+        else:
+            self.splu = splu(self.mat.diags('csc'))
+
+    def __call__(self, b, u=None, axis=0):
+        """Solve for the first N items of b along axis
+
+        args:
+            b    (input/output)    Right hand side on entry. Solution on
+                                   exit unless u is provided.
+            u    (output)          Optional output array
+
+        kwargs:
+            axis     int           The axis to solve along
+
+        """
+        u, x = _solve_view(b, u, axis, self.N)
+        if self.lu is not None:
+            x3, copied = _strided_view3D(x, axis)
+            la.Banded_Solve3D(self.lu, self.piv, self.kl, self.ku, x3,
+                              _get_threads(self.mat))
+            if copied:
+                x[:] = x3.reshape(x.shape)
+
+        else:
+            x = np.moveaxis(x, axis, 0)
+            xr = x.reshape((self.N, -1))
+            if np.iscomplexobj(xr) and self.splu.L.dtype.char in 'fd':
+                xr = self.splu.solve(xr.real) + 1j*self.splu.solve(xr.imag)
+            else:
+                xr = self.splu.solve(xr)
+            x[:] = xr.reshape(x.shape)
+
+        return u
+
+class Diagonal(object):
+    """Solver for diagonal matrix
+
+    Note that the scale of SpectralMatrices is not applied.
+
+    args:
+        mat    SparseMatrix with only the main diagonal
+
+    """
+
+    def __init__(self, mat):
+        assert isinstance(mat, SparseMatrix)
+        assert list(mat.keys()) == [0]
+        self.mat = mat
+        self.N = mat.shape[0]
+        self.d = np.broadcast_to(mat[0], self.N)
+
+    def __call__(self, b, u=None, axis=0):
+        """Solve for the first N items of b along axis
+
+        args:
+            b    (input/output)    Right hand side on entry. Solution on
+                                   exit unless u is provided.
+            u    (output)          Optional output array
+
+        kwargs:
+            axis     int           The axis to solve along
+
+        """
+        u, x = _solve_view(b, u, axis, self.N)
+        s = [np.newaxis]*x.ndim
+        s[axis] = slice(None)
+        x /= self.d[tuple(s)]
+        return u
+
+class SymTDMA(object):
+    """Solver for symmetric matrix with diagonals in offsets -2, 0, 2
+
+    Odd and even coefficients are decoupled, and each is solved as a
+    tridiagonal system without pivoting. Hence the matrix must be definite.
+
+    Note that the scale of SpectralMatrices is not applied.
+
+    args:
+        mat    SparseMatrix
+
+    """
+
+    def __init__(self, mat):
+        assert isinstance(mat, SparseMatrix)
+        N = self.N = mat.shape[0]
+        self.mat = mat
+        self.dd = mat[0]*np.ones(N)
+        self.ud = mat.get(2, 0)*np.ones(N-2)
+        self.L = np.zeros(N-2)
+        la.TDMA_SymLU(self.dd, self.ud, self.L)
+
+    def definite(self):
+        """Return whether all pivots have the same sign"""
+        return np.all(self.dd > 0) or np.all(self.dd < 0)
+
+    def __call__(self, b, u=None, axis=0):
+        """Solve for the first N items of b along axis
+
+        args:
+            b    (input/output)    Right hand side on entry. Solution on
+                                   exit unless u is provided.
+            u    (output)          Optional output array
+
+        kwargs:
+            axis     int           The axis to solve along
+
+        """
+        u, x = _solve_view(b, u, axis, self.N)
+        x3, copied = _contiguous_view3D(u, x, axis)
+        la.TDMA_SymSolve3D(self.dd, self.ud, self.L, x3, 1,
+                           _get_threads(self.mat))
+        if copied:
+            x[:] = x3.reshape(x.shape)
+        return u
+
+class SymPDMA(object):
+    """Solver for symmetric matrix with diagonals in offsets -4, -2, 0, 2, 4
+
+    Odd and even coefficients are decoupled, and each is solved as a
+    pentadiagonal system without pivoting. Hence the matrix must be
+    definite.
+
+    Note that the scale of SpectralMatrices is not applied.
+
+    args:
+        mat    SparseMatrix
+
+    """
+
+    def __init__(self, mat):
+        assert isinstance(mat, SparseMatrix)
+        N = self.N = mat.shape[0]
+        self.mat = mat
+        self.d0 = mat[0]*np.ones(N)
+        self.d1 = mat.get(2, 0)*np.ones(N-2)
+        self.d2 = mat.get(4, 0)*np.ones(N-4)
+        la.PDMA_SymLU(self.d0, self.d1, self.d2)
+
+    def definite(self):
+        """Return whether all pivots have the same sign"""
+        return np.all(self.d0 > 0) or np.all(self.d0 < 0)
+
+    def __call__(self, b, u=None, axis=0):
+        """Solve for the first N items of b along axis
+
+        args:
+            b    (input/output)    Right hand side on entry. Solution on
+                                   exit unless u is provided.
+            u    (output)          Optional output array
+
+        kwargs:
+            axis     int           The axis to solve along
+
+        """
+        u, x = _solve_view(b, u, axis, self.N)
+        x3, copied = _contiguous_view3D(u, x, axis)
+        la.PDMA_Symsolve3D_ptr(self.d0, self.d1, self.d2, x3, 1,
+                               _get_threads(self.mat))
+        if copied:
+            x[:] = x3.reshape(x.shape)
+        return u
+
+def get_solver(mat):
+    """Return fastest exact solver for square matrix
+
+    The solver is selected from the diagonal offsets and symmetry of mat
+
+        Diagonal    Only main diagonal
+        SymTDMA     Symmetric and definite with offsets -2, 0, 2
+        SymPDMA     Symmetric and definite with offsets -4, -2, 0, 2, 4
+        Banded      All other matrices
+
+    All solvers are called as solver(b, u=None, axis=0) and solve for the
+    first N items of b along axis. The scale of SpectralMatrices is not
+    applied.
+
+    args:
+        mat    SparseMatrix
+
+    """
+    assert isinstance(mat, SparseMatrix)
+    assert mat.shape[0] == mat.shape[1]
+    N = mat.shape[0]
+    keys = set(mat.keys())
+    if keys == set((0,)):
+        return Diagonal(mat)
+
+    real = not any(np.iscomplexobj(val) for val in mat.values())
+    symmetric = all(np.all(np.asarray(mat[key]) == np.asarray(mat.get(-key)))
+                    for key in keys)
+    if real and symmetric and 0 in keys:
+        solver = None
+        if keys.issubset((-2, 0, 2)) and N > 2:
+            solver = SymTDMA(mat)
+        elif keys.issubset((-4, -2, 0, 2, 4)) and N > 4:
+            solver = SymPDMA(mat)
+        if solver is not None and solver.definite():
+            return solver
+
+    return Banded(mat)
+
+def _apply_along(M, x, y, axis):
+    """Set y = M x along axis of x, with matrix-matrix products
+
+    Complex data is multiplied with the real M through real views, such that
+    all products use real BLAS.
+    """
+    x3 = _strided_view3D(x, axis)[0]
+    y3, copied = _strided_view3D(y, axis)
+    if x3.shape[2] == 1:
+        np.matmul(x3[..., 0], M.T, out=y3[..., 0])
+    elif (np.iscomplexobj(x3) and not np.iscomplexobj(M) and
+          x3.flags['C_CONTIGUOUS'] and y3.flags['C_CONTIGUOUS']):
+        np.matmul(M, x3.view(x3.real.dtype), out=y3.view(y3.real.dtype))
+    else:
+        np.matmul(M, x3, out=y3)
+    if copied:
+        y[...] = y3.reshape(y.shape)
+    return y
+
+def _matrix_key(mat):
+    """Return key identifying the diagonals of SpectralMatrix mat"""
+    key = (mat.__class__,)
+    for basis, k in (mat.testfunction, mat.trialfunction):
+        key += basis._cache_key('matrix', basis.N, int(np.ravel(k)[0]))
+    return key
+
+class FastDiagonalization(object):
+    """Solver for tensor product systems with several non-periodic directions
+
+    The system is a sum of terms as returned by inner for bilinear forms with
+    two or more non-periodic directions, e.g.,
+
+        matrices = inner(v, div(grad(u))) + inner(v, alfa*u)
+
+    Each term is a dictionary with one SpectralMatrix for each non-periodic
+    axis, and the key 'scale' holding the contribution of the Fourier
+    directions. Along each non-periodic axis there must be a mass matrix B
+    and at most one other matrix A, up to scaling. The generalized eigenvalue
+    problem A V = B V diag(lmbda) then decouples the system, which is solved
+    as
+
+        u = (V_0 x V_1 x ...) S^{-1} (W_0 x W_1 x ...) b
+
+    where W = (B V)^{-1}, and S is diagonal with the eigenvalues and scales of
+    all terms. The dense basis changes are applied with matrix-matrix
+    products along one axis at the time, using O(N^{d+1}) operations for d
+    non-periodic directions. The data is redistributed between pencils
+    aligned in each non-periodic axis in turn. The transfers between the
+    pencils are freed with destroy.
+
+    The eigenpairs are stored in the LRUCache FastDiagonalization.cache, and
+    optionally also as files in a directory. Only homogeneous boundary
+    conditions are supported. Modes with a zero eigenvalue in all terms,
+    e.g., the constant Neumann mode, are set to zero.
+
+    args:
+        T           TensorProductSpace
+        matrices    List of dictionaries returned by inner
+
+    kwargs:
+        path        string          Directory used for storing eigenpairs
+
+    Example:
+
+        >>> u = TrialFunction(T)
+        >>> v = TestFunction(T)
+        >>> H = FastDiagonalization(T, inner(v, div(grad(u))))
+        >>> u_hat = H(u_hat, f_hat)
+
+    """
+
+    cache = LRUCache()
+
+    def __init__(self, T, matrices, path=None):
+        if isinstance(matrices, dict):
+            matrices = [matrices]
+        self.T = T
+        self.path = path
+        if path is not None and T.comm.Get_rank() == 0:
+            if not os.path.exists(path):
+                os.makedirs(path)
+        T.comm.Barrier()
+
+        axes = sorted(key for key in matrices[0] if not key == 'scale')
+        assert len(axes) > 0
+        assert all(sorted(key for key in term if not key == 'scale') == axes
+                   for term in matrices)
+
+        # Eigenpairs of each non-periodic axis, and the diagonal of each term
+        # in eigenspace
+        self.V = {}
+        self.W = {}
+        scales = [np.asarray(term['scale']) for term in matrices]
+        diagonals = [{} for term in matrices]
+        for axis in axes:
+            mats = [term[axis] for term in matrices]
+            B = mats[0]
+            for mat in mats:
+                if (np.all(np.ravel(mat.testfunction[1]) == 0) and
+                        np.all(np.ravel(mat.trialfunction[1]) == 0)):
+                    B = mat
+                    break
+            A = None
+            for mat in mats:
+                if not _matrix_key(mat) == _matrix_key(B):
+                    A = mat
+                    break
+            lmbda, V, W = self.eigenpairs(A, B)
+            N = B.testfunction[0].N
+            s = B.testfunction[0].slice()
+            self.V[axis] = np.zeros((N, N))
+            self.V[axis][s, s] = V
+            self.W[axis] = np.zeros((N, N))
+            self.W[axis][s, s] = W
+            for i, mat in enumerate(mats):
+                d = np.zeros(N)
+                if _matrix_key(mat) == _matrix_key(B):
+                    d[s] = 1
+                elif _matrix_key(mat) == _matrix_key(A):
+                    d[s] = lmbda
+                else:
+                    D = W.dot(mat.diags().toarray().dot(V))
+                    d[s] = np.diag(D)
+                    D[np.diag_indices_from(D)] = 0
+                    assert abs(D).max() <= 1e-8*abs(d).max()
+                diagonals[i][axis] = d
+                scales[i] = scales[i]*mat.scale
+
+        # Pencils aligned in each non-periodic axis, starting with the
+        # alignment of the spectral data
+        pencil = T.forward.output_pencil
+        dtype = T.forward.output_array.dtype
+        if pencil.axis in axes:
+            axes.remove(pencil.axis)
+            axes.insert(0, pencil.axis)
+        self.pencils = [pencil]
+        self.axes = [axes[0] if pencil.axis == axes[0] else None]
+        for axis in axes[int(self.axes[0] is not None):]:
+            self.pencils.append(self.pencils[-1].pencil(axis))
+            self.axes.append(axis)
+        self.transfers = [p0.transfer(p1, dtype) for p0, p1 in
+                          zip(self.pencils[:-1], self.pencils[1:])]
+        self.X = [None]+[np.zeros(p.subshape, dtype=dtype) for p in self.pencils[1:]]
+        self.Y = [np.zeros(p.subshape, dtype=dtype) if axis is not None else None
+                  for p, axis in zip(self.pencils, self.axes)]
+
+        # Inverse of the diagonal system, computed for the spectral data and
+        # redistributed to the last pencil
+        ndim = len(pencil.subshape)
+        ls = [slice(start, start+shape) for start, shape in
+              zip(pencil.substart, pencil.subshape)]
+        S = 0
+        for scale, diagonal in zip(scales, diagonals):
+            for axis, d in diagonal.items():
+                sl = [np.newaxis]*ndim
+                sl[axis] = ls[axis]
+                scale = scale*d[tuple(sl)]
+            S = S + scale
+        S = np.broadcast_to(S, pencil.subshape)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            S = np.where(S == 0, 0, 1./S)
+        S = S.astype(dtype)
+        for transfer, p1 in zip(self.transfers, self.pencils[1:]):
+            S1 = np.zeros(p1.subshape, dtype=dtype)
+            transfer.forward(S, S1)
+            S = S1
+        self.Sinv = S
+
+    def eigenpairs(self, A, B):
+        """Return generalized eigenpairs of A and B
+
+        Returns the eigenvalues lmbda, the eigenvectors V and W = (B V)^{-1},
+        such that A V = B V diag(lmbda). If A is None, then lmbda is one and V
+        is the identity.
+
+        args:
+            A       SpectralMatrix or None
+            B       SpectralMatrix
+
+        """
+        key = (None if A is None else _matrix_key(A), _matrix_key(B))
+        def func():
+            filename = None
+            if self.path is not None:
+                filename = os.path.join(self.path, hashlib.sha1(
+                    repr(key).encode('utf-8')).hexdigest()+'.npz')
+                if os.path.exists(filename):
+                    try:
+                        with np.load(filename) as f:
+                            return f['lmbda'], f['V'], f['W']
+                    except (IOError, OSError, KeyError, ValueError):
+                        pass
+            b = B.diags().toarray()
+            if A is None:
+                lmbda = np.ones(b.shape[0])
+                V = np.eye(b.shape[0])
+                W = np.linalg.inv(b)
+            else:
+                a = A.diags().toarray()
+                if np.allclose(a, a.T) and np.allclose(b, b.T):
+                    lmbda, V = scipy_la.eigh(a, b)
+                    W = V.T.copy()
+                else:
+                    lmbda, V = scipy_la.eig(a, b)
+                    assert np.allclose(lmbda.imag, 0)
+                    lmbda, V = lmbda.real.copy(), V.real.copy()
+                    W = np.linalg.inv(b.dot(V))
+            if filename is not None and self.T.comm.Get_rank() == 0:
+                fd, tmpname = tempfile.mkstemp(suffix='.tmp', dir=self.path)
+                try:
+                    with os.fdopen(fd, 'wb') as f:
+                        np.savez(f, lmbda=lmbda, V=V, W=W)
+                    os.replace(tmpname, filename)
+                except:
+                    os.remove(tmpname)
+                    raise
+            return lmbda, V, W
+        return self.cache.get(key, func)
+
+    def destroy(self):
+        for trans in self.transfers:
+            trans.destroy()
+
+    def __call__(self, u, b):
+        """Solve system for right hand side b and return solution u
+
+        u and b may be the same array.
+
+        args:
+            u      (output)     Array
+            b      (input)      Array
+
+        """
+        x = b
+        for i, axis in enumerate(self.axes):
+            if i > 0:
+                self.transfers[i-1].forward(x, self.X[i])
+                x = self.X[i]
+            if axis is not None:
+                x = _apply_along(self.W[axis], x, self.Y[i], axis)
+
+        x *= self.Sinv
+
+        for i in range(len(self.axes)-1, -1, -1):
+            axis = self.axes[i]
+            if axis is not None:
+                x = _apply_along(self.V[axis], x, u if i == 0 else self.X[i],
+                                 axis)
+            if i > 0:
+                y = self.Y[i-1]
+                if y is None:
+                    y = u
+                self.transfers[i-1].backward(x, y)
+                x = y
+        return u
+
+class KrylovSolver(object):
+    """Base class for matrix-free Krylov solvers of A u = b
+
+    The arrays may be distributed, and all inner products are reduced over
+    comm. Work arrays are allocated on the first call, and reused as long as
+    the shape and type of b are unchanged.
+
+    args:
+        A        callable   A(x, y) sets y = A x and returns y, e.g., a
+                            MatrixFreeOperator
+
+    kwargs:
+        M        callable   Preconditioner. M(z, r) sets z to the approximate
+                            solution of A z = r and returns z, e.g., a
+                            constant-coefficient Helmholtz solver. Defaults
+                            to no preconditioner
+        comm                MPI communicator
+        tol      float      Relative tolerance for the residual norm
+        maxiter  int        Maximum number of iterations
+
+    After a call the number of iterations, the relative residual norm and
+    whether the tolerance was reached are stored in the attributes
+    iterations, residual and converged.
+
+    """
+    nwork = 0
+
+    def __init__(self, A, M=None, comm=MPI.COMM_WORLD, tol=1e-8, maxiter=200):
+        self.A = A
+        self.M = M
+        self.comm = comm
+        self.tol = tol
+        self.maxiter = maxiter
+        self.work = []
+        self.iterations = 0
+        self.residual = 0
+        self.converged = False
+
+    def dot(self, x, y):
+        """Return inner product of x and y, reduced over comm"""
+        return self.comm.allreduce(np.vdot(x, y))
+
+    def norm(self, x):
+        """Return 2-norm of x, reduced over comm"""
+        return np.sqrt(abs(self.dot(x, x)))
+
+    def axpy(self, a, x, y):
+        """Set y = y + a*x and return y"""
+        y += np.multiply(x, a, out=self.work[0])
+        return y
+
+    def precondition(self, z, r):
+        """Set z = M^{-1} r and return z, without modifying r"""
+        if self.M is None:
+            z[...] = r
+            return z
+        w = self.work[0]
+        w[...] = r
+        return self.M(z, w)
+
+    def init(self, b):
+        if not (self.work and self.work[0].shape == b.shape and
+                self.work[0].dtype == b.dtype):
+            self.work = [np.zeros_like(np.asarray(b)) for i in range(self.nwork)]
+
+    def __call__(self, b, u=None):
+        """Solve A u = b and return u
+
+        args:
+            b    (input)           Array
+
+        kwargs:
+            u    (input/output)    Array. Initial guess, overwritten with the
+                                   solution. If not provided, then the
+                                   initial guess is zero
+
+        """
+        if u is None:
+            u = np.zeros_like(b)
+        self.init(b)
+        bnorm = self.norm(b)
+        if bnorm == 0:
+            u[...] = 0
+            self.iterations, self.residual, self.converged = 0, 0, True
+            return u
+        self.iterations = 0
+        self.residual = 1
+        self.converged = False
+        return self.solve(b, u, bnorm)
+
+    def solve(self, b, u, bnorm):
+        raise NotImplementedError
+
+
+class CG(KrylovSolver):
+    """Preconditioned conjugate gradient method
+
+    For operators and preconditioners that are symmetric and positive
+    definite. See KrylovSolver for arguments.
+
+    """
+    nwork = 5
+
+    def solve(self, b, u, bnorm):
+        r, z, p, q = self.work[1:]
+        q = self.A(u, q)
+        np.subtract(b, q, out=r)
+        z = self.precondition(z, r)
+        p[...] = z
+        rz = self.dot(r, z)
+        for i in range(self.maxiter):
+            q = self.A(p, q)
+            alfa = rz / self.dot(p, q)
+            self.axpy(alfa, p, u)
+            self.axpy(-alfa, q, r)
+            self.iterations = i+1
+            self.residual = self.norm(r) / bnorm
+            if self.residual < self.tol:
+                self.converged = True
+                break
+            z = self.precondition(z, r)
+            rz, rz0 = self.dot(r, z), rz
+            p *= rz / rz0
+            p += z
+        return u
+
+
+class BiCGStab(KrylovSolver):
+    """Right preconditioned stabilized biconjugate gradient method
+
+    See KrylovSolver for arguments.
+
+    """
+    nwork = 8
+
+    def solve(self, b, u, bnorm):
+        r, r0, p, v, ph, sh, t = self.work[1:]
+        v = self.A(u, v)
+        np.subtract(b, v, out=r)
+        r0[...] = r
+        rho = alfa = omega = 1
+        v[...] = 0
+        p[...] = 0
+        for i in range(self.maxiter):
+            rho, rho0 = self.dot(r0, r), rho
+            beta = (rho / rho0) * (alfa / omega)
+            self.axpy(-omega, v, p)
+            p *= beta
+            p += r
+            ph = self.precondition(ph, p)
+            v = self.A(ph, v)
+            alfa = rho / self.dot(r0, v)
+            self.axpy(-alfa, v, r)    # r is now s
+            self.axpy(alfa, ph, u)
+            self.iterations = i+1
+            self.residual = self.norm(r) / bnorm
+            if self.residual < self.tol:
+                self.converged = True
+                break
+            sh = self.precondition(sh, r)
+            t = self.A(sh, t)
+            omega = self.dot(t, r) / self.dot(t, t)
+            self.axpy(omega, sh, u)
+            self.axpy(-omega, t, r)
+            self.residual = self.norm(r) / bnorm
+            if self.residual < self.tol:
+                self.converged = True
+                break
+        return u
+
+
+class GMRES(KrylovSolver):
+    """Right preconditioned restarted generalized minimal residual method
+
+    See KrylovSolver for arguments, and also
+
+    kwargs:
+        restart  int        Number of iterations between restarts
+
+    """
+
+    def __init__(self, A, M=None, comm=MPI.COMM_WORLD, tol=1e-8, maxiter=200,
+                 restart=30):
+        KrylovSolver.__init__(self, A, M=M, comm=comm, tol=tol,
+                              maxiter=maxiter)
+        self.restart = restart
+        self.nwork = restart+3
+
+    def solve(self, b, u, bnorm):
+        m = self.restart
+        w, z = self.work[1:3]
+        V = self.work[3:]
+        dtype = np.result_type(b.dtype, float)
+        H = np.zeros((m+1, m), dtype=dtype)
+        cs = np.zeros(m, dtype=dtype)
+        sn = np.zeros(m, dtype=dtype)
+        g = np.zeros(m+1, dtype=dtype)
+        while self.iterations < self.maxiter:
+            w = self.A(u, w)
+            np.subtract(b, w, out=V[0])
+            beta = self.norm(V[0])
+            V[0] /= beta
+            g[:] = 0
+            g[0] = beta
+            for j in range(m):
+                z = self.precondition(z, V[j])
+                w = self.A(z, w)
+                for i in range(j+1):    # Modified Gram-Schmidt
+                    H[i, j] = self.dot(V[i], w)
+                    self.axpy(-H[i, j], V[i], w)
+                H[j+1, j] = self.norm(w)
+                if H[j+1, j] != 0 and j < m-1:
+                    np.divide(w, H[j+1, j], out=V[j+1])
+                for i in range(j):      # Apply Givens rotations
+                    H[i, j], H[i+1, j] = (np.conj(cs[i])*H[i, j] + np.conj(sn[i])*H[i+1, j],
+                                          -sn[i]*H[i, j] + cs[i]*H[i+1, j])
+                d = np.sqrt(abs(H[j, j])**2 + abs(H[j+1, j])**2)
+                cs[j] = H[j, j] / d
+                sn[j] = H[j+1, j] / d
+                H[j, j] = d
+                H[j+1, j] = 0
+                g[j+1] = -sn[j]*g[j]
+                g[j] = np.conj(cs[j])*g[j]
+                self.iterations += 1
+                self.residual = abs(g[j+1]) / bnorm
+                if self.residual < self.tol or self.iterations >= self.maxiter:
+                    break
+            # Update solution with the preconditioned Krylov vectors
+            y = scipy_la.solve_triangular(H[:j+1, :j+1], g[:j+1])
+            w[...] = 0
+            for i in range(j+1):
+                self.axpy(y[i], V[i], w)
+            z = self.precondition(z, w)
+            u += z
+            if self.residual < self.tol:
+                self.converged = True
+                break
+        return u
+
+
 class DiagonalMatrix(np.ndarray):
     """Matrix type with only diagonal matrices in all dimensions
 
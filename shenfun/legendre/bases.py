@@ -1,7 +1,10 @@
+from copy import copy
 import numpy as np
 import pyfftw
-from .lobatto import legendre_lobatto_nodes_and_weights
-from shenfun.spectralbase import SpectralBase, work
+from .lobatto import legendre_lobatto_nodes_and_weights, \
+    legendre_gauss_nodes_and_weights
+from .dlt import DLT
+from shenfun.spectralbase import SpectralBase, work, _func_wrap
 from shenfun.utilities import inheritdocstrings
 from numpy.polynomial import legendre as leg
 
@@ -53,15 +56,20 @@ class LegendreBase(SpectralBase):
         N             int         Number of quadrature points
         quad      ('LG', 'GL')    Legendre-Gauss or Legendre-Gauss-Lobatto
         domain   (float, float)   The computational domain
+        padding_factor  float     Factor for padding backward transforms.
+                                  Forward transforms and scalar products
+                                  are truncated accordingly
 
     """
 
-    def __init__(self, N=0, quad="LG", domain=(-1., 1.)):
-        SpectralBase.__init__(self, N, quad, domain=domain)
+    def __init__(self, N=0, quad="LG", domain=(-1., 1.), padding_factor=1):
+        SpectralBase.__init__(self, N, quad, padding_factor=padding_factor,
+                              domain=domain)
+        self._dlt = None
 
     def points_and_weights(self, N, scaled=False):
         if self.quad == "LG":
-            points, weights = leg.leggauss(N)
+            points, weights = legendre_gauss_nodes_and_weights(N)
         elif self.quad == "GL":
             points, weights = legendre_lobatto_nodes_and_weights(N)
         else:
@@ -116,6 +124,34 @@ class LegendreBase(SpectralBase):
         else:
             return 2./(b-a)
 
+    def _get_exact_mass_base(self):
+        if self.quad == 'LG':
+            return self
+        # Legendre-Gauss quadrature gives the exact mass matrix
+        base = copy(self)
+        base.quad = 'LG'
+        base._mass = None
+        return base
+
+    def get_dlt(self):
+        """Return fast discrete Legendre transform for quadrature points"""
+        if self._dlt is None or self._dlt.N != self.N:
+            points, weights = self.cached_points_and_weights(self.N)
+            self._dlt = DLT(points, weights, self.quad)
+        return self._dlt
+
+    def evaluate_scalar_product(self, fj, fk):
+        r"""Fast scalar product
+
+            f_k = (f, \phi_k)_w  for all k = 0, 1, ..., N-1
+
+        args:
+            fj   (input)     Function values on quadrature mesh
+            fk   (output)    Scalar product
+
+        """
+        raise NotImplementedError
+
     def forward(self, input_array=None, output_array=None, fast_transform=False):
         """Fast forward transform
 
@@ -128,7 +164,6 @@ class LegendreBase(SpectralBase):
                              if False use Vandermonde type
 
         """
-        assert fast_transform is False
         if input_array is not None:
             self.forward.input_array[...] = input_array
 
@@ -154,12 +189,15 @@ class LegendreBase(SpectralBase):
                              if False use Vandermonde type
 
         """
-        assert fast_transform is False
         if input_array is not None:
             self.backward.input_array[...] = input_array
 
-        self.vandermonde_evaluate_expansion_all(self.backward.input_array,
-                                                self.backward.output_array)
+        if fast_transform:
+            self.evaluate_expansion_all(self.backward.input_array,
+                                        self.backward.output_array)
+        else:
+            self.vandermonde_evaluate_expansion_all(self.backward.input_array,
+                                                    self.backward.output_array)
 
         if output_array is not None:
             output_array[...] = self.backward.output_array
@@ -168,12 +206,15 @@ class LegendreBase(SpectralBase):
             return self.backward.output_array
 
     def scalar_product(self, input_array=None, output_array=None, fast_transform=False):
-        assert fast_transform is False
         if input_array is not None:
             self.scalar_product.input_array[...] = input_array
 
-        self.vandermonde_scalar_product(self.scalar_product.input_array,
-                                        self.scalar_product.output_array)
+        if fast_transform:
+            self.evaluate_scalar_product(self.scalar_product.input_array,
+                                         self.scalar_product.output_array)
+        else:
+            self.vandermonde_scalar_product(self.scalar_product.input_array,
+                                            self.scalar_product.output_array)
 
         if output_array is not None:
             output_array[...] = self.scalar_product.output_array
@@ -185,11 +226,17 @@ class LegendreBase(SpectralBase):
         if isinstance(axis, tuple):
             axis = axis[0]
 
-        if isinstance(self.forward, _Wrap):
-            if self.forward.input_array.shape == shape and self.axis == axis:
+        if isinstance(self.forward, (_Wrap, _func_wrap)):
+            if (self.forward.input_array.shape == shape and self.axis == axis and
+                    self.forward.input_array.dtype == np.dtype(dtype) and
+                    self.threads == options.get('threads', 1)):
                 # Already planned
                 return
 
+        if self.padding_factor > 1.+1e-8:
+            self._plan_padded(shape, axis, dtype, options)
+            return
+
         if isinstance(axis, tuple):
             axis = axis[0]
 
@@ -199,6 +246,7 @@ class LegendreBase(SpectralBase):
         V.fill(0)
 
         self.axis = axis
+        self.threads = options.get('threads', 1)
         self.forward = _Wrap(self.forward, U, V)
         self.backward = _Wrap(self.backward, V, U)
         self.scalar_product = _Wrap(self.scalar_product, U, V)
@@ -215,16 +263,24 @@ class Basis(LegendreBase):
                                   basis is part of a TensorProductSpace,
                                   then planning needs to be delayed.
         domain   (float, float)   The computational domain
+        padding_factor  float     Factor for padding backward transforms
 
     """
 
-    def __init__(self, N=0, quad="GL", plan=False, domain=(-1., 1.)):
-        LegendreBase.__init__(self, N, quad, domain=domain)
+    def __init__(self, N=0, quad="GL", plan=False, domain=(-1., 1.),
+                 padding_factor=1):
+        LegendreBase.__init__(self, N, quad, domain=domain,
+                              padding_factor=padding_factor)
         if plan:
-            self.plan(N, 0, np.float, {})
+            self.plan(int(np.round(N*self.padding_factor)), 0, np.float, {})
 
     def evaluate_expansion_all(self, fk, fj):
-        raise NotImplementedError
+        fj = self.get_dlt().backward(fk, fj, self.axis)
+        return fj
+
+    def evaluate_scalar_product(self, fj, fk):
+        fk = self.get_dlt().scalar_product(fj, fk, self.axis)
+        return fk
 
     def eval(self, x, fk):
         return leg.legval(x, fk)
@@ -246,19 +302,21 @@ class ShenDirichletBasis(LegendreBase):
                                   with 1/sqrt(4k+6). Scaled test functions
                                   give a stiffness matrix equal to the
                                   identity matrix.
+        padding_factor  float     Factor for padding backward transforms
 
     """
 
     def __init__(self, N=0, quad="LG", bc=(0., 0.), plan=False,
-                 domain=(-1., 1.), scaled=False):
-        LegendreBase.__init__(self, N, quad, domain=domain)
+                 domain=(-1., 1.), scaled=False, padding_factor=1):
+        LegendreBase.__init__(self, N, quad, domain=domain,
+                              padding_factor=padding_factor)
         from shenfun.tensorproductspace import BoundaryValues
         self.LT = Basis(N, quad)
         self._scaled = scaled
         self._factor = np.ones(1)
-        if plan:
-            self.plan(N, 0, np.float, {})
         self.bc = BoundaryValues(self, bc=bc)
+        if plan:
+            self.plan(int(np.round(N*self.padding_factor)), 0, np.float, {})
 
     def set_factor_array(self, v):
         if self.is_scaled():
@@ -281,7 +339,6 @@ class ShenDirichletBasis(LegendreBase):
         return P
 
     def forward(self, input_array=None, output_array=None, fast_transform=False):
-        assert fast_transform is False
         if input_array is not None:
             self.forward.input_array[...] = input_array
 
@@ -306,11 +363,24 @@ class ShenDirichletBasis(LegendreBase):
         w_hat[s1] -= fk[s0]*self._factor
         self.bc.apply_before(w_hat, False, (0.5, 0.5))
 
-        fj = self.LT.backward(w_hat)
+        fj = self.LT.backward(w_hat, fast_transform=True)
         assert fk is self.backward.input_array
         assert fj is self.backward.output_array
         return fj
 
+    def evaluate_scalar_product(self, fj, fk):
+        fk = self.LT.evaluate_scalar_product(fj, fk)
+        w_hat = work[(fk, 0)]
+        w_hat[...] = fk
+        s0 = self.sl(slice(0, -2))
+        s1 = self.sl(slice(2, None))
+        self.set_factor_array(fk)
+        fk[s0] -= w_hat[s1]
+        fk[s0] *= self._factor
+        fk[self.sl(-2)] = (w_hat[self.sl(0)] + w_hat[self.sl(1)])/2
+        fk[self.sl(-1)] = (w_hat[self.sl(0)] - w_hat[self.sl(1)])/2
+        return fk
+
     def slice(self):
         return slice(0, self.N-2)
 
@@ -329,13 +399,20 @@ class ShenDirichletBasis(LegendreBase):
         if isinstance(axis, tuple):
             axis = axis[0]
 
-        if isinstance(self.forward, _Wrap):
-            if self.forward.input_array.shape == shape and self.axis == axis:
+        if isinstance(self.forward, (_Wrap, _func_wrap)):
+            if (self.forward.input_array.shape == shape and self.axis == axis and
+                    self.forward.input_array.dtype == np.dtype(dtype) and
+                    self.threads == options.get('threads', 1)):
                 # Already planned
                 return
 
+        if self.padding_factor > 1.+1e-8:
+            self._plan_padded(shape, axis, dtype, options)
+            return
+
         self.LT.plan(shape, axis, dtype, options)
         self.axis = self.LT.axis
+        self.threads = self.LT.threads
         U, V = self.LT.forward.input_array, self.LT.forward.output_array
         self.forward = _Wrap(self.forward, U, V)
         self.backward = _Wrap(self.backward, V, U)
@@ -354,16 +431,19 @@ class ShenNeumannBasis(LegendreBase):
                                   basis is part of a TensorProductSpace,
                                   then planning needs to be delayed.
         domain   (float, float)   The computational domain
+        padding_factor  float     Factor for padding backward transforms
 
     """
 
-    def __init__(self, N=0, quad="LG", mean=0, plan=False, domain=(-1., 1.)):
-        LegendreBase.__init__(self, N, quad, domain=domain)
+    def __init__(self, N=0, quad="LG", mean=0, plan=False, domain=(-1., 1.),
+                 padding_factor=1):
+        LegendreBase.__init__(self, N, quad, domain=domain,
+                              padding_factor=padding_factor)
         self.mean = mean
         self.LT = Basis(N, quad)
         self._factor = np.zeros(0)
         if plan:
-            self.plan(N, 0, np.float, {})
+            self.plan(int(np.round(N*self.padding_factor)), 0, np.float, {})
 
     def get_vandermonde_basis(self, V):
         assert self.N == V.shape[1]
@@ -378,12 +458,15 @@ class ShenNeumannBasis(LegendreBase):
             self._factor = k*(k+1)/(k+2)/(k+3)
 
     def scalar_product(self, input_array=None, output_array=None, fast_transform=False):
-        assert fast_transform is False
         if input_array is not None:
             self.scalar_product.input_array[...] = input_array
 
-        self.vandermonde_scalar_product(self.scalar_product.input_array,
-                                        self.scalar_product.output_array)
+        if fast_transform:
+            self.evaluate_scalar_product(self.scalar_product.input_array,
+                                         self.scalar_product.output_array)
+        else:
+            self.vandermonde_scalar_product(self.scalar_product.input_array,
+                                            self.scalar_product.output_array)
 
         fk = self.scalar_product.output_array
         s = self.sl(0)
@@ -404,9 +487,20 @@ class ShenNeumannBasis(LegendreBase):
         s1 = self.sl(slice(2, None))
         w_hat[s0] = fk[s0]
         w_hat[s1] -= self._factor*fk[s0]
-        fj = self.LT.backward(w_hat)
+        fj = self.LT.backward(w_hat, fast_transform=True)
         return fj
 
+    def evaluate_scalar_product(self, fj, fk):
+        fk = self.LT.evaluate_scalar_product(fj, fk)
+        w_hat = work[(fk, 0)]
+        w_hat[...] = fk
+        self.set_factor_array(fk)
+        s0 = self.sl(slice(0, -2))
+        s1 = self.sl(slice(2, None))
+        fk[s0] -= self._factor*w_hat[s1]
+        fk[self.sl(slice(-2, None))] = 0
+        return fk
+
     def slice(self):
         return slice(0, self.N-2)
 
@@ -425,13 +519,20 @@ class ShenNeumannBasis(LegendreBase):
         if isinstance(axis, tuple):
             axis = axis[0]
 
-        if isinstance(self.forward, _Wrap):
-            if self.forward.input_array.shape == shape and self.axis == axis:
+        if isinstance(self.forward, (_Wrap, _func_wrap)):
+            if (self.forward.input_array.shape == shape and self.axis == axis and
+                    self.forward.input_array.dtype == np.dtype(dtype) and
+                    self.threads == options.get('threads', 1)):
                 # Already planned
                 return
 
+        if self.padding_factor > 1.+1e-8:
+            self._plan_padded(shape, axis, dtype, options)
+            return
+
         self.LT.plan(shape, axis, dtype, options)
         self.axis = self.LT.axis
+        self.threads = self.LT.threads
         U, V = self.LT.forward.input_array, self.LT.forward.output_array
         self.forward = _Wrap(self.forward, U, V)
         self.backward = _Wrap(self.backward, V, U)
@@ -451,16 +552,19 @@ class ShenBiharmonicBasis(LegendreBase):
                                   basis is part of a TensorProductSpace,
                                   then planning needs to be delayed.
         domain   (float, float)   The computational domain
+        padding_factor  float     Factor for padding backward transforms
 
     """
 
-    def __init__(self, N=0, quad="LG", plan=False, domain=(-1., 1.)):
-        LegendreBase.__init__(self, N, quad, domain=domain)
+    def __init__(self, N=0, quad="LG", plan=False, domain=(-1., 1.),
+                 padding_factor=1):
+        LegendreBase.__init__(self, N, quad, domain=domain,
+                              padding_factor=padding_factor)
         self.LT = Basis(N, quad)
         self._factor1 = np.zeros(0)
         self._factor2 = np.zeros(0)
         if plan:
-            self.plan(N, 0, np.float, {})
+            self.plan(int(np.round(N*self.padding_factor)), 0, np.float, {})
 
     def get_vandermonde_basis(self, V):
         P = np.zeros_like(V)
@@ -477,12 +581,15 @@ class ShenBiharmonicBasis(LegendreBase):
             self._factor2 = ((2*k+3)/(2*k+7)).astype(float)
 
     def scalar_product(self, input_array=None, output_array=None, fast_transform=False):
-        assert fast_transform is False
         if input_array is not None:
             self.scalar_product.input_array[...] = input_array
 
-        output = self.vandermonde_scalar_product(self.scalar_product.input_array,
-                                                 self.scalar_product.output_array)
+        if fast_transform:
+            output = self.evaluate_scalar_product(self.scalar_product.input_array,
+                                                  self.scalar_product.output_array)
+        else:
+            output = self.vandermonde_scalar_product(self.scalar_product.input_array,
+                                                     self.scalar_product.output_array)
 
         output[self.sl(slice(-4, None))] = 0
 
@@ -506,11 +613,23 @@ class ShenBiharmonicBasis(LegendreBase):
         w_hat = work[(fk, 0)]
         self.set_factor_arrays(fk)
         w_hat = self.set_w_hat(w_hat, fk, self._factor1, self._factor2)
-        fj = self.LT.backward(w_hat)
+        fj = self.LT.backward(w_hat, fast_transform=True)
         assert fk is self.backward.input_array
         assert fj is self.backward.output_array
         return fj
 
+    def evaluate_scalar_product(self, fj, fk):
+        fk = self.LT.evaluate_scalar_product(fj, fk)
+        w_hat = work[(fk, 0)]
+        w_hat[...] = fk
+        self.set_factor_arrays(fk)
+        s = self.sl(self.slice())
+        s2 = self.sl(slice(2, -2))
+        s4 = self.sl(slice(4, None))
+        fk[s] += self._factor1*w_hat[s2]
+        fk[s] += self._factor2*w_hat[s4]
+        return fk
+
     def slice(self):
         return slice(0, self.N-4)
 
@@ -532,13 +651,20 @@ class ShenBiharmonicBasis(LegendreBase):
         if isinstance(axis, tuple):
             axis = axis[0]
 
-        if isinstance(self.forward, _Wrap):
-            if self.forward.input_array.shape == shape and self.axis == axis:
+        if isinstance(self.forward, (_Wrap, _func_wrap)):
+            if (self.forward.input_array.shape == shape and self.axis == axis and
+                    self.forward.input_array.dtype == np.dtype(dtype) and
+                    self.threads == options.get('threads', 1)):
                 # Already planned
                 return
 
+        if self.padding_factor > 1.+1e-8:
+            self._plan_padded(shape, axis, dtype, options)
+            return
+
         self.LT.plan(shape, axis, dtype, options)
         self.axis = self.LT.axis
+        self.threads = self.LT.threads
         U, V = self.LT.forward.input_array, self.LT.forward.output_array
         self.forward = _Wrap(self.forward, U, V)
         self.backward = _Wrap(self.backward, V, U)
@@ -558,16 +684,19 @@ class SecondNeumannBasis(LegendreBase):
                                   basis is part of a TensorProductSpace,
                                   then planning needs to be delayed.
         domain   (float, float)   The computational domain
+        padding_factor  float     Factor for padding backward transforms
 
     """
 
-    def __init__(self, N=0, quad="LG", mean=0, plan=False, domain=(-1., 1.)):
-        LegendreBase.__init__(self, N, quad, domain=domain)
+    def __init__(self, N=0, quad="LG", mean=0, plan=False, domain=(-1., 1.),
+                 padding_factor=1):
+        LegendreBase.__init__(self, N, quad, domain=domain,
+                              padding_factor=padding_factor)
         self.mean = mean
         self.LT = Basis(N, quad)
         self._factor = np.zeros(0)
         if plan:
-            self.plan(N, 0, np.float, {})
+            self.plan(int(np.round(N*self.padding_factor)), 0, np.float, {})
 
     def get_vandermonde_basis(self, V):
         assert self.N == V.shape[1]
@@ -581,17 +710,21 @@ class SecondNeumannBasis(LegendreBase):
         return P
 
     def set_factor_array(self, v):
-        if not self._factor.shape == v.shape:
-            k = self.wavenumbers(v.shape, self.axis).astype(np.float)
+        k = np.arange(self.N-4).astype(np.float)
+        k = self.broadcast_to_ndims(k, v.ndim, self.axis)
+        if not self._factor.shape == k.shape:
             self._factor = -(k+1)*(k+2)*(2*k+3)/((k+3)*(k+4)*(2*k+7))
 
     def scalar_product(self, input_array=None, output_array=None, fast_transform=False):
-        assert fast_transform is False
         if input_array is not None:
             self.scalar_product.input_array[...] = input_array
 
-        self.vandermonde_scalar_product(self.scalar_product.input_array,
-                                        self.scalar_product.output_array)
+        if fast_transform:
+            self.evaluate_scalar_product(self.scalar_product.input_array,
+                                         self.scalar_product.output_array)
+        else:
+            self.vandermonde_scalar_product(self.scalar_product.input_array,
+                                            self.scalar_product.output_array)
 
         fk = self.scalar_product.output_array
         #s = self.sl(0)
@@ -605,17 +738,33 @@ class SecondNeumannBasis(LegendreBase):
         else:
             return self.scalar_product.output_array
 
-    #def evaluate_expansion_all(self, fk, fj):
-        #w_hat = work[(fk, 0)]
-        #self.set_factor_array(fk)
-        #s0 = self.sl(slice(0, -4))
-        #s1 = self.sl(slice(2, -2))
-        #s2 = self.sl(slice(4, None))
-        #w_hat[s0] = fk[s0]
-        #w_hat[s1] += (self._factor-1)*fk[s0]
-        #w_hat[s2] -= self._factor*fk[s0]
-        #fj = self.LT.backward(w_hat)
-        #return fj
+    def evaluate_expansion_all(self, fk, fj):
+        w_hat = work[(fk, 0)]
+        self.set_factor_array(fk)
+        s0 = self.sl(slice(0, -4))
+        s1 = self.sl(slice(2, -2))
+        s2 = self.sl(slice(4, None))
+        w_hat[...] = 0
+        w_hat[s0] = fk[s0]
+        w_hat[s1] += (self._factor-1)*fk[s0]
+        w_hat[s2] -= self._factor*fk[s0]
+        w_hat[self.sl(slice(0, 2))] += fk[self.sl(slice(-4, -2))]
+        fj = self.LT.backward(w_hat, fast_transform=True)
+        return fj
+
+    def evaluate_scalar_product(self, fj, fk):
+        fk = self.LT.evaluate_scalar_product(fj, fk)
+        w_hat = work[(fk, 0)]
+        w_hat[...] = fk
+        self.set_factor_array(fk)
+        s0 = self.sl(slice(0, -4))
+        s1 = self.sl(slice(2, -2))
+        s2 = self.sl(slice(4, None))
+        fk[s0] += (self._factor-1)*w_hat[s1]
+        fk[s0] -= self._factor*w_hat[s2]
+        fk[self.sl(slice(-4, -2))] = w_hat[self.sl(slice(0, 2))]
+        fk[self.sl(slice(-2, None))] = 0
+        return fk
 
     def slice(self):
         return slice(0, self.N-2)
@@ -635,13 +784,20 @@ class SecondNeumannBasis(LegendreBase):
         if isinstance(axis, tuple):
             axis = axis[0]
 
-        if isinstance(self.forward, _Wrap):
-            if self.forward.input_array.shape == shape and self.axis == axis:
+        if isinstance(self.forward, (_Wrap, _func_wrap)):
+            if (self.forward.input_array.shape == shape and self.axis == axis and
+                    self.forward.input_array.dtype == np.dtype(dtype) and
+                    self.threads == options.get('threads', 1)):
                 # Already planned
                 return
 
+        if self.padding_factor > 1.+1e-8:
+            self._plan_padded(shape, axis, dtype, options)
+            return
+
         self.LT.plan(shape, axis, dtype, options)
         self.axis = self.LT.axis
+        self.threads = self.LT.threads
         U, V = self.LT.forward.input_array, self.LT.forward.output_array
         self.forward = _Wrap(self.forward, U, V)
         self.backward = _Wrap(self.backward, V, U)
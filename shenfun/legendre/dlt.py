@@ -0,0 +1,290 @@
+"""
+Fast discrete Legendre transforms
+
+The transforms are computed through Chebyshev expansions:
+
+    - Legendre coefficients are converted to Chebyshev coefficients with the
+      Legendre to Chebyshev connection matrix M, which is the Hadamard
+      product of a Toeplitz and a Hankel matrix. The Hankel part is
+      approximated by a pivoted Cholesky factorization of low rank, such that
+      M may be applied with a few FFTs [1].
+
+    - The Chebyshev series is evaluated on the Legendre quadrature points
+      x_j = cos(theta_j) through Taylor expansions of cos(k theta_j) around
+      the nearby, uniformly spaced, Chebyshev points. Each term in the Taylor
+      expansion is one DCT or DST [2].
+
+The scalar product is computed with the transpose of the same operators.
+The cost is O(N log N) for each transform, and only O(N) memory is needed.
+
+[1] A. Townsend, M. Webb and S. Olver, "Fast polynomial transforms based on
+    Toeplitz and Hankel matrices", Math. Comp. 87, 1913-1934 (2018)
+[2] N. Hale and A. Townsend, "A fast FFT-based discrete Legendre transform",
+    IMA J. Numer. Anal. 36, 1670-1684 (2016)
+
+"""
+from math import factorial
+import numpy as np
+from scipy.fftpack import dct, dst
+
+__all__ = ['Leg2Cheb', 'DLT']
+
+
+def _bc(x, ndim, axis):
+    """Return x broadcasted along axis of ndim dimensional array"""
+    s = [np.newaxis]*ndim
+    s[axis] = slice(None)
+    return x[tuple(s)]
+
+def _sl(a, ndim, axis):
+    s = [slice(None)]*ndim
+    s[axis] = a
+    return tuple(s)
+
+def _lambda(N):
+    """Return Lambda(m) = Gamma(m+1/2)/Gamma(m+1) for m = 0, 1, ..., N-1"""
+    lam = np.zeros(N)
+    lam[0] = np.sqrt(np.pi)
+    for m in range(1, N):
+        lam[m] = lam[m-1]*(m-0.5)/m
+    return lam
+
+def _pivoted_cholesky(h, M, s, tol):
+    """Return low rank factor L such that L.T L approximates H
+
+    The positive semidefinite Hankel matrix is H_pq = h[p+q+s], p, q < M
+    """
+    d = h[2*np.arange(M)+s].copy()
+    L = []
+    while len(L) < M:
+        piv = np.argmax(d)
+        if d[piv] < tol:
+            break
+        col = h[np.arange(M)+piv+s].copy()
+        for l in L:
+            col -= l*l[piv]
+        l = col/np.sqrt(d[piv])
+        L.append(l)
+        d -= l**2
+    return np.array(L)
+
+
+class Leg2Cheb(object):
+    """Legendre to Chebyshev connection matrix
+
+    Converts Legendre coefficients a to Chebyshev coefficients c = M a, of
+    the same polynomial. The transpose M^T is also available.
+
+    args:
+        N             int       Number of coefficients
+
+    kwargs:
+        threshold     int       Use dense matrix for N below threshold
+        tol           float     Tolerance of low rank approximation
+
+    """
+
+    def __init__(self, N, threshold=256, tol=1e-15):
+        self.N = N
+        self.lam = lam = _lambda(N+2)
+        self.M = None
+        if N < threshold:
+            M = np.zeros((N, N))
+            for j in range(N):
+                k = np.arange(j, N, 2)
+                M[j, k] = 2/np.pi*lam[(k-j)//2]*lam[(k+j)//2]
+            M[0] /= 2
+            self.M = M
+            return
+
+        self.L = []
+        self.T_hat = []
+        for s in (0, 1):
+            Ms = len(range(s, N, 2))
+            self.L.append(_pivoted_cholesky(lam, Ms, s, tol))
+            self.T_hat.append(np.fft.rfft(lam[:Ms], 2*Ms))
+
+    def __call__(self, input_array, output_array, axis=0, transpose=False):
+        """Apply connection matrix along axis
+
+        args:
+            input_array    (input)    Legendre (Chebyshev if transpose)
+                                      coefficients
+            output_array   (output)   Chebyshev (Legendre if transpose)
+                                      coefficients
+
+        kwargs:
+            axis           int        Axis of coefficients
+            transpose      bool       Apply transpose of connection matrix
+
+        """
+        if np.iscomplexobj(input_array):
+            output_array.real = self(input_array.real, output_array.real.copy(),
+                                     axis, transpose)
+            output_array.imag = self(input_array.imag, output_array.imag.copy(),
+                                     axis, transpose)
+            return output_array
+
+        ndim = input_array.ndim
+        if self.M is not None:
+            M = self.M.T if transpose else self.M
+            fc = np.moveaxis(input_array, axis, -1)
+            output_array[...] = np.moveaxis(np.dot(fc, M.T), -1, axis)
+            return output_array
+
+        for s in (0, 1):
+            y = input_array[_sl(slice(s, None, 2), ndim, axis)]
+            Ms = y.shape[axis]
+            if transpose and s == 0:
+                y = y.copy()
+                y[_sl(0, ndim, axis)] /= 2
+            T_hat = _bc(self.T_hat[s], ndim, axis)
+            z = np.zeros(y.shape)
+            for l in self.L[s]:
+                l = _bc(l, ndim, axis)
+                if transpose:
+                    zz = np.fft.rfft(l*y, 2*Ms, axis=axis)
+                    zz = np.fft.irfft(T_hat*zz, 2*Ms, axis=axis)
+                    z += l*zz[_sl(slice(0, Ms), ndim, axis)]
+                else:
+                    zz = np.fft.rfft(np.flip(l*y, axis), 2*Ms, axis=axis)
+                    zz = np.fft.irfft(T_hat*zz, 2*Ms, axis=axis)
+                    z += l*np.flip(zz[_sl(slice(0, Ms), ndim, axis)], axis)
+            z *= 2/np.pi
+            if not transpose and s == 0:
+                z[_sl(0, ndim, axis)] /= 2
+            output_array[_sl(slice(s, None, 2), ndim, axis)] = z
+        return output_array
+
+
+class DLT(object):
+    """Fast discrete Legendre transforms on Legendre quadrature points
+
+    args:
+        points        array     Legendre-Gauss or Legendre-Gauss-Lobatto
+                                points, sorted in ascending order
+        weights       array     Quadrature weights
+        quad      ('LG', 'GL')  Legendre-Gauss or Legendre-Gauss-Lobatto
+
+    kwargs:
+        eps           float     Truncation error of Taylor expansions
+
+    """
+
+    def __init__(self, points, weights, quad, eps=1e-17):
+        N = self.N = len(points)
+        self.quad = quad
+        self.weights = weights
+        self.leg2cheb = Leg2Cheb(N)
+        theta = np.arccos(points)[::-1]
+        if quad == 'LG':
+            phi = (np.arange(N)+0.5)*np.pi/N
+        elif quad == 'GL':
+            phi = np.arange(N)*np.pi/(N-1)
+        else:
+            raise NotImplementedError
+        self.Ndelta = N*(theta-phi)
+        r = np.abs(self.Ndelta).max()
+        self.nterms = 1
+        while r**self.nterms/factorial(self.nterms) > eps:
+            self.nterms += 1
+
+    def _cos(self, b, axis, transpose):
+        """Return sum_k b_k cos(k phi_j), or its transpose"""
+        ndim = b.ndim
+        if self.quad == 'LG':
+            if transpose:
+                return dct(b, 2, axis=axis)/2
+            return (dct(b, 3, axis=axis) + b[_sl(slice(0, 1), ndim, axis)])/2
+
+        f = dct(b, 1, axis=axis)
+        f += b[_sl(slice(0, 1), ndim, axis)]
+        f += _bc((-1.)**np.arange(self.N), ndim, axis)*b[_sl(slice(-1, None), ndim, axis)]
+        return f/2
+
+    def _sin(self, b, axis, transpose):
+        """Return sum_k b_k sin(k phi_j), or its transpose"""
+        ndim = b.ndim
+        f = np.zeros_like(b)
+        if self.quad == 'LG':
+            if transpose:
+                f[_sl(slice(1, None), ndim, axis)] = dst(b, 2, axis=axis)[_sl(slice(0, -1), ndim, axis)]/2
+            else:
+                f[_sl(slice(0, -1), ndim, axis)] = b[_sl(slice(1, None), ndim, axis)]
+                f = dst(f, 3, axis=axis)/2
+            return f
+
+        if self.N > 2:
+            f[_sl(slice(1, -1), ndim, axis)] = dst(b[_sl(slice(1, -1), ndim, axis)], 1, axis=axis)/2
+        return f
+
+    def backward(self, input_array, output_array, axis=0):
+        """Evaluate Legendre series on quadrature points
+
+        args:
+            input_array    (input)    Legendre coefficients
+            output_array   (output)   Function values on quadrature points
+
+        kwargs:
+            axis           int        Axis of transform
+
+        """
+        if np.iscomplexobj(input_array):
+            output_array.real = self.backward(input_array.real,
+                                              output_array.real.copy(), axis)
+            output_array.imag = self.backward(input_array.imag,
+                                              output_array.imag.copy(), axis)
+            return output_array
+
+        ndim = input_array.ndim
+        c = self.leg2cheb(input_array, np.zeros_like(input_array), axis)
+        k = _bc(np.arange(self.N)/self.N, ndim, axis)
+        Nd = _bc(self.Ndelta, ndim, axis)
+        f = np.zeros_like(c)
+        dp = np.ones_like(Nd)
+        for p in range(self.nterms):
+            sign = (1, -1, -1, 1)[p % 4]
+            if p % 2 == 0:
+                f += (sign*dp)*self._cos(c, axis, False)
+            else:
+                f += (sign*dp)*self._sin(c, axis, False)
+            c *= k
+            dp = dp*Nd/(p+1)
+        output_array[...] = np.flip(f, axis)
+        return output_array
+
+    def scalar_product(self, input_array, output_array, axis=0):
+        """Compute Legendre scalar product with quadrature
+
+            s_k = sum_j u(x_j) L_k(x_j) w_j
+
+        args:
+            input_array    (input)    Function values on quadrature points
+            output_array   (output)   Scalar product
+
+        kwargs:
+            axis           int        Axis of transform
+
+        """
+        if np.iscomplexobj(input_array):
+            output_array.real = self.scalar_product(input_array.real,
+                                                    output_array.real.copy(), axis)
+            output_array.imag = self.scalar_product(input_array.imag,
+                                                    output_array.imag.copy(), axis)
+            return output_array
+
+        ndim = input_array.ndim
+        z = np.flip(input_array*_bc(self.weights, ndim, axis), axis)
+        k = _bc(np.arange(self.N)/self.N, ndim, axis)
+        Nd = _bc(self.Ndelta, ndim, axis)
+        g = np.zeros(input_array.shape)
+        kp = np.ones_like(k)
+        for p in range(self.nterms):
+            sign = (1, -1, -1, 1)[p % 4]
+            if p % 2 == 0:
+                g += (sign*kp)*self._cos(z, axis, True)
+            else:
+                g += (sign*kp)*self._sin(z, axis, True)
+            z = z*Nd
+            kp = kp*k/(p+1)
+        return self.leg2cheb(g, output_array, axis, transpose=True)
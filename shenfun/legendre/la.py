@@ -3,7 +3,7 @@ from copy import copy
 import scipy.linalg as scipy_la
 import scipy.sparse.linalg as sparse_la
 from shenfun.optimization import la
-from shenfun.la import TDMA as la_TDMA
+from shenfun.la import TDMA as la_TDMA, _view3D
 from . import bases
 
 
@@ -30,7 +30,7 @@ class TDMA(la_TDMA):
             self.init(N)
 
         if len(u.shape) == 3:
-            la.TDMA_SymSolve3D(self.dd, self.ud, self.L, u, axis)
+            la.TDMA_SymSolve3D(self.dd, self.ud, self.L, u, axis, v.threads)
             #la.TDMA_SymSolve3D_ptr(self.dd[self.s], self.ud[self.s], self.L,
                                    #u[self.s], axis)
         elif len(u.shape) == 2:
@@ -40,7 +40,8 @@ class TDMA(la_TDMA):
             la.TDMA_SymSolve(self.dd, self.ud, self.L, u)
 
         else:
-            raise NotImplementedError
+            la.TDMA_SymSolve3D(self.dd, self.ud, self.L, _view3D(u, axis), 1,
+                               v.threads)
 
         bc.apply_after(u, False)
 
@@ -266,10 +267,11 @@ class Helmholtz_2dirichlet(object):
         pencilA = T.forward.output_pencil
         pencilB = pencilA.pencil(1)
         self.pencilB = pencilB
-        self.transAB = pencilA.transfer(pencilB, 'd')
-        self.u_B = np.zeros(self.transAB.subshapeB)
-        self.rhs_A = np.zeros(self.transAB.subshapeA)
-        self.rhs_B = np.zeros(self.transAB.subshapeB)
+        dtype = T.forward.output_array.dtype
+        self.transAB = pencilA.transfer(pencilB, dtype)
+        self.u_B = np.zeros(self.transAB.subshapeB, dtype=dtype)
+        self.rhs_A = np.zeros(self.transAB.subshapeA, dtype=dtype)
+        self.rhs_B = np.zeros(self.transAB.subshapeB, dtype=dtype)
 
         self.A = A
         self.B = B
@@ -344,7 +346,7 @@ class Helmholtz_2dirichlet(object):
             Helmy = Helmholtz(**{'ADDmat': self.A1, 'BDDmat': self.B1})
 
             # Map the right hand side to eigen space
-            self.rhs_A = (self.V.T).dot(b)
+            self.rhs_A[:] = (self.V.T).dot(b)
             self.rhs_A /= self.lmbda[:, np.newaxis]
             self.transAB.forward(self.rhs_A, self.rhs_B)
             self.u_B = Helmy(self.u_B, self.rhs_B)
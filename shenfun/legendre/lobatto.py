@@ -1,84 +1,194 @@
+r"""
+Legendre-Gauss and Legendre-Gauss-Lobatto nodes and weights
+
+The nodes are computed with Newton iterations in theta, x = cos(theta),
+where the Legendre polynomial P_n(cos(theta)) and its derivative are
+evaluated with the interior asymptotic (Stieltjes) expansion
+
+    P_n(cos t) = C_n \sum_m h_{n,m} cos(a_{n,m})/(2 sin t)^{m+1/2}
+
+    a_{n,m} = (n+m+1/2)t - (m+1/2)pi/2
+
+The cost of evaluating the expansion is independent of n, and as such the
+total cost of computing all nodes and weights is O(N). The expansion is not
+accurate close to the endpoints, and for the few nodes with n sin(t) < 25
+the three-term recurrence (scipy.special.eval_legendre) is used instead. See
+
+    N. Hale and A. Townsend, "Fast and accurate computation of Gauss-Legendre
+    and Gauss-Jacobi quadrature nodes and weights", SIAM J. Sci. Comput. 35,
+    A652-A674 (2013)
+
+"""
 import numpy as np
-from numpy.polynomial import legendre as leg
+from scipy.special import eval_legendre
 
-def legendre_lobatto_nodes_and_weights(N):
-    M = N//2
-    j = np.arange(1, M)
-    x = np.zeros(N)
-    x[0] = -1.
-    x[-1] = 1.
+__all__ = ['legendre_gauss_nodes_and_weights',
+           'legendre_lobatto_nodes_and_weights']
 
-    x[1:M] = -np.cos((j+0.25)*np.pi/N - 3./(8.*N*np.pi*(j+0.25)))
-    Ln = leg.Legendre.basis(N-1)
-    Ld = Ln.deriv(1)
-    Ld2 = Ln.deriv(2)
-    converged = False
-    dx = np.zeros_like(x[1:M])
-    y = x[1:M]
-    count = 0
-    while not converged and count < 10:
-        dx[:] = Ld(y)/Ld2(y)
-        y -= dx
-        error = np.linalg.norm(dx)
-        converged = error < 1e-16
-        count += 1
-        #print(count, error)
-
-    MM = M if N % 2 == 0 else M+1
-    x[MM:-1] = -x[1:M][::-1]
-    w = 2./(N*(N-1)*Ln(x)**2)
-    return x, w
+# Use the recurrence for all nodes below this N
+_N_RECURRENCE = 100
+
+# Use the recurrence for nodes with n*sin(theta) below this value
+_BOUNDARY = 25.
+
+def _legendre_recurrence(n, t):
+    """Return P_n(cos t) and its derivative with respect to t
+
+    computed with the three-term recurrence
+    """
+    x = np.cos(t)
+    p = eval_legendre(n, x)
+    dp = n*(x*p - eval_legendre(n-1, x))/np.sin(t)
+    return p, dp
+
+def _legendre_asymptotic(n, t, tol=1e-17):
+    """Return P_n(cos t)/C_n and its derivative with respect to t
+
+    computed with the interior asymptotic expansion
+    """
+    s = 2*np.sin(t)
+    c = 2*np.cos(t)
+    p = np.zeros_like(t)
+    dp = np.zeros_like(t)
+    h = 1.
+    sm = np.sqrt(s)
+    for m in range(30):
+        a = (n+m+0.5)*t - (m+0.5)*np.pi/2
+        ca = np.cos(a)
+        p += h*ca/sm
+        dp -= h*((n+m+0.5)*np.sin(a)/sm + (m+0.5)*ca*c/(sm*s))
+        if np.all(abs(h/sm) < tol):
+            break
+        h *= (m+0.5)**2/((m+1)*(n+m+1.5))
+        sm *= s
+    return p, dp
+
+def _newton(func, x, maxit=20, tol=1e-15):
+    """Return root of func near x, where func(x) returns (f(x), f'(x))"""
+    for _ in range(maxit):
+        f, df = func(x)
+        dx = f/df
+        x -= dx
+        if np.all(abs(dx) < tol):
+            break
+    return x
+
+def _nodes(N, theta, gauss):
+    """Return nodes cos(theta) > 0 and weights
 
+    args:
+        N         int      Number of quadrature points
+        theta     array    Initial guesses for theta of the nodes
+        gauss     bool     Legendre-Gauss if True, otherwise the interior
+                           nodes of Legendre-Gauss-Lobatto
+
+    """
+    n = N if gauss else N-1
+    if N < _N_RECURRENCE:
+        boundary = np.ones(len(theta), dtype=bool)
+    else:
+        boundary = n*np.sin(theta) < _BOUNDARY
+
+    theta = theta.copy()
+    p = np.zeros_like(theta)
+    dp = np.zeros_like(theta)
+    for func, s in ((_legendre_recurrence, boundary),
+                    (_legendre_asymptotic, ~boundary)):
+        if gauss:
+            f = lambda t: func(n, t)
+        else:
+            # Lobatto nodes are the roots of dP_n/dt, and the second
+            # derivative follows from Legendre's differential equation
+            def f(t):
+                p, dp = func(n, t)
+                return dp, -dp/np.tan(t) - n*(n+1)*p
+        theta[s] = _newton(f, theta[s])
+        p[s], dp[s] = func(n, theta[s])
+
+    if not np.all(boundary):
+        # Scale expansion with C_n, which is found by comparing with the
+        # recurrence at a local extremum of P_n close to the first node
+        t = theta[~boundary][:1]
+        if gauss:
+            t = t + np.pi/(2*n)
+        scale = _legendre_recurrence(n, t)[0]/_legendre_asymptotic(n, t)[0]
+        p[~boundary] *= scale
+        dp[~boundary] *= scale
+
+    if gauss:
+        # w = 2/((1-x^2)P'_n(x)^2) = 2/(dP_n/dt)^2
+        w = 2/dp**2
+    else:
+        w = 2/(n*(n+1)*p**2)
+    return np.cos(theta), w
 
 def legendre_gauss_nodes_and_weights(N):
+    """Return Legendre-Gauss nodes and weights
+
+    args:
+        N         int      Number of quadrature points
+
+    """
     M = N//2
-    j = np.arange(1, M)
+    k = np.arange(1, M+1)
+    theta = (4*k-1)*np.pi/(4*N+2)
+    xp, wp = _nodes(N, theta, True)
     x = np.zeros(N)
-    s = quadpy.line_segment.GaussLegendre(N)
-    x[:] = s.points
-
-    Ln = leg.Legendre.basis(N)
-    Ld = Ln.deriv(1)
-    converged = False
-    dx = np.zeros_like(x)
-    count = 0
-    while not converged and count < 10:
-        dx[:] = Ln(x)/Ld(x)
-        x -= dx
-        error = np.linalg.norm(dx)
-        converged = error < 1e-16
-        count += 1
-        print(count, error)
-
-    MM = M if N % 2 == 0 else M+1
-    x[MM:-1] = -x[1:M][::-1]
-    w = 2./(1-x**2)/Ld(x)**2
+    w = np.zeros(N)
+    x[N-M:] = xp[::-1]
+    x[:M] = -xp
+    w[N-M:] = wp[::-1]
+    w[:M] = wp
+    if N % 2 == 1:
+        # Node at x=0, where P'_N(0) = N P_{N-1}(0)
+        w[M] = 2/(N*eval_legendre(N-1, 0.))**2
+    return x, w
+
+def legendre_lobatto_nodes_and_weights(N):
+    """Return Legendre-Gauss-Lobatto nodes and weights
+
+    args:
+        N         int      Number of quadrature points
+
+    """
+    M = (N-2)//2
+    x = np.zeros(N)
+    w = np.zeros(N)
+    x[0] = -1.
+    x[-1] = 1.
+    w[0] = w[-1] = 2./(N*(N-1))
+    if M > 0:
+        j = np.arange(1, M+1)
+        theta = (j+0.25)*np.pi/N - 3./(8.*N*np.pi*(j+0.25))
+        xp, wp = _nodes(N, theta, False)
+        x[N-1-M:-1] = xp[::-1]
+        x[1:M+1] = -xp
+        w[N-1-M:-1] = wp[::-1]
+        w[1:M+1] = wp
+    if N % 2 == 1 and N > 1:
+        # Node at x=0
+        w[M+1] = 2./(N*(N-1)*eval_legendre(N-1, 0.)**2)
     return x, w
 
 if __name__ == '__main__': # pragma: no cover
     import sys
     from time import time
-    import quadpy
+    from numpy.polynomial import legendre as leg
 
     N = eval(sys.argv[-1])
     t0 = time()
     x, w = legendre_lobatto_nodes_and_weights(N)
-    print("Time mine {}".format(time()-t0))
-
-    t0 = time()
-    s = quadpy.line_segment.GaussLobatto(N)
-    print("Time quadpy {}".format(time()-t0))
-
-    assert np.allclose(x, s.points)
-    assert np.allclose(w, s.weights)
+    print("Time Lobatto {}".format(time()-t0))
+    Ld = leg.Legendre.basis(N-1).deriv(1)
+    print("Max |P'_{N-1}(x)| {}".format(abs(Ld(x[1:-1])).max()))
 
     t0 = time()
     x, w = legendre_gauss_nodes_and_weights(N)
-    print("Time mine {}".format(time()-t0))
-
-    t0 = time()
-    s = quadpy.line_segment.GaussLegendre(N)
-    print("Time quadpy {}".format(time()-t0))
+    print("Time Gauss {}".format(time()-t0))
 
-    assert np.allclose(x, s.points)
-    assert np.allclose(w, s.weights)
+    if N < 1000:
+        t0 = time()
+        xn, wn = leg.leggauss(N)
+        print("Time numpy {}".format(time()-t0))
+        assert np.allclose(x, xn)
+        assert np.allclose(w, wn)
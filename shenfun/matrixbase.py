@@ -1,14 +1,16 @@
 from __future__ import division
 import numpy as np
 from scipy.sparse import diags as sp_diags
-from scipy.sparse.linalg import spsolve
 from scipy.linalg import solve as lasolve
 import six
-from copy import deepcopy
+from copy import copy, deepcopy
 from numbers import Number
 from .utilities import inheritdocstrings
+from .utilities.cache import LRUCache
+from .optimization import Matvec
 
-__all__=['SparseMatrix', 'SpectralMatrix', 'extract_diagonal_matrix']
+__all__=['SparseMatrix', 'SpectralMatrix', 'LinearCombination',
+         'extract_diagonal_matrix']
 
 class SparseMatrix(dict):
     """Base class for sparse matrices
@@ -39,8 +41,17 @@ class SparseMatrix(dict):
         dict.__init__(self, d)
         self.shape = shape
         self._diags = None
+        self._solver = None
+        self._bands = None
 
-    def matvec(self, v, c, format='dia', axis=0):
+    def __setitem__(self, key, val):
+        dict.__setitem__(self, key, val)
+        # Sparse matrix, solver and packed diagonals are out of date
+        self._diags = None
+        self._solver = None
+        self._bands = None
+
+    def matvec(self, v, c, format='cython', axis=0):
         """Matrix vector product
 
         Returns c = dot(self, v)
@@ -54,15 +65,22 @@ class SparseMatrix(dict):
                      'dia',      format = 'csr' or 'dia' uses sparse matrices
                      'python',   from scipy.sparse and their built in matvec.
                      'self',     format = 'python' uses numpy and vectorization
-                     'cython')   'self' and 'cython' are keywords reserved for
-                                 methods overloaded in subclasses, and may not
-                                 be implemented for all matrices.
+                     'cython')   format = 'cython' uses a compiled banded
+                                 matvec for any ndim and axis.
+                                 'self' and 'cython' are keywords reserved for
+                                 methods overloaded in subclasses, and fall
+                                 back on the compiled banded matvec.
 
         """
         assert v.shape == c.shape
         N, M = self.shape
         c.fill(0)
 
+        if format not in ('csr', 'dia', 'python'):
+            if self._banded_matvec(v, c, axis):
+                return c
+            format = 'csr'
+
         # Roll relevant axis to first
         if axis > 0:
             v = np.moveaxis(v, axis, 0)
@@ -78,8 +96,6 @@ class SparseMatrix(dict):
                     c[:min(N, M-key)] += val*v[key:min(M, N+key)]
 
         else:
-            if format not in ('csr', 'dia'): # Fallback on 'csr'. Should probably throw warning
-                format = 'csr'
             diags = self.diags(format=format)
             P = int(np.prod(v.shape[1:]))
             c[:N] = diags.dot(v[:M].reshape(M, P)).reshape(c[:N].shape)
@@ -90,6 +106,39 @@ class SparseMatrix(dict):
 
         return c
 
+    def _banded_matvec(self, v, c, axis):
+        """Compute c = dot(self, v) along axis with compiled kernel
+
+        Returns False, without computing c, for unsupported data types.
+        """
+        dtype = v.dtype
+        if not (c.dtype == dtype and dtype.char in 'fdFD' and v.flags.writeable):
+            return False
+        if self._bands is None:
+            self._bands = {}
+        if dtype.char not in self._bands:
+            if dtype.char in 'fd' and any(np.iscomplexobj(val) for val in self.values()):
+                return False
+            N, M = self.shape
+            offsets = np.array(sorted(self.keys()), dtype=np.int64)
+            bands = np.zeros((len(offsets), N), dtype=dtype)
+            for i, key in enumerate(offsets):
+                bands[i, max(0, -key):min(N, M-key)] = self[key]
+            self._bands[dtype.char] = (offsets, bands)
+        offsets, bands = self._bands[dtype.char]
+
+        N, M = self.shape
+        sN = [slice(None)]*c.ndim
+        sN[axis] = slice(0, N)
+        sN = tuple(sN)
+        sM = sN[:axis] + (slice(0, M),) + sN[axis+1:]
+        v3 = _strided_view3D(v[sM], axis)[0]
+        c3, copied = _strided_view3D(c[sN], axis)
+        Matvec.Banded_matvec3D(v3, c3, offsets, bands, None, _get_threads(self))
+        if copied:
+            c[sN] = c3.reshape(c[sN].shape)
+        return True
+
     def diags(self, format='dia'):
         """Return a regular sparse matrix of specified format
 
@@ -110,26 +159,17 @@ class SparseMatrix(dict):
     def __imul__(self, y):
         """self.__imul__(y) <==> self*=y"""
         assert isinstance(y, Number)
+        # New arrays, since diagonals may be shared with other matrices
         for key in self:
-            # Check if symmetric
-            if key < 0 and (-key) in self:
-                if id(self[key]) == id(self[-key]):
-                    continue
-            self[key] *= y
+            self[key] = self[key]*y
 
         return self
 
     def __mul__(self, y):
         """Returns copy of self.__mul__(y) <==> self*y"""
-        f = SparseMatrix(deepcopy(dict(self)), self.shape)
         assert isinstance(y, Number)
-        for key in f:
-            # Check if symmetric
-            if key < 0 and (-key) in f:
-                if id(f[key]) == id(f[-key]):
-                    continue
-            f[key] *= y
-        return f
+        return SparseMatrix({key: val*y for key, val in six.iteritems(self)},
+                            self.shape)
 
     def __rmul__(self, y):
         """Returns copy of self.__rmul__(y) <==> y*self"""
@@ -137,31 +177,24 @@ class SparseMatrix(dict):
 
     def __div__(self, y):
         """Returns copy self.__div__(y) <==> self/y"""
-        f = SparseMatrix(deepcopy(dict(self)), self.shape)
         assert isinstance(y, Number)
-        for key in f:
-            # Check if symmetric
-            if key < 0 and (-key) in f:
-                if id(f[key]) == id(f[-key]):
-                    continue
-            f[key] /= y
-        return f
+        return SparseMatrix({key: val/y for key, val in six.iteritems(self)},
+                            self.shape)
 
     def __truediv__(self, y):
         """Returns copy self.__div__(y) <==> self/y"""
         return self.__div__(y)
 
     def __add__(self, d):
-        """Return copy of self.__add__(y) <==> self+d"""
-        f = SparseMatrix(deepcopy(dict(self)), self.shape)
+        """Return copy of self.__add__(y) <==> self+d
+
+        Diagonals not in both self and d are shared with the returned matrix
+        """
+        f = SparseMatrix(dict(self), self.shape)
         assert isinstance(d, dict)
         #assert d.shape == self.shape
         for key, val in six.iteritems(d):
             if key in f:
-                # Check if symmetric and make copy if necessary
-                if -key in f:
-                    if id(f[key]) == id(f[-key]):
-                        f[-key] = deepcopy(f[key])
                 f[key] = f[key] + val
             else:
                 f[key] = val
@@ -172,29 +205,25 @@ class SparseMatrix(dict):
         """self.__iadd__(d) <==> self += d"""
         assert isinstance(d, dict)
         assert d.shape == self.shape
+        # New arrays, since diagonals may be shared with other matrices
         for key, val in six.iteritems(d):
             if key in self:
-                # Check if symmetric and make copy if necessary
-                if -key in self:
-                    if id(self[key]) == id(self[-key]):
-                        self[-key] = deepcopy(self[key])
-                self[key] += val
+                self[key] = self[key] + val
             else:
                 self[key] = val
 
         return self
 
     def __sub__(self, d):
-        """Return copy of self.__sub__(y) <==> self-d"""
-        f = SparseMatrix(deepcopy(dict(self)), self.shape)
+        """Return copy of self.__sub__(y) <==> self-d
+
+        Diagonals only in self are shared with the returned matrix
+        """
+        f = SparseMatrix(dict(self), self.shape)
         assert isinstance(d, dict)
         assert d.shape == self.shape
         for key, val in six.iteritems(d):
             if key in f:
-                # Check if symmetric and make copy if necessary
-                if -key in f:
-                    if id(f[key]) == id(f[-key]):
-                        f[-key] = deepcopy(f[key])
                 f[key] = f[key] - val
             else:
                 f[key] = -val
@@ -205,13 +234,10 @@ class SparseMatrix(dict):
         """self.__isub__(d) <==> self -= d"""
         assert isinstance(d, dict)
         assert d.shape == self.shape
+        # New arrays, since diagonals may be shared with other matrices
         for key, val in six.iteritems(d):
             if key in self:
-                # Check if symmetric and make copy if necessary
-                if -key in self:
-                    if id(self[key]) == id(self[-key]):
-                        self[-key] = deepcopy(self[key])
-                self[key] -= val
+                self[key] = self[key] - val
             else:
                 self[key] = -val
 
@@ -230,35 +256,31 @@ class SparseMatrix(dict):
                                    Solution on exit unless u is provided.
             u    (output)          Optional output vector
 
-        Vectors may be one- or multidimensional.
+        kwargs:
+            axis     int           The axis to solve along
+
+        Vectors may be one- or multidimensional. The solver of self is
+        selected and factorized on the first call and reused, see
+        factorize.
 
         """
         assert self.shape[0] == self.shape[1]
         assert self.shape[0] == b.shape[axis]
+        return self.factorize()(b, u, axis=axis)
 
-        if u is None:
-            u = b
-        else:
-            assert u.shape == b.shape
-
-        # Roll relevant axis to first
-        if axis > 0:
-            u = np.moveaxis(u, axis, 0)
-            if not u is b:
-                b = np.moveaxis(b, axis, 0)
+    def factorize(self):
+        """Return solver for self
 
-        if b.ndim == 1:
-            u[:] = spsolve(self.diags(), b)
-        else:
-            N = b.shape[0]
-            P = np.prod(b.shape[1:])
-            u[:] = spsolve(self.diags(), b.reshape((N, P))).reshape(u.shape)
+        The fastest exact solver is selected from the diagonals of self
+        with shenfun.la.get_solver. The solver and its factorization is
+        computed on the first call and reused until the diagonals of self
+        are modified.
 
-        if axis > 0:
-            u = np.moveaxis(u, 0, axis)
-            if not u is b:
-                b = np.moveaxis(b, 0, axis)
-        return u
+        """
+        if self._solver is None:
+            from shenfun.la import get_solver
+            self._solver = get_solver(self)
+        return self._solver
 
 
 @inheritdocstrings
@@ -371,7 +393,16 @@ class SpectralMatrix(SparseMatrix):
     k = 0, 1, ..., N-2, i.e., including the zero index for a nonzero average
     value.
 
+    Matrices assembled with shenfun.spectralbase.inner_product are stored in
+    the LRUCache SpectralMatrix.cache, and all matrices of the same bases
+    share the same read-only diagonals. Scaling a matrix only changes its
+    scale, adding or subtracting another matrix in place replaces the
+    diagonals of the sum with new arrays, and the sum or difference of two
+    different matrices is a lazy LinearCombination.
+
     """
+    cache = LRUCache()
+
     def __init__(self, d, test, trial, scale=1.0):
         if isinstance(test[1], (int, np.integer)):
             k_test, k_trial = test[1], trial[1]
@@ -402,10 +433,14 @@ class SpectralMatrix(SparseMatrix):
     def get_dense_matrix(self):
         """Return dense matrix automatically computed from basis"""
         N = self.testfunction[0].N
-        x, w = self.testfunction[0].points_and_weights(N)
-        V = self.testfunction[0].vandermonde(x)
-        test = self.testfunction[0].get_vandermonde_basis_derivative(V, self.testfunction[1])
-        trial = self.trialfunction[0].get_vandermonde_basis_derivative(V, self.trialfunction[1])
+        w = self.testfunction[0].cached_points_and_weights(N)[1]
+        test = self.testfunction[0].cached_vandermonde_basis_derivative(self.testfunction[1])
+        if self.trialfunction[0].quad == self.testfunction[0].quad:
+            trial = self.trialfunction[0].cached_vandermonde_basis_derivative(self.trialfunction[1])
+        else:
+            x = self.testfunction[0].cached_points_and_weights(N)[0]
+            V = self.testfunction[0].vandermonde(x)
+            trial = self.trialfunction[0].get_vandermonde_basis_derivative(V, self.trialfunction[1])
         return np.dot(w*test.T, np.conj(trial))
 
     def test_sanity(self):
@@ -421,7 +456,7 @@ class SpectralMatrix(SparseMatrix):
         for key, val in six.iteritems(self):
             assert np.allclose(val, Dsp[key])
 
-    def matvec(self, v, c, format='csr', axis=0):
+    def matvec(self, v, c, format='cython', axis=0):
         c = super(SpectralMatrix, self).matvec(v, c, format=format, axis=axis)
         if self.testfunction[0].__class__.__name__ == 'ShenNeumannBasis':
             ss = [slice(None)]*len(v.shape)
@@ -443,6 +478,43 @@ class SpectralMatrix(SparseMatrix):
         u = default_solve(self, b, u, axis=axis)
         return u
 
+    def factorize(self):
+        """Return solver for self
+
+        For a Neumann test basis, the first equation of self is singular, and
+        it is replaced with the Dirichlet condition u[0] = b[0] for the
+        mean value. The solver is then for this bordered matrix.
+
+        """
+        if (self._solver is None and
+                self.testfunction[0].__class__.__name__ == 'ShenNeumannBasis'):
+            from shenfun.la import get_solver
+            N = self.shape[0]
+            d = {0: np.zeros(N)}
+            for key, val in six.iteritems(self):
+                if key >= 0:
+                    val = np.broadcast_to(val, N-key).copy()
+                    val[0] = 0
+                d[key] = val
+            d[0][0] = 1
+            self._solver = get_solver(SparseMatrix(d, self.shape))
+        return SparseMatrix.factorize(self)
+
+    def _shared_copy(self, test, trial):
+        """Return copy of self for the bases of test and trial
+
+        The copy shares the diagonals of self, but has its own scale and
+        solver.
+        """
+        A = copy(self)
+        A.testfunction = (test[0], self.testfunction[1])
+        A.trialfunction = (trial[0], self.trialfunction[1])
+        A._diags = None
+        solver = self.__dict__.get('solve')
+        if getattr(solver, 'mat', None) is self:
+            A.solve = solver.__class__(A)
+        return A
+
     def __hash__(self):
         return hash(((self.testfunction[0].__class__, self.testfunction[1]),
                      (self.trialfunction[0].__class__, self.trialfunction[1])))
@@ -460,9 +532,12 @@ class SpectralMatrix(SparseMatrix):
         return self
 
     def __mul__(self, y):
-        """Returns copy of self.__mul__(y) <==> self*y"""
+        """Returns copy of self.__mul__(y) <==> self*y
+
+        The copy shares the diagonals of self
+        """
         assert isinstance(y, Number)
-        f = SpectralMatrix(deepcopy(dict(self)), self.testfunction,
+        f = SpectralMatrix(dict(self), self.testfunction,
                            self.trialfunction, self.scale*y)
         return f
 
@@ -471,9 +546,12 @@ class SpectralMatrix(SparseMatrix):
         return self.__mul__(y)
 
     def __div__(self, y):
-        """Returns copy self.__div__(y) <==> self/y"""
+        """Returns copy self.__div__(y) <==> self/y
+
+        The copy shares the diagonals of self
+        """
         assert isinstance(y, Number)
-        f = SpectralMatrix(deepcopy(dict(self)), self.testfunction,
+        f = SpectralMatrix(dict(self), self.testfunction,
                            self.trialfunction, self.scale/y)
         return f
 
@@ -482,26 +560,17 @@ class SpectralMatrix(SparseMatrix):
         return self.__div__(y)
 
     def __add__(self, d):
-        """Return copy of self.__add__(y) <==> self+d"""
+        """Return copy of self.__add__(y) <==> self+d
+
+        The sum of two different matrices is a LinearCombination, that shares
+        the diagonals of self and d.
+        """
         assert isinstance(d, dict)
         # Check is the same matrix
         if self.__hash__() == d.__hash__():
-            f = SpectralMatrix(deepcopy(dict(self)), self.testfunction,
-                               self.trialfunction, self.scale+d.scale)
-        else:
-            f = SpectralMatrix(deepcopy(dict(self)), self.testfunction,
-                               self.trialfunction, 1.0)
-            for key, val in six.iteritems(d):
-                if key in f:
-                    # Check if symmetric and make copy if necessary
-                    if -key in f:
-                        if id(f[key]) == id(f[-key]):
-                            f[-key] = deepcopy(f[key])
-                    f[key] = self.scale*f[key] + d.scale*val
-                else:
-                    f[key] = d.scale*val
-
-        return f
+            return SpectralMatrix(dict(self), self.testfunction,
+                                  self.trialfunction, self.scale+d.scale)
+        return LinearCombination([self, d])
 
     def __iadd__(self, d):
         """self.__iadd__(d) <==> self += d"""
@@ -510,40 +579,28 @@ class SpectralMatrix(SparseMatrix):
         if self.__hash__() == d.__hash__():
             self.scale += d.scale
         else:
+            # New arrays, since diagonals may be shared with other matrices
             for key, val in six.iteritems(d):
                 if key in self:
-                    # Check if symmetric and make copy if necessary
-                    if -key in self:
-                        if id(self[key]) == id(self[-key]):
-                            self[-key] = deepcopy(self[key])
-                    self[key] += d.scale*val/self.scale
+                    self[key] = self[key] + d.scale*val/self.scale
                 else:
                     self[key] = d.scale*val/self.scale
+            self._diags = None
 
         return self
 
     def __sub__(self, d):
-        """Return copy of self.__sub__(y) <==> self-d"""
+        """Return copy of self.__sub__(y) <==> self-d
+
+        The difference of two different matrices is a LinearCombination, that
+        shares the diagonals of self and d.
+        """
         assert isinstance(d, dict)
         # Check is the same matrix
         if self.__hash__() == d.__hash__():
-            f = SpectralMatrix(deepcopy(dict(self)), self.testfunction,
-                               self.trialfunction, self.scale-d.scale)
-        else:
-            f = SpectralMatrix(deepcopy(dict(self)), self.testfunction,
-                               self.trialfunction, 1.0)
-            for key, val in six.iteritems(d):
-                if key in f:
-                    # Check if symmetric and make copy if necessary
-                    if -key in f:
-                        if id(f[key]) == id(f[-key]):
-                            f[-key] = deepcopy(f[key])
-                    f[key] = self.scale*f[key] - d.scale*val
-                else:
-                    f[key] = -d.scale*val
-
-        return f
-
+            return SpectralMatrix(dict(self), self.testfunction,
+                                  self.trialfunction, self.scale-d.scale)
+        return LinearCombination([self, d], [1, -1])
 
     def __isub__(self, d):
         """self.__isub__(d) <==> self -= d"""
@@ -552,19 +609,255 @@ class SpectralMatrix(SparseMatrix):
         if self.__hash__() == d.__hash__():
             self.scale -= d.scale
         else:
+            # New arrays, since diagonals may be shared with other matrices
             for key, val in six.iteritems(d):
                 if key in self:
-                    # Check if symmetric and make copy if necessary
-                    if -key in self:
-                        if id(self[key]) == id(self[-key]):
-                            self[-key] = deepcopy(self[key])
-                    self[key] -= d.scale*val/self.scale
+                    self[key] = self[key] - d.scale*val/self.scale
                 else:
                     self[key] = -d.scale*val/self.scale
+            self._diags = None
 
         return self
 
 
+@inheritdocstrings
+class LinearCombination(SpectralMatrix):
+    """Lazy linear combination of SpectralMatrices
+
+    Represents the matrix
+
+        sum_i coefficients[i]*matrices[i]
+
+    without adding the diagonals. The matrix vector product is computed term
+    by term, and the coefficients may be scale arrays that broadcast against
+    the result, like the scales of matrices assembled for tensor product
+    spaces. The diagonals of the sum are computed on first access through
+    the dictionary interface, or when the matrix is factorized, and are then
+    reused until the coefficients change. A diagonal found in only one term
+    with unit coefficient is shared with that term. With array coefficients
+    the diagonals of the sum are not defined. The keys are then the union of
+    the keys of the terms, and accessing the diagonals, diags or factorize
+    raises ValueError.
+
+    args:
+        matrices        list of SpectralMatrices. LinearCombinations are
+                        flattened into their terms
+
+    kwargs:
+        coefficients    list of numbers or arrays, one for each matrix.
+                        Default is 1 for all
+
+    The coefficients include the scales of the matrices, and may be modified
+    in place, e.g., for a new time step
+
+    >>> H = A + B
+    >>> H.coefficients[1] = dt*B.scale
+
+    The matrices are shallow copies, so modifying one of the original
+    matrices afterwards does not change the combination.
+
+    """
+    def __init__(self, matrices, coefficients=None):
+        if coefficients is None:
+            coefficients = [1]*len(matrices)
+        assert len(coefficients) == len(matrices)
+        self.matrices = []
+        self.coefficients = []
+        for mat, c in zip(matrices, coefficients):
+            self._add_terms(mat, c)
+        mat = self.matrices[0]
+        self.testfunction = mat.testfunction
+        self.trialfunction = mat.trialfunction
+        self.scale = 1.0
+        self._key = None
+        SparseMatrix.__init__(self, {}, mat.shape)
+
+    def _add_terms(self, mat, c):
+        assert isinstance(mat, SpectralMatrix)
+        if self.matrices:
+            assert mat.shape == self.matrices[0].shape
+        if isinstance(mat, LinearCombination):
+            for m, cm in zip(mat.matrices, mat.coefficients):
+                self.matrices.append(m)
+                self.coefficients.append(c*mat.scale*cm)
+        else:
+            m = copy(mat)
+            m.scale = 1.0
+            self.matrices.append(m)
+            self.coefficients.append(c*mat.scale)
+
+    def _scalar_coefficients(self):
+        return all(np.size(c) == 1 for c in self.coefficients)
+
+    def _materialize(self):
+        """Compute the diagonals of the sum, unless up to date
+
+        With scale arrays for coefficients the diagonals of the sum are not
+        defined. The keys are then the union of the keys of the terms, and
+        the diagonals are not available.
+        """
+        if not self._scalar_coefficients():
+            key = tuple(id(mat) for mat in self.matrices)
+            if key == self._key:
+                return
+            d = {}
+            for mat in self.matrices:
+                d.update((k, None) for k in mat)
+        else:
+            key = tuple(np.asarray(c).item() for c in self.coefficients)
+            if key == self._key:
+                return
+            d = {}
+            for c, mat in zip(key, self.matrices):
+                for k, val in six.iteritems(mat):
+                    if k in d:
+                        d[k] = d[k] + c*val
+                    else:
+                        d[k] = val if c == 1 else c*val
+        dict.clear(self)
+        dict.update(self, d)
+        self._key = key
+        self._diags = None
+        self._solver = None
+        self._bands = None
+
+    def _diagonals(self):
+        """Compute the diagonals of the sum, or raise ValueError if they are
+        not defined"""
+        self._materialize()
+        if not self._scalar_coefficients():
+            raise ValueError("The diagonals of a LinearCombination are not "
+                             "defined for array coefficients. Use matvec, "
+                             "or the terms in matrices")
+
+    def __getitem__(self, key):
+        self._diagonals()
+        return dict.__getitem__(self, key)
+
+    def __setitem__(self, key, val):
+        # Replace terms with the modified sum
+        self._diagonals()
+        mat = SpectralMatrix(dict(self), self.testfunction, self.trialfunction)
+        mat[key] = val
+        self.matrices = [mat]
+        self.coefficients = [1]
+        self._materialize()
+
+    def __contains__(self, key):
+        self._materialize()
+        return dict.__contains__(self, key)
+
+    def __iter__(self):
+        self._materialize()
+        return dict.__iter__(self)
+
+    def __len__(self):
+        self._materialize()
+        return dict.__len__(self)
+
+    def __repr__(self):
+        if not self._scalar_coefficients():
+            return '%s(%r, %r)' % (self.__class__.__name__, self.matrices,
+                                   self.coefficients)
+        self._materialize()
+        return dict.__repr__(self)
+
+    def get(self, key, default=None):
+        self._diagonals()
+        return dict.get(self, key, default)
+
+    def keys(self):
+        self._materialize()
+        return dict.keys(self)
+
+    def values(self):
+        self._diagonals()
+        return dict.values(self)
+
+    def items(self):
+        self._diagonals()
+        return dict.items(self)
+
+    def __reduce__(self):
+        return (LinearCombination, (self.matrices, self.coefficients),
+                {'scale': self.scale})
+
+    def __hash__(self):
+        return id(self)
+
+    def get_key(self):
+        return self.__hash__()
+
+    def diags(self, format='dia'):
+        self._diagonals()
+        return SpectralMatrix.diags(self, format=format)
+
+    def factorize(self):
+        self._diagonals()
+        return SpectralMatrix.factorize(self)
+
+    def matvec(self, v, c, format='cython', axis=0):
+        c.fill(0)
+        w = np.empty_like(c)
+        for coef, mat in zip(self.coefficients, self.matrices):
+            w = mat.matvec(v, w, format=format, axis=axis)
+            c += coef*w
+        return c
+
+    def __mul__(self, y):
+        """Returns copy of self.__mul__(y) <==> self*y"""
+        assert isinstance(y, Number)
+        return LinearCombination([self], [y])
+
+    def __div__(self, y):
+        """Returns copy self.__div__(y) <==> self/y"""
+        assert isinstance(y, Number)
+        return LinearCombination([self], [1./y])
+
+    def __add__(self, d):
+        """Return copy of self.__add__(y) <==> self+d"""
+        assert isinstance(d, dict)
+        return LinearCombination([self, d])
+
+    def __sub__(self, d):
+        """Return copy of self.__sub__(y) <==> self-d"""
+        assert isinstance(d, dict)
+        return LinearCombination([self, d], [1, -1])
+
+    def __iadd__(self, d):
+        """self.__iadd__(d) <==> self += d"""
+        assert isinstance(d, dict)
+        self._add_terms(d, 1./self.scale)
+        return self
+
+    def __isub__(self, d):
+        """self.__isub__(d) <==> self -= d"""
+        assert isinstance(d, dict)
+        self._add_terms(d, -1./self.scale)
+        return self
+
+
+def _strided_view3D(u, axis):
+    """Return 3D view of array u, with axis in the middle
+
+    Unlike shenfun.la._view3D, u may have any strides. If u cannot be viewed
+    in 3D, then a copy is returned instead.
+
+    Returns the 3D array and whether it is a copy.
+    """
+    shape = (int(np.prod(u.shape[:axis])), u.shape[axis],
+             int(np.prod(u.shape[axis+1:])))
+    try:
+        x = u.view()
+        x.shape = shape
+        return x, False
+    except AttributeError:
+        return u.reshape(shape), True
+
+def _get_threads(mat):
+    """Return number of threads of the test basis of mat, or 1"""
+    return getattr(getattr(mat, 'testfunction', (None,))[0], 'threads', 1)
+
 def extract_diagonal_matrix(M, abstol=1e-8, reltol=1e-12):
     """Return SparseMatrix version of M
 
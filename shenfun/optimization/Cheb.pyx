@@ -10,6 +10,8 @@ ctypedef double real
 ctypedef fused T:
     real_t
     complex_t
+    np.float32_t
+    np.complex64_t
 
 def derivative_coefficients(np.ndarray[T, ndim=1] fk, np.ndarray[T, ndim=1] ck):
     cdef:
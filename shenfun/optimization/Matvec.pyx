@@ -13,20 +13,21 @@ ctypedef np.int64_t int_t
 ctypedef fused T:
     real_t
     complex_t
+    np.float32_t
+    np.complex64_t
 
-def imult(T[:, :, ::1] array, real_t scale):
+def imult(T[:, :, ::1] array, real_t scale, int num_threads=1):
     cdef int i, j, k
 
-    #for i in prange(array.shape[0], nogil=True, num_threads=1):
-    for i in range(array.shape[0]):
+    for i in prange(array.shape[0], nogil=True, num_threads=num_threads):
         for j in range(array.shape[1]):
             for k in range(array.shape[2]):
                 array[i, j, k] *= scale
     return array
 
 
-def CDNmat_matvec(np.ndarray[real_t, ndim=1] ud,
-                  np.ndarray[real_t, ndim=1] ld,
+def CDNmat_matvec(const real_t[:] ud,
+                  const real_t[:] ld,
                   np.ndarray[T, ndim=3] v,
                   np.ndarray[T, ndim=3] b,
                   np.int64_t axis):
@@ -69,8 +70,8 @@ def CDNmat_matvec(np.ndarray[real_t, ndim=1] ud,
 
 
 def BDNmat_matvec(real_t ud,
-                  np.ndarray[real_t, ndim=1] ld,
-                  np.ndarray[real_t, ndim=1] dd,
+                  const real_t[:] ld,
+                  const real_t[:] dd,
                   np.ndarray[T, ndim=3] v,
                   np.ndarray[T, ndim=3] b,
                   np.int64_t axis):
@@ -118,8 +119,8 @@ def BDNmat_matvec(real_t ud,
                     b[i, j, k] = ud*v[i, j, k+2] + dd[k]*v[i, j, k] + ld[k-2]*v[i, j, k-2]
 
 
-def CDDmat_matvec(np.ndarray[real_t, ndim=1] ud,
-                  np.ndarray[real_t, ndim=1] ld,
+def CDDmat_matvec(const real_t[:] ud,
+                  const real_t[:] ld,
                   np.ndarray[T, ndim=3] v,
                   np.ndarray[T, ndim=3] b,
                   np.int64_t axis):
@@ -163,7 +164,7 @@ def CDDmat_matvec(np.ndarray[real_t, ndim=1] ud,
 
 def SBBmat_matvec(np.ndarray[T, ndim=1] v,
                   np.ndarray[T, ndim=1] b,
-                  np.ndarray[real_t, ndim=1] dd):
+                  const real_t[:] dd):
     cdef:
         int i, j, k
         int N = v.shape[0]-4
@@ -194,7 +195,7 @@ def SBBmat_matvec(np.ndarray[T, ndim=1] v,
 
 def SBBmat_matvec3D(np.ndarray[T, ndim=3] v,
                     np.ndarray[T, ndim=3] b,
-                    np.ndarray[real_t, ndim=1] dd,
+                    const real_t[:] dd,
                     np.int64_t axis):
     cdef:
         int i, j, k, jj
@@ -285,7 +286,7 @@ def SBBmat_matvec3D(np.ndarray[T, ndim=3] v,
 
 def ADDmat_matvec(np.ndarray[T, ndim=1] v,
                   np.ndarray[T, ndim=1] b,
-                  np.ndarray[real_t, ndim=1] dd):
+                  const real_t[:] dd):
     cdef:
         int i, j, k
         int N = v.shape[0]-2
@@ -311,10 +312,11 @@ def ADDmat_matvec(np.ndarray[T, ndim=1] v,
 
 def Tridiagonal_matvec3D(T[:, :, ::1] v,
                          T[:, :, ::1] b,
-                         real_t[::1] ld,
-                         real_t[::1] dd,
-                         real_t[::1] ud,
-                         np.int64_t axis):
+                         const real_t[::1] ld,
+                         const real_t[::1] dd,
+                         const real_t[::1] ud,
+                         np.int64_t axis,
+                         int num_threads=1):
     cdef:
         np.intp_t i, j, k
         np.intp_t N = dd.shape[0]
@@ -323,65 +325,49 @@ def Tridiagonal_matvec3D(T[:, :, ::1] v,
         #for j in range(v.shape[2]):
             #Tridiagonal_matvec(v[:, i, j], b[:, i, j], ld, dd, ud)
     if axis == 0:
-        for i in range(v.shape[1]):
+        for i in prange(v.shape[1], nogil=True, num_threads=num_threads):
             for j in range(v.shape[2]):
                 b[0, i, j] = dd[0]*v[0, i, j] + ud[0]*v[2, i, j]
                 b[1, i, j] = dd[1]*v[1, i, j] + ud[1]*v[3, i, j]
 
-        for k in xrange(2, N-2):
-            for i in range(v.shape[1]):
+            for k in range(2, N-2):
                 for j in range(v.shape[2]):
                     b[k, i, j] = ld[k-2]* v[k-2, i, j] + dd[k]*v[k, i, j] + ud[k]*v[k+2, i, j]
 
-        for i in range(v.shape[1]):
             for j in range(v.shape[2]):
-                k = N-2
-                b[k, i, j] = ld[k-2]* v[k-2, i, j] + dd[k]*v[k, i, j]
-                k = N-1
-                b[k, i, j] = ld[k-2]* v[k-2, i, j] + dd[k]*v[k, i, j]
+                b[N-2, i, j] = ld[N-4]* v[N-4, i, j] + dd[N-2]*v[N-2, i, j]
+                b[N-1, i, j] = ld[N-3]* v[N-3, i, j] + dd[N-1]*v[N-1, i, j]
     elif axis == 1:
-        for i in range(v.shape[0]):
+        for i in prange(v.shape[0], nogil=True, num_threads=num_threads):
             for k in range(v.shape[2]):
                 b[i, 0, k] = dd[0]*v[i, 0, k] + ud[0]*v[i, 2, k]
                 b[i, 1, k] = dd[1]*v[i, 1, k] + ud[1]*v[i, 3, k]
 
-        for i in range(v.shape[0]):
-            for j in xrange(2, N-2):
+            for j in range(2, N-2):
                 for k in range(v.shape[2]):
                     b[i, j, k] = ld[j-2]* v[i, j-2, k] + dd[j]*v[i, j, k] + ud[j]*v[i, j+2, k]
 
-        for i in range(v.shape[0]):
             for k in range(v.shape[2]):
-                j = N-2
-                b[i, j, k] = ld[j-2]* v[i, j-2, k] + dd[j]*v[i, j, k]
-                j = N-1
-                b[i, j, k] = ld[j-2]* v[i, j-2, k] + dd[j]*v[i, j, k]
+                b[i, N-2, k] = ld[N-4]* v[i, N-4, k] + dd[N-2]*v[i, N-2, k]
+                b[i, N-1, k] = ld[N-3]* v[i, N-3, k] + dd[N-1]*v[i, N-1, k]
 
     elif axis == 2:
-        for i in range(v.shape[0]):
+        for i in prange(v.shape[0], nogil=True, num_threads=num_threads):
             for j in range(v.shape[1]):
                 b[i, j, 0] = dd[0]*v[i, j, 0] + ud[0]*v[i, j, 2]
                 b[i, j, 1] = dd[1]*v[i, j, 1] + ud[1]*v[i, j, 3]
-
-        for i in range(v.shape[0]):
-            for j in range(v.shape[1]):
-                for k in xrange(2, N-2):
+                for k in range(2, N-2):
                     b[i, j, k] = ld[k-2]* v[i, j, k-2] + dd[k]*v[i, j, k] + ud[k]*v[i, j, k+2]
-
-        for i in range(v.shape[0]):
-            for j in range(v.shape[1]):
-                k = N-2
-                b[i, j, k] = ld[k-2]* v[i, j, k-2] + dd[k]*v[i, j, k]
-                k = N-1
-                b[i, j, k] = ld[k-2]* v[i, j, k-2] + dd[k]*v[i, j, k]
+                b[i, j, N-2] = ld[N-4]* v[i, j, N-4] + dd[N-2]*v[i, j, N-2]
+                b[i, j, N-1] = ld[N-3]* v[i, j, N-3] + dd[N-1]*v[i, j, N-1]
 
 
 
 def Tridiagonal_matvec(np.ndarray[T, ndim=1] v,
                        np.ndarray[T, ndim=1] b,
-                       real_t[::1] ld,
-                       real_t[::1] dd,
-                       real_t[::1] ud):
+                       const real_t[::1] ld,
+                       const real_t[::1] dd,
+                       const real_t[::1] ud):
     cdef:
         np.intp_t i
         np.intp_t N = dd.shape[0]
@@ -405,9 +391,9 @@ def Tridiagonal_matvec(np.ndarray[T, ndim=1] v,
 
 def Tridiagonal_matvec3DT(np.ndarray[T, ndim=3] v,
                           np.ndarray[T, ndim=3] b,
-                          np.ndarray[real_t, ndim=1] ld,
-                          np.ndarray[real_t, ndim=1] dd,
-                          np.ndarray[real_t, ndim=1] ud):
+                          const real_t[:] ld,
+                          const real_t[:] dd,
+                          const real_t[:] ud):
     cdef:
         int i, j, k
         int N = dd.shape[0]
@@ -423,11 +409,11 @@ def Tridiagonal_matvec3DT(np.ndarray[T, ndim=3] v,
 
 def Pentadiagonal_matvec3D(np.ndarray[T, ndim=3] v,
                     np.ndarray[T, ndim=3] b,
-                    np.ndarray[real_t, ndim=1] ldd,
-                    np.ndarray[real_t, ndim=1] ld,
-                    np.ndarray[real_t, ndim=1] dd,
-                    np.ndarray[real_t, ndim=1] ud,
-                    np.ndarray[real_t, ndim=1] udd,
+                    const real_t[:] ldd,
+                    const real_t[:] ld,
+                    const real_t[:] dd,
+                    const real_t[:] ud,
+                    const real_t[:] udd,
                     np.int64_t axis):
     cdef:
         int i, j, k
@@ -512,11 +498,11 @@ def Pentadiagonal_matvec3D(np.ndarray[T, ndim=3] v,
 
 def Pentadiagonal_matvec(T[::1] v,
                          T[::1] b,
-                         real_t[::1] ldd,
-                         real_t[::1] ld,
-                         real_t[::1] dd,
-                         real_t[::1] ud,
-                         real_t[::1] udd):
+                         const real_t[::1] ldd,
+                         const real_t[::1] ld,
+                         const real_t[::1] dd,
+                         const real_t[::1] ud,
+                         const real_t[::1] udd):
     cdef:
         int i
         int N = dd.shape[0]
@@ -539,9 +525,9 @@ def Pentadiagonal_matvec(T[::1] v,
 
 def CBD_matvec3D(np.ndarray[T, ndim=3] v,
                  np.ndarray[T, ndim=3] b,
-                 np.ndarray[real_t, ndim=1] ld,
-                 np.ndarray[real_t, ndim=1] ud,
-                 np.ndarray[real_t, ndim=1] udd,
+                 const real_t[:] ld,
+                 const real_t[:] ud,
+                 const real_t[:] udd,
                  np.int64_t axis):
     cdef:
         int i, j, k
@@ -592,9 +578,9 @@ def CBD_matvec3D(np.ndarray[T, ndim=3] v,
 
 def CBD_matvec(np.ndarray[T, ndim=1] v,
                np.ndarray[T, ndim=1] b,
-               np.ndarray[real_t, ndim=1] ld,
-               np.ndarray[real_t, ndim=1] ud,
-               np.ndarray[real_t, ndim=1] udd):
+               const real_t[:] ld,
+               const real_t[:] ud,
+               const real_t[:] udd):
     cdef:
         int i
         int N = udd.shape[0]
@@ -607,9 +593,9 @@ def CBD_matvec(np.ndarray[T, ndim=1] v,
 
 def CDB_matvec3D(T [:, :, ::1] v,
                  T [:, :, ::1] b,
-                 real_t [::1] lld,
-                 real_t [::1] ld,
-                 real_t [::1] ud,
+                 const real_t[::1] lld,
+                 const real_t[::1] ld,
+                 const real_t[::1] ud,
                  np.int64_t axis):
     cdef:
         int i, j, k
@@ -691,9 +677,9 @@ def CDB_matvec3D(T [:, :, ::1] v,
 def BBD_matvec3D(np.ndarray[T, ndim=3] v,
                  np.ndarray[T, ndim=3] b,
                  real_t ld,
-                 np.ndarray[real_t, ndim=1] dd,
-                 np.ndarray[real_t, ndim=1] ud,
-                 np.ndarray[real_t, ndim=1] uud,
+                 const real_t[:] dd,
+                 const real_t[:] ud,
+                 const real_t[:] uud,
                  np.int64_t axis):
     cdef:
         int i, j, k
@@ -750,9 +736,9 @@ def Helmholtz_matvec(np.ndarray[T, ndim=1] v,
                      np.ndarray[T, ndim=1] b,
                      real_t alfa,
                      real_t beta,
-                     np.ndarray[real_t, ndim=1] dd,
-                     np.ndarray[real_t, ndim=1] ud,
-                     np.ndarray[real_t, ndim=1] bd):
+                     const real_t[:] dd,
+                     const real_t[:] ud,
+                     const real_t[:] bd):
     # b = (alfa*A + beta*B)*v
     # For B matrix ld = ud = -pi/2
     cdef:
@@ -781,3 +767,67 @@ def Helmholtz_matvec(np.ndarray[T, ndim=1] v,
     s2 += v[k+1]
     b[k] = (dd[k]*alfa + bd[k]*beta)*v[k] - pi_half*beta*v[k+2] + ud[k]*alfa*s1
     b[k-1] = (dd[k-1]*alfa + bd[k-1]*beta)*v[k-1] - pi_half*beta*v[k+1] + ud[k-1]*alfa*s2
+
+
+def Banded_matvec3D(T[:, :, :] v,
+                    T[:, :, :] c,
+                    const int_t[::1] offsets,
+                    const T[:, :] diags,
+                    const T[:, :, :] scale=None,
+                    int num_threads=1):
+    """Return c = scale*dot(A, v) along axis 1 of v and c
+
+    Generic matvec for banded matrix A with any diagonal offsets and any
+    strides of v and c.
+
+    args:
+        v           Input array of shape (P, M, Q)
+        c           Output array of shape (P, N, Q)
+        offsets     Diagonal offsets of A
+        diags       Diagonals of A of shape (len(offsets), N). Row j of A,
+                    i.e., c[:, j], uses diags[:, j]
+
+    kwargs:
+        scale       Optional array broadcasted to the shape of c
+        num_threads Number of threads
+
+    """
+    cdef:
+        np.intp_t N = c.shape[1]
+        np.intp_t M = v.shape[1]
+        np.intp_t Q = c.shape[2]
+        np.intp_t ij, i, j, k, d, o, j0, j1
+        bint has_scale = scale is not None
+        T s
+
+    if Q == 1:
+        # Axis is last. Loop over diagonals for contiguous access
+        for i in prange(c.shape[0], nogil=True, num_threads=num_threads):
+            for j in range(N):
+                c[i, j, 0] = 0
+            for d in range(offsets.shape[0]):
+                o = offsets[d]
+                j0 = max(0, -o)
+                j1 = min(N, M-o)
+                for j in range(j0, j1):
+                    c[i, j, 0] = c[i, j, 0] + diags[d, j]*v[i, j+o, 0]
+            if has_scale:
+                for j in range(N):
+                    c[i, j, 0] = c[i, j, 0]*scale[i, j, 0]
+
+    else:
+        for ij in prange(c.shape[0]*N, nogil=True, num_threads=num_threads):
+            i = ij // N
+            j = ij - i*N
+            for k in range(Q):
+                c[i, j, k] = 0
+            for d in range(offsets.shape[0]):
+                o = j + offsets[d]
+                if o >= 0 and o < M:
+                    s = diags[d, j]
+                    for k in range(Q):
+                        c[i, j, k] = c[i, j, k] + s*v[i, o, k]
+            if has_scale:
+                for k in range(Q):
+                    c[i, j, k] = c[i, j, k]*scale[i, j, k]
+    return c
@@ -6,10 +6,14 @@ cimport cython
 cimport numpy as np
 from libcpp.vector cimport vector
 from libcpp.algorithm cimport copy
+from cython.parallel import prange, threadid
+from libc.math cimport M_PI
 
 ctypedef fused T:
     np.float64_t
     np.complex128_t
+    np.float32_t
+    np.complex64_t
 
 ctypedef np.complex128_t complex_t
 ctypedef np.float64_t real_t
@@ -372,7 +376,7 @@ def PDMA_Symsolve2D(real_t [::1] d,
             b[n-4, j] -= e[n-4]*b[n-2, j]
 
         for k in xrange(n-5,-1,-1):
-            for i in xrange(b.shape[1]):
+            for j in xrange(b.shape[1]):
                 b[k, j] /= d[k]
                 b[k, j] -= (e[k]*b[k+2, j] + f[k]*b[k+4, j])
 
@@ -449,24 +453,25 @@ def PDMA_Symsolve3D_ptr(real_t[::1] d,
                         real_t[::1] e,
                         real_t[::1] f,
                         T[:, :, ::1] x,
-                        np.int64_t axis):
+                        np.int64_t axis,
+                        int num_threads=1):
     cdef:
         int n = d.shape[0]
         int i, j, k, strides
 
     strides = x.strides[axis]/x.itemsize
     if axis == 0:
-        for j in range(x.shape[1]):
+        for j in prange(x.shape[1], nogil=True, num_threads=num_threads):
             for k in range(x.shape[2]):
                 PDMA_SymSolve_ptr(&d[0], &e[0], &f[0], &x[0,j,k], n, strides)
 
     elif axis == 1:
-        for i in range(x.shape[0]):
+        for i in prange(x.shape[0], nogil=True, num_threads=num_threads):
             for k in range(x.shape[2]):
                 PDMA_SymSolve_ptr(&d[0], &e[0], &f[0], &x[i,0,k], n, strides)
 
     elif axis == 2:
-        for i in range(x.shape[0]):
+        for i in prange(x.shape[0], nogil=True, num_threads=num_threads):
             for j in range(x.shape[1]):
                 PDMA_SymSolve_ptr(&d[0], &e[0], &f[0], &x[i,j,0], n, strides)
 
@@ -607,24 +612,25 @@ def TDMA_SymSolve3D_ptr(real_t[::1] d,
                         real_t[::1] a,
                         real_t[::1] l,
                         T[:, :, ::1] x,
-                        np.int64_t axis):
+                        np.int64_t axis,
+                        int num_threads=1):
     cdef:
         int n = d.shape[0]
         int i, j, k, strides
 
     strides = x.strides[axis]/x.itemsize
     if axis == 0:
-        for j in range(x.shape[1]):
+        for j in prange(x.shape[1], nogil=True, num_threads=num_threads):
             for k in range(x.shape[2]):
                 TDMA_SymSolve_ptr(&d[0], &a[0], &l[0], &x[0,j,k], n, strides)
 
     elif axis == 1:
-        for i in range(x.shape[0]):
+        for i in prange(x.shape[0], nogil=True, num_threads=num_threads):
             for k in range(x.shape[2]):
                 TDMA_SymSolve_ptr(&d[0], &a[0], &l[0], &x[i,0,k], n, strides)
 
     elif axis == 2:
-        for i in range(x.shape[0]):
+        for i in prange(x.shape[0], nogil=True, num_threads=num_threads):
             for j in range(x.shape[1]):
                 TDMA_SymSolve_ptr(&d[0], &a[0], &l[0], &x[i,j,0], n, strides)
 
@@ -649,31 +655,28 @@ def TDMA_SymSolve3D(real_t[::1] d,
                     real_t[::1] a,
                     real_t[::1] l,
                     T[:,:,::1] x,
-                    np.int64_t axis):
+                    np.int64_t axis,
+                    int num_threads=1):
     cdef:
-        unsigned int n = d.shape[0]
+        np.intp_t n = d.shape[0]
         np.intp_t i, j, k
-        real_t d1
 
     if axis == 0:
-        for i in range(2, n):
-            for j in range(x.shape[1]):
+        for j in prange(x.shape[1], nogil=True, num_threads=num_threads):
+            for i in range(2, n):
                 for k in range(x.shape[2]):
                     x[i, j, k] -= l[i-2]*x[i-2, j, k]
 
-        for j in range(x.shape[1]):
             for k in range(x.shape[2]):
                 x[n-1, j, k] = x[n-1, j, k]/d[n-1]
                 x[n-2, j, k] = x[n-2, j, k]/d[n-2]
 
-        for i in range(n - 3, -1, -1):
-            d1 = 1./d[i]
-            for j in range(x.shape[1]):
+            for i in range(n - 3, -1, -1):
                 for k in range(x.shape[2]):
-                    x[i, j, k] = (x[i, j, k] - a[i]*x[i+2, j, k])*d1
+                    x[i, j, k] = (x[i, j, k] - a[i]*x[i+2, j, k])/d[i]
 
     elif axis == 1:
-        for i in range(x.shape[0]):
+        for i in prange(x.shape[0], nogil=True, num_threads=num_threads):
             for j in range(2, n):
                 for k in range(x.shape[2]):
                     x[i, j, k] -= l[j-2]*x[i, j-2, k]
@@ -687,7 +690,7 @@ def TDMA_SymSolve3D(real_t[::1] d,
                     x[i, j, k] = (x[i, j, k] - a[j]*x[i, j+2, k])/d[j]
 
     elif axis == 2:
-        for i in range(x.shape[0]):
+        for i in prange(x.shape[0], nogil=True, num_threads=num_threads):
             for j in range(x.shape[1]):
                 for k in range(2, n):
                     x[i, j, k] -= l[k-2]*x[i, j, k-2]
@@ -801,391 +804,187 @@ cdef void TDMA_SymSolve_ptr3(real_t* d,
         x[i*st] = (x[i*st] - a[i*st]*x[(i+2)*st])/d[i*st]
 
 
-def LU_Helmholtz_1D(A, B,
-                    np.float_t A_scale,
-                    np.float_t B_scale,
-                    bint neumann,
-                    np.ndarray[real_t, ndim=1] d0,
-                    np.ndarray[real_t, ndim=1] d1,
-                    np.ndarray[real_t, ndim=1] d2,
-                    np.ndarray[real_t, ndim=1] L):
+cdef void LU_Helmholtz_1D_ptr(const real_t* A_0,
+                              const real_t* A_2,
+                              const real_t* A_4,
+                              const real_t* B_m2,
+                              const real_t* B_0,
+                              const real_t* B_2,
+                              real_t A_scale,
+                              real_t B_scale,
+                              bint neumann,
+                              real_t* d0,
+                              np.intp_t sF,
+                              np.intp_t st,
+                              int N) nogil:
+    # LU factorization of the Helmholtz matrix A_scale*A + B_scale*B of
+    # length N, with factors d0, d1, d2 and L stored with stride st, and sF
+    # apart
     cdef:
-        int i, N
-        np.ndarray[real_t, ndim=1] A_0 = A[0].copy()
-        np.ndarray[real_t, ndim=1] A_2 = A[2].copy()
-        np.ndarray[real_t, ndim=1] A_4 = A[4].copy()
-        np.ndarray[real_t, ndim=1] B_m2 = B[-2].copy()
-        np.ndarray[real_t, ndim=1] B_0 = B[0].copy()
-        np.ndarray[real_t, ndim=1] B_2 = B[2].copy()
-
-    N = A_0.shape[0]
-    if neumann:
-        A_0[0] = np.pi/A_scale
-        B_0[0] = 0.0
-        for i in xrange(1, N):
-            A_0[i] /= pow(i, 2)
-            B_0[i] /= pow(i, 2)
-        for i in xrange(2, N):
-            A_2[i-2] /= pow(i, 2)
-            B_2[i-2] /= pow(i, 2)
-        for i in xrange(4, N):
-            A_4[i-4] /= pow(i, 2)
-        for i in xrange(1, N-2):
-            B_m2[i] /= pow(i, 2)
+        int i
+        real_t* d1 = d0+sF
+        real_t* d2 = d0+2*sF
+        real_t* L = d0+3*sF
 
     d0[0] =  A_scale*A_0[0] + B_scale*B_0[0]
-    d0[1] =  A_scale*A_0[1] + B_scale*B_0[1]
+    if neumann:
+        d0[0] = M_PI
+    d0[st] =  A_scale*A_0[1] + B_scale*B_0[1]
     d1[0] =  A_scale*A_2[0] + B_scale*B_2[0]
-    d1[1] =  A_scale*A_2[1] + B_scale*B_2[1]
+    d1[st] =  A_scale*A_2[1] + B_scale*B_2[1]
     d2[0] =  A_scale*A_4[0]
-    d2[1] =  A_scale*A_4[1]
-    for i in xrange(2, N):
-        L[i-2] = B_scale*B_m2[i-2] / d0[i-2]
-        d0[i] = A_scale*A_0[i] + B_scale*B_0[i] - L[i-2]*d1[i-2]
+    d2[st] =  A_scale*A_4[1]
+    for i in range(2, N):
+        L[(i-2)*st] = B_scale*B_m2[i-2] / d0[(i-2)*st]
+        d0[i*st] = A_scale*A_0[i] + B_scale*B_0[i] - L[(i-2)*st]*d1[(i-2)*st]
         if i < N-2:
-            d1[i] = A_scale*A_2[i] + B_scale*B_2[i] - L[i-2]*d2[i-2]
+            d1[i*st] = A_scale*A_2[i] + B_scale*B_2[i] - L[(i-2)*st]*d2[(i-2)*st]
         if i < N-4:
-            d2[i] = A_scale*A_4[i] - L[i-2]*d2[i-2]
+            d2[i*st] = A_scale*A_4[i] - L[(i-2)*st]*d2[(i-2)*st]
 
 
-def Solve_Helmholtz_1D(np.ndarray[T, ndim=1] fk,
-                       np.ndarray[T, ndim=1] u_hat,
-                       bint neumann,
-                       np.ndarray[real_t, ndim=1] d0,
-                       np.ndarray[real_t, ndim=1] d1,
-                       np.ndarray[real_t, ndim=1] d2,
-                       np.ndarray[real_t, ndim=1] L):
-    cdef:
-        int i, j, N
-        vector[T] y
-        T sum_even = 0.0
-        T sum_odd = 0.0
-
-    N = d0.shape[0]
-    y.resize(N)
-    y[0] = fk[0]
-    y[1] = fk[1]
-    for i in xrange(2, N):
-        y[i] = fk[i] - L[i-2]*y[i-2]
-
-    u_hat[N-1] = y[N-1] / d0[N-1]
-    u_hat[N-2] = y[N-2] / d0[N-2]
-    u_hat[N-3] = (y[N-3] - d1[N-3]*u_hat[N-1]) / d0[N-3]
-    u_hat[N-4] = (y[N-4] - d1[N-4]*u_hat[N-2]) / d0[N-4]
-    for i in xrange(N-5, -1, -1):
-        u_hat[i] = y[i] - d1[i]*u_hat[i+2]
-        if i % 2 == 0:
-            sum_even += u_hat[i+4]
-            u_hat[i] -= d2[i]*sum_even
-        else:
-            sum_odd += u_hat[i+4]
-            u_hat[i] -= d2[i]*sum_odd
-        u_hat[i]/=d0[i]
-
-    if neumann:
-        u_hat[0] = 0.0
-        for i in xrange(1, N):
-            u_hat[i] /= pow(i, 2)
+def LU_Helmholtz_n(A, B,
+                   const real_t[:, ::1] A_scale,
+                   const real_t[:, ::1] B_scale,
+                   bint neumann,
+                   real_t[:, :, :, ::1] lu,
+                   int num_threads=1):
+    """LU decomposition of A_scale*A + B_scale*B along axis 2 of lu
 
-
-cdef void Solve_Helmholtz_1D_ptr(T* fk,
-                                 T* u_hat,
-                                 bint neumann,
-                                 real_t* d0,
-                                 real_t* d1,
-                                 real_t* d2,
-                                 real_t* L,
-                                 T* y,
-                                 int N,
-                                 int strides) nogil:
+    The factors d0, d1, d2 and L of the system with scales A_scale[i, k]
+    and B_scale[i, k] are stored in lu[:, i, :, k].
+    """
     cdef:
-        int i, j, st, ii, jj
-        T sum_even = 0.0
-        T sum_odd = 0.0
-
-    st = strides
-    y[0] = fk[0]
-    y[1] = fk[st]
-    for i in xrange(2, N):
-        y[i] = fk[i*st] - L[(i-2)*st]*y[i-2]
-
-    u_hat[(N-1)*st] = y[N-1] / d0[(N-1)*st]
-    u_hat[(N-2)*st] = y[N-2] / d0[(N-2)*st]
-    u_hat[(N-3)*st] = (y[N-3] - d1[(N-3)*st]*u_hat[(N-1)*st]) / d0[(N-3)*st]
-    u_hat[(N-4)*st] = (y[N-4] - d1[(N-4)*st]*u_hat[(N-2)*st]) / d0[(N-4)*st]
-    for i in xrange(N-5, -1, -1):
-        ii = i*st
-        u_hat[ii] = y[i] - d1[ii]*u_hat[(i+2)*st]
-        if i % 2 == 0:
-            sum_even += u_hat[(i+4)*st]
-            u_hat[ii] -= d2[ii]*sum_even
-        else:
-            sum_odd += u_hat[(i+4)*st]
-            u_hat[ii] -= d2[ii]*sum_odd
-        u_hat[ii]/=d0[ii]
+        int i, N
+        np.intp_t ij, j, k, Q, sF, st
+        real_t[::1] A_0 = np.array(A[0], dtype=float)
+        real_t[::1] A_2 = np.array(A[2], dtype=float)
+        real_t[::1] A_4 = np.array(A[4], dtype=float)
+        real_t[::1] B_m2 = np.array(B[-2], dtype=float)
+        real_t[::1] B_0 = np.array(B[0], dtype=float)
+        real_t[::1] B_2 = np.array(B[2], dtype=float)
 
+    N = A_0.shape[0]
     if neumann:
-        u_hat[0] = 0.0
-        for i in xrange(1, N):
-            u_hat[i*st] /= (i*i)
+        B_0[0] = 0.0
+        for i in range(1, N):
+            A_0[i] /= pow(i, 2)
+            B_0[i] /= pow(i, 2)
+        for i in range(2, N):
+            A_2[i-2] /= pow(i, 2)
+            B_2[i-2] /= pow(i, 2)
+        for i in range(4, N):
+            A_4[i-4] /= pow(i, 2)
+        for i in range(1, N-2):
+            B_m2[i] /= pow(i, 2)
 
-def Solve_Helmholtz_3D_ptr(np.int64_t axis,
-                           T[:,:,::1] fk,
-                           T[:,:,::1] u_hat,
-                           bint neumann,
-                           real_t[:,:,::1] d0,
-                           real_t[:,:,::1] d1,
-                           real_t[:,:,::1] d2,
-                           real_t[:,:,::1] L):
+    Q = lu.shape[3]
+    sF = lu.strides[0] // sizeof(real_t)
+    st = lu.strides[2] // sizeof(real_t)
+    for ij in prange(lu.shape[1]*Q, nogil=True, num_threads=num_threads):
+        j = ij // Q
+        k = ij % Q
+        LU_Helmholtz_1D_ptr(&A_0[0], &A_2[0], &A_4[0], &B_m2[0], &B_0[0],
+                            &B_2[0], A_scale[j, k], B_scale[j, k], neumann,
+                            &lu[0, j, 0, k], sF, st, N)
+
+
+cdef void Solve_Helmholtz_n_ptr(T* fk,
+                                T* u_hat,
+                                np.intp_t sf,
+                                np.intp_t su,
+                                np.intp_t sfk,
+                                np.intp_t suk,
+                                int nb,
+                                bint neumann,
+                                const real_t* d0,
+                                np.intp_t sF,
+                                np.intp_t sd,
+                                np.intp_t sdk,
+                                T* y,
+                                T* sums,
+                                int N) nogil:
+    # Solve the nb systems fk[i*sf+k*sfk], k < nb. Item i of the factors
+    # d0, d1, d2 and L of system k is d0[i*sd+k*sdk], and the factors are
+    # sF apart. y and sums are workspace of length N*nb and 2*nb
     cdef:
-        T* fk_ptr
-        T* u_hat_ptr
-        real_t* d0_ptr
-        real_t* d1_ptr
-        real_t* d2_ptr
-        real_t* L_ptr
-        vector[T] y
-        int ii, jj, strides
-
-    strides = fk.strides[axis]/fk.itemsize
-    y.resize(d0.shape[axis])
-    if axis == 0:
-        for ii in range(d0.shape[1]):
-            for jj in range(d0.shape[2]):
-                fk_ptr = &fk[0,ii,jj]
-                u_hat_ptr = &u_hat[0,ii,jj]
-                d0_ptr = &d0[0,ii,jj]
-                d1_ptr = &d1[0,ii,jj]
-                d2_ptr = &d2[0,ii,jj]
-                L_ptr = &L[0,ii,jj]
-                Solve_Helmholtz_1D_ptr(fk_ptr, u_hat_ptr, neumann, d0_ptr,
-                                       d1_ptr, d2_ptr, L_ptr, &y[0], d0.shape[axis],
-                                       strides)
-    elif axis == 1:
-        for ii in range(d0.shape[0]):
-            for jj in range(d0.shape[2]):
-                fk_ptr = &fk[ii,0,jj]
-                u_hat_ptr = &u_hat[ii,0,jj]
-                d0_ptr = &d0[ii,0,jj]
-                d1_ptr = &d1[ii,0,jj]
-                d2_ptr = &d2[ii,0,jj]
-                L_ptr = &L[ii,0,jj]
-                Solve_Helmholtz_1D_ptr(fk_ptr, u_hat_ptr, neumann, d0_ptr,
-                                       d1_ptr, d2_ptr, L_ptr, &y[0], d0.shape[axis],
-                                       strides)
+        int i, k
+        np.intp_t ii, jj
+        const real_t* d1 = d0+sF
+        const real_t* d2 = d0+2*sF
+        const real_t* L = d0+3*sF
+
+    for k in range(nb):
+        y[k] = fk[k*sfk]
+        y[nb+k] = fk[sf+k*sfk]
+        sums[k] = 0
+        sums[nb+k] = 0
+    for i in range(2, N):
+        for k in range(nb):
+            y[i*nb+k] = fk[i*sf+k*sfk] - L[(i-2)*sd+k*sdk]*y[(i-2)*nb+k]
+
+    for k in range(nb):
+        ii = k*suk
+        jj = k*sdk
+        u_hat[ii+(N-1)*su] = y[(N-1)*nb+k] / d0[jj+(N-1)*sd]
+        u_hat[ii+(N-2)*su] = y[(N-2)*nb+k] / d0[jj+(N-2)*sd]
+        u_hat[ii+(N-3)*su] = (y[(N-3)*nb+k] - d1[jj+(N-3)*sd]*u_hat[ii+(N-1)*su]) / d0[jj+(N-3)*sd]
+        u_hat[ii+(N-4)*su] = (y[(N-4)*nb+k] - d1[jj+(N-4)*sd]*u_hat[ii+(N-2)*su]) / d0[jj+(N-4)*sd]
+    for i in range(N-5, -1, -1):
+        for k in range(nb):
+            ii = i*su+k*suk
+            jj = i*sd+k*sdk
+            sums[(i%2)*nb+k] = sums[(i%2)*nb+k] + u_hat[ii+4*su]
+            u_hat[ii] = (y[i*nb+k] - d1[jj]*u_hat[ii+2*su]
+                         - d2[jj]*sums[(i%2)*nb+k]) / d0[jj]
 
-    elif axis == 2:
-        for ii in range(d0.shape[0]):
-            for jj in range(d0.shape[1]):
-                fk_ptr = &fk[ii,jj,0]
-                u_hat_ptr = &u_hat[ii,jj,0]
-                d0_ptr = &d0[ii,jj,0]
-                d1_ptr = &d1[ii,jj,0]
-                d2_ptr = &d2[ii,jj,0]
-                L_ptr = &L[ii,jj,0]
-                Solve_Helmholtz_1D_ptr(fk_ptr, u_hat_ptr, neumann, d0_ptr,
-                                       d1_ptr, d2_ptr, L_ptr, &y[0], d0.shape[axis],
-                                       strides)
-
-
-def Solve_Helmholtz_2D_ptr(np.int64_t axis,
-                           T[:,::1] fk,
-                           T[:,::1] u_hat,
-                           bint neumann,
-                           real_t[:,::1] d0,
-                           real_t[:,::1] d1,
-                           real_t[:,::1] d2,
-                           real_t[:,::1] L):
+    if neumann:
+        for k in range(nb):
+            u_hat[k*suk] = 0.0
+        for i in range(1, N):
+            for k in range(nb):
+                u_hat[i*su+k*suk] = u_hat[i*su+k*suk] / (i*i)
+
+
+def Solve_Helmholtz_n(T[:, :, :] fk,
+                      T[:, :, :] u_hat,
+                      const real_t[:, :, :, :] lu,
+                      bint neumann,
+                      int num_threads=1):
+    """Solve Helmholtz systems along axis 1 of fk
+
+    The system fk[i, :, k] is solved with the factors lu[:, i, :, k] of
+    LU_Helmholtz_n, that may be broadcasted with zero strides. Blocks of
+    systems that are adjacent along the last axis are solved together, and
+    the blocks are shared between threads. fk and u_hat may be the same
+    array.
+    """
     cdef:
-        T* fk_ptr
-        T* u_hat_ptr
-        real_t* d0_ptr
-        real_t* d1_ptr
-        real_t* d2_ptr
-        real_t* L_ptr
+        np.intp_t t, i, k, Q, n, sf, su, sfk, suk, sF, sd, sdk, nblk
+        int nb, blk = 16
         vector[T] y
-        int ii, strides
-
-    strides = fk.strides[axis]/fk.itemsize
-    y.resize(d0.shape[axis])
-    if axis == 0:
-        for ii in range(d0.shape[1]):
-            fk_ptr = &fk[0,ii]
-            u_hat_ptr = &u_hat[0,ii]
-            d0_ptr = &d0[0,ii]
-            d1_ptr = &d1[0,ii]
-            d2_ptr = &d2[0,ii]
-            L_ptr = &L[0,ii]
-            Solve_Helmholtz_1D_ptr(fk_ptr, u_hat_ptr, neumann, d0_ptr,
-                                    d1_ptr, d2_ptr, L_ptr, &y[0], d0.shape[axis],
-                                    strides)
-    elif axis == 1:
-        for ii in range(d0.shape[1]):
-            fk_ptr = &fk[ii,0]
-            u_hat_ptr = &u_hat[ii,0]
-            d0_ptr = &d0[ii,0]
-            d1_ptr = &d1[ii,0]
-            d2_ptr = &d2[ii,0]
-            L_ptr = &L[ii,0]
-            Solve_Helmholtz_1D_ptr(fk_ptr, u_hat_ptr, neumann, d0_ptr,
-                                    d1_ptr, d2_ptr, L_ptr, &y[0], d0.shape[axis],
-                                    strides)
-
-
-def LU_Helmholtz_3D(A, B, np.int64_t axis,
-                    np.ndarray[real_t, ndim=3] A_scale,
-                    np.ndarray[real_t, ndim=3] B_scale,
-                    bint neumann,
-                    np.ndarray[real_t, ndim=3] d0,
-                    np.ndarray[real_t, ndim=3] d1,
-                    np.ndarray[real_t, ndim=3] d2,
-                    np.ndarray[real_t, ndim=3] L):
-    cdef:
-        unsigned int ii, jj
-
-    if axis == 0:
-        for ii in range(d0.shape[1]):
-            for jj in range(d0.shape[2]):
-                LU_Helmholtz_1D(A, B,
-                                A_scale[0, ii, jj],
-                                B_scale[0, ii, jj],
-                                neumann,
-                                d0[:, ii, jj],
-                                d1[:, ii, jj],
-                                d2[:, ii, jj],
-                                L [:, ii, jj])
-
-    elif axis == 1:
-        for ii in range(d0.shape[0]):
-            for jj in range(d0.shape[2]):
-                LU_Helmholtz_1D(A, B,
-                                A_scale[ii, 0, jj],
-                                B_scale[ii, 0, jj],
-                                neumann,
-                                d0[ii, :, jj],
-                                d1[ii, :, jj],
-                                d2[ii, :, jj],
-                                L [ii, :, jj])
-
-    elif axis == 2:
-        for ii in range(d0.shape[0]):
-            for jj in range(d0.shape[1]):
-                LU_Helmholtz_1D(A, B,
-                                A_scale[ii, jj, 0],
-                                B_scale[ii, jj, 0],
-                                neumann,
-                                d0[ii, jj, :],
-                                d1[ii, jj, :],
-                                d2[ii, jj, :],
-                                L [ii, jj, :])
-
-def Solve_Helmholtz_3D(np.int64_t axis,
-                       np.ndarray[T, ndim=3] fk,
-                       np.ndarray[T, ndim=3] u_hat,
-                       bint neumann,
-                       np.ndarray[real_t, ndim=3] d0,
-                       np.ndarray[real_t, ndim=3] d1,
-                       np.ndarray[real_t, ndim=3] d2,
-                       np.ndarray[real_t, ndim=3] L):
-    cdef:
-        unsigned int ii, jj
-
-    if axis == 0:
-        for ii in range(d0.shape[1]):
-            for jj in range(d0.shape[2]):
-                Solve_Helmholtz_1D(fk[:, ii, jj],
-                                   u_hat[:, ii, jj],
-                                   neumann,
-                                   d0[:, ii, jj],
-                                   d1[:, ii, jj],
-                                   d2[:, ii, jj],
-                                   L [:, ii, jj])
-
-    elif axis == 1:
-        for ii in range(d0.shape[0]):
-            for jj in range(d0.shape[2]):
-                Solve_Helmholtz_1D(fk[ii, :, jj],
-                                   u_hat[ii, :, jj],
-                                   neumann,
-                                   d0[ii, :, jj],
-                                   d1[ii, :, jj],
-                                   d2[ii, :, jj],
-                                   L [ii, :, jj])
 
-    elif axis == 2:
-        for ii in range(d0.shape[0]):
-            for jj in range(d0.shape[1]):
-                Solve_Helmholtz_1D(fk[ii, jj, :],
-                                   u_hat[ii, jj, :],
-                                   neumann,
-                                   d0[ii, jj, :],
-                                   d1[ii, jj, :],
-                                   d2[ii, jj, :],
-                                   L [ii, jj, :])
-
-def LU_Helmholtz_2D(A, B, np.int64_t axis,
-                    np.ndarray[real_t, ndim=2] A_scale,
-                    np.ndarray[real_t, ndim=2] B_scale,
-                    bint neumann,
-                    np.ndarray[real_t, ndim=2] d0,
-                    np.ndarray[real_t, ndim=2] d1,
-                    np.ndarray[real_t, ndim=2] d2,
-                    np.ndarray[real_t, ndim=2] L):
-    cdef:
-        unsigned int ii
-
-    if axis == 0:
-        for ii in range(d0.shape[1]):
-            LU_Helmholtz_1D(A, B,
-                            A_scale[0, ii],
-                            B_scale[0, ii],
-                            neumann,
-                            d0[:, ii],
-                            d1[:, ii],
-                            d2[:, ii],
-                            L [:, ii])
-
-    elif axis == 1:
-        for ii in range(d0.shape[0]):
-            LU_Helmholtz_1D(A, B,
-                            A_scale[ii, 0],
-                            B_scale[ii, 0],
-                            neumann,
-                            d0[ii, :],
-                            d1[ii, :],
-                            d2[ii, :],
-                            L [ii, :])
-
-def Solve_Helmholtz_2D(np.int64_t axis,
-                       np.ndarray[T, ndim=2] fk,
-                       np.ndarray[T, ndim=2] u_hat,
-                       bint neumann,
-                       np.ndarray[real_t, ndim=2] d0,
-                       np.ndarray[real_t, ndim=2] d1,
-                       np.ndarray[real_t, ndim=2] d2,
-                       np.ndarray[real_t, ndim=2] L):
-    cdef:
-        unsigned int ii
-
-    if axis == 0:
-        for ii in range(d0.shape[1]):
-            Solve_Helmholtz_1D(fk[:, ii],
-                                u_hat[:, ii],
-                                neumann,
-                                d0[:, ii],
-                                d1[:, ii],
-                                d2[:, ii],
-                                L [:, ii])
-
-    elif axis == 1:
-        for ii in range(d0.shape[0]):
-            Solve_Helmholtz_1D(fk[ii, :],
-                                u_hat[ii, :],
-                                neumann,
-                                d0[ii, :],
-                                d1[ii, :],
-                                d2[ii, :],
-                                L [ii, :])
+    n = lu.shape[2]
+    Q = fk.shape[2]
+    sf = fk.strides[1] // sizeof(T)
+    su = u_hat.strides[1] // sizeof(T)
+    sfk = fk.strides[2] // sizeof(T)
+    suk = u_hat.strides[2] // sizeof(T)
+    sF = lu.strides[0] // sizeof(real_t)
+    sd = lu.strides[2] // sizeof(real_t)
+    sdk = lu.strides[3] // sizeof(real_t)
+    nblk = (Q+blk-1) // blk
+    y.resize((n+2)*blk*max(num_threads, 1))
+    for t in prange(fk.shape[0]*nblk, nogil=True, num_threads=num_threads):
+        i = t // nblk
+        k = (t % nblk)*blk
+        nb = blk
+        if Q-k < blk:
+            nb = Q-k
+        Solve_Helmholtz_n_ptr(&fk[i, 0, k], &u_hat[i, 0, k], sf, su, sfk, suk,
+                              nb, neumann, &lu[0, i, 0, k], sF, sd, sdk,
+                              &y[threadid()*(n+2)*blk],
+                              &y[threadid()*(n+2)*blk+n*blk], n)
 
 
 def Solve_Helmholtz_3D_hc(int axis,
@@ -1321,93 +1120,60 @@ def Solve_Helmholtz_3D_hc(int axis,
                         u_hat[ii,jj,i] /= pow(i, 2)
 
 
-
-def LU_Biharmonic_1D(np.float_t a,
-                     np.float_t b,
-                     np.float_t c,
-                     # 3 upper diagonals of SBB
-                     np.ndarray[real_t, ndim=1] sii,
-                     np.ndarray[real_t, ndim=1] siu,
-                     np.ndarray[real_t, ndim=1] siuu,
-                     # All 3 diagonals of ABB
-                     np.ndarray[real_t, ndim=1] ail,
-                     np.ndarray[real_t, ndim=1] aii,
-                     np.ndarray[real_t, ndim=1] aiu,
-                     # All 5 diagonals of BBB
-                     np.ndarray[real_t, ndim=1] bill,
-                     np.ndarray[real_t, ndim=1] bil,
-                     np.ndarray[real_t, ndim=1] bii,
-                     np.ndarray[real_t, ndim=1] biu,
-                     np.ndarray[real_t, ndim=1] biuu,
-                     # Three upper and two lower diagonals of LU decomposition
-                     np.ndarray[real_t, ndim=2] u0,
-                     np.ndarray[real_t, ndim=2] u1,
-                     np.ndarray[real_t, ndim=2] u2,
-                     np.ndarray[real_t, ndim=2] l0,
-                     np.ndarray[real_t, ndim=2] l1):
-
-    LU_oe_Biharmonic_1D(0, a, b, c, sii[::2], siu[::2], siuu[::2], ail[::2], aii[::2], aiu[::2], bill[::2], bil[::2], bii[::2], biu[::2], biuu[::2], u0[0], u1[0], u2[0], l0[0], l1[0])
-    LU_oe_Biharmonic_1D(1, a, b, c, sii[1::2], siu[1::2], siuu[1::2], ail[1::2], aii[1::2], aiu[1::2], bill[1::2], bil[1::2], bii[1::2], biu[1::2], biuu[1::2], u0[1], u1[1], u2[1], l0[1], l1[1])
-
-def LU_oe_Biharmonic_1D(bint odd,
-                        np.float_t a,
-                        np.float_t b,
-                        np.float_t c,
-                        # 3 upper diagonals of SBB
-                        np.ndarray[real_t, ndim=1] sii,
-                        np.ndarray[real_t, ndim=1] siu,
-                        np.ndarray[real_t, ndim=1] siuu,
-                        # All 3 diagonals of ABB
-                        np.ndarray[real_t, ndim=1] ail,
-                        np.ndarray[real_t, ndim=1] aii,
-                        np.ndarray[real_t, ndim=1] aiu,
-                        # All 5 diagonals of BBB
-                        np.ndarray[real_t, ndim=1] bill,
-                        np.ndarray[real_t, ndim=1] bil,
-                        np.ndarray[real_t, ndim=1] bii,
-                        np.ndarray[real_t, ndim=1] biu,
-                        np.ndarray[real_t, ndim=1] biuu,
-                        # Two upper and two lower diagonals of LU decomposition
-                        np.ndarray[real_t, ndim=1] u0,
-                        np.ndarray[real_t, ndim=1] u1,
-                        np.ndarray[real_t, ndim=1] u2,
-                        np.ndarray[real_t, ndim=1] l0,
-                        np.ndarray[real_t, ndim=1] l1):
-
+cdef void LU_oe_Biharmonic_1D_ptr(bint odd,
+                                  real_t a,
+                                  real_t b,
+                                  real_t c,
+                                  const real_t* sii,
+                                  const real_t* siu,
+                                  const real_t* siuu,
+                                  const real_t* ail,
+                                  const real_t* aii,
+                                  const real_t* aiu,
+                                  const real_t* bill,
+                                  const real_t* bil,
+                                  const real_t* bii,
+                                  const real_t* biu,
+                                  const real_t* biuu,
+                                  real_t* u0,
+                                  np.intp_t sF,
+                                  np.intp_t st,
+                                  real_t* c0,
+                                  real_t* c1,
+                                  real_t* c2,
+                                  int M) nogil:
+    # LU factorization of the even (odd=0) or odd (odd=1) Biharmonic
+    # system a*S + b*A + c*B of length M, with factors u0, u1, u2, l0 and l1
+    # stored with stride st, and sF apart. c0, c1 and c2 are workspace of
+    # length max(M, 5)
     cdef:
         int i, j, kk
         long long int m, k
-        real pi = np.pi
-        vector[real] c0, c1, c2
-
-    M = sii.shape[0]
-
-    c0.resize(M)
-    c1.resize(M)
-    c2.resize(M)
+        real pi = M_PI
+        real_t* u1 = u0+sF
+        real_t* u2 = u0+2*sF
+        real_t* l0 = u0+3*sF
+        real_t* l1 = u0+4*sF
 
     c0[0] = a*sii[0] + b*aii[0] + c*bii[0]
     c0[1] = a*siu[0] + b*aiu[0] + c*biu[0]
     c0[2] = a*siuu[0] + c*biuu[0]
     m = 8*(odd+1)*(odd+2)*(odd*(odd+4)+3*(6+odd+2)*(6+odd+2))
     c0[3] = m*a*pi/(6+odd+3.)
-    #c0[3] = a*8./(6+odd+3.)*pi*(odd+1.)*(odd+2.)*(odd*(odd+4.)+3.*pow(6+odd+2., 2))
     m = 8*(odd+1)*(odd+2)*(odd*(odd+4)+3*(8+odd+2)*(8+odd+2))
     c0[4] = m*a*pi/(8+odd+3.)
-    #c0[4] = a*8./(8+odd+3.)*pi*(odd+1.)*(odd+2.)*(odd*(odd+4.)+3.*pow(8+odd+2., 2))
     c1[0] = b*ail[0] + c*bil[0]
     c1[1] = a*sii[1] + b*aii[1] + c*bii[1]
     c1[2] = a*siu[1] + b*aiu[1] + c*biu[1]
     c1[3] = a*siuu[1] + c*biuu[1]
     m = 8*(odd+3)*(odd+4)*((odd+2)*(odd+6)+3*(8+odd+2)*(8+odd+2))
     c1[4] = m*a*pi/(8+odd+3.)
-    #c1[4] = a*8./(8+odd+3.)*pi*(odd+3.)*(odd+4.)*((odd+2.)*(odd+6.)+3.*pow(8+odd+2., 2))
     c2[0] = c*bill[0]
     c2[1] = b*ail[1] + c*bil[1]
     c2[2] = a*sii[2] + b*aii[2] + c*bii[2]
     c2[3] = a*siu[2] + b*aiu[2] + c*biu[2]
     c2[4] = a*siuu[2] + c*biuu[2]
-    for i in xrange(5, M):
+    for i in range(5, M):
         j = 2*i+odd
         m = 8*(odd+1)*(odd+2)*(odd*(odd+4)+3*(j+2)*(j+2))
         c0[i] = m*a*pi/(j+3.)
@@ -1415,26 +1181,23 @@ def LU_oe_Biharmonic_1D(bint odd,
         c1[i] = m*a*pi/(j+3.)
         m = 8*(odd+5)*(odd+6)*((odd+4)*(odd+8)+3*(j+2)*(j+2))
         c2[i] = m*a*pi/(j+3.)
-        #c0[i] = a*8./(j+3.)*pi*(odd+1.)*(odd+2.)*(odd*(odd+4.)+3.*pow(j+2., 2))
-        #c1[i] = a*8./(j+3.)*pi*(odd+3.)*(odd+4.)*((odd+2)*(odd+6.)+3.*pow(j+2., 2))
-        #c2[i] = a*8./(j+3.)*pi*(odd+5.)*(odd+6.)*((odd+4)*(odd+8.)+3.*pow(j+2., 2))
 
     u0[0] = c0[0]
     u1[0] = c0[1]
     u2[0] = c0[2]
-    for kk in xrange(1, M):
-        l0[kk-1] = c1[kk-1]/u0[kk-1]
+    for kk in range(1, M):
+        l0[(kk-1)*st] = c1[kk-1]/u0[(kk-1)*st]
         if kk < M-1:
-            l1[kk-1] = c2[kk-1]/u0[kk-1]
+            l1[(kk-1)*st] = c2[kk-1]/u0[(kk-1)*st]
 
-        for i in xrange(kk, M):
-            c1[i] = c1[i] - l0[kk-1]*c0[i]
+        for i in range(kk, M):
+            c1[i] = c1[i] - l0[(kk-1)*st]*c0[i]
 
         if kk < M-1:
-            for i in xrange(kk, M):
-                c2[i] = c2[i] - l1[kk-1]*c0[i]
+            for i in range(kk, M):
+                c2[i] = c2[i] - l1[(kk-1)*st]*c0[i]
 
-        for i in xrange(kk, M):
+        for i in range(kk, M):
             c0[i] = c1[i]
             c1[i] = c2[i]
 
@@ -1448,1030 +1211,215 @@ def LU_oe_Biharmonic_1D(bint odd,
                 c2[kk+4] = a*siuu[kk+2] + c*biuu[kk+2]
             if kk < M-5:
                 k = 2*(kk+2)+odd
-                for i in xrange(kk+5, M):
+                for i in range(kk+5, M):
                     j = 2*i+odd
                     m = 8*(k+1)*(k+2)*(k*(k+4)+3*(j+2)*(j+2))
                     c2[i] = m*a*pi/(j+3.)
-                    #c2[i] = a*8./(j+3.)*pi*(k+1.)*(k+2.)*(k*(k+4.)+3.*pow(j+2., 2))
 
-        u0[kk] = c0[kk]
+        u0[kk*st] = c0[kk]
         if kk < M-1:
-            u1[kk] = c0[kk+1]
+            u1[kk*st] = c0[kk+1]
         if kk < M-2:
-            u2[kk] = c0[kk+2]
-
-cdef ForwardBsolve_L(np.ndarray[T, ndim=1] y,
-                     np.ndarray[real_t, ndim=1] l0,
-                     np.ndarray[real_t, ndim=1] l1,
-                     np.ndarray[T, ndim=1] fk):
-    # Solve Forward Ly = f
-    cdef np.intp_t i, N
-    y[0] = fk[0]
-    y[1] = fk[1] - l0[0]*y[0]
-    N = l0.shape[0]
-    for i in xrange(2, N):
-        y[i] = fk[i] - l0[i-1]*y[i-1] - l1[i-2]*y[i-2]
-
-
-def Biharmonic_factor_pr_3D(np.int64_t axis,
-                            np.ndarray[real_t, ndim=4] a,
-                            np.ndarray[real_t, ndim=4] b,
-                            np.ndarray[real_t, ndim=4] l0,
-                            np.ndarray[real_t, ndim=4] l1):
-
-    cdef:
-        unsigned int ii, jj
-
-    if axis == 0:
-        for ii in range(a.shape[2]):
-            for jj in range(a.shape[3]):
-                Biharmonic_factor_pr(a[:, :, ii, jj],
-                                    b[:, :, ii, jj],
-                                    l0[:, :, ii, jj],
-                                    l1[:, :, ii, jj])
-    elif axis == 1:
-        for ii in range(a.shape[1]):
-            for jj in range(a.shape[3]):
-                Biharmonic_factor_pr(a[:, ii, :, jj],
-                                    b[:, ii, :, jj],
-                                    l0[:, ii, :, jj],
-                                    l1[:, ii, :, jj])
-
-    elif axis == 2:
-        for ii in range(a.shape[1]):
-            for jj in range(a.shape[2]):
-                Biharmonic_factor_pr(a[:, ii, jj, :],
-                                    b[:, ii, jj, :],
-                                    l0[:, ii, jj, :],
-                                    l1[:, ii, jj, :])
-
-
-def Biharmonic_factor_pr_2D(np.int64_t axis,
-                            np.ndarray[real_t, ndim=3] a,
-                            np.ndarray[real_t, ndim=3] b,
-                            np.ndarray[real_t, ndim=3] l0,
-                            np.ndarray[real_t, ndim=3] l1):
-
+            u2[kk*st] = c0[kk+2]
+
+
+cdef void Biharmonic_factor_oe_pr_ptr(bint odd,
+                                      real_t* a,
+                                      real_t* b,
+                                      const real_t* l0,
+                                      const real_t* l1,
+                                      real_t ac,
+                                      np.intp_t st,
+                                      int M) nogil:
+    # Factors a and b of the even (odd=0) or odd (odd=1) Biharmonic system,
+    # of length M = l0.shape[0]+1, with arrays of stride st. a and b are
+    # multiplied by ac
     cdef:
-        unsigned int ii
-
-    if axis == 0:
-        for ii in range(a.shape[2]):
-            Biharmonic_factor_pr(a[:, :, ii],
-                                b[:, :, ii],
-                                l0[:, :, ii],
-                                l1[:, :, ii])
-    elif axis == 1:
-        for ii in range(a.shape[1]):
-            Biharmonic_factor_pr(a[:, ii, :],
-                                b[:, ii, :],
-                                l0[:, ii, :],
-                                l1[:, ii, :])
-
-
-def Biharmonic_factor_pr(np.ndarray[real_t, ndim=2] a,
-                         np.ndarray[real_t, ndim=2] b,
-                         np.ndarray[real_t, ndim=2] l0,
-                         np.ndarray[real_t, ndim=2] l1):
-
-    Biharmonic_factor_oe_pr(0, a[0], b[0], l0[0], l1[0])
-    Biharmonic_factor_oe_pr(1, a[1], b[1], l0[1], l1[1])
-
-def Biharmonic_factor_oe_pr(bint odd,
-                            np.ndarray[real_t, ndim=1] a,
-                            np.ndarray[real_t, ndim=1] b,
-                            np.ndarray[real_t, ndim=1] l0,
-                            np.ndarray[real_t, ndim=1] l1):
-    cdef:
-        int i, j, M
-        real pi = np.pi
+        real pi = M_PI
         long long int pp, rr, k, kk
 
-    M = l0.shape[0]+1
     k = odd
     a[0] = 8*k*(k+1)*(k+2)*(k+4)*pi
     b[0] = 24*(k+1)*(k+2)*pi
     k = 2+odd
-    a[1] = 8*k*(k+1)*(k+2)*(k+4)*pi - l0[0]*a[0]
-    b[1] = 24*(k+1)*(k+2)*pi - l0[0]*b[0]
-    for k in xrange(2, M-3):
+    a[st] = 8*k*(k+1)*(k+2)*(k+4)*pi - l0[0]*a[0]
+    b[st] = 24*(k+1)*(k+2)*pi - l0[0]*b[0]
+    for k in range(2, M-3):
         kk = 2*k+odd
         pp = 8*kk*(kk+1)*(kk+2)*(kk+4)
         rr = 24*(kk+1)*(kk+2)
-        a[k] = pp*pi - l0[k-1]*a[k-1] - l1[k-2]*a[k-2]
-        b[k] = rr*pi - l0[k-1]*b[k-1] - l1[k-2]*b[k-2]
-
-
-def Solve_Biharmonic_1D(np.ndarray[T, ndim=1] fk,
-                        np.ndarray[T, ndim=1] uk,
-                        np.ndarray[real_t, ndim=2] u0,
-                        np.ndarray[real_t, ndim=2] u1,
-                        np.ndarray[real_t, ndim=2] u2,
-                        np.ndarray[real_t, ndim=2] l0,
-                        np.ndarray[real_t, ndim=2] l1,
-                        np.ndarray[real_t, ndim=2] a,
-                        np.ndarray[real_t, ndim=2] b,
-                        np.float_t ac):
-
-    Solve_oe_Biharmonic_1D(0, fk[::2], uk[::2], u0[0], u1[0], u2[0], l0[0], l1[0], a[0], b[0], ac)
-    Solve_oe_Biharmonic_1D(1, fk[1::2], uk[1::2], u0[1], u1[1], u2[1], l0[1], l1[1], a[1], b[1], ac)
-
-
-def Solve_oe_Biharmonic_1D(bint odd,
-                           np.ndarray[T, ndim=1] fk,
-                           np.ndarray[T, ndim=1] uk,
-                           np.ndarray[real_t, ndim=1] u0,
-                           np.ndarray[real_t, ndim=1] u1,
-                           np.ndarray[real_t, ndim=1] u2,
-                           np.ndarray[real_t, ndim=1] l0,
-                           np.ndarray[real_t, ndim=1] l1,
-                           np.ndarray[real_t, ndim=1] a,
-                           np.ndarray[real_t, ndim=1] b,
-                           np.float_t ac):
-    """
-    Solve (aS+b*A+cB)x = f, where S, A and B are 4th order Laplace, stiffness and mass matrices of Shen with Dirichlet BC
+        a[k*st] = pp*pi - l0[(k-1)*st]*a[(k-1)*st] - l1[(k-2)*st]*a[(k-2)*st]
+        b[k*st] = rr*pi - l0[(k-1)*st]*b[(k-1)*st] - l1[(k-2)*st]*b[(k-2)*st]
+    for k in range(max(M-3, 2)):
+        a[k*st] = a[k*st]*ac
+        b[k*st] = b[k*st]*ac
+
+
+def LU_Biharmonic_n(S, A, B,
+                    const real_t[:, ::1] S_scale,
+                    const real_t[:, ::1] A_scale,
+                    const real_t[:, ::1] B_scale,
+                    real_t[:, :, :, :, ::1] lu,
+                    int num_threads=1):
+    """LU decomposition of S_scale*S + A_scale*A + B_scale*B along axis 3 of lu
+
+    The factors u0, u1, u2, l0, l1, a*S_scale and b*S_scale of the even
+    (odd) coefficients of the system with scales S_scale[i, k],
+    A_scale[i, k] and B_scale[i, k] are stored in lu[:, 0 (1), i, :, k].
     """
     cdef:
-        unsigned int M
-        np.ndarray[T, ndim=1] y = np.zeros(u0.shape[0], dtype=fk.dtype)
-
-    M = u0.shape[0]
-    ForwardBsolve_L(y, l0, l1, fk)
-
-    # Solve Backward U u = y
-    BackBsolve_U(M, odd, y, uk, u0, u1, u2, l0, l1, a, b, ac)
-
-cdef BackBsolve_U(int M,
-                  bint odd,
-                  np.ndarray[T, ndim=1] f,  # Uc = f
-                  np.ndarray[T, ndim=1] uk,
-                  np.ndarray[real_t, ndim=1] u0,
-                  np.ndarray[real_t, ndim=1] u1,
-                  np.ndarray[real_t, ndim=1] u2,
-                  np.ndarray[real_t, ndim=1] l0,
-                  np.ndarray[real_t, ndim=1] l1,
-                  np.ndarray[real_t, ndim=1] a,
-                  np.ndarray[real_t, ndim=1] b,
-                  np.float_t ac):
+        int j, odd, W
+        np.intp_t ij, i, k, Q, sF, st
+        int[2] M
+        real_t[:, :, ::1] D
+        vector[real_t] c
+
+    diags = (S[0], S[2], S[4], A[-2], A[0], A[2], B[-4], B[-2], B[0], B[2],
+             B[4])
+    M[0] = len(S[0][::2])
+    M[1] = len(S[0][1::2])
+    Dp = np.zeros((2, len(diags), M[0]+2))
+    for j, d in enumerate(diags):
+        Dp[0, j, :len(d[::2])] = d[::2]
+        Dp[1, j, :len(d[1::2])] = d[1::2]
+    D = Dp
+
+    Q = lu.shape[4]
+    sF = lu.strides[0] // sizeof(real_t)
+    st = lu.strides[3] // sizeof(real_t)
+    W = max(M[0], 5)
+    c.resize(3*W*max(num_threads, 1))
+    for ij in prange(lu.shape[2]*Q, nogil=True, num_threads=num_threads):
+        i = ij // Q
+        k = ij % Q
+        for odd in range(2):
+            LU_oe_Biharmonic_1D_ptr(odd, S_scale[i, k], A_scale[i, k],
+                                    B_scale[i, k], &D[odd, 0, 0], &D[odd, 1, 0],
+                                    &D[odd, 2, 0], &D[odd, 3, 0], &D[odd, 4, 0],
+                                    &D[odd, 5, 0], &D[odd, 6, 0], &D[odd, 7, 0],
+                                    &D[odd, 8, 0], &D[odd, 9, 0],
+                                    &D[odd, 10, 0], &lu[0, odd, i, 0, k], sF,
+                                    st, &c[3*W*threadid()],
+                                    &c[3*W*threadid()+W],
+                                    &c[3*W*threadid()+2*W], M[odd])
+            Biharmonic_factor_oe_pr_ptr(odd, &lu[5, odd, i, 0, k],
+                                        &lu[6, odd, i, 0, k],
+                                        &lu[3, odd, i, 0, k],
+                                        &lu[4, odd, i, 0, k], S_scale[i, k],
+                                        st, M[odd]+1)
+
+
+cdef void Solve_oe_Biharmonic_n_ptr(bint odd,
+                                    T* fk,
+                                    T* uk,
+                                    np.intp_t sf,
+                                    np.intp_t su,
+                                    np.intp_t sfk,
+                                    np.intp_t suk,
+                                    int nb,
+                                    const real_t* u0,
+                                    np.intp_t sF,
+                                    np.intp_t sd,
+                                    np.intp_t sdk,
+                                    T* y,
+                                    T* s,
+                                    int M) nogil:
+    # Solve the even (odd=0) or odd (odd=1) Biharmonic systems
+    # fk[i*sf+k*sfk], k < nb, into uk. Item i of the factors of
+    # LU_Biharmonic_n for system k is u0[i*sd+k*sdk], and the factors are sF
+    # apart. y and s are workspace of length M*nb and 2*nb
     cdef:
         int i, j, k, kk
-        T s1 = 0.0
-        T s2 = 0.0
-
-    uk[M-1] = f[M-1] / u0[M-1]
-    uk[M-2] = (f[M-2] - u1[M-2]*uk[M-1]) / u0[M-2]
-    uk[M-3] = (f[M-3] - u1[M-3]*uk[M-2] - u2[M-3]*uk[M-1]) / u0[M-3]
-
-    s1 = 0.0
-    s2 = 0.0
-    for kk in xrange(M-4, -1, -1):
-        k = 2*kk+odd
-        j = k+6
-        s1 += uk[kk+3]/(j+3.)
-        s2 += (uk[kk+3]/(j+3.))*((j+2)*(j+2))
-        uk[kk] = (f[kk] - u1[kk]*uk[kk+1] - u2[kk]*uk[kk+2] - a[kk]*ac*s1 - b[kk]*ac*s2) / u0[kk]
-
-
-def Solve_oe_Biharmonic_1D(bint odd,
-                           np.ndarray[T, ndim=1] fk,
-                           np.ndarray[T, ndim=1] uk,
-                           np.ndarray[real_t, ndim=1] u0,
-                           np.ndarray[real_t, ndim=1] u1,
-                           np.ndarray[real_t, ndim=1] u2,
-                           np.ndarray[real_t, ndim=1] l0,
-                           np.ndarray[real_t, ndim=1] l1,
-                           np.ndarray[real_t, ndim=1] a,
-                           np.ndarray[real_t, ndim=1] b,
-                           np.float_t ac):
-    """
-    Solve (aS+b*A+cB)x = f, where S, A and B are 4th order Laplace, stiffness and mass matrices of Shen with Dirichlet BC
-    """
-    cdef:
-        unsigned int M
-        np.ndarray[T, ndim=1] y = np.zeros(u0.shape[0], dtype=fk.dtype)
+        np.intp_t ii, jj
+        real r, q
+        const real_t* u1 = u0+sF
+        const real_t* u2 = u0+2*sF
+        const real_t* l0 = u0+3*sF
+        const real_t* l1 = u0+4*sF
+        const real_t* a = u0+5*sF
+        const real_t* b = u0+6*sF
+
+    fk = fk + odd*sf
+    uk = uk + odd*su
+    sf = 2*sf
+    su = 2*su
 
-    M = u0.shape[0]
-    ForwardBsolve_L(y, l0, l1, fk)
+    # Solve Forward Ly = f
+    for k in range(nb):
+        y[k] = fk[k*sfk]
+        y[nb+k] = fk[sf+k*sfk] - l0[k*sdk]*y[k]
+        s[k] = 0
+        s[nb+k] = 0
+    for i in range(2, M):
+        for k in range(nb):
+            jj = k*sdk
+            y[i*nb+k] = (fk[i*sf+k*sfk] - l0[jj+(i-1)*sd]*y[(i-1)*nb+k]
+                         - l1[jj+(i-2)*sd]*y[(i-2)*nb+k])
 
     # Solve Backward U u = y
-    BackBsolve_U(M, odd, y, uk, u0, u1, u2, l0, l1, a, b, ac)
-
-# This one is fastest by far
-@cython.cdivision(True)
-def Solve_Biharmonic_3D_n(np.int64_t axis,
-                          np.ndarray[T, ndim=3, mode='c'] fk,
-                          np.ndarray[T, ndim=3, mode='c'] uk,
-                          np.ndarray[real_t, ndim=4, mode='c'] u0,
-                          np.ndarray[real_t, ndim=4, mode='c'] u1,
-                          np.ndarray[real_t, ndim=4, mode='c'] u2,
-                          np.ndarray[real_t, ndim=4, mode='c'] l0,
-                          np.ndarray[real_t, ndim=4, mode='c'] l1,
-                          np.ndarray[real_t, ndim=4, mode='c'] a,
-                          np.ndarray[real_t, ndim=4, mode='c'] b,
-                          np.ndarray[real_t, ndim=3] a0):
-
-    cdef:
-        int i, j, k, kk, m, M, ke, ko, jj, je, jo
-        np.float_t ac
-        np.ndarray[T, ndim=2, mode='c'] s1
-        np.ndarray[T, ndim=2, mode='c'] s2
-        np.ndarray[T, ndim=2, mode='c'] o1
-        np.ndarray[T, ndim=2, mode='c'] o2
-        np.ndarray[T, ndim=3, mode='c'] y = np.zeros((fk.shape[0], fk.shape[1], fk.shape[2]), dtype=fk.dtype)
-
-
-    if axis == 0:
-        s1 = np.zeros((fk.shape[1], fk.shape[2]), dtype=fk.dtype)
-        s2 = np.zeros((fk.shape[1], fk.shape[2]), dtype=fk.dtype)
-        o1 = np.zeros((fk.shape[1], fk.shape[2]), dtype=fk.dtype)
-        o2 = np.zeros((fk.shape[1], fk.shape[2]), dtype=fk.dtype)
-
-        M = u0.shape[1]
-        for j in range(fk.shape[1]):
-            for k in range(fk.shape[2]):
-                y[0, j, k] = fk[0, j, k]
-                y[1, j, k] = fk[1, j, k]
-                y[2, j, k] = fk[2, j, k] - l0[0, 0, j, k]*y[0, j, k]
-                y[3, j, k] = fk[3, j, k] - l0[1, 0, j, k]*y[1, j, k]
-
-        for i in xrange(2, M):
-            ke = 2*i
-            ko = ke+1
-            for j in range(fk.shape[1]):
-                for k in range(fk.shape[2]):
-                    y[ko, j, k] = fk[ko, j, k] - l0[1, i-1, j, k]*y[ko-2, j, k] - l1[1, i-2, j, k]*y[ko-4, j, k]
-                    y[ke, j, k] = fk[ke, j, k] - l0[0, i-1, j, k]*y[ke-2, j, k] - l1[0, i-2, j, k]*y[ke-4, j, k]
-
-        ke = 2*(M-1)
-        ko = ke+1
-        for j in range(fk.shape[1]):
-            for k in range(fk.shape[2]):
-                uk[ke, j, k] = y[ke, j, k] / u0[0, M-1, j, k]
-                uk[ko, j, k] = y[ko, j, k] / u0[1, M-1, j, k]
-
-        ke = 2*(M-2)
-        ko = ke+1
-        for j in range(fk.shape[1]):
-            for k in range(fk.shape[2]):
-                uk[ke, j, k] = (y[ke, j, k] - u1[0, M-2, j, k]*uk[ke+2, j, k]) / u0[0, M-2, j, k]
-                uk[ko, j, k] = (y[ko, j, k] - u1[1, M-2, j, k]*uk[ko+2, j, k]) / u0[1, M-2, j, k]
-
-        ke = 2*(M-3)
-        ko = ke+1
-        for j in range(fk.shape[1]):
-            for k in range(fk.shape[2]):
-                uk[ke, j, k] = (y[ke, j, k] - u1[0, M-3, j, k]*uk[ke+2, j, k] - u2[0, M-3, j, k]*uk[ke+4, j, k]) / u0[0, M-3, j, k]
-                uk[ko, j, k] = (y[ko, j, k] - u1[1, M-3, j, k]*uk[ko+2, j, k] - u2[1, M-3, j, k]*uk[ko+4, j, k]) / u0[1, M-3, j, k]
-
-        for kk in xrange(M-4, -1, -1):
-            ke = 2*kk
-            ko = ke+1
-            je = ke+6
-            jo = ko+6
-            for j in range(fk.shape[1]):
-                for k in range(fk.shape[2]):
-                    ac = a0[0, j, k]
-                    s1[j, k] += uk[je, j, k]/(je+3.)
-                    s2[j, k] += (uk[je, j, k]/(je+3.))*((je+2.)*(je+2.))
-                    uk[ke, j, k] = (y[ke, j, k] - u1[0, kk, j, k]*uk[ke+2, j, k] - u2[0, kk, j, k]*uk[ke+4, j, k] - a[0, kk, j, k]*ac*s1[j, k] - b[0, kk, j, k]*ac*s2[j, k]) / u0[0, kk, j, k]
-                    o1[j, k] += uk[jo, j, k]/(jo+3.)
-                    o2[j, k] += (uk[jo, j, k]/(jo+3.))*((jo+2.)*(jo+2.))
-                    uk[ko, j, k] = (y[ko, j, k] - u1[1, kk, j, k]*uk[ko+2, j, k] - u2[1, kk, j, k]*uk[ko+4, j, k] - a[1, kk, j, k]*ac*o1[j, k] - b[1, kk, j, k]*ac*o2[j, k]) / u0[1, kk, j, k]
-
-    elif axis == 1:
-        s1 = np.zeros((fk.shape[0], fk.shape[2]), dtype=fk.dtype)
-        s2 = np.zeros((fk.shape[0], fk.shape[2]), dtype=fk.dtype)
-        o1 = np.zeros((fk.shape[0], fk.shape[2]), dtype=fk.dtype)
-        o2 = np.zeros((fk.shape[0], fk.shape[2]), dtype=fk.dtype)
-
-        M = u0.shape[2]
-        for j in range(fk.shape[0]):
-            for k in range(fk.shape[2]):
-                y[j, 0, k] = fk[j, 0, k]
-                y[j, 1, k] = fk[j, 1, k]
-                y[j, 2, k] = fk[j, 2, k] - l0[0, j, 0, k]*y[j, 0, k]
-                y[j, 3, k] = fk[j, 3, k] - l0[1, j, 0, k]*y[j, 1, k]
-
-            for i in xrange(2, M):
-                ke = 2*i
-                ko = ke+1
-                for k in range(fk.shape[2]):
-                    y[j, ko, k] = fk[j, ko, k] - l0[1, j, i-1, k]*y[j, ko-2, k] - l1[1, j, i-2, k]*y[j, ko-4, k]
-                    y[j, ke, k] = fk[j, ke, k] - l0[0, j, i-1, k]*y[j, ke-2, k] - l1[0, j, i-2, k]*y[j, ke-4, k]
-
-            ke = 2*(M-1)
-            ko = ke+1
-            for k in range(fk.shape[2]):
-                uk[j, ke, k] = y[j, ke, k] / u0[0, j, M-1, k]
-                uk[j, ko, k] = y[j, ko, k] / u0[1, j, M-1, k]
-
-            ke = 2*(M-2)
-            ko = ke+1
-            for k in range(fk.shape[2]):
-                uk[j, ke, k] = (y[j, ke, k] - u1[0, j, M-2, k]*uk[j, ke+2, k]) / u0[0, j, M-2, k]
-                uk[j, ko, k] = (y[j, ko, k] - u1[1, j, M-2, k]*uk[j, ko+2, k]) / u0[1, j, M-2, k]
-
-            ke = 2*(M-3)
-            ko = ke+1
-            for k in range(fk.shape[2]):
-                uk[j, ke, k] = (y[j, ke, k] - u1[0, j, M-3, k]*uk[j, ke+2, k] - u2[0, j, M-3, k]*uk[j, ke+4, k]) / u0[0, j, M-3, k]
-                uk[j, ko, k] = (y[j, ko, k] - u1[1, j, M-3, k]*uk[j, ko+2, k] - u2[1, j, M-3, k]*uk[j, ko+4, k]) / u0[1, j, M-3, k]
-
-            for kk in xrange(M-4, -1, -1):
-                ke = 2*kk
-                ko = ke+1
-                je = ke+6
-                jo = ko+6
-                for k in range(fk.shape[2]):
-                    ac = a0[j, 0, k]
-                    s1[j, k] += uk[j, je, k]/(je+3.)
-                    s2[j, k] += (uk[j, je, k]/(je+3.))*((je+2.)*(je+2.))
-                    uk[j, ke, k] = (y[j, ke, k] - u1[0, j, kk, k]*uk[j, ke+2, k] - u2[0, j, kk, k]*uk[j, ke+4, k] - a[0, j, kk, k]*ac*s1[j, k] - b[0, j, kk, k]*ac*s2[j, k]) / u0[0, j, kk, k]
-                    o1[j, k] += uk[j, jo, k]/(jo+3.)
-                    o2[j, k] += (uk[j, jo, k]/(jo+3.))*((jo+2.)*(jo+2.))
-                    uk[j, ko, k] = (y[j, ko, k] - u1[1, j, kk, k]*uk[j, ko+2, k] - u2[1, j, kk, k]*uk[j, ko+4, k] - a[1, j, kk, k]*ac*o1[j, k] - b[1, j, kk, k]*ac*o2[j, k]) / u0[1, j, kk, k]
-
-
-    elif axis == 2:
-        s1 = np.zeros((fk.shape[0], fk.shape[1]), dtype=fk.dtype)
-        s2 = np.zeros((fk.shape[0], fk.shape[1]), dtype=fk.dtype)
-        o1 = np.zeros((fk.shape[0], fk.shape[1]), dtype=fk.dtype)
-        o2 = np.zeros((fk.shape[0], fk.shape[1]), dtype=fk.dtype)
-
-        M = u0.shape[3]
-        for j in range(fk.shape[0]):
-            for k in range(fk.shape[1]):
-                y[j, k, 0] = fk[j, k, 0]
-                y[j, k, 1] = fk[j, k, 1]
-                y[j, k, 2] = fk[j, k, 2] - l0[0, j, k, 0]*y[j, k, 0]
-                y[j, k, 3] = fk[j, k, 3] - l0[1, j, k, 0]*y[j, k, 1]
-
-                for i in xrange(2, M):
-                    ke = 2*i
-                    ko = ke+1
-                    y[j, k, ko] = fk[j, k, ko] - l0[1, j, k, i-1]*y[j, k, ko-2] - l1[1, j, k, i-2]*y[j, k, ko-4]
-                    y[j, k, ke] = fk[j, k, ke] - l0[0, j, k, i-1]*y[j, k, ke-2] - l1[0, j, k, i-2]*y[j, k, ke-4]
-
-                ke = 2*(M-1)
-                ko = ke+1
-                uk[j, k, ke] = y[j, k, ke] / u0[0, j, k, M-1]
-                uk[j, k, ko] = y[j, k, ko] / u0[1, j, k, M-1]
-
-                ke = 2*(M-2)
-                ko = ke+1
-                uk[j, k, ke] = (y[j, k, ke] - u1[0, j, k, M-2]*uk[j, k, ke+2]) / u0[0, j, k, M-2]
-                uk[j, k, ko] = (y[j, k, ko] - u1[1, j, k, M-2]*uk[j, k, ko+2]) / u0[1, j, k, M-2]
-
-                ke = 2*(M-3)
-                ko = ke+1
-                uk[j, k, ke] = (y[j, k, ke] - u1[0, j, k, M-3]*uk[j, k, ke+2] - u2[0, j, k, M-3]*uk[j, k, ke+4]) / u0[0, j, k, M-3]
-                uk[j, k, ko] = (y[j, k, ko] - u1[1, j, k, M-3]*uk[j, k, ko+2] - u2[1, j, k, M-3]*uk[j, k, ko+4]) / u0[1, j, k, M-3]
-
-                for kk in xrange(M-4, -1, -1):
-                    ke = 2*kk
-                    ko = ke+1
-                    je = ke+6
-                    jo = ko+6
-                    ac = a0[j, k, 0]
-                    s1[j, k] += uk[j, k, je]/(je+3.)
-                    s2[j, k] += (uk[j, k, je]/(je+3.))*((je+2.)*(je+2.))
-                    uk[j, k, ke] = (y[j, k, ke] - u1[0, j, k, kk]*uk[j, k, ke+2] - u2[0, j, k, kk]*uk[j, k, ke+4] - a[0, j, k, kk]*ac*s1[j, k] - b[0, j, k, kk]*ac*s2[j, k]) / u0[0, j, k, kk]
-                    o1[j, k] += uk[j, k, jo]/(jo+3.)
-                    o2[j, k] += (uk[j, k, jo]/(jo+3.))*((jo+2.)*(jo+2.))
-                    uk[j, k, ko] = (y[j, k, ko] - u1[1, j, k, kk]*uk[j, k, ko+2] - u2[1, j, k, kk]*uk[j, k, ko+4] - a[1, j, k, kk]*ac*o1[j, k] - b[1, j, k, kk]*ac*o2[j, k]) / u0[1, j, k, kk]
-
-
-@cython.cdivision(True)
-def Solve_Biharmonic_2D_n(np.int64_t axis,
-                          np.ndarray[T, ndim=2, mode='c'] fk,
-                          np.ndarray[T, ndim=2, mode='c'] uk,
-                          np.ndarray[real_t, ndim=3, mode='c'] u0,
-                          np.ndarray[real_t, ndim=3, mode='c'] u1,
-                          np.ndarray[real_t, ndim=3, mode='c'] u2,
-                          np.ndarray[real_t, ndim=3, mode='c'] l0,
-                          np.ndarray[real_t, ndim=3, mode='c'] l1,
-                          np.ndarray[real_t, ndim=3, mode='c'] a,
-                          np.ndarray[real_t, ndim=3, mode='c'] b,
-                          np.ndarray[real_t, ndim=2] a0):
-
-    cdef:
-        int i, j, k, kk, m, M, ke, ko, jj, je, jo
-        np.float_t ac
-        np.ndarray[T, ndim=1, mode='c'] s1
-        np.ndarray[T, ndim=1, mode='c'] s2
-        np.ndarray[T, ndim=1, mode='c'] o1
-        np.ndarray[T, ndim=1, mode='c'] o2
-        np.ndarray[T, ndim=2, mode='c'] y = np.zeros((fk.shape[0], fk.shape[1]), dtype=fk.dtype)
-
-
-    if axis == 0:
-        s1 = np.zeros(fk.shape[1], dtype=fk.dtype)
-        s2 = np.zeros(fk.shape[1], dtype=fk.dtype)
-        o1 = np.zeros(fk.shape[1], dtype=fk.dtype)
-        o2 = np.zeros(fk.shape[1], dtype=fk.dtype)
-
-        M = u0.shape[1]
-        for j in range(fk.shape[1]):
-            y[0, j] = fk[0, j]
-            y[1, j] = fk[1, j]
-            y[2, j] = fk[2, j] - l0[0, 0, j]*y[0, j]
-            y[3, j] = fk[3, j] - l0[1, 0, j]*y[1, j]
-
-        for i in xrange(2, M):
-            ke = 2*i
-            ko = ke+1
-            for j in range(fk.shape[1]):
-                y[ko, j] = fk[ko, j] - l0[1, i-1, j]*y[ko-2, j] - l1[1, i-2, j]*y[ko-4, j]
-                y[ke, j] = fk[ke, j] - l0[0, i-1, j]*y[ke-2, j] - l1[0, i-2, j]*y[ke-4, j]
-
-        ke = 2*(M-1)
-        ko = ke+1
-        for j in range(fk.shape[1]):
-            uk[ke, j] = y[ke, j] / u0[0, M-1, j]
-            uk[ko, j] = y[ko, j] / u0[1, M-1, j]
-
-        ke = 2*(M-2)
-        ko = ke+1
-        for j in range(fk.shape[1]):
-            uk[ke, j] = (y[ke, j] - u1[0, M-2, j]*uk[ke+2, j]) / u0[0, M-2, j]
-            uk[ko, j] = (y[ko, j] - u1[1, M-2, j]*uk[ko+2, j]) / u0[1, M-2, j]
-
-        ke = 2*(M-3)
-        ko = ke+1
-        for j in range(fk.shape[1]):
-            uk[ke, j] = (y[ke, j] - u1[0, M-3, j]*uk[ke+2, j] - u2[0, M-3, j]*uk[ke+4, j]) / u0[0, M-3, j]
-            uk[ko, j] = (y[ko, j] - u1[1, M-3, j]*uk[ko+2, j] - u2[1, M-3, j]*uk[ko+4, j]) / u0[1, M-3, j]
-
-        for kk in xrange(M-4, -1, -1):
-            ke = 2*kk
-            ko = ke+1
-            je = ke+6
-            jo = ko+6
-            for j in range(fk.shape[1]):
-                ac = a0[0, j]
-                s1[j] += uk[je, j]/(je+3.)
-                s2[j] += (uk[je, j]/(je+3.))*((je+2.)*(je+2.))
-                uk[ke, j] = (y[ke, j] - u1[0, kk, j]*uk[ke+2, j] - u2[0, kk, j]*uk[ke+4, j] - a[0, kk, j]*ac*s1[j] - b[0, kk, j]*ac*s2[j]) / u0[0, kk, j]
-                o1[j] += uk[jo, j]/(jo+3.)
-                o2[j] += (uk[jo, j]/(jo+3.))*((jo+2.)*(jo+2.))
-                uk[ko, j] = (y[ko, j] - u1[1, kk, j]*uk[ko+2, j] - u2[1, kk, j]*uk[ko+4, j] - a[1, kk, j]*ac*o1[j] - b[1, kk, j]*ac*o2[j]) / u0[1, kk, j]
-
-    elif axis == 1:
-        s1 = np.zeros(fk.shape[0], dtype=fk.dtype)
-        s2 = np.zeros(fk.shape[0], dtype=fk.dtype)
-        o1 = np.zeros(fk.shape[0], dtype=fk.dtype)
-        o2 = np.zeros(fk.shape[0], dtype=fk.dtype)
-
-        M = u0.shape[2]
-        for j in range(fk.shape[0]):
-            y[j, 0] = fk[j, 0]
-            y[j, 1] = fk[j, 1]
-            y[j, 2] = fk[j, 2] - l0[0, j, 0]*y[j, 0]
-            y[j, 3] = fk[j, 3] - l0[1, j, 0]*y[j, 1]
-
-            for i in xrange(2, M):
-                ke = 2*i
-                ko = ke+1
-                y[j, ko] = fk[j, ko] - l0[1, j, i-1]*y[j, ko-2] - l1[1, j, i-2]*y[j, ko-4]
-                y[j, ke] = fk[j, ke] - l0[0, j, i-1]*y[j, ke-2] - l1[0, j, i-2]*y[j, ke-4]
-
-            ke = 2*(M-1)
-            ko = ke+1
-            uk[j, ke] = y[j, ke] / u0[0, j, M-1]
-            uk[j, ko] = y[j, ko] / u0[1, j, M-1]
-
-            ke = 2*(M-2)
-            ko = ke+1
-            uk[j, ke] = (y[j, ke] - u1[0, j, M-2]*uk[j, ke+2]) / u0[0, j, M-2]
-            uk[j, ko] = (y[j, ko] - u1[1, j, M-2]*uk[j, ko+2]) / u0[1, j, M-2]
-
-            ke = 2*(M-3)
-            ko = ke+1
-            uk[j, ke] = (y[j, ke] - u1[0, j, M-3]*uk[j, ke+2] - u2[0, j, M-3]*uk[j, ke+4]) / u0[0, j, M-3]
-            uk[j, ko] = (y[j, ko] - u1[1, j, M-3]*uk[j, ko+2] - u2[1, j, M-3]*uk[j, ko+4]) / u0[1, j, M-3]
-
-            for kk in xrange(M-4, -1, -1):
-                ke = 2*kk
-                ko = ke+1
-                je = ke+6
-                jo = ko+6
-                ac = a0[j, 0]
-                s1[j] += uk[j, je]/(je+3.)
-                s2[j] += (uk[j, je]/(je+3.))*((je+2.)*(je+2.))
-                uk[j, ke] = (y[j, ke] - u1[0, j, kk]*uk[j, ke+2] - u2[0, j, kk]*uk[j, ke+4] - a[0, j, kk]*ac*s1[j] - b[0, j, kk]*ac*s2[j]) / u0[0, j, kk]
-                o1[j] += uk[j, jo]/(jo+3.)
-                o2[j] += (uk[j, jo]/(jo+3.))*((jo+2.)*(jo+2.))
-                uk[j, ko] = (y[j, ko] - u1[1, j, kk]*uk[j, ko+2] - u2[1, j, kk]*uk[j, ko+4] - a[1, j, kk]*ac*o1[j] - b[1, j, kk]*ac*o2[j]) / u0[1, j, kk]
-
-
-
-@cython.cdivision(True)
-#@cython.linetrace(True)
-#@cython.binding(True)
-def LU_Biharmonic_3D_n(np.int64_t axis,
-                     np.ndarray[real_t, ndim=3] alfa,
-                     np.ndarray[real_t, ndim=3] beta,
-                     np.ndarray[real_t, ndim=3] ceta,
-                     # 3 upper diagonals of SBB
-                     np.ndarray[real_t, ndim=1, mode='c'] sii,
-                     np.ndarray[real_t, ndim=1, mode='c'] siu,
-                     np.ndarray[real_t, ndim=1, mode='c'] siuu,
-                     # All 3 diagonals of ABB
-                     np.ndarray[real_t, ndim=1, mode='c'] ail,
-                     np.ndarray[real_t, ndim=1, mode='c'] aii,
-                     np.ndarray[real_t, ndim=1, mode='c'] aiu,
-                     # All 5 diagonals of BBB
-                     np.ndarray[real_t, ndim=1, mode='c'] bill,
-                     np.ndarray[real_t, ndim=1, mode='c'] bil,
-                     np.ndarray[real_t, ndim=1, mode='c'] bii,
-                     np.ndarray[real_t, ndim=1, mode='c'] biu,
-                     np.ndarray[real_t, ndim=1, mode='c'] biuu,
-                     np.ndarray[real_t, ndim=4, mode='c'] u0,
-                     np.ndarray[real_t, ndim=4, mode='c'] u1,
-                     np.ndarray[real_t, ndim=4, mode='c'] u2,
-                     np.ndarray[real_t, ndim=4, mode='c'] l0,
-                     np.ndarray[real_t, ndim=4, mode='c'] l1):
-    cdef:
-        unsigned int ii, jj, N1, N2, odd, i, j, k, kk, M, ll
-        long long int m, n, p, dd, w0
-        double a, b, c, pp
-        double pi = np.pi
-        vector[double] c0, c1, c2
-        #double* pc0, pc1, pc2
-        #np.ndarray[real_t, ndim=1] c0 = np.zeros(sii.shape[0]/2)
-        #np.ndarray[real_t, ndim=1] c1 = np.zeros(sii.shape[0]/2)
-        #np.ndarray[real_t, ndim=1] c2 = np.zeros(sii.shape[0]/2)
-
-    M = sii.shape[0]/2
-
-    c0.resize(M)
-    c1.resize(M)
-    c2.resize(M)
-
-    if axis == 0:
-        N1 = alfa.shape[1]
-        N2 = alfa.shape[2]
-
-        for j in xrange(N1):
-            for k in xrange(N2):
-                a = alfa[0, j, k]
-                b = beta[0, j, k]
-                c = ceta[0, j, k]
-                for odd in xrange(2):
-                    c0[0] = a*sii[odd] + b*aii[odd] + c*bii[odd]
-                    c0[1] = a*siu[odd] + b*aiu[odd] + c*biu[odd]
-                    c0[2] = a*siuu[odd] + c*biuu[odd]
-                    m = 8*(odd+1)*(odd+2)*(odd*(odd+4)+3*(6+odd+2)*(6+odd+2))
-                    c0[3] = m*a*pi/(6+odd+3.)
-                    m = 8*(odd+1)*(odd+2)*(odd*(odd+4)+3*(8+odd+2)*(8+odd+2))
-                    c0[4] = m*a*pi/(8+odd+3.)
-
-                    c1[0] = b*ail[odd] + c*bil[odd]
-                    c1[1] = a*sii[2+odd] + b*aii[2+odd] + c*bii[2+odd]
-                    c1[2] = a*siu[2+odd] + b*aiu[2+odd] + c*biu[2+odd]
-                    c1[3] = a*siuu[2+odd] + c*biuu[2+odd]
-                    m = 8*(odd+3)*(odd+4)*((odd+2)*(odd+6)+3*(8+odd+2)*(8+odd+2))
-                    c1[4] = m*a*pi/(8+odd+3.)
-
-                    c2[0] = c*bill[odd]
-                    c2[1] = b*ail[2+odd] + c*bil[2+odd]
-                    c2[2] = a*sii[4+odd] + b*aii[4+odd] + c*bii[4+odd]
-                    c2[3] = a*siu[4+odd] + b*aiu[4+odd] + c*biu[4+odd]
-                    c2[4] = a*siuu[4+odd] + c*biuu[4+odd]
-
-                    for i in xrange(5, M):
-                        p = 2*i+odd
-                        pp = pi/(p+3.)
-                        m = 8*(odd+1)*(odd+2)*(odd*(odd+4)+3*(p+2)*(p+2))
-                        c0[i] = m*a*pp
-                        m = 8*(odd+3)*(odd+4)*((odd+2)*(odd+6)+3*(p+2)*(p+2))
-                        c1[i] = m*a*pp
-                        m = 8*(odd+5)*(odd+6)*((odd+4)*(odd+8)+3*(p+2)*(p+2))
-                        c2[i] = m*a*pp
-
-                    u0[odd, 0, j, k] = c0[0]
-                    u1[odd, 0, j, k] = c0[1]
-                    u2[odd, 0, j, k] = c0[2]
-                    for kk in xrange(1, M):
-                        l0[odd, kk-1, j, k] = c1[kk-1]/u0[odd, kk-1, j, k]
-                        if kk < M-1:
-                            l1[odd, kk-1, j, k] = c2[kk-1]/u0[odd, kk-1, j, k]
-
-                        for i in xrange(kk, M):
-                            c1[i] -= l0[odd, kk-1, j, k]*c0[i]
-
-                        if kk < M-1:
-                            for i in xrange(kk, M):
-                                c2[i] -= l1[odd, kk-1, j, k]*c0[i]
-
-                        #for i in xrange(kk, M):
-                            #c0[i] = c1[i]
-                            #c1[i] = c2[i]
-                        copy(c1.begin()+kk, c1.end(), c0.begin()+kk)
-                        copy(c2.begin()+kk, c2.end(), c1.begin()+kk)
-
-                        if kk < M-2:
-                            ll = 2*kk+odd
-                            c2[kk] = c*bill[ll]
-                            c2[kk+1] = b*ail[ll+2] + c*bil[ll+2]
-                            c2[kk+2] = a*sii[ll+4] + b*aii[ll+4] + c*bii[ll+4]
-                            if kk < M-3:
-                                c2[kk+3] = a*siu[ll+4] + b*aiu[ll+4] + c*biu[ll+4]
-                            if kk < M-4:
-                                c2[kk+4] = a*siuu[ll+4] + c*biuu[ll+4]
-                            if kk < M-5:
-                                n = 2*(kk+2)+odd
-                                dd = 8*(n+1)*(n+2)
-                                w0 = dd*n*(n+4)
-                                for i in xrange(kk+5, M):
-                                    p = 2*i+odd
-                                    c2[i] = (w0 + dd*3*(p+2)*(p+2))*a*pi/(p+3.)
-
-                        u0[odd, kk, j, k] = c0[kk]
-                        if kk < M-1:
-                            u1[odd, kk, j, k] = c0[kk+1]
-                        if kk < M-2:
-                            u2[odd, kk, j, k] = c0[kk+2]
-
-    elif axis == 1:
-        N1 = alfa.shape[0]
-        N2 = alfa.shape[2]
-
-        for j in xrange(N1):
-            for k in xrange(N2):
-                a = alfa[j, 0, k]
-                b = beta[j, 0, k]
-                c = ceta[j, 0, k]
-                for odd in xrange(2):
-                    c0[0] = a*sii[odd] + b*aii[odd] + c*bii[odd]
-                    c0[1] = a*siu[odd] + b*aiu[odd] + c*biu[odd]
-                    c0[2] = a*siuu[odd] + c*biuu[odd]
-                    m = 8*(odd+1)*(odd+2)*(odd*(odd+4)+3*(6+odd+2)*(6+odd+2))
-                    c0[3] = m*a*pi/(6+odd+3.)
-                    m = 8*(odd+1)*(odd+2)*(odd*(odd+4)+3*(8+odd+2)*(8+odd+2))
-                    c0[4] = m*a*pi/(8+odd+3.)
-
-                    c1[0] = b*ail[odd] + c*bil[odd]
-                    c1[1] = a*sii[2+odd] + b*aii[2+odd] + c*bii[2+odd]
-                    c1[2] = a*siu[2+odd] + b*aiu[2+odd] + c*biu[2+odd]
-                    c1[3] = a*siuu[2+odd] + c*biuu[2+odd]
-                    m = 8*(odd+3)*(odd+4)*((odd+2)*(odd+6)+3*(8+odd+2)*(8+odd+2))
-                    c1[4] = m*a*pi/(8+odd+3.)
-
-                    c2[0] = c*bill[odd]
-                    c2[1] = b*ail[2+odd] + c*bil[2+odd]
-                    c2[2] = a*sii[4+odd] + b*aii[4+odd] + c*bii[4+odd]
-                    c2[3] = a*siu[4+odd] + b*aiu[4+odd] + c*biu[4+odd]
-                    c2[4] = a*siuu[4+odd] + c*biuu[4+odd]
-
-                    for i in xrange(5, M):
-                        p = 2*i+odd
-                        pp = pi/(p+3.)
-                        m = 8*(odd+1)*(odd+2)*(odd*(odd+4)+3*(p+2)*(p+2))
-                        c0[i] = m*a*pp
-                        m = 8*(odd+3)*(odd+4)*((odd+2)*(odd+6)+3*(p+2)*(p+2))
-                        c1[i] = m*a*pp
-                        m = 8*(odd+5)*(odd+6)*((odd+4)*(odd+8)+3*(p+2)*(p+2))
-                        c2[i] = m*a*pp
-
-                    u0[odd, j, 0, k] = c0[0]
-                    u1[odd, j, 0, k] = c0[1]
-                    u2[odd, j, 0, k] = c0[2]
-                    for kk in xrange(1, M):
-                        l0[odd, j, kk-1, k] = c1[kk-1]/u0[odd, j, kk-1, k]
-                        if kk < M-1:
-                            l1[odd, j, kk-1, k] = c2[kk-1]/u0[odd, j, kk-1, k]
-
-                        for i in xrange(kk, M):
-                            c1[i] -= l0[odd, j, kk-1, k]*c0[i]
-
-                        if kk < M-1:
-                            for i in xrange(kk, M):
-                                c2[i] -= l1[odd, j, kk-1, k]*c0[i]
-
-                        #for i in xrange(kk, M):
-                            #c0[i] = c1[i]
-                            #c1[i] = c2[i]
-                        copy(c1.begin()+kk, c1.end(), c0.begin()+kk)
-                        copy(c2.begin()+kk, c2.end(), c1.begin()+kk)
-
-                        if kk < M-2:
-                            ll = 2*kk+odd
-                            c2[kk] = c*bill[ll]
-                            c2[kk+1] = b*ail[ll+2] + c*bil[ll+2]
-                            c2[kk+2] = a*sii[ll+4] + b*aii[ll+4] + c*bii[ll+4]
-                            if kk < M-3:
-                                c2[kk+3] = a*siu[ll+4] + b*aiu[ll+4] + c*biu[ll+4]
-                            if kk < M-4:
-                                c2[kk+4] = a*siuu[ll+4] + c*biuu[ll+4]
-                            if kk < M-5:
-                                n = 2*(kk+2)+odd
-                                dd = 8*(n+1)*(n+2)
-                                w0 = dd*n*(n+4)
-                                for i in xrange(kk+5, M):
-                                    p = 2*i+odd
-                                    c2[i] = (w0 + dd*3*(p+2)*(p+2))*a*pi/(p+3.)
-
-                        u0[odd, j, kk, k] = c0[kk]
-                        if kk < M-1:
-                            u1[odd, j, kk, k] = c0[kk+1]
-                        if kk < M-2:
-                            u2[odd, j, kk, k] = c0[kk+2]
-
-    elif axis == 2:
-        N1 = alfa.shape[0]
-        N2 = alfa.shape[1]
-
-        for j in xrange(N1):
-            for k in xrange(N2):
-                a = alfa[j, k, 0]
-                b = beta[j, k, 0]
-                c = ceta[j, k, 0]
-                for odd in xrange(2):
-                    c0[0] = a*sii[odd] + b*aii[odd] + c*bii[odd]
-                    c0[1] = a*siu[odd] + b*aiu[odd] + c*biu[odd]
-                    c0[2] = a*siuu[odd] + c*biuu[odd]
-                    m = 8*(odd+1)*(odd+2)*(odd*(odd+4)+3*(6+odd+2)*(6+odd+2))
-                    c0[3] = m*a*pi/(6+odd+3.)
-                    m = 8*(odd+1)*(odd+2)*(odd*(odd+4)+3*(8+odd+2)*(8+odd+2))
-                    c0[4] = m*a*pi/(8+odd+3.)
-
-                    c1[0] = b*ail[odd] + c*bil[odd]
-                    c1[1] = a*sii[2+odd] + b*aii[2+odd] + c*bii[2+odd]
-                    c1[2] = a*siu[2+odd] + b*aiu[2+odd] + c*biu[2+odd]
-                    c1[3] = a*siuu[2+odd] + c*biuu[2+odd]
-                    m = 8*(odd+3)*(odd+4)*((odd+2)*(odd+6)+3*(8+odd+2)*(8+odd+2))
-                    c1[4] = m*a*pi/(8+odd+3.)
-
-                    c2[0] = c*bill[odd]
-                    c2[1] = b*ail[2+odd] + c*bil[2+odd]
-                    c2[2] = a*sii[4+odd] + b*aii[4+odd] + c*bii[4+odd]
-                    c2[3] = a*siu[4+odd] + b*aiu[4+odd] + c*biu[4+odd]
-                    c2[4] = a*siuu[4+odd] + c*biuu[4+odd]
-
-                    for i in xrange(5, M):
-                        p = 2*i+odd
-                        pp = pi/(p+3.)
-                        m = 8*(odd+1)*(odd+2)*(odd*(odd+4)+3*(p+2)*(p+2))
-                        c0[i] = m*a*pp
-                        m = 8*(odd+3)*(odd+4)*((odd+2)*(odd+6)+3*(p+2)*(p+2))
-                        c1[i] = m*a*pp
-                        m = 8*(odd+5)*(odd+6)*((odd+4)*(odd+8)+3*(p+2)*(p+2))
-                        c2[i] = m*a*pp
-
-                    u0[odd, j, k, 0] = c0[0]
-                    u1[odd, j, k, 0] = c0[1]
-                    u2[odd, j, k, 0] = c0[2]
-                    for kk in xrange(1, M):
-                        l0[odd, j, k, kk-1] = c1[kk-1]/u0[odd, j, k, kk-1]
-                        if kk < M-1:
-                            l1[odd, j, k, kk-1] = c2[kk-1]/u0[odd, j, k, kk-1]
-
-                        for i in xrange(kk, M):
-                            c1[i] -= l0[odd, j, k, kk-1]*c0[i]
-
-                        if kk < M-1:
-                            for i in xrange(kk, M):
-                                c2[i] -= l1[odd, j, k, kk-1]*c0[i]
-
-                        #for i in xrange(kk, M):
-                            #c0[i] = c1[i]
-                            #c1[i] = c2[i]
-                        copy(c1.begin()+kk, c1.end(), c0.begin()+kk)
-                        copy(c2.begin()+kk, c2.end(), c1.begin()+kk)
-
-                        if kk < M-2:
-                            ll = 2*kk+odd
-                            c2[kk] = c*bill[ll]
-                            c2[kk+1] = b*ail[ll+2] + c*bil[ll+2]
-                            c2[kk+2] = a*sii[ll+4] + b*aii[ll+4] + c*bii[ll+4]
-                            if kk < M-3:
-                                c2[kk+3] = a*siu[ll+4] + b*aiu[ll+4] + c*biu[ll+4]
-                            if kk < M-4:
-                                c2[kk+4] = a*siuu[ll+4] + c*biuu[ll+4]
-                            if kk < M-5:
-                                n = 2*(kk+2)+odd
-                                dd = 8*(n+1)*(n+2)
-                                w0 = dd*n*(n+4)
-                                for i in xrange(kk+5, M):
-                                    p = 2*i+odd
-                                    c2[i] = (w0 + dd*3*(p+2)*(p+2))*a*pi/(p+3.)
-
-                        u0[odd, j, k, kk] = c0[kk]
-                        if kk < M-1:
-                            u1[odd, j, k, kk] = c0[kk+1]
-                        if kk < M-2:
-                            u2[odd, j, k, kk] = c0[kk+2]
-
-
-@cython.cdivision(True)
-#@cython.linetrace(True)
-#@cython.binding(True)
-def LU_Biharmonic_2D_n(np.int64_t axis,
-                     np.ndarray[real_t, ndim=2] alfa,
-                     np.ndarray[real_t, ndim=2] beta,
-                     np.ndarray[real_t, ndim=2] ceta,
-                     # 3 upper diagonals of SBB
-                     np.ndarray[real_t, ndim=1, mode='c'] sii,
-                     np.ndarray[real_t, ndim=1, mode='c'] siu,
-                     np.ndarray[real_t, ndim=1, mode='c'] siuu,
-                     # All 3 diagonals of ABB
-                     np.ndarray[real_t, ndim=1, mode='c'] ail,
-                     np.ndarray[real_t, ndim=1, mode='c'] aii,
-                     np.ndarray[real_t, ndim=1, mode='c'] aiu,
-                     # All 5 diagonals of BBB
-                     np.ndarray[real_t, ndim=1, mode='c'] bill,
-                     np.ndarray[real_t, ndim=1, mode='c'] bil,
-                     np.ndarray[real_t, ndim=1, mode='c'] bii,
-                     np.ndarray[real_t, ndim=1, mode='c'] biu,
-                     np.ndarray[real_t, ndim=1, mode='c'] biuu,
-                     np.ndarray[real_t, ndim=3, mode='c'] u0,
-                     np.ndarray[real_t, ndim=3, mode='c'] u1,
-                     np.ndarray[real_t, ndim=3, mode='c'] u2,
-                     np.ndarray[real_t, ndim=3, mode='c'] l0,
-                     np.ndarray[real_t, ndim=3, mode='c'] l1):
+    for k in range(nb):
+        ii = k*suk
+        jj = k*sdk
+        uk[ii+(M-1)*su] = y[(M-1)*nb+k] / u0[jj+(M-1)*sd]
+        uk[ii+(M-2)*su] = (y[(M-2)*nb+k] - u1[jj+(M-2)*sd]*uk[ii+(M-1)*su]) / u0[jj+(M-2)*sd]
+        uk[ii+(M-3)*su] = (y[(M-3)*nb+k] - u1[jj+(M-3)*sd]*uk[ii+(M-2)*su]
+                           - u2[jj+(M-3)*sd]*uk[ii+(M-1)*su]) / u0[jj+(M-3)*sd]
+    for kk in range(M-4, -1, -1):
+        j = 2*kk+odd+6
+        r = 1./(j+3.)
+        q = (j+2)*(j+2)*r
+        for k in range(nb):
+            ii = kk*su+k*suk
+            jj = kk*sd+k*sdk
+            s[k] = s[k] + uk[ii+3*su]*r
+            s[nb+k] = s[nb+k] + uk[ii+3*su]*q
+            uk[ii] = (y[kk*nb+k] - u1[jj]*uk[ii+su] - u2[jj]*uk[ii+2*su]
+                      - a[jj]*s[k] - b[jj]*s[nb+k]) / u0[jj]
+
+
+def Solve_Biharmonic_n(T[:, :, :] fk,
+                       T[:, :, :] uk,
+                       const real_t[:, :, :, :, :] lu,
+                       int Mo,
+                       int num_threads=1):
+    """Solve Biharmonic systems along axis 1 of fk
+
+    The system fk[i, :, k] is solved with the factors lu[:, :, i, :, k] of
+    LU_Biharmonic_n, that may be broadcasted with zero strides. The odd
+    coefficients have Mo unknowns. Blocks of systems that are adjacent
+    along the last axis are solved together, and the blocks are shared
+    between threads. fk and uk may be the same array.
+    """
     cdef:
-        unsigned int ii, jj, N1, N2, odd, i, j, k, kk, M, ll
-        long long int m, n, p, dd, w0
-        double a, b, c, pp
-        double pi = np.pi
-        vector[double] c0, c1, c2
-        #double* pc0, pc1, pc2
-        #np.ndarray[real_t, ndim=1] c0 = np.zeros(sii.shape[0]/2)
-        #np.ndarray[real_t, ndim=1] c1 = np.zeros(sii.shape[0]/2)
-        #np.ndarray[real_t, ndim=1] c2 = np.zeros(sii.shape[0]/2)
-
-    M = sii.shape[0]/2
-
-    c0.resize(M)
-    c1.resize(M)
-    c2.resize(M)
+        np.intp_t t, i, k, Q, Me, sf, su, sfk, suk, sF, sd, sdk, nblk
+        int odd, nb, blk = 16
+        int[2] M
+        vector[T] y
 
-    if axis == 0:
-        N1 = alfa.shape[1]
-
-        for j in xrange(N1):
-            a = alfa[0, j]
-            b = beta[0, j]
-            c = ceta[0, j]
-            for odd in xrange(2):
-                c0[0] = a*sii[odd] + b*aii[odd] + c*bii[odd]
-                c0[1] = a*siu[odd] + b*aiu[odd] + c*biu[odd]
-                c0[2] = a*siuu[odd] + c*biuu[odd]
-                m = 8*(odd+1)*(odd+2)*(odd*(odd+4)+3*(6+odd+2)*(6+odd+2))
-                c0[3] = m*a*pi/(6+odd+3.)
-                m = 8*(odd+1)*(odd+2)*(odd*(odd+4)+3*(8+odd+2)*(8+odd+2))
-                c0[4] = m*a*pi/(8+odd+3.)
-
-                c1[0] = b*ail[odd] + c*bil[odd]
-                c1[1] = a*sii[2+odd] + b*aii[2+odd] + c*bii[2+odd]
-                c1[2] = a*siu[2+odd] + b*aiu[2+odd] + c*biu[2+odd]
-                c1[3] = a*siuu[2+odd] + c*biuu[2+odd]
-                m = 8*(odd+3)*(odd+4)*((odd+2)*(odd+6)+3*(8+odd+2)*(8+odd+2))
-                c1[4] = m*a*pi/(8+odd+3.)
-
-                c2[0] = c*bill[odd]
-                c2[1] = b*ail[2+odd] + c*bil[2+odd]
-                c2[2] = a*sii[4+odd] + b*aii[4+odd] + c*bii[4+odd]
-                c2[3] = a*siu[4+odd] + b*aiu[4+odd] + c*biu[4+odd]
-                c2[4] = a*siuu[4+odd] + c*biuu[4+odd]
-
-                for i in xrange(5, M):
-                    p = 2*i+odd
-                    pp = pi/(p+3.)
-                    m = 8*(odd+1)*(odd+2)*(odd*(odd+4)+3*(p+2)*(p+2))
-                    c0[i] = m*a*pp
-                    m = 8*(odd+3)*(odd+4)*((odd+2)*(odd+6)+3*(p+2)*(p+2))
-                    c1[i] = m*a*pp
-                    m = 8*(odd+5)*(odd+6)*((odd+4)*(odd+8)+3*(p+2)*(p+2))
-                    c2[i] = m*a*pp
-
-                u0[odd, 0, j] = c0[0]
-                u1[odd, 0, j] = c0[1]
-                u2[odd, 0, j] = c0[2]
-                for kk in xrange(1, M):
-                    l0[odd, kk-1, j] = c1[kk-1]/u0[odd, kk-1, j]
-                    if kk < M-1:
-                        l1[odd, kk-1, j] = c2[kk-1]/u0[odd, kk-1, j]
-
-                    for i in xrange(kk, M):
-                        c1[i] -= l0[odd, kk-1, j]*c0[i]
-
-                    if kk < M-1:
-                        for i in xrange(kk, M):
-                            c2[i] -= l1[odd, kk-1, j]*c0[i]
-
-                    #for i in xrange(kk, M):
-                        #c0[i] = c1[i]
-                        #c1[i] = c2[i]
-                    copy(c1.begin()+kk, c1.end(), c0.begin()+kk)
-                    copy(c2.begin()+kk, c2.end(), c1.begin()+kk)
-
-                    if kk < M-2:
-                        ll = 2*kk+odd
-                        c2[kk] = c*bill[ll]
-                        c2[kk+1] = b*ail[ll+2] + c*bil[ll+2]
-                        c2[kk+2] = a*sii[ll+4] + b*aii[ll+4] + c*bii[ll+4]
-                        if kk < M-3:
-                            c2[kk+3] = a*siu[ll+4] + b*aiu[ll+4] + c*biu[ll+4]
-                        if kk < M-4:
-                            c2[kk+4] = a*siuu[ll+4] + c*biuu[ll+4]
-                        if kk < M-5:
-                            n = 2*(kk+2)+odd
-                            dd = 8*(n+1)*(n+2)
-                            w0 = dd*n*(n+4)
-                            for i in xrange(kk+5, M):
-                                p = 2*i+odd
-                                c2[i] = (w0 + dd*3*(p+2)*(p+2))*a*pi/(p+3.)
-
-                    u0[odd, kk, j] = c0[kk]
-                    if kk < M-1:
-                        u1[odd, kk, j] = c0[kk+1]
-                    if kk < M-2:
-                        u2[odd, kk, j] = c0[kk+2]
-
-    elif axis == 1:
-        N1 = alfa.shape[0]
-
-        for j in xrange(N1):
-            a = alfa[j, 0]
-            b = beta[j, 0]
-            c = ceta[j, 0]
-            for odd in xrange(2):
-                c0[0] = a*sii[odd] + b*aii[odd] + c*bii[odd]
-                c0[1] = a*siu[odd] + b*aiu[odd] + c*biu[odd]
-                c0[2] = a*siuu[odd] + c*biuu[odd]
-                m = 8*(odd+1)*(odd+2)*(odd*(odd+4)+3*(6+odd+2)*(6+odd+2))
-                c0[3] = m*a*pi/(6+odd+3.)
-                m = 8*(odd+1)*(odd+2)*(odd*(odd+4)+3*(8+odd+2)*(8+odd+2))
-                c0[4] = m*a*pi/(8+odd+3.)
-
-                c1[0] = b*ail[odd] + c*bil[odd]
-                c1[1] = a*sii[2+odd] + b*aii[2+odd] + c*bii[2+odd]
-                c1[2] = a*siu[2+odd] + b*aiu[2+odd] + c*biu[2+odd]
-                c1[3] = a*siuu[2+odd] + c*biuu[2+odd]
-                m = 8*(odd+3)*(odd+4)*((odd+2)*(odd+6)+3*(8+odd+2)*(8+odd+2))
-                c1[4] = m*a*pi/(8+odd+3.)
-
-                c2[0] = c*bill[odd]
-                c2[1] = b*ail[2+odd] + c*bil[2+odd]
-                c2[2] = a*sii[4+odd] + b*aii[4+odd] + c*bii[4+odd]
-                c2[3] = a*siu[4+odd] + b*aiu[4+odd] + c*biu[4+odd]
-                c2[4] = a*siuu[4+odd] + c*biuu[4+odd]
-
-                for i in xrange(5, M):
-                    p = 2*i+odd
-                    pp = pi/(p+3.)
-                    m = 8*(odd+1)*(odd+2)*(odd*(odd+4)+3*(p+2)*(p+2))
-                    c0[i] = m*a*pp
-                    m = 8*(odd+3)*(odd+4)*((odd+2)*(odd+6)+3*(p+2)*(p+2))
-                    c1[i] = m*a*pp
-                    m = 8*(odd+5)*(odd+6)*((odd+4)*(odd+8)+3*(p+2)*(p+2))
-                    c2[i] = m*a*pp
-
-                u0[odd, j, 0] = c0[0]
-                u1[odd, j, 0] = c0[1]
-                u2[odd, j, 0] = c0[2]
-                for kk in xrange(1, M):
-                    l0[odd, j, kk-1] = c1[kk-1]/u0[odd, j, kk-1]
-                    if kk < M-1:
-                        l1[odd, j, kk-1] = c2[kk-1]/u0[odd, j, kk-1]
-
-                    for i in xrange(kk, M):
-                        c1[i] -= l0[odd, j, kk-1]*c0[i]
-
-                    if kk < M-1:
-                        for i in xrange(kk, M):
-                            c2[i] -= l1[odd, j, kk-1]*c0[i]
-
-                    #for i in xrange(kk, M):
-                        #c0[i] = c1[i]
-                        #c1[i] = c2[i]
-                    copy(c1.begin()+kk, c1.end(), c0.begin()+kk)
-                    copy(c2.begin()+kk, c2.end(), c1.begin()+kk)
-
-                    if kk < M-2:
-                        ll = 2*kk+odd
-                        c2[kk] = c*bill[ll]
-                        c2[kk+1] = b*ail[ll+2] + c*bil[ll+2]
-                        c2[kk+2] = a*sii[ll+4] + b*aii[ll+4] + c*bii[ll+4]
-                        if kk < M-3:
-                            c2[kk+3] = a*siu[ll+4] + b*aiu[ll+4] + c*biu[ll+4]
-                        if kk < M-4:
-                            c2[kk+4] = a*siuu[ll+4] + c*biuu[ll+4]
-                        if kk < M-5:
-                            n = 2*(kk+2)+odd
-                            dd = 8*(n+1)*(n+2)
-                            w0 = dd*n*(n+4)
-                            for i in xrange(kk+5, M):
-                                p = 2*i+odd
-                                c2[i] = (w0 + dd*3*(p+2)*(p+2))*a*pi/(p+3.)
-
-                    u0[odd, j, kk] = c0[kk]
-                    if kk < M-1:
-                        u1[odd, j, kk] = c0[kk+1]
-                    if kk < M-2:
-                        u2[odd, j, kk] = c0[kk+2]
+    Me = lu.shape[3]
+    M[0] = Me
+    M[1] = Mo
+    Q = fk.shape[2]
+    sf = fk.strides[1] // sizeof(T)
+    su = uk.strides[1] // sizeof(T)
+    sfk = fk.strides[2] // sizeof(T)
+    suk = uk.strides[2] // sizeof(T)
+    sF = lu.strides[0] // sizeof(real_t)
+    sd = lu.strides[3] // sizeof(real_t)
+    sdk = lu.strides[4] // sizeof(real_t)
+    nblk = (Q+blk-1) // blk
+    y.resize((Me+2)*blk*max(num_threads, 1))
+    for t in prange(fk.shape[0]*nblk, nogil=True, num_threads=num_threads):
+        i = t // nblk
+        k = (t % nblk)*blk
+        nb = blk
+        if Q-k < blk:
+            nb = Q-k
+        for odd in range(2):
+            Solve_oe_Biharmonic_n_ptr(odd, &fk[i, 0, k], &uk[i, 0, k], sf, su,
+                                      sfk, suk, nb, &lu[0, odd, i, 0, k], sF,
+                                      sd, sdk, &y[threadid()*(Me+2)*blk],
+                                      &y[threadid()*(Me+2)*blk+Me*blk], M[odd])
 
 
 def LU_Helmholtz_Biharmonic_1D(A, B,
@@ -2625,7 +1573,8 @@ def Solve_Helmholtz_Biharmonic_3D_ptr(np.int64_t axis,
                            real_t[:,:,::1] l1,
                            real_t[:,:,::1] d,
                            real_t[:,:,::1] u1,
-                           real_t[:,:,::1] u2):
+                           real_t[:,:,::1] u2,
+                           int num_threads=1):
     cdef:
         T* fk_ptr
         T* u_hat_ptr
@@ -2638,7 +1587,7 @@ def Solve_Helmholtz_Biharmonic_3D_ptr(np.int64_t axis,
 
     strides = fk.strides[axis]/fk.itemsize
     if axis == 0:
-        for ii in range(d.shape[1]):
+        for ii in prange(d.shape[1], nogil=True, num_threads=num_threads):
             for jj in range(d.shape[2]):
                 fk_ptr = &fk[0,ii,jj]
                 u_hat_ptr = &u_hat[0,ii,jj]
@@ -2652,7 +1601,7 @@ def Solve_Helmholtz_Biharmonic_3D_ptr(np.int64_t axis,
                                        strides)
 
     elif axis == 1:
-        for ii in range(d.shape[0]):
+        for ii in prange(d.shape[0], nogil=True, num_threads=num_threads):
             for jj in range(d.shape[2]):
                 fk_ptr = &fk[ii,0,jj]
                 u_hat_ptr = &u_hat[ii,0,jj]
@@ -2666,7 +1615,7 @@ def Solve_Helmholtz_Biharmonic_3D_ptr(np.int64_t axis,
                                        strides)
 
     elif axis == 2:
-        for ii in range(d.shape[0]):
+        for ii in prange(d.shape[0], nogil=True, num_threads=num_threads):
             for jj in range(d.shape[1]):
                 fk_ptr = &fk[ii,jj,0]
                 u_hat_ptr = &u_hat[ii,jj,0]
@@ -2726,3 +1675,47 @@ def LU_Helmholtz_Biharmonic_3D(A, B, np.int64_t axis,
                                 d[ii, jj, :],
                                 u1[ii, jj, :],
                                 u2[ii, jj, :])
+
+def Banded_Solve3D(const real_t[:, :] lu,
+                   const int[::1] piv,
+                   int kl,
+                   int ku,
+                   T[:, :, :] x,
+                   int num_threads=1):
+    """Solve banded system along axis 1 of x using LU from LAPACK's gbtrf
+
+    Same as LAPACK's gbtrs, but for any number of right hand sides stored
+    along the first and last axes of x.
+    """
+    cdef:
+        np.intp_t n = lu.shape[1]
+        np.intp_t kd = kl+ku
+        np.intp_t i, j, k, l, p, lm
+        T tmp
+
+    for i in prange(x.shape[0], nogil=True, num_threads=num_threads):
+        # Forward substitution with L and row interchanges
+        for j in range(n-1):
+            lm = kl
+            if n-j-1 < lm:
+                lm = n-j-1
+            l = piv[j]
+            if l != j:
+                for k in range(x.shape[2]):
+                    tmp = x[i, l, k]
+                    x[i, l, k] = x[i, j, k]
+                    x[i, j, k] = tmp
+            for p in range(1, lm+1):
+                for k in range(x.shape[2]):
+                    x[i, j+p, k] = x[i, j+p, k] - lu[kd+p, j]*x[i, j, k]
+
+        # Backward substitution with U of bandwidth kl+ku
+        for j in range(n-1, -1, -1):
+            for k in range(x.shape[2]):
+                x[i, j, k] = x[i, j, k]/lu[kd, j]
+            l = j-kd
+            if l < 0:
+                l = 0
+            for p in range(l, j):
+                for k in range(x.shape[2]):
+                    x[i, p, k] = x[i, p, k] - lu[kd+p-j, j]*x[i, j, k]
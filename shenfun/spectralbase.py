@@ -80,11 +80,19 @@ Each class has methods for moving fast between spectral and physical space, and
 for computing the (weighted) scalar product.
 
 """
+from copy import copy
 import numpy as np
 import pyfftw
 from .utilities import inheritdocstrings
+from .utilities.cache import LRUCache
+from .matrixbase import SpectralMatrix
 from mpiFFT4py import work_arrays
 
+try:
+    from threadpoolctl import threadpool_limits
+except ImportError:
+    threadpool_limits = None
+
 work = work_arrays()
 
 class SpectralBase(object):
@@ -95,22 +103,65 @@ class SpectralBase(object):
         quad   ('GL', 'GC', 'LG')  Chebyshev-Gauss-Lobatto, Chebyshev-Gauss
                                    or Legendre-Gauss
 
+    Quadrature points and weights, and Vandermonde matrices of the basis, are
+    stored in the LRUCache SpectralBase.cache, which is shared by all bases.
+
     """
 
+    cache = LRUCache()
+
     def __init__(self, N, quad, padding_factor=1, domain=(-1., 1.)):
         self.N = N
         self.domain = domain
         self.quad = quad
         self._mass = None # Mass matrix (if needed)
         self.axis = 0
+        self.axes = (0,)
         self.xfftn_fwd = None
         self.xfftn_bck = None
+        self.threads = 1
         self.padding_factor = np.floor(N*padding_factor)/N
 
     def points_and_weights(self, N):
         """Return points and weights of quadrature"""
         raise NotImplementedError
 
+    def _cache_key(self, *args):
+        return (self.__class__, self.quad, tuple(self.domain),
+                self.is_scaled()) + args
+
+    def cached_points_and_weights(self, N, scaled=False):
+        """Return read-only points and weights of quadrature from cache
+
+        args:
+            N          int     Number of quadrature points
+
+        kwargs:
+            scaled     bool    Whether or not to scale points to domain
+
+        """
+        key = self._cache_key('points_and_weights', N, scaled)
+        return self.cache.get(key, lambda: self.points_and_weights(N, scaled=scaled))
+
+    def cached_vandermonde_basis_derivative(self, k=0):
+        """Return read-only Vandermonde matrix of basis from cache
+
+        The Vandermonde matrix is evaluated on the N quadrature points.
+
+        kwargs:
+            k    integer    k'th derivative
+
+        """
+        def func():
+            x = self.cached_points_and_weights(self.N)[0]
+            V = self.vandermonde(x)
+            return self.get_vandermonde_basis_derivative(V, k)
+        return self.cache.get(self._cache_key('vandermonde', self.N, k), func)
+
+    def is_scaled(self):
+        """Return True if basis functions are scaled"""
+        return False
+
     def mesh(self, N, axis=0):
         """Return the computational mesh
 
@@ -118,7 +169,7 @@ class SpectralBase(object):
 
         """
         N = list(N) if np.ndim(N) else [N]
-        x = self.points_and_weights(N[axis], scaled=True)[0]
+        x = self.cached_points_and_weights(N[axis], scaled=True)[0].copy()
         X = self.broadcast_to_ndims(x, len(N), axis)
         return X
 
@@ -254,9 +305,8 @@ class SpectralBase(object):
         """
         assert abs(self.padding_factor-1) < 1e-8
         assert self.N == input_array.shape[self.axis]
-        points, weights = self.points_and_weights(self.N)
-        V = self.vandermonde(points)
-        P = self.get_vandermonde_basis(V)
+        weights = self.cached_points_and_weights(self.N)[1]
+        P = self.cached_vandermonde_basis_derivative(0)
         if input_array.ndim == 1:
             output_array[:] = np.dot(input_array*weights, np.conj(P))
 
@@ -264,7 +314,7 @@ class SpectralBase(object):
             bc_shape = [np.newaxis,]*input_array.ndim
             bc_shape[self.axis] = slice(None)
             fc = np.moveaxis(input_array*weights[bc_shape], self.axis, -1)
-            output_array[:] = np.moveaxis(np.dot(fc, np.conj(P)), -1, self.axis)
+            output_array[:] = np.moveaxis(_dot(fc, np.conj(P), self.threads), -1, self.axis)
 
         assert output_array is self.forward.output_array
         return output_array
@@ -281,16 +331,14 @@ class SpectralBase(object):
         """
         assert abs(self.padding_factor-1) < 1e-8
         assert self.N == output_array.shape[self.axis]
-        points = self.points_and_weights(self.N)[0]
-        V = self.vandermonde(points)
-        P = self.get_vandermonde_basis(V)
+        P = self.cached_vandermonde_basis_derivative(0)
 
         if output_array.ndim == 1:
             output_array = np.dot(P, input_array, out=output_array)
         else:
-            fc = np.moveaxis(input_array, self.axis, -2)
-            array = np.dot(P, fc)
-            output_array[:] = np.moveaxis(array, 0, self.axis)
+            fc = np.moveaxis(input_array, self.axis, -1)
+            array = _dot(fc, P.T, self.threads)
+            output_array[:] = np.moveaxis(array, -1, self.axis)
 
         assert output_array is self.backward.output_array
         assert input_array is self.backward.input_array
@@ -328,12 +376,19 @@ class SpectralBase(object):
           scalar_product
 
         with or without padding
+
+        If axis is a tuple of more than one axis, then the transforms are
+        planned as one multidimensional transform over all these collapsed
+        axes, see TensorProductSpace. The basis is then the basis of the last
+        axis in the tuple, which is the axis of the 1D transforms.
         """
-        if isinstance(axis, tuple):
-            axis = axis[0]
+        axes = axis if isinstance(axis, tuple) else (axis,)
+        axis = axes[-1]
 
         if isinstance(self.forward, _func_wrap):
-            if self.forward.input_array.shape == shape and self.axis == axis:
+            if (self.forward.input_array.shape == shape and self.axes == axes and
+                    self.forward.input_array.dtype == np.dtype(dtype) and
+                    self.threads == options.get('threads', 1)):
                 # Already planned
                 return
 
@@ -346,22 +401,46 @@ class SpectralBase(object):
             threads=1,
         )
         opts.update(options)
+        wisdom = opts.pop('wisdom', None)
 
         plan_fwd = self._xfftn_fwd
         plan_bck = self._xfftn_bck
 
-        n = shape[axis]
+        if wisdom is not None:
+            # Collapsed axes, if any, are part of the kind of transform
+            key = wisdom.key((self.__class__.__name__, self.quad)+axes[:-1], shape,
+                             dtype, axis, opts['threads'], opts['planner_effort'])
+            found = wisdom.load(key)
+
         U = pyfftw.empty_aligned(shape, dtype=dtype)
-        xfftn_fwd = plan_fwd(U, n=n, axis=axis, **opts)
+        if len(axes) > 1:
+            assert abs(self.padding_factor-1) < 1e-8
+            s = tuple(shape[ax] for ax in axes)
+            xfftn_fwd = self._xfftn_fwd_nd(U, s=s, axes=axes, **opts)
+            V = xfftn_fwd.output_array
+            bck_opts = dict(opts)
+            if np.dtype(dtype).char in 'fdg':
+                # Multidimensional complex-to-real transforms always
+                # overwrite the input, and do not take the option
+                bck_opts.pop('overwrite_input', None)
+            xfftn_bck = self._xfftn_bck_nd(V, s=s, axes=axes, **bck_opts)
+        else:
+            n = shape[axis]
+            xfftn_fwd = plan_fwd(U, n=n, axis=axis, **opts)
+            V = xfftn_fwd.output_array
+            xfftn_bck = plan_bck(V, n=n, axis=axis, **opts)
         U.fill(0)
-        V = xfftn_fwd.output_array
-        xfftn_bck = plan_bck(V, n=n, axis=axis, **opts)
         V.fill(0)
 
         xfftn_fwd.update_arrays(U, V)
         xfftn_bck.update_arrays(V, U)
 
+        if wisdom is not None and not found:
+            wisdom.save(key)
+
         self.axis = axis
+        self.axes = axes
+        self.threads = opts['threads']
         self.xfftn_fwd = xfftn_fwd
         self.xfftn_bck = xfftn_bck
 
@@ -376,6 +455,106 @@ class SpectralBase(object):
         # scalar_product is not padded, just the forward/backward
         self.scalar_product = _func_wrap(self.scalar_product, xfftn_fwd, U, V)
 
+    def _plan_padded(self, shape, axis, dtype, options):
+        """Plan padded transforms
+
+        The transforms on the padded mesh are computed by an unpadded copy of
+        current basis, with padding_factor*N quadrature points. Backward
+        transforms pad the N expansion coefficients with zeros, whereas
+        forward transforms and scalar products truncate the scalar product
+        computed on the padded mesh to N coefficients. Forward transforms then
+        apply the inverse mass matrix of current basis, such that the forward
+        transform of a product of two padded backward transforms is free of
+        aliasing errors.
+        """
+        if isinstance(shape, int):
+            shape = (shape,)
+        padded = self.get_unplanned_copy(shape[axis])
+        padded.plan(shape, axis, dtype, options)
+
+        self._padded = padded
+        self.axis = padded.axis
+        self.threads = padded.threads
+        self.xfftn_fwd = padded.xfftn_fwd
+        self.xfftn_bck = padded.xfftn_bck
+        U = padded.forward.input_array
+        V = self._get_truncarray(shape, padded.forward.output_array.dtype)
+        V.fill(0)
+        self.forward = _func_wrap(self._padded_forward, self.xfftn_fwd, U, V)
+        self.backward = _func_wrap(self._padded_backward, self.xfftn_bck, V, U)
+        self.scalar_product = _func_wrap(self._padded_scalar_product,
+                                         self.xfftn_fwd, U, V)
+        self._exact_mass = self._get_exact_mass_base()
+
+    def _padded_forward(self, input_array=None, output_array=None, **kw):
+        """Forward transform from padded mesh
+
+        kwargs:
+            input_array    (input)     Function values on padded quadrature mesh
+            output_array   (output)    Expansion coefficients
+
+        """
+        self._padded_scalar_product(**kw)
+        self._exact_mass.apply_inverse_mass(self.forward.output_array)
+        return self.forward.output_array
+
+    def _padded_backward(self, input_array=None, output_array=None, **kw):
+        """Backward transform to padded mesh
+
+        kwargs:
+            input_array    (input)     Expansion coefficients
+            output_array   (output)    Function values on padded quadrature mesh
+
+        """
+        self._padding_backward(self.backward.input_array,
+                               self._padded.backward.input_array)
+        return self._padded.backward(**kw)
+
+    def _padded_scalar_product(self, input_array=None, output_array=None, **kw):
+        """Scalar product on padded mesh
+
+        kwargs:
+            input_array    (input)     Function values on padded quadrature mesh
+            output_array   (output)    Scalar product, truncated to N
+                                       coefficients
+
+        """
+        output = self._padded.scalar_product(**kw)
+        self._truncation_forward(output, self.scalar_product.output_array)
+        return self.scalar_product.output_array
+
+    def _get_exact_mass_base(self):
+        """Return basis with the mass matrix used by padded forward transforms
+
+        The scalar products computed on the padded mesh are exact for the
+        unpadded basis, so the mass matrix must be exact as well.
+        """
+        return self
+
+    def get_unplanned_copy(self, N=None):
+        """Return unplanned copy of basis
+
+        The copy may be planned for a different shape than current basis,
+        e.g., with an additional leading axis for vector components.
+
+        kwargs:
+            N       int     Number of quadrature points of copy. If given,
+                            the copy is not padded.
+
+        """
+        b = copy(self)
+        for name in ('forward', 'backward', 'scalar_product', '_padded',
+                     '_exact_mass'):
+            b.__dict__.pop(name, None)
+        b._mass = None
+        if N is not None:
+            b.N = N
+            b.padding_factor = 1.
+        for name in ('CT', 'LT'):
+            if name in b.__dict__:
+                setattr(b, name, getattr(b, name).get_unplanned_copy(N))
+        return b
+
     def _get_truncarray(self, shape, dtype):
         shape = list(shape)
         shape[self.axis] = int(np.round(shape[self.axis] / self.padding_factor))
@@ -461,23 +640,29 @@ class SpectralBase(object):
 
     def _truncation_forward(self, padded_array, trunc_array):
         if self.padding_factor > 1.0+1e-8:
+            # Copy the self.slice() coefficients, and any trailing coefficients
+            # outside of self.slice(), like boundary values, from the end
             trunc_array.fill(0)
             N = trunc_array.shape[self.axis]
+            s = self.slice()
             su = [slice(None)]*trunc_array.ndim
-            su[self.axis] = slice(0, N//2+1)
-            trunc_array[su] = padded_array[su]
-            su[self.axis] = slice(-(N//2), None)
-            trunc_array[su] += padded_array[su]
+            su[self.axis] = s
+            trunc_array[tuple(su)] = padded_array[tuple(su)]
+            if s.stop < N:
+                su[self.axis] = slice(s.stop-N, None)
+                trunc_array[tuple(su)] = padded_array[tuple(su)]
 
     def _padding_backward(self, trunc_array, padded_array):
         if self.padding_factor > 1.0+1e-8:
             padded_array.fill(0)
             N = trunc_array.shape[self.axis]
+            s = self.slice()
             su = [slice(None)]*trunc_array.ndim
-            su[self.axis] = slice(0, np.ceil(N/2.).astype(np.int))
-            padded_array[su] = trunc_array[su]
-            su[self.axis] = slice(-(N//2), None)
-            padded_array[su] = trunc_array[su]
+            su[self.axis] = s
+            padded_array[tuple(su)] = trunc_array[tuple(su)]
+            if s.stop < N:
+                su[self.axis] = slice(s.stop-N, None)
+                padded_array[tuple(su)] = trunc_array[tuple(su)]
 
 
 def inner_product(test, trial, out=None, axis=0, fast_transform=False):
@@ -501,6 +686,9 @@ def inner_product(test, trial, out=None, axis=0, fast_transform=False):
         axis             int          Axis to take the inner product over
         fast_transform   bool         Use fast transform method if True
 
+    The diagonals of matrices are only assembled once for the same bases,
+    and then shared through SpectralMatrix.cache.
+
     Example:
         Compute mass matrix of Shen's Chebyshev Dirichlet basis:
 
@@ -526,9 +714,18 @@ def inner_product(test, trial, out=None, axis=0, fast_transform=False):
         else:
             raise RuntimeError
 
-        mat = test[0]._get_mat()
-        m = mat[key](test, trial)
-        return m
+        # Assemble matrix, or get diagonals assembled earlier from cache
+        mat = test[0]._get_mat()[key]
+        def assemble():
+            A = mat(test, trial)
+            # Do not keep bases alive in the cache
+            A.testfunction = (None, A.testfunction[1])
+            A.trialfunction = (None, A.trialfunction[1])
+            return A
+        A = SpectralMatrix.cache.get(
+            (mat,) + test[0]._cache_key('matrix', test[0].N, key[0][1]) +
+            trial[0]._cache_key('matrix', trial[0].N, key[1][1]), assemble)
+        return A._shared_copy(test, trial)
 
     else:
         # Linear form
@@ -537,13 +734,32 @@ def inner_product(test, trial, out=None, axis=0, fast_transform=False):
             if isinstance(test, fourier.FourierBase):
                 if isinstance(test, fourier.R2CBasis):
                     sl[axis] = sl[axis]//2+1
-                out = np.zeros(sl, dtype=np.complex)
+                out = np.zeros(sl, dtype=np.result_type(trial, np.complex64))
             else:
                 out = np.zeros_like(trial)
         out = test.scalar_product(trial, out, fast_transform=fast_transform)
         return out
 
 
+def _dot(a, b, threads=1):
+    """Return np.dot(a, b), computed by BLAS with the given number of threads
+
+    For threads > 1 the BLAS threads are limited with threadpoolctl, if
+    installed, such that the processes on a node do not oversubscribe the
+    cores. Otherwise BLAS uses its own number of threads.
+
+    args:
+        a       (input)    Array of any dimension
+        b       (input)    2D array
+        threads  int       Number of threads
+
+    """
+    if threads <= 1 or threadpool_limits is None:
+        return np.dot(a, b)
+    with threadpool_limits(limits=threads, user_api='blas'):
+        return np.dot(a, b)
+
+
 class _func_wrap(object):
 
     # pylint: disable=too-few-public-methods
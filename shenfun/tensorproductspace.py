@@ -1,9 +1,14 @@
+import os
+import json
+import tempfile
+from time import time
 import numpy as np
 from numbers import Number
 from shenfun.fourier.bases import FourierBase, R2CBasis, C2CBasis
 from shenfun import chebyshev, legendre
 from mpi4py_fft.mpifft import Transform
-from mpi4py_fft.pencil import Subcomm, Pencil
+from mpi4py_fft.pencil import Subcomm, Pencil, _blockdist
+from mpi4py import MPI
 import sympy
 from copy import copy
 
@@ -26,6 +31,47 @@ class TensorProductSpace(object):
                              to range(len(bases))
         dtype                Type of input data in real physical space.
         slab                 Use 1D slab decomposition instead of default pencil.
+        collapse             Transform consecutive Fourier axes that are
+                             not distributed with one multidimensional
+                             transform. Default is False. Fourier bases with
+                             padding or direct dealiasing are never
+                             collapsed. Only the base of the last axis of
+                             a collapsed group is planned, and the
+                             transforms of the other bases of the group
+                             raise an error.
+        chunks               Number of chunks used for overlapping the
+                             global redistributions with the serial
+                             transforms, see PipelinedTransform. Default
+                             is 1, which means no overlap.
+        decomposition        None, 'auto' or a filename. With 'auto' the
+                             processor grid is chosen by timing forward
+                             and backward transforms for all grids where
+                             the first transformed axis is not
+                             distributed, which includes the slab. If axes
+                             is not given, then also the first transformed
+                             axis is chosen among the axes that may be
+                             transformed first. The spectral data are
+                             always aligned in the first axis. With a
+                             filename the choice is also stored in this
+                             file, for each shape, number of processes and
+                             bases, such that later runs skip the timings.
+                             Default is None, which means the slab or
+                             the default pencil decomposition.
+        wisdom               FFTWWisdom instance, or path to a directory,
+                             for storing FFTW wisdom between runs. See
+                             shenfun.utilities.fftw_wisdom.
+        threads              Number of threads used by each process for
+                             the serial transforms along each axis, and
+                             by the Cython solvers and matvecs of the bases.
+                             If threadpoolctl is installed, it also limits
+                             the BLAS threads of the Vandermonde transforms.
+                             Either an integer, a sequence with one integer
+                             for each axis, or 'auto'. With 'auto' the
+                             number of threads is chosen for each axis by
+                             timing the transforms using 1, 2, 4, ... up to
+                             the number of cores per process on the node.
+
+    Remaining kwargs are passed on to the planners of the 1D bases.
 
     """
 
@@ -36,6 +82,7 @@ class TensorProductSpace(object):
         assert len(shape) > 0
         assert min(shape) > 0
 
+        tune_axes = axes is None
         if axes is not None:
             axes = list(axes) if np.ndim(axes) else [axes]
             for i, axis in enumerate(axes):
@@ -59,13 +106,20 @@ class TensorProductSpace(object):
         dtype = self.dtype = np.dtype(dtype)
         assert dtype.char in 'fdgFDG'
 
+        decomposition = kw.pop('decomposition', None)
         if isinstance(comm, Subcomm):
             assert slab is False
+            assert decomposition is None
             assert len(comm) == len(shape)
             assert comm[axes[-1]].Get_size() == 1
             self.subcomm = comm
         else:
-            if slab:
+            if decomposition is not None:
+                assert slab is False
+                filename = None if decomposition == 'auto' else decomposition
+                axes, dims = _autotune_decomposition(comm, bases, axes, dtype,
+                                                     tune_axes, kw, filename)
+            elif slab:
                 dims = [1] * len(shape)
                 dims[axes[0]] = comm.Get_size()
             else:
@@ -73,11 +127,20 @@ class TensorProductSpace(object):
                 dims[axes[-1]] = 1
             self.subcomm = Subcomm(comm, dims)
 
-        collapse = False # kw.pop('collapse', True)
+        self._owns_subcomm = True
+
+        collapse = kw.pop('collapse', False)
+        chunks = kw.pop('chunks', 1)
+        assert chunks >= 1
         if collapse:
-            groups = [[]]
-            for axis in reversed(axes):
-                if self.subcomm[axis].Get_size() == 1:
+            # The last axis of a group is aligned when the group is
+            # transformed. The remaining axes of the group must be
+            # non-distributed from the start.
+            groups = [[axes[-1]]]
+            for axis in reversed(axes[:-1]):
+                if (self.subcomm[axis].Get_size() == 1 and
+                        _collapsible(bases[axis]) and
+                        _collapsible(bases[groups[0][-1]])):
                     groups[0].insert(0, axis)
                 else:
                     groups.insert(0, [axis])
@@ -85,34 +148,23 @@ class TensorProductSpace(object):
         else:
             self.axes = tuple((axis,) for axis in axes)
 
-        self.xfftn = []
-        self.transfer = []
-        self.pencil = [None, None]
-
-        axes = self.axes[-1]
-        pencil = Pencil(self.subcomm, shape, axes[-1])
-        self.xfftn.append(self.bases[axes[-1]])
-        self.xfftn[-1].plan(pencil.subshape, axes, dtype, kw)
-        self.pencil[0] = pencilA = pencil
-        if not shape[axes[-1]] == self.xfftn[-1].forward.output_array.shape[axes[-1]]:
-            dtype = self.xfftn[-1].forward.output_array.dtype
-            shape[axes[-1]] = self.xfftn[-1].forward.output_array.shape[axes[-1]]
-            pencilA = Pencil(self.subcomm, shape, axes[-1])
-
-        for i, axes in enumerate(reversed(self.axes[:-1])):
-            pencilB = pencilA.pencil(axes[-1])
-            transAB = pencilA.transfer(pencilB, dtype)
-            xfftn = self.bases[axes[-1]]
-            xfftn.plan(pencilB.subshape, axes, dtype, kw)
-            self.xfftn.append(xfftn)
-            self.transfer.append(transAB)
-            pencilA = pencilB
-            if not shape[axes[-1]] == xfftn.forward.output_array.shape[axes[-1]]:
-                dtype = xfftn.forward.output_array.dtype
-                shape[axes[-1]] = xfftn.forward.output_array.shape[axes[-1]]
-                pencilA = Pencil(pencilB.subcomm, shape, axes[-1])
-
-        self.pencil[1] = pencilA
+        if isinstance(kw.get('wisdom', None), str):
+            from shenfun.utilities.fftw_wisdom import FFTWWisdom
+            assert not isinstance(comm, Subcomm)
+            kw['wisdom'] = FFTWWisdom(kw['wisdom'], comm)
+
+        threads = kw.get('threads', 1)
+        if threads == 'auto':
+            assert not isinstance(comm, Subcomm)
+            threads = _autotune_threads(self.bases, self.axes, self.subcomm,
+                                        shape, dtype, kw, comm)
+        threads = tuple(threads) if np.ndim(threads) else (threads,)*len(shape)
+        assert len(threads) == len(shape)
+        kw['threads'] = self.threads = threads
+
+        self.plan_options = kw
+        self.xfftn, self.transfer, self.pencil = _plan_transforms(
+            self.bases, self.axes, self.subcomm, shape, dtype, kw)
 
         self.forward = Transform(
             [o.forward for o in self.xfftn],
@@ -127,6 +179,20 @@ class TensorProductSpace(object):
             [o.forward for o in self.transfer],
             self.pencil)
 
+        if chunks > 1:
+            self.forward = PipelinedTransform(
+                self.forward,
+                [_pipeline_stage(base, 'forward', trans, True, chunks, kw)
+                 for base, trans in zip(self.xfftn[:-1], self.transfer)])
+            self.backward = PipelinedTransform(
+                self.backward,
+                [_pipeline_stage(base, 'backward', trans, False, chunks, kw)
+                 for base, trans in zip(self.xfftn[:0:-1], self.transfer[::-1])])
+            self.scalar_product = PipelinedTransform(
+                self.scalar_product,
+                [_pipeline_stage(base, 'scalar_product', trans, True, chunks, kw)
+                 for base, trans in zip(self.xfftn[:-1], self.transfer)])
+
         if any(isinstance(base, (chebyshev.bases.ShenDirichletBasis,
                                  legendre.bases.ShenDirichletBasis))
                                  for base in self.bases):
@@ -136,9 +202,84 @@ class TensorProductSpace(object):
                     base.bc.set_tensor_bcs(self)
 
     def destroy(self):
-        self.subcomm.destroy()
+        if self._owns_subcomm:
+            self.subcomm.destroy()
         for trans in self.transfer:
             trans.destroy()
+        for trans in (self.forward, self.backward, self.scalar_product):
+            if isinstance(trans, PipelinedTransform):
+                trans.destroy()
+        projector = getattr(self, '_projector', None)
+        if projector is not None:
+            projector.destroy()
+            self._projector = None
+
+    def eval(self, points, coefficients, output_array=None, cache=True):
+        """Evaluate expansion at arbitrary points
+
+        Each process computes the part of the sum that corresponds to its local
+        coefficients, and the partial sums are then added over all processes.
+        All processes must call eval with the same points.
+
+        args:
+            points          (input)    Array of shape (ndim, N) with the
+                                       physical coordinates of N points
+            coefficients    (input)    Local expansion coefficients, e.g.,
+                                       Function(self)
+
+        kwargs:
+            output_array    (output)   Array of shape (N,) for the result
+            cache            bool      Store the basis functions evaluated at
+                                       the points. Repeated evaluations at the
+                                       same points then reuse them.
+
+        """
+        points = np.atleast_2d(points)
+        assert points.shape[0] == len(self)
+        if output_array is None:
+            output_array = np.zeros(points.shape[1], dtype=self.dtype)
+        P = self._get_eval_basis(points, cache)
+
+        # Contract one axis at the time, starting with the last. Points are
+        # evaluated in chunks to limit the size of the intermediate arrays.
+        shape = coefficients.shape
+        chunk = max(1, 2**22 // max(1, int(np.prod(shape[:-1]))))
+        for i in range(0, points.shape[1], chunk):
+            s = slice(i, i+chunk)
+            out = np.dot(coefficients, P[-1][s].T)
+            for axis in range(len(self)-2, -1, -1):
+                out = (out*P[axis][s].T).sum(axis=-2)
+            if self.dtype.char in 'fdg':
+                out = out.real
+            output_array[s] = out
+
+        for comm in self.subcomm:
+            comm.Allreduce(MPI.IN_PLACE, output_array, op=MPI.SUM)
+        return output_array
+
+    def _get_eval_basis(self, points, cache=True):
+        """Return local basis functions evaluated at points, for each axis"""
+        if cache and hasattr(self, '_eval_basis'):
+            x, P = self._eval_basis
+            if x.shape == points.shape and np.array_equal(x, points):
+                return P
+
+        P = []
+        for axis, (base, s) in enumerate(zip(self, self.local_slice(True))):
+            a, b = base.domain
+            if isinstance(base, FourierBase):
+                x = (points[axis]-a)*2*np.pi/(b-a)
+            else:
+                x = 2*(points[axis]-a)/(b-a)-1
+            V = base.get_vandermonde_basis(base.vandermonde(x))
+            if isinstance(base, R2CBasis):
+                # Account for the Hermitian symmetric half of the spectrum
+                V[:, 1:(base.N+1)//2] *= 2
+            P.append(V[:, s])
+
+        if cache:
+            self._eval_basis = (points.copy(), P)
+        return P
 
     def wavenumbers(self, scaled=False, eliminate_highest_freq=False):
         K = []
@@ -231,6 +372,47 @@ class TensorProductSpace(object):
         forward_output = self.is_forward_output(u)
         return Function(self, forward_output=forward_output, buffer=u)
 
+    def get_dealiased(self, padding_factor=1.5):
+        """Return TensorProductSpace for dealiasing nonlinear terms
+
+        The returned space uses copies of the bases of current space with
+        padding_factor, and the same distribution of the spectral data. The
+        backward transform of expansion coefficients of current space then
+        gives the Function on the padded mesh, and the forward transform of a
+        product computed on the padded mesh is free of aliasing errors.
+
+        Padded Fourier axes are not collapsed, and the padded mesh is then
+        distributed such that the global redistributions of the padded space
+        end up with the subcommunicators of the spectral data of current
+        space. The subcommunicators are shared with current space, and only
+        freed by its destroy.
+
+        kwargs:
+            padding_factor  float   Factor for padding backward transforms.
+                                    padding_factor=1.5 corresponds to a
+                                    3/2-rule
+
+        """
+        bases = []
+        for base in self.bases:
+            base = base.get_unplanned_copy()
+            base.padding_factor = np.floor(base.N*padding_factor)/base.N
+            if hasattr(base, 'bc'):
+                # Boundary values are shared, but slices are for the padded space
+                base.bc = copy(base.bc)
+            bases.append(base)
+        axes = [axis for group in self.axes for axis in group]
+
+        # Undo the swaps of subcommunicators of each global redistribution
+        subcomm = list(self.forward.output_pencil.subcomm)
+        for i, j in zip(axes[:-1], axes[1:]):
+            subcomm[i], subcomm[j] = subcomm[j], subcomm[i]
+        subcomm = tuple.__new__(Subcomm, subcomm)
+        kw = dict(self.plan_options, collapse=False)
+        T = TensorProductSpace(subcomm, bases, axes=axes, dtype=self.dtype, **kw)
+        T._owns_subcomm = False
+        return T
+
 
 class MixedTensorProductSpace(object):
     """Class for composite tensorproductspaces.
@@ -238,13 +420,43 @@ class MixedTensorProductSpace(object):
     args:
         spaces        List of tensorproductspaces
 
+    kwargs:
+        batched       Transform all components together, using one plan with
+                      a leading component axis and one global redistribution
+                      per stage. Requires that all spaces are the same
+                      TensorProductSpace.
+
     """
 
-    def __init__(self, spaces):
+    def __init__(self, spaces, batched=False):
         self.spaces = spaces
-        self.forward = VectorTransform([space.forward for space in spaces])
-        self.backward = VectorTransform([space.backward for space in spaces])
-        self.scalar_product = VectorTransform([space.scalar_product for space in spaces])
+        fwd = bck = sp = None
+        if batched:
+            T = spaces[0]
+            assert all(space is T for space in spaces)
+            self.bases = [base.get_unplanned_copy() for base in T.bases]
+            dirichlet = [base for base in self.bases
+                         if isinstance(base, (chebyshev.bases.ShenDirichletBasis,
+                                              legendre.bases.ShenDirichletBasis))]
+            for base in dirichlet:
+                # Boundary values are shared with T, but slices have an
+                # additional leading axis
+                base.bc = copy(base.bc)
+            xfftn, self.transfer, pencil = _plan_transforms(
+                self.bases, T.axes, T.subcomm, T.shape(), T.dtype,
+                T.plan_options, len(spaces))
+            for base in dirichlet:
+                base.bc.set_slices(base)
+            fwd = Transform([o.forward for o in xfftn],
+                            [o.forward for o in self.transfer], pencil)
+            bck = Transform([o.backward for o in xfftn[::-1]],
+                            [o.backward for o in self.transfer[::-1]],
+                            pencil[::-1])
+            sp = Transform([o.scalar_product for o in xfftn],
+                           [o.forward for o in self.transfer], pencil)
+        self.forward = VectorTransform([space.forward for space in spaces], fwd)
+        self.backward = VectorTransform([space.backward for space in spaces], bck)
+        self.scalar_product = VectorTransform([space.scalar_product for space in spaces], sp)
 
     def ndim(self):
         return self.spaces[0].ndim()
@@ -263,6 +475,23 @@ class MixedTensorProductSpace(object):
     def __getitem__(self, i):
         return self.spaces[i]
 
+    def get_dealiased(self, padding_factor=1.5):
+        """Return space of same type for dealiasing nonlinear terms
+
+        Equal spaces are replaced by the same padded space, and then
+        transformed together. See TensorProductSpace.get_dealiased.
+
+        kwargs:
+            padding_factor  float   Factor for padding backward transforms
+
+        """
+        T = self.spaces[0]
+        if all(space is T for space in self.spaces):
+            Tp = T.get_dealiased(padding_factor)
+            return self.__class__([Tp]*len(self.spaces), batched=True)
+        return self.__class__([space.get_dealiased(padding_factor)
+                               for space in self.spaces])
+
     def __getattr__(self, name):
         obj = object.__getattribute__(self, 'spaces')
         return getattr(obj[0], name)
@@ -279,10 +508,14 @@ class VectorTensorProductSpace(MixedTensorProductSpace):
     args:
         spaces        List of tensorproductspaces
 
+    kwargs:
+        batched       Transform all components together. See
+                      MixedTensorProductSpace
+
     """
 
-    def __init__(self, spaces):
-        MixedTensorProductSpace.__init__(self, spaces)
+    def __init__(self, spaces, batched=False):
+        MixedTensorProductSpace.__init__(self, spaces, batched=batched)
         assert len(self.spaces) == self.ndim()
 
     def num_components(self):
@@ -295,10 +528,11 @@ class VectorTensorProductSpace(MixedTensorProductSpace):
 
 class VectorTransform(object):
 
-    __slots__ = ('_transforms')
+    __slots__ = ('_transforms', '_batched')
 
-    def __init__(self, transforms):
+    def __init__(self, transforms, batched=None):
         self._transforms = transforms
+        self._batched = batched
 
     def __getattr__(self, name):
         obj = object.__getattribute__(self, '_transforms')
@@ -307,11 +541,445 @@ class VectorTransform(object):
         return getattr(obj[0], name)
 
     def __call__(self, input_array, output_array, **kw):
+        if self._batched is not None:
+            return self._batched(input_array, output_array, **kw)
         for i, transform in enumerate(self._transforms):
             output_array[i] = transform(input_array[i], output_array[i], **kw)
         return output_array
 
 
+class PipelinedTransform(Transform):
+    """Parallel transform that overlaps global redistributions with the
+    serial transforms
+
+    Before each global redistribution the data are split into chunks along
+    the axis that is aligned after the redistribution. The serial transform
+    is computed for one chunk at the time, and the redistribution of a chunk
+    is started with a nonblocking Ialltoallw as soon as the chunk is ready.
+    The redistribution of one chunk then runs while the serial transform of
+    the next chunk is computed.
+
+    args:
+        transform   The blocking Transform
+        stages      List of _PipelineStage, one for each global
+                    redistribution. Stages that are None are blocking.
+
+    """
+    def __init__(self, transform, stages):
+        Transform.__init__(self, transform._xfftn, transform._transfer,
+                           transform._pencil)
+        assert len(stages) == len(self._transfer)
+        self._stages = tuple(stages)
+
+    def __call__(self, input_array=None, output_array=None, **kw):
+        if input_array is not None:
+            self.input_array[...] = input_array
+
+        for i, stage in enumerate(self._stages):
+            arrayA = self._xfftn[i].output_array
+            arrayB = self._xfftn[i+1].input_array
+            if stage is None:
+                self._xfftn[i](**kw)
+                self._transfer[i](arrayA, arrayB)
+            else:
+                stage(self._xfftn[i].input_array, arrayA, arrayB, **kw)
+        self._xfftn[-1](**kw)
+
+        if output_array is not None:
+            output_array[...] = self.output_array
+            return output_array
+        return self.output_array
+
+    def destroy(self):
+        for stage in self._stages:
+            if stage is not None:
+                stage.destroy()
+
+
+class _PipelineStage(object):
+    """Chunked serial transform followed by chunked global redistribution
+
+    The serial transform of each chunk is computed by a copy of the basis,
+    planned for the shape of the chunk.
+
+    args:
+        base        Basis of the serial transform
+        name        Name of transform, 'forward', 'backward' or
+                    'scalar_product'
+        transfer    The Transfer object of the redistribution
+        forward     Whether to redistribute forward or backward
+        chunks      Number of chunks
+        options     Options to the planners
+
+    """
+    def __init__(self, base, name, transfer, forward, chunks, options):
+        if forward:
+            shapeA, axisA = transfer.subshapeA, transfer.axisA
+            shapeB, axisB = transfer.subshapeB, transfer.axisB
+        else:
+            shapeA, axisA = transfer.subshapeB, transfer.axisB
+            shapeB, axisB = transfer.subshapeA, transfer.axisA
+        self.comm = comm = transfer.comm
+
+        # Wisdom is not used, since the number of copies may differ
+        # between processes
+        options = dict(_base_options(options, base.axis))
+        options.pop('wisdom', None)
+        shape = list(base.forward.input_array.shape)
+        dtype = base.forward.input_array.dtype
+        # Only Fourier bases are planned for collapsed axes
+        axes = base.axes if isinstance(base, FourierBase) else base.axis
+        copies = {}
+        self.transforms = []
+        self.slices = []
+        self.typesA = []
+        self.typesB = []
+        for chunk in range(chunks):
+            n, s = _blockdist(shapeA[axisB], chunks, chunk)
+            if n > 0 and n not in copies:
+                shape[axisB] = n
+                b = base.get_unplanned_copy()
+                b.plan(tuple(shape), axes, dtype, options)
+                copies[n] = getattr(b, name)
+            sl = [slice(None)]*len(shape)
+            sl[axisB] = slice(s, s+n)
+            self.transforms.append(copies.get(n, None))
+            self.slices.append(tuple(sl))
+            self.typesA.append(_chunk_subarraytypes(
+                comm, transfer.shape, axisA, shapeA, transfer.dtype, axisB,
+                chunk, chunks))
+            self.typesB.append(_chunk_subarraytypes(
+                comm, transfer.shape, axisB, shapeB, transfer.dtype, axisB,
+                chunk, chunks))
+
+    def __call__(self, input_array, arrayA, arrayB, **kw):
+        requests = []
+        for xfftn, s, typesA, typesB in zip(self.transforms, self.slices,
+                                            self.typesA, self.typesB):
+            if xfftn is not None:
+                xfftn(input_array[s], arrayA[s], **kw)
+            requests.append(self.comm.Ialltoallw([arrayA]+typesA,
+                                                 [arrayB]+typesB))
+            # Let MPI progress the redistributions started so far
+            MPI.Request.Testall(requests)
+        MPI.Request.Waitall(requests)
+        return arrayB
+
+    def destroy(self):
+        for types in self.typesA + self.typesB:
+            for count, datatype in zip(types[0][0], types[1]):
+                if count > 0:
+                    datatype.Free()
+
+
+def _pipeline_stage(base, name, transfer, forward, chunks, options):
+    """Return _PipelineStage, or None if the stage must be blocking
+
+    Dirichlet bases are not split into chunks, since their boundary values
+    are set up for the full arrays. Nothing is overlapped if the
+    redistribution is within one process.
+    """
+    shapeA = transfer.subshapeA if forward else transfer.subshapeB
+    if (transfer.comm.Get_size() == 1 or
+            getattr(base, name).output_array.shape != shapeA or
+            isinstance(base, (chebyshev.bases.ShenDirichletBasis,
+                              legendre.bases.ShenDirichletBasis))):
+        return None
+    return _PipelineStage(base, name, transfer, forward, chunks, options)
+
+
+def _chunk_subarraytypes(comm, shape, axis, subshape, dtype, chunk_axis,
+                         chunk, chunks):
+    """Return counts and datatypes for redistributing one chunk
+
+    As mpi4py_fft.pencil._subarraytypes, but only for the part of the local
+    array of shape subshape that belongs to chunk number chunk along
+    chunk_axis. If chunk_axis is the axis that is split between the
+    processes, then the block of each process is split into chunks.
+
+    """
+    # pylint: disable=protected-access
+    p = comm.Get_size()
+    datatype = MPI._typedict[np.dtype(dtype).char]
+    counts = []
+    datatypes = []
+    for i in range(p):
+        subsizes = list(subshape)
+        substarts = [0]*len(subshape)
+        n, s = _blockdist(shape[axis], p, i)
+        subsizes[axis], substarts[axis] = n, s
+        if chunk_axis == axis:
+            n, s = _blockdist(n, chunks, chunk)
+            subsizes[axis] = n
+            substarts[axis] += s
+        else:
+            n, s = _blockdist(subshape[chunk_axis], chunks, chunk)
+            subsizes[chunk_axis], substarts[chunk_axis] = n, s
+        if min(subsizes) > 0:
+            counts.append(1)
+            datatypes.append(datatype.Create_subarray(
+                subshape, subsizes, substarts).Commit())
+        else:
+            counts.append(0)
+            datatypes.append(datatype)
+    return [(counts, [0]*p), datatypes]
+
+
+def _plan_transforms(bases, axes, subcomm, shape, dtype, kw, num_components=0):
+    """Plan serial transforms and global redistributions for all axes
+
+    args:
+        bases           List of 1D bases
+        axes            Tuple of tuples of axes, in the order of transforms
+        subcomm         Subcommunicators
+        shape           Global shape of real data
+        dtype           Type of real data
+        kw              Options to the planners
+
+    kwargs:
+        num_components  If nonzero, plan for data with an additional leading
+                        (non-distributed) axis of this length, such that all
+                        components of a vector are transformed together
+
+    Returns lists of serial transforms and transfer objects, and the input
+    and output pencils
+
+    """
+    shape = list(shape)
+    s = 0
+    if num_components > 0:
+        s = 1
+        shape.insert(0, num_components)
+        subcomm = [MPI.COMM_SELF] + list(subcomm)
+
+    xfftn = []
+    transfer = []
+    pencil = [None, None]
+
+    all_axes = [tuple(ax+s for ax in axes_) for axes_ in axes]
+    for axes in all_axes:
+        # Collapsed axes are planned by the base of the last axis
+        for name in ('forward', 'backward', 'scalar_product'):
+            # The base may have been collapsed in another space
+            if isinstance(getattr(bases[axes[-1]-s], name), _CollapsedTransform):
+                delattr(bases[axes[-1]-s], name)
+            for axis in axes[:-1]:
+                bases[axis-s].axis = axis
+                setattr(bases[axis-s], name, _CollapsedTransform(
+                    name, axis-s, tuple(ax-s for ax in axes)))
+    axes = all_axes[-1]
+    pencilA = Pencil(subcomm, shape, axes[-1])
+    xfftn.append(bases[axes[-1]-s])
+    xfftn[-1].plan(pencilA.subshape, axes, dtype, _base_options(kw, axes[-1]-s))
+    pencil[0] = pencilA
+    if not shape[axes[-1]] == xfftn[-1].forward.output_array.shape[axes[-1]]:
+        dtype = xfftn[-1].forward.output_array.dtype
+        shape[axes[-1]] = xfftn[-1].forward.output_array.shape[axes[-1]]
+        pencilA = Pencil(subcomm, shape, axes[-1])
+
+    for axes in reversed(all_axes[:-1]):
+        pencilB = pencilA.pencil(axes[-1])
+        transAB = pencilA.transfer(pencilB, dtype)
+        base = bases[axes[-1]-s]
+        base.plan(pencilB.subshape, axes, dtype, _base_options(kw, axes[-1]-s))
+        xfftn.append(base)
+        transfer.append(transAB)
+        pencilA = pencilB
+        if not shape[axes[-1]] == base.forward.output_array.shape[axes[-1]]:
+            dtype = base.forward.output_array.dtype
+            shape[axes[-1]] = base.forward.output_array.shape[axes[-1]]
+            pencilA = Pencil(pencilB.subcomm, shape, axes[-1])
+
+    pencil[1] = pencilA
+    return xfftn, transfer, pencil
+
+
+class _CollapsedTransform(object):
+    """Transform of a base that is not planned, since its axis is
+    transformed together with other axes by the base of the last axis"""
+
+    def __init__(self, name, axis, axes):
+        self._message = (
+            "%s of the base of axis %d is not planned, since axes %s are "
+            "transformed together by the base of axis %d (collapse=True). "
+            "Use the transforms of the TensorProductSpace, or create it with "
+            "collapse=False" % (name, axis, axes, axes[-1]))
+
+    def __call__(self, *args, **kw):
+        raise RuntimeError(self._message)
+
+    def __getattr__(self, name):
+        if name.startswith('__'):
+            raise AttributeError(name)
+        raise AttributeError(self.__dict__.get('_message', name))
+
+
+def _collapsible(base):
+    """Return True if base may be transformed together with other axes"""
+    return (isinstance(base, FourierBase) and not base.dealias_direct and
+            abs(base.padding_factor-1) < 1e-8)
+
+
+def _base_options(kw, axis):
+    """Return planner options for the base along axis"""
+    threads = kw.get('threads', 1)
+    if np.ndim(threads):
+        kw = dict(kw, threads=threads[axis])
+    return kw
+
+
+def _autotune_threads(bases, axes, subcomm, shape, dtype, kw, comm, repeat=4):
+    """Return the fastest number of threads for the transforms along each axis
+
+    All axes are planned and timed with 1, 2, 4, ... threads, up to the
+    number of cores per process on the node. The slowest process decides.
+    """
+    local = comm.Split_type(MPI.COMM_TYPE_SHARED)
+    max_threads = max(1, (os.cpu_count() or 1)//local.Get_size())
+    local.Free()
+    candidates = [1]
+    while 2*candidates[-1] <= max_threads:
+        candidates.append(2*candidates[-1])
+
+    timings = np.zeros((len(candidates), len(shape)))
+    for i, threads in enumerate(candidates):
+        xfftn, transfer, pencil = _plan_transforms(
+            bases, axes, subcomm, shape, dtype, dict(kw, threads=threads))
+        for axes_, base in zip(reversed(axes), xfftn):
+            t0 = time()
+            for _ in range(repeat):
+                base.forward()
+                base.backward()
+            timings[i, axes_[-1]] = time()-t0
+        for trans in transfer:
+            trans.destroy()
+    comm.Allreduce(MPI.IN_PLACE, timings, op=MPI.MAX)
+    return tuple(candidates[i] for i in np.argmin(timings, axis=0))
+
+
+def _decomposition_candidates(comm, bases, axes, tune_axes):
+    """Return candidate pairs of axes and dims for the processor grid"""
+    lasts = [axes[-1]]
+    if tune_axes and not any(isinstance(base, R2CBasis) for base in bases):
+        # Fourier bases are only transformed first if chosen by the user,
+        # since they decide the type of the data
+        lasts += [axis for axis in axes[1:-1]
+                  if not isinstance(bases[axis], FourierBase)]
+
+    def factorizations(n, m):
+        """Return all tuples of m integers with product n"""
+        if m == 1:
+            return [(n,)]
+        return [(d,)+f for d in range(1, n+1) if n % d == 0
+                for f in factorizations(n//d, m-1)]
+
+    candidates = []
+    for last in lasts:
+        axes_ = [axis for axis in axes if axis != last] + [last]
+        for f in factorizations(comm.Get_size(), len(axes_)-1):
+            dims = [1]*len(bases)
+            for axis, d in zip(axes_[:-1], f):
+                dims[axis] = d
+            candidates.append((axes_, dims))
+    return candidates
+
+
+def _fits_processes(bases, axes, dims):
+    """Return whether all pencils of a candidate grid have at least one
+    point for each process along each axis"""
+    shape = [int(np.round(base.N*base.padding_factor)) for base in bases]
+    sizes = list(dims)
+    aligned = axes[-1]
+    for axis in reversed(axes):
+        sizes[aligned], sizes[axis] = sizes[axis], sizes[aligned]
+        if any(n < size for n, size in zip(shape, sizes)):
+            return False
+        base = bases[axis]
+        shape[axis] = base.N//2+1 if isinstance(base, R2CBasis) else base.N
+        aligned = axis
+    return True
+
+
+def _decomposition_key(comm, bases, axes, dtype, kw):
+    """Return key for the stored decomposition of a TensorProductSpace"""
+    return repr((comm.Get_size(), tuple(axes), np.dtype(dtype).str,
+                 tuple((base.__class__.__name__, int(base.N), base.quad,
+                        float(base.padding_factor)) for base in bases),
+                 bool(kw.get('collapse', False)), int(kw.get('chunks', 1))))
+
+
+def _autotune_decomposition(comm, bases, axes, dtype, tune_axes, kw,
+                            filename=None, repeat=4):
+    """Return the fastest axes and dims of the processor grid
+
+    Each candidate is planned with unplanned copies of the bases, and timed
+    with forward and backward transforms. The slowest process decides. If
+    filename is given, then the choice is looked up in, or stored to, this
+    JSON file.
+    """
+    key = _decomposition_key(comm, bases, axes, dtype, kw)
+    choice = None
+    if filename is not None and comm.Get_rank() == 0:
+        if os.path.exists(filename):
+            with open(filename, 'r') as f:
+                choice = json.load(f).get(key, None)
+    choice = comm.bcast(choice, root=0)
+    if choice is not None:
+        return list(choice['axes']), list(choice['dims'])
+
+    opts = dict(kw)
+    opts.pop('wisdom', None)
+    if opts.get('threads', 1) == 'auto':
+        opts['threads'] = 1
+    candidates = _decomposition_candidates(comm, bases, axes, tune_axes)
+    timings = np.zeros(len(candidates))
+    for i, (axes_, dims) in enumerate(candidates):
+        if not _fits_processes(bases, axes_, dims):
+            # Too many processes for some axis
+            timings[i] = np.inf
+            continue
+        copies = []
+        for base in bases:
+            b = base.get_unplanned_copy()
+            if isinstance(b, (chebyshev.bases.ShenDirichletBasis,
+                              legendre.bases.ShenDirichletBasis)):
+                # Boundary values are set up for one TensorProductSpace
+                b.bc = BoundaryValues(b, bc=base.bc.bc)
+            copies.append(b)
+        subcomm = Subcomm(comm, dims)
+        T = TensorProductSpace(subcomm, copies, axes=axes_, dtype=dtype, **opts)
+        u = T.forward.input_array
+        u[...] = np.random.random(u.shape)
+        u_hat = T.forward(u).copy()
+        t0 = time()
+        for _ in range(repeat):
+            T.forward(u, u_hat)
+            T.backward(u_hat, u)
+        timings[i] = time()-t0
+        T.destroy()
+    comm.Allreduce(MPI.IN_PLACE, timings, op=MPI.MAX)
+    axes, dims = candidates[int(np.argmin(timings))]
+
+    if filename is not None and comm.Get_rank() == 0:
+        stored = {}
+        if os.path.exists(filename):
+            with open(filename, 'r') as f:
+                stored = json.load(f)
+        stored[key] = {'axes': [int(a) for a in axes], 'dims': dims}
+        # Written to a temporary file that replaces the store, such that
+        # other jobs never read a partial file
+        fd, tmpname = tempfile.mkstemp(suffix='.tmp',
+                                       dir=os.path.dirname(os.path.abspath(filename)))
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(stored, f, indent=1)
+            os.replace(tmpname, filename)
+        except:
+            os.remove(tmpname)
+            raise
+    return axes, dims
+
+
 class BoundaryValues(object):
     """Class for setting nonhomogeneous boundary conditions for a 1D Dirichlet base
     inside a multidimensional TensorProductSpace.
@@ -332,13 +1000,41 @@ class BoundaryValues(object):
         self.slm1 = -1
         self.slm2 = -2
         self.axis = 0
+        self.sympy_params = {}  # Values of parameters in sympy.Exprs
+        self._planes = None     # For fast updates in TensorProductSpaces
         self.update_bcs(bc=bc)
 
     def update_bcs(self, sympy_params={}, bc=None):
-        if not sympy_params is {}:
+        """Update boundary values
+
+        kwargs:
+            sympy_params    dict    Values of parameters in sympy boundary
+                                    values, other than the coordinates x, y
+                                    and z, e.g., {t: 0.5}
+            bc              tuple   New boundary values
+
+        Inside a TensorProductSpace, new values of the parameters are only
+        evaluated and transformed on the boundary planes, using the
+        functions compiled by set_tensor_bcs. The cost is then proportional
+        to the size of the boundary. New boundary values are compiled again.
+        A KeyError is raised if the value of a parameter has never been
+        given.
+
+        """
+        self.sympy_params.update(sympy_params)
+        if isinstance(self.T, TensorProductSpace):
+            if bc is not None:
+                assert len(bc) == 2
+                self.bc = list(bc)
+                self.set_tensor_bcs(self.T)
+            elif self._planes is not None:
+                self._update_planes()
+            return
+
+        if sympy_params:
             for i in range(2):
                 if isinstance(self.bc[i], sympy.Expr):
-                    self.bcs[i] = self.bc[i].evalf(subs=sympy_params)
+                    self.bcs[i] = self.bc[i].evalf(subs=self.sympy_params)
             self.bcs_final[:] = self.bcs
 
         if bc is not None:
@@ -372,15 +1068,15 @@ class BoundaryValues(object):
             # one Fourier space to the right, then one Fourier transform needs to
             # be performed on the bc data first. For two Fourier spaces to the right,
             # two transforms need to be executed.
-            from shenfun import Array
             axis = None
             dirichlet_base = None
             number_of_bases_after_dirichlet = 0
             bases = []
+            # One entry in bases for each transform, where collapsed Fourier
+            # axes count as one
             for axes in reversed(T.axes):
-                base = T.bases[axes[0]]
-                assert len(axes) == 1
-                assert axes[0] == base.axis
+                base = T.bases[axes[-1]]
+                assert axes[-1] == base.axis
                 if isinstance(base, (legendre.bases.ShenDirichletBasis,
                                      chebyshev.bases.ShenDirichletBasis)):
                     axis = self.axis = base.axis
@@ -393,108 +1089,205 @@ class BoundaryValues(object):
                     bases.append('F')
 
             self.set_slices(dirichlet_base)
+            self.number_of_bases_after_dirichlet = number_of_bases_after_dirichlet
 
+            self._planes = None
             if self.has_nonhomogeneous_bcs() is False:
                 self.bcs[0] = self.bcs_final[0] = 0
                 self.bcs[1] = self.bcs_final[1] = 0
                 return
 
-            # Set boundary values
-            # These are values set at the end of a transform in Dirichlet space,
-            # but before any Fourier transforms
-            # Shape is like real space, since Dirichlet does not alter shape
-            b = Array(T, False)
-            s = T.local_slice(False)[axis]
-
-            if isinstance(self.bc[0], sympy.Expr):
-                bc0 = self.bc[0]
-                bc1 = self.bc[1]
-                X = T.local_mesh(True)
-                x, y, z = sympy.symbols("x,y,z")
-                sym0 = [sym for sym in (x, y, z) if sym in bc0.free_symbols]
-                sym1 = [sym for sym in (x, y, z) if sym in bc1.free_symbols]
-                lbc0 = sympy.lambdify(sym0, bc0, 'numpy')
-                lbc1 = sympy.lambdify(sym1, bc1, 'numpy')
-                Y0 = []
-                Y1 = []
-                for i, ax in enumerate((x, y, z)):
-                    if ax in bc0.free_symbols:
-                        Y0.append(X[i][dirichlet_base.sl(0)])
-                    if ax in bc1.free_symbols:
-                        Y1.append(X[i][dirichlet_base.sl(0)])
-
-                f_bc0 = lbc0(*Y0)
-                f_bc1 = lbc1(*Y1)
-                if s.stop == dirichlet_base.N:
-                    b[self.slm2] = f_bc0
-                    b[self.slm1] = f_bc1
-
-            elif isinstance(self.bc[0], Number):
-                if s.stop == dirichlet_base.N:
-                    b[self.slm2] = self.bc[0]
-                    b[self.slm1] = self.bc[1]
-
-            elif isinstance(self.bc[0], np.ndarray):
-                if s.stop == dirichlet_base.N:
-                    b[self.slm2] = self.bc[0][self.sl0]
-                    b[self.slm1] = self.bc[0][self.slm1]
-
-            else:
-                raise NotImplementedError
-
-            self.number_of_bases_after_dirichlet = number_of_bases_after_dirichlet
-
-            if number_of_bases_after_dirichlet == 0:
-                # Dirichlet base is the first to be transformed
-                b_hat = b
-
-            elif number_of_bases_after_dirichlet == 1:
-                T.forward._xfftn[0].input_array[...] = b
-
-                T.forward._xfftn[0]()
-                arrayA = T.forward._xfftn[0].output_array
-                arrayB = T.forward._xfftn[1].input_array
-                T.forward._transfer[0](arrayA, arrayB)
-                b_hat = arrayB.copy()
-
-            elif number_of_bases_after_dirichlet == 2:
-                T.forward._xfftn[0].input_array[...] = b
-
-                T.forward._xfftn[0]()
-                arrayA = T.forward._xfftn[0].output_array
-                arrayB = T.forward._xfftn[1].input_array
-                T.forward._transfer[0](arrayA, arrayB)
+            if isinstance(self.bc[0], np.ndarray):
+                self._set_tensor_bcs_volume(T, dirichlet_base, bases)
+                return
 
-                T.forward._xfftn[1]()
-                arrayA = T.forward._xfftn[1].output_array
-                arrayB = T.forward._xfftn[2].input_array
-                T.forward._transfer[1](arrayA, arrayB)
-                b_hat = arrayB.copy()
+            self._plan_planes(T, dirichlet_base, number_of_bases_after_dirichlet)
+            if self._has_sympy_params():
+                # Otherwise evaluated by update_bcs, that requires all values
+                self._update_planes()
+
+    def _set_tensor_bcs_volume(self, T, dirichlet_base, bases):
+        """Set boundary values from arrays of the same shape as the
+        local physical data, by transforming the entire array"""
+        from shenfun import Array
+        axis = dirichlet_base.axis
+        number_of_bases_after_dirichlet = self.number_of_bases_after_dirichlet
+        # Set boundary values
+        # These are values set at the end of a transform in Dirichlet space,
+        # but before any Fourier transforms
+        # Shape is like real space, since Dirichlet does not alter shape
+        b = Array(T, False)
+        s = T.local_slice(False)[axis]
+
+        if s.stop == dirichlet_base.N:
+            b[self.slm2] = self.bc[0][self.sl0]
+            b[self.slm1] = self.bc[0][self.slm1]
+
+        if number_of_bases_after_dirichlet == 0:
+            # Dirichlet base is the first to be transformed
+            b_hat = b
+
+        elif number_of_bases_after_dirichlet == 1:
+            T.forward._xfftn[0].input_array[...] = b
 
-            # Now b_hat contains the correct slices in slm1 and slm2
-            self.bcs[0] = b_hat[self.slm2].copy()
-            self.bcs[1] = b_hat[self.slm1].copy()
+            T.forward._xfftn[0]()
+            arrayA = T.forward._xfftn[0].output_array
+            arrayB = T.forward._xfftn[1].input_array
+            T.forward._transfer[0](arrayA, arrayB)
+            b_hat = arrayB.copy()
 
-            # Final
+        elif number_of_bases_after_dirichlet == 2:
             T.forward._xfftn[0].input_array[...] = b
-            for i in range(len(T.forward._transfer)):
-                if bases[i] == 'F':
-                    T.forward._xfftn[i]()
-                else:
-                    T.forward._xfftn[i].output_array[...] = T.forward._xfftn[i].input_array
 
-                arrayA = T.forward._xfftn[i].output_array
-                arrayB = T.forward._xfftn[i+1].input_array
-                T.forward._transfer[i](arrayA, arrayB)
+            T.forward._xfftn[0]()
+            arrayA = T.forward._xfftn[0].output_array
+            arrayB = T.forward._xfftn[1].input_array
+            T.forward._transfer[0](arrayA, arrayB)
+
+            T.forward._xfftn[1]()
+            arrayA = T.forward._xfftn[1].output_array
+            arrayB = T.forward._xfftn[2].input_array
+            T.forward._transfer[1](arrayA, arrayB)
+            b_hat = arrayB.copy()
+
+        # Now b_hat contains the correct slices in slm1 and slm2
+        self.bcs[0] = b_hat[self.slm2].copy()
+        self.bcs[1] = b_hat[self.slm1].copy()
+
+        # Final
+        T.forward._xfftn[0].input_array[...] = b
+        for i in range(len(T.forward._transfer)):
+            if bases[i] == 'F':
+                T.forward._xfftn[i]()
+            else:
+                T.forward._xfftn[i].output_array[...] = T.forward._xfftn[i].input_array
+
+            arrayA = T.forward._xfftn[i].output_array
+            arrayB = T.forward._xfftn[i+1].input_array
+            T.forward._transfer[i](arrayA, arrayB)
 
-            if bases[-1] == 'F':
-                T.forward._xfftn[-1]()
+        if bases[-1] == 'F':
+            T.forward._xfftn[-1]()
+        else:
+            T.forward._xfftn[-1].output_array[...] = T.forward._xfftn[-1].input_array
+
+        b_hat = T.forward._xfftn[-1].output_array
+        self.bcs_final[0] = b_hat[self.slm2].copy()
+        self.bcs_final[1] = b_hat[self.slm1].copy()
+
+    def _plan_planes(self, T, dirichlet_base, number_of_bases_after_dirichlet):
+        """Plan fast updates of the boundary values of TensorProductSpace T
+
+        Only the two boundary planes of the global array are evaluated and
+        transformed. The planes are computed in full on each process, and
+        the local parts are then picked out of the planes. Sympy boundary
+        values are compiled with lambdify, where the parameters that are not
+        coordinates are arguments to the compiled functions.
+        """
+        axis = dirichlet_base.axis
+        ndim = len(T)
+        dirichlet_stage = number_of_bases_after_dirichlet
+
+        # Local slices of the global data before each stage of the forward
+        # transform, and of the output
+        pencil = T.forward.input_pencil
+        slices = []
+        for i, xfftn in enumerate(T.forward._xfftn):
+            slices.append([slice(st, st+n) for st, n in zip(pencil.substart,
+                                                              pencil.subshape)])
+            if i < len(T.axes)-1:
+                shape = list(pencil.shape)
+                for ax in T.axes[-1-i]:
+                    shape[ax] = xfftn.output_array.shape[ax]
+                pencil = Pencil(pencil.subcomm, shape, pencil.axis)
+                pencil = pencil.pencil(T.axes[-2-i][-1])
+        slices.append(list(T.local_slice(True)))
+        for sl in slices:
+            sl[axis] = slice(None)
+
+        # Serial transforms of the global planes, with the Dirichlet axis
+        # of length 2
+        options = dict(T.plan_options)
+        options.pop('wisdom', None)
+        shape = list(T.shape())
+        shape[axis] = 2
+        dtype = T.forward.input_array.dtype
+        transforms = []
+        for i, axes in enumerate(reversed(T.axes)):
+            base = T.bases[axes[-1]]
+            if i == dirichlet_stage:
+                transforms.append(None)
+                continue
+            axes = base.axes if isinstance(base, FourierBase) else base.axis
+            b = base.get_unplanned_copy()
+            b.plan(tuple(shape), axes, dtype, _base_options(options, base.axis))
+            transforms.append(b.forward)
+            shape = list(b.forward.output_array.shape)
+            dtype = b.forward.output_array.dtype
+
+        # Compiled boundary values
+        X = T.mesh()
+        coors = sympy.symbols('x,y,z')[:ndim]
+        funcs = []
+        for bc in self.bc:
+            if isinstance(bc, sympy.Expr):
+                syms = [sym for sym in coors if sym in bc.free_symbols]
+                params = sorted(bc.free_symbols - set(coors), key=str)
+                func = sympy.lambdify(syms+params, bc, 'numpy')
+                Y = [X[coors.index(sym)][tuple(dirichlet_base.sl(0))] for sym in syms]
+                funcs.append((func, Y, params))
+            elif isinstance(bc, Number):
+                funcs.append((bc, [], []))
             else:
-                T.forward._xfftn[-1].output_array[...] = T.forward._xfftn[-1].input_array
+                raise NotImplementedError
 
-            b_hat = T.forward._xfftn[-1].output_array
-            self.bcs_final[0] = b_hat[self.slm2].copy()
-            self.bcs_final[1] = b_hat[self.slm1].copy()
+        plane = np.zeros(T.shape(), dtype=T.forward.input_array.dtype)
+        plane = plane[tuple(dirichlet_base.sl(slice(0, 2)))].copy()
+        self._planes = (plane, transforms, funcs, slices[dirichlet_stage],
+                        slices[-1])
+
+    def _update_planes(self):
+        """Evaluate and transform boundary planes"""
+        plane, transforms, funcs, sl_bcs, sl_final = self._planes
+        for i, (func, Y, params) in enumerate(funcs):
+            s = [slice(None)]*plane.ndim
+            s[self.axis] = i
+            if callable(func):
+                args = [self._sympy_param(p) for p in params]
+                plane[tuple(s)] = func(*(Y+args))
+            else:
+                plane[tuple(s)] = func
+
+        b = plane
+        for i, transform in enumerate(transforms):
+            if transform is None:
+                # Dirichlet stage
+                for j in range(2):
+                    s = list(sl_bcs)
+                    s[self.axis] = j
+                    self.bcs[j] = b[tuple(s)].copy()
+            else:
+                b = transform(b)
+        for j in range(2):
+            s = list(sl_final)
+            s[self.axis] = j
+            self.bcs_final[j] = b[tuple(s)].copy()
+
+    def _sympy_param(self, param):
+        """Return value of sympy parameter"""
+        for key in (param, str(param)):
+            if key in self.sympy_params:
+                return self.sympy_params[key]
+        raise KeyError("No value given for sympy parameter '%s' of boundary "
+                       "values. Use update_bcs({%s: value})" % (param, param))
+
+    def _has_sympy_params(self):
+        """Return whether values of all parameters of planes are given"""
+        for func, Y, params in self._planes[2]:
+            for param in params:
+                if param not in self.sympy_params and str(param) not in self.sympy_params:
+                    return False
+        return True
 
     def set_slices(self, T):
         self.sl0 = T.sl(0)
@@ -521,9 +1314,10 @@ class BoundaryValues(object):
             u[self.slm1] = self.bcs[1]
 
     def has_nonhomogeneous_bcs(self):
-        if self.bcs[0] == 0 and self.bcs[1] == 0:
-            return False
-        return True
+        for bc in self.bc:
+            if not (isinstance(bc, Number) and bc == 0):
+                return True
+        return False
 
 if __name__ == '__main__':
     import shenfun
@@ -0,0 +1,127 @@
+from collections import OrderedDict
+import numpy as np
+
+__all__ = ('LRUCache',)
+
+
+def _nbytes(value):
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (tuple, list)):
+        return sum(_nbytes(v) for v in value)
+    if isinstance(value, dict):
+        return _nbytes(list(value.values()))
+    return getattr(value, 'nbytes', 0)
+
+def _freeze(value):
+    if isinstance(value, np.ndarray):
+        value.setflags(write=False)
+    elif isinstance(value, (tuple, list)):
+        for v in value:
+            _freeze(v)
+    elif isinstance(value, dict):
+        _freeze(list(value.values()))
+    return value
+
+
+class LRUCache(object):
+    """Least recently used cache of Numpy arrays with a memory budget
+
+    Stored arrays, also inside tuples, lists and dictionaries, are made
+    read-only, since they are shared by all users of the cache. When the
+    total size of the stored arrays exceeds maxbytes, the least recently used
+    items are evicted. Items larger than maxbytes are never stored. Other
+    objects are counted with their attribute nbytes, if present, as measured
+    when they are stored.
+
+    kwargs:
+        maxbytes    int     Maximum total size in bytes of cached arrays
+        maxitems    int     Maximum number of cached items, or None for no
+                            limit
+
+    Example:
+
+        >>> cache = LRUCache(2**20)
+        >>> x = cache.get('x', lambda: np.arange(4.))
+        >>> x = cache.get('x', lambda: np.arange(4.))
+        >>> cache.hits, cache.misses
+        (1, 1)
+
+    """
+    def __init__(self, maxbytes=2**28, maxitems=None):
+        self.maxbytes = maxbytes
+        self.maxitems = maxitems
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._sizes = {}
+
+    def get(self, key, func):
+        """Return value stored under key
+
+        If key is not in the cache, then the value is computed as func() and
+        stored.
+
+        args:
+            key                 Hashable key
+            func    callable    Function without arguments that computes
+                                the value
+
+        """
+        try:
+            value = self._data.pop(key)
+            self._data[key] = value
+            self.hits += 1
+            return value
+        except KeyError:
+            pass
+        self.misses += 1
+        value = _freeze(func())
+        nbytes = _nbytes(value)
+        if nbytes <= self.maxbytes:
+            self._data[key] = value
+            self._sizes[key] = nbytes
+            self.nbytes += nbytes
+            self.evict()
+        return value
+
+    def evict(self):
+        """Remove least recently used items until below maxbytes and maxitems"""
+        while (self.nbytes > self.maxbytes or
+               (self.maxitems is not None and len(self._data) > self.maxitems)):
+            key, value = self._data.popitem(last=False)
+            self.nbytes -= self._sizes.pop(key)
+
+    def pop(self, key):
+        """Remove item stored under key and return it"""
+        value = self._data.pop(key)
+        self.nbytes -= self._sizes.pop(key)
+        return value
+
+    def resize(self, maxbytes, maxitems=None):
+        """Set new memory budget, and maximum number of items if given"""
+        self.maxbytes = maxbytes
+        if maxitems is not None:
+            self.maxitems = maxitems
+        self.evict()
+
+    def clear(self):
+        """Remove all items and reset counters"""
+        self._data.clear()
+        self._sizes.clear()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def info(self):
+        """Return dictionary of cache statistics"""
+        return {'hits': self.hits, 'misses': self.misses,
+                'items': len(self._data), 'nbytes': self.nbytes,
+                'maxbytes': self.maxbytes, 'maxitems': self.maxitems}
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def __len__(self):
+        return len(self._data)
@@ -0,0 +1,160 @@
+import os
+import pickle
+import tempfile
+import hashlib
+import numpy as np
+import pyfftw
+from mpi4py import MPI
+
+__all__ = ('FFTWWisdom',)
+
+
+def _new_wisdom(wisdom, known):
+    """Return the entries of wisdom that are not in known
+
+    Wisdom is a tuple of strings, one for each precision, with a header line,
+    one line for each entry and a closing line.
+    """
+    if known is None:
+        return wisdom
+    new = []
+    for w, k in zip(wisdom, known):
+        lines = w.splitlines()
+        k = set(k.splitlines()[1:-1])
+        entries = [line for line in lines[1:-1] if line not in k]
+        new.append(b'\n'.join([lines[0]]+entries+lines[-1:]) + b'\n')
+    return tuple(new)
+
+
+class FFTWWisdom(object):
+    """Class for storing FFTW wisdom on disk
+
+    Planning with FFTW_MEASURE or FFTW_PATIENT may take a long time for large
+    arrays. With a wisdom store the plans are computed once, and then reused
+    by later jobs with the same layout. Use as
+
+        wisdom = FFTWWisdom('wisdom_dir', comm)
+        T = TensorProductSpace(comm, bases, wisdom=wisdom,
+                               planner_effort='FFTW_PATIENT')
+
+    Wisdom is loaded before planning of each transform, and saved after
+    planning if no wisdom was found, with one file for each key. Each file
+    holds only the wisdom that was new to FFTW after planning. Only rank 0 of
+    comm touches the files. The wisdom read by rank 0 is broadcast to all
+    ranks, and before saving, the wisdom of all ranks is gathered and merged
+    on rank 0.
+
+    args:
+        path        string          Directory used for storing wisdom
+
+    kwargs:
+        comm        MPI communicator
+        max_size    int             Maximum total size in bytes of the
+                                    stored wisdom. The least recently used
+                                    files are evicted when exceeded
+
+    """
+    def __init__(self, path, comm=MPI.COMM_WORLD, max_size=2**26):
+        self.path = path
+        self.comm = comm
+        self.max_size = max_size
+        self.loads = 0
+        self.hits = 0
+        self._known = {}
+        if comm.Get_rank() == 0:
+            if not os.path.exists(path):
+                os.makedirs(path)
+        comm.Barrier()
+
+    @staticmethod
+    def key(kind, shape, dtype, axis, threads, planner_effort):
+        """Return key for wisdom of a planned transform
+
+        args:
+            kind            string  Name of transform, e.g., class name and
+                                    quadrature of basis
+            shape           tuple   Shape of planned input array
+            dtype           dtype   Type of planned input array
+            axis            int     Axis of transform
+            threads         int     Number of threads used by FFTW
+            planner_effort  string  FFTW planner flag
+
+        """
+        s = repr((kind, tuple(int(i) for i in shape), np.dtype(dtype).str,
+                  int(axis), int(threads), str(planner_effort)))
+        return hashlib.sha1(s.encode('utf-8')).hexdigest()
+
+    def filename(self, key):
+        return os.path.join(self.path, key+'.wisdom')
+
+    def load(self, key):
+        """Import stored wisdom for key into FFTW, if it exists
+
+        Must be called collectively on comm. Returns True if wisdom was found.
+        Otherwise, the wisdom known to FFTW is recorded, such that only new
+        wisdom is stored by save.
+        """
+        wisdom = None
+        if self.comm.Get_rank() == 0:
+            filename = self.filename(key)
+            if os.path.exists(filename):
+                try:
+                    with open(filename, 'rb') as f:
+                        wisdom = pickle.load(f)
+                    os.utime(filename, None)
+                except (IOError, OSError, EOFError, pickle.UnpicklingError):
+                    wisdom = None
+        wisdom = self.comm.bcast(wisdom, root=0)
+        self.loads += 1
+        if wisdom is None:
+            if self.comm.Get_rank() == 0:
+                self._known[key] = pyfftw.export_wisdom()
+            return False
+        pyfftw.import_wisdom(wisdom)
+        self.hits += 1
+        return True
+
+    def save(self, key):
+        """Save wisdom that is new to FFTW since load of key
+
+        Must be called collectively on comm, after a load of key that did not
+        find any wisdom. The file is written to a unique temporary file and
+        then renamed, such that concurrent jobs never read a partial file.
+        """
+        wisdom = self.comm.gather(pyfftw.export_wisdom(), root=0)
+        if self.comm.Get_rank() == 0:
+            for w in wisdom[1:]:
+                pyfftw.import_wisdom(w)
+            wisdom = _new_wisdom(pyfftw.export_wisdom(), self._known.pop(key, None))
+            fd, tmpname = tempfile.mkstemp(suffix='.tmp', dir=self.path)
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    pickle.dump(wisdom, f)
+                os.replace(tmpname, self.filename(key))
+            except:
+                os.remove(tmpname)
+                raise
+            self.evict()
+
+    def evict(self):
+        """Remove least recently used files until below max_size"""
+        files = []
+        for name in os.listdir(self.path):
+            if name.endswith('.wisdom'):
+                filename = os.path.join(self.path, name)
+                stat = os.stat(filename)
+                files.append((stat.st_mtime, stat.st_size, filename))
+        files.sort()
+        size = sum(f[1] for f in files)
+        while size > self.max_size and len(files) > 1:
+            mtime, fsize, filename = files.pop(0)
+            os.remove(filename)
+            size -= fsize
+
+    def clear(self):
+        """Remove all stored wisdom"""
+        if self.comm.Get_rank() == 0:
+            for name in os.listdir(self.path):
+                if name.endswith('.wisdom'):
+                    os.remove(os.path.join(self.path, name))
+        self.comm.Barrier()
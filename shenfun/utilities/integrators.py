@@ -24,6 +24,18 @@ class IntegratorBase(object):
     def setup(self, dt):
         pass
 
+    def _cast(self, a):
+        """Return a in the floating point precision of the spectral data
+
+        The coefficients of the integrators are computed in double precision,
+        and then cast such that single precision data is not upcast.
+        """
+        a = np.asarray(a)
+        real = np.finfo(self.T.forward.output_array.dtype).dtype
+        if np.iscomplexobj(a):
+            return a.astype(np.result_type(real, np.complex64))
+        return a.astype(real)
+
 class ETD(IntegratorBase):
 
     def __init__(self, T,
@@ -41,14 +53,15 @@ class ETD(IntegratorBase):
         L = self.LinearRHS()
         L = np.atleast_1d(L)
         hL = L*dt
-        self.ehL = np.exp(hL)
+        self.ehL = self._cast(np.exp(hL))
         M = 50
-        psi = self.psi = np.zeros(hL.shape, dtype=np.float)
+        psi = np.zeros(hL.shape, dtype=np.float)
         for k in range(1, M+1):
             ll = hL+np.exp(np.pi*1j*(k-0.5)/M)
             psi += ((np.exp(ll)-1.)/ll).real
 
         psi /= M
+        self.psi = self._cast(psi)
 
     def solve(self, u, u_hat, dt, trange):
         if self.psi is None or abs(self.params['dt']-dt)>1e-12:
@@ -86,8 +99,8 @@ class ETDRK4(IntegratorBase):
         L = self.LinearRHS()
         L = np.atleast_1d(L)
         hL = L*dt
-        ehL = self.ehL = np.exp(hL)
-        ehL_h = self.ehL_h = np.exp(hL/2.)
+        self.ehL = self._cast(np.exp(hL))
+        self.ehL_h = self._cast(np.exp(hL/2.))
 
         M = 50
         psi = self.psi = np.zeros((4,) + hL.shape, dtype=np.float)
@@ -104,7 +117,8 @@ class ETDRK4(IntegratorBase):
         a.append(2*psi[1]-4*psi[2])
         a.append(2*psi[1]-4*psi[2])
         a.append(-psi[1]+4*psi[2])
-        self.a = a
+        self.a = [self._cast(ai) for ai in a]
+        self.psi = self._cast(psi)
 
     def solve(self, u, u_hat, dt, trange):
         if self.a is None or abs(self.params['dt']-dt)>1e-12:
@@ -155,7 +169,7 @@ class RK4(IntegratorBase):
             self.setup(dt)
         t, end_time = trange
         tstep = 0
-        L = self.LinearRHS()
+        L = self._cast(self.LinearRHS())
         while t < end_time-1e-8:
             t += dt
             tstep += 1
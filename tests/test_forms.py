@@ -93,3 +93,59 @@ if __name__ == '__main__':
     test_sub(u2)
     test_isub(u2)
     test_neg(u2)
+
+def _scales(A):
+    if isinstance(A, list):
+        return [b['scale'] for b in A]
+    return [mat.scale for mat in A.values()]
+
+@pytest.mark.parametrize('family', ('chebyshev', 'legendre'))
+def test_inner_cache(family):
+    from shenfun import inner, div, grad, TestFunction, TrialFunction, Function
+    base = {'chebyshev': cbases, 'legendre': lbases}[family]
+    for bases in ((base.ShenDirichletBasis(N), fbases.R2CBasis(N)),
+                  (base.ShenDirichletBasis(N), base.ShenDirichletBasis(N))):
+        T = shenfun.TensorProductSpace(comm, bases)
+        u = TrialFunction(T)
+        v = TestFunction(T)
+        A = inner(v, div(grad(u)))
+        hits = T._forms.hits
+        B = inner(v, div(grad(u)))
+        assert T._forms.hits == hits+1
+
+        # Returned matrices have their own scale
+        for a, b in zip(_scales(A), _scales(B)):
+            assert a is not b
+            assert np.allclose(a, b)
+            b *= 2
+        C = inner(v, div(grad(u)))
+        for a, c in zip(_scales(A), _scales(C)):
+            assert np.allclose(a, c)
+
+        # A different scale reuses the form
+        items = len(T._forms)
+        D = inner(v, 2*div(grad(u)))
+        assert len(T._forms) == items
+        for a, d in zip(_scales(A), _scales(D)):
+            assert np.allclose(2*a, d)
+
+        # Linear form
+        uj = Function(T, False)
+        uj[:] = np.random.random(uj.shape)
+        uh = T.forward(uj, Function(T))
+        f0 = inner(v, div(grad(uh)), output_array=Function(T), uh_hat=uh)
+        f1 = inner(v, div(grad(uh)), output_array=Function(T), uh_hat=uh)
+        items = len(T._forms)
+        for c in (2, 3.5, -1):
+            f2 = inner(v, c*div(grad(uh)), output_array=Function(T), uh_hat=uh)
+            assert np.allclose(c*f0, f2)
+        assert len(T._forms) == items
+        assert np.allclose(f0, f1)
+        assert T._forms.nbytes == sum(form.nbytes for form in T._forms._data.values())
+
+def test_cache_maxitems():
+    cache = shenfun.LRUCache(maxitems=2)
+    for i in range(4):
+        cache.get(i, lambda: np.arange(4.))
+    assert len(cache) == 2 and 3 in cache and 0 not in cache
+    assert cache.nbytes == 64
@@ -1,4 +1,5 @@
 import pytest
+import os
 from shenfun.chebyshev.la import PDMA
 from shenfun.chebyshev.bases import ShenBiharmonicBasis
 from shenfun import inner, TestFunction, TrialFunction, div, grad
@@ -45,3 +46,217 @@ def test_PDMA(quad):
 
 
 
+@pytest.mark.parametrize('axis', (0, 1, 2))
+def test_threaded_kernels(axis):
+    from shenfun.optimization import la as cla, Matvec
+    M = 12
+    d = np.random.random(M)+4
+    a = np.random.random(M-2)
+    l = np.zeros(M-2)
+    cla.TDMA_SymLU(d, a, l)
+    shape = [5, 6, 7]
+    shape[axis] = M
+    b = np.random.random(shape)
+    for solve in (cla.TDMA_SymSolve3D, cla.TDMA_SymSolve3D_ptr):
+        u0 = b.copy()
+        solve(d, a, l, u0, axis)
+        u1 = b.copy()
+        solve(d, a, l, u1, axis, 3)
+        assert np.allclose(u0, u1)
+    c0 = np.zeros_like(b)
+    c1 = np.zeros_like(b)
+    Matvec.Tridiagonal_matvec3D(b, c0, a, d, a, axis)
+    Matvec.Tridiagonal_matvec3D(b, c1, a, d, a, axis, 3)
+    assert np.allclose(c0, c1)
+
+@pytest.mark.parametrize('keys', ((-1, 0, 1), (-3, -1, 0, 2, 4), (0, 2, 4, 6, 8)))
+@pytest.mark.parametrize('axis', (0, 1, 2))
+def test_Banded(keys, axis):
+    from shenfun import SparseMatrix
+    M = 40
+    d = {k: np.random.random(M-abs(k))-0.5 for k in keys}
+    A = SparseMatrix(d, (M, M))
+    D = A.diags().toarray()
+    shape = [5, 6, 7]
+    shape[axis] = M
+    b = np.random.random(shape) + 1j*np.random.random(shape)
+    u = A.solve(b.copy(), axis=axis)
+    c = np.zeros_like(u)
+    assert np.allclose(A.matvec(u, c, axis=axis), b)
+    lu = A.factorize()
+    assert lu.lu is not None
+
+    # Factorization is reused, also for non-contiguous arrays
+    bt = np.asfortranarray(b)
+    ut = np.zeros_like(bt)
+    A.solve(bt, ut, axis=axis)
+    assert A.factorize() is lu
+    assert np.allclose(ut, u)
+
+    # and updated when A is modified
+    A[0] = A[0] + 1
+    assert A.factorize() is not lu
+    A.solve(bt, ut, axis=axis)
+    assert np.allclose(np.apply_along_axis(lambda x: (D+np.eye(M)).dot(x), axis, ut), b)
+
+@pytest.mark.parametrize('basis,k,solver', (('ShenDirichletBasis', 0, 'SymTDMA'),
+                                            ('ShenBiharmonicBasis', 0, 'SymPDMA'),
+                                            ('Basis', 0, 'Diagonal'),
+                                            ('ShenDirichletBasis', 2, 'Banded'),
+                                            ('ShenNeumannBasis', 2, 'Banded')))
+def test_get_solver(basis, k, solver):
+    from shenfun.chebyshev import bases
+    from shenfun.spectralbase import inner_product
+    from shenfun import solve as default_solve
+    B = getattr(bases, basis)(N)
+    s = B.slice()
+    A = inner_product((B, 0), (B, k))
+    for M in (A, 2*A, A + inner_product((B, 0), (B, 0))*0.5):
+        # Solver is selected from the diagonals, also for sums and scalings
+        assert type(M.factorize()).__name__ == solver
+        assert M.factorize() is M.factorize()
+        f = np.random.random((N, 4, 3))
+        u = default_solve(M, f.copy())
+        D = M.diags().toarray()
+        if basis == 'ShenNeumannBasis':
+            D[0] = 0
+            D[0, 0] = 1
+            f[0] = B.mean
+        assert np.allclose(np.tensordot(D, u[s], 1)*M.scale, f[s])
+
+@pytest.mark.parametrize('solver', ('Helmholtz', 'Biharmonic'))
+@pytest.mark.parametrize('axis', (0, 1, 3))
+def test_Helmholtz_Biharmonic_nd(solver, axis):
+    from shenfun.chebyshev import bases, la as cla
+    from shenfun.spectralbase import inner_product
+    M = 25
+    if solver == 'Helmholtz':
+        B = bases.ShenDirichletBasis(M)
+        mats = [inner_product((B, 0), (B, 2)), inner_product((B, 0), (B, 0))]
+    else:
+        B = bases.ShenBiharmonicBasis(M)
+        mats = [inner_product((B, 0), (B, k)) for k in (4, 2, 0)]
+    s = B.slice()
+    # Scales vary along two axes and broadcast along the parameter axis 2
+    shape = [4, 3, 2, 5]
+    shape[axis] = M
+    B.plan(shape, axis, np.complex, {'threads': 3})
+    if solver == 'Helmholtz':
+        B.bc.set_slices(B)
+    sshape = [4, 3, 1, 5]
+    sshape[axis] = 1
+    scales = [-np.ones(sshape)] + [np.random.random(sshape)+1 for m in mats[1:]]
+    if solver == 'Biharmonic':
+        scales[0] = -scales[0]
+    for m in mats:
+        m.axis = axis
+    H = getattr(cla, solver)(*(mats+scales))
+    f = np.random.random(shape) + 1j*np.random.random(shape)
+    u = H(np.zeros_like(f), f.copy())
+    sl = [slice(None)]*4
+    sl[axis] = s
+    sl = tuple(sl)
+    assert np.allclose(H(np.zeros_like(f).T.copy().T, f.copy())[sl], u[sl])
+    b = f.copy()
+    assert np.allclose(H(b, b)[sl], u[sl])
+
+    # Compare with dense solve of each system
+    fm = np.moveaxis(f, axis, -1)
+    um = np.moveaxis(u, axis, -1)
+    sm = [np.moveaxis(np.broadcast_to(c, shape), axis, -1) for c in scales]
+    D = [m.diags().toarray() for m in mats]
+    for ind in np.ndindex(fm.shape[:-1]):
+        A = sum(c[ind][0]*d for c, d in zip(sm, D))
+        assert np.allclose(um[ind][s], np.linalg.solve(A, fm[ind][s]))
+
+@pytest.mark.parametrize('family', ('chebyshev', 'legendre'))
+@pytest.mark.parametrize('fourier', (False, True))
+def test_FastDiagonalization(family, fourier, tmpdir):
+    from mpi4py import MPI
+    from shenfun import TensorProductSpace, Function, chebyshev, legendre
+    from shenfun.fourier.bases import R2CBasis
+    from shenfun.la import FastDiagonalization
+    comm = MPI.COMM_WORLD
+    bases = {'chebyshev': chebyshev.bases, 'legendre': legendre.bases}[family]
+    if fourier:
+        B = [bases.ShenDirichletBasis(12), bases.ShenDirichletBasis(14), R2CBasis(8)]
+    else:
+        B = [bases.ShenDirichletBasis(n) for n in (12, 13, 14)]
+    T = TensorProductSpace(comm, B)
+    u = TrialFunction(T)
+    v = TestFunction(T)
+    mats = inner(v, div(grad(u))) + inner(v, 2*u)
+    path = comm.bcast(str(tmpdir), root=0)
+    FastDiagonalization.cache.clear()
+    H = FastDiagonalization(T, mats, path=path)
+    f = Function(T)
+    f[:] = np.random.random(f.shape)
+    for axis in range(3-fourier):
+        s = [slice(None)]*3
+        s[axis] = slice(-2, None)
+        f[tuple(s)] = 0
+    uh = H(Function(T), f.copy())
+    assert np.allclose(H(f.copy(), f.copy()), uh)
+
+    # Eigenpairs are reused from disk, with no temporary files left
+    FastDiagonalization.cache.clear()
+    H2 = FastDiagonalization(T, mats, path=path)
+    assert np.allclose(H2(Function(T), f.copy()), uh)
+    assert all(name.endswith('.npz') for name in os.listdir(path))
+    H2.destroy()
+
+    if comm.Get_size() == 1:
+        r = np.zeros_like(f)
+        for term in mats:
+            w = uh.copy()
+            for axis in sorted(key for key in term if not key == 'scale'):
+                w = term[axis].matvec(w, np.zeros_like(w), axis=axis)
+            r += w*term['scale']
+        assert np.allclose(r, f)
+    H.destroy()
+    T.destroy()
+
+@pytest.mark.parametrize('family', ('chebyshev', 'legendre'))
+@pytest.mark.parametrize('solver', ('CG', 'GMRES', 'BiCGStab'))
+def test_krylov(family, solver):
+    from mpi4py import MPI
+    from sympy import symbols, diff
+    from shenfun import TensorProductSpace, Function, MatrixFreeOperator, Dx, \
+        chebyshev, legendre
+    from shenfun.fourier.bases import R2CBasis
+    from shenfun import la as sla
+    comm = MPI.COMM_WORLD
+    fam = {'chebyshev': chebyshev, 'legendre': legendre}[family]
+    x, y = symbols("x,y")
+    ke = 1 + 0.5*sin(x)*cos(y)
+    ue = (1-x**2)*sin(2*x)*cos(3*y)
+    fe = -diff(ke*diff(ue, x), x) - diff(ke*diff(ue, y), y)
+
+    SD = fam.bases.ShenDirichletBasis(32)
+    T = TensorProductSpace(comm, (SD, R2CBasis(24)))
+    TL = TensorProductSpace(comm, (fam.bases.Basis(32, quad=SD.quad), R2CBasis(24)))
+    X = T.local_mesh(True)
+    k, kx, ky = [lambdify((x, y), f)(*X)*np.ones(X[0].shape[:1]+X[1].shape[1:])
+                 for f in (ke, diff(ke, x), diff(ke, y))]
+    A = MatrixFreeOperator(T, [(-k, lambda u: div(grad(u))),
+                               (-kx, lambda u: Dx(u, 0, 1)),
+                               (-ky, lambda u: Dx(u, 1, 1))], TL)
+    u = TrialFunction(T)
+    v = TestFunction(T)
+    if family == 'chebyshev':
+        H = fam.la.Helmholtz(**inner(v, -div(grad(u))))
+    else:
+        H = fam.la.Helmholtz(**inner(grad(v), grad(u)))
+    f_hat = inner(v, lambdify((x, y), fe)(*X)*np.ones_like(k), output_array=Function(T))
+    S = getattr(sla, solver)(A, H, comm, tol=1e-10)
+    u_hat = S(f_hat)
+    assert S.converged
+    assert S.iterations < 30
+    uj = T.backward(u_hat, Function(T, False))
+    assert np.allclose(uj, lambdify((x, y), ue)(*X), atol=1e-8)
+
+    # Work arrays are reused, and the initial guess is used
+    work = S.work
+    u_hat = S(f_hat, u_hat)
+    assert S.work is work
+    assert S.iterations <= 1
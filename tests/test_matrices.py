@@ -240,5 +240,153 @@ def test_sub(key, mat, quad):
     for key, val in six.iteritems(mc):
         assert np.allclose(val, 0.0)
 
+def test_cache():
+    from shenfun.spectralbase import inner_product
+    cache = shenfun.SpectralMatrix.cache
+    SD = cbases.ShenDirichletBasis(N)
+    A0 = inner_product((SD, 0), (SD, 2))
+    hits, misses = cache.hits, cache.misses
+    SD1 = cbases.ShenDirichletBasis(N)
+    A1 = inner_product((SD1, 0), (SD1, 2))
+    assert cache.hits == hits+1 and cache.misses == misses
+    assert A1 is not A0 and A1.testfunction[0] is SD1
+    for key, val in six.iteritems(A1):
+        assert val is A0[key]
+        assert not val.flags.writeable
+
+    # Shared diagonals work with all matvec formats and solve
+    A = cmatrices.ADDmat((SD, 0), (SD, 2))
+    for format in formats:
+        A.matvec(b, d, format=format)
+        A1.matvec(b, d1, format=format)
+        assert np.allclose(d, d1)
+    assert np.allclose(A.solve(b.copy()), A1.solve(b.copy()))
+
+    # Scaling and adding does not modify the shared diagonals
+    A1 *= 2
+    A1 += inner_product((SD1, 0), (SD1, 0))
+    assert A0.scale == 1
+    for key, val in six.iteritems(A0):
+        assert np.allclose(val, A[key])
+
+    misses = cache.misses
+    inner_product((cbases.ShenDirichletBasis(N+2), 0),
+                  (cbases.ShenDirichletBasis(N+2), 2))
+    assert cache.misses == misses+1
+
+@pytest.mark.parametrize('dtype', ('d', 'D', 'f', 'F'))
+@pytest.mark.parametrize('shape', ((N, 5), (4, N), (2, N, 3, 4), (3, 2, 4, N)))
+def test_banded_matvec(dtype, shape):
+    from shenfun.optimization import Matvec
+    SD = cbases.ShenDirichletBasis(N)
+    mat = shenfun.spectralbase.inner_product((SD, 0), (SD, 2))
+    axis = shape.index(N)
+    v = np.random.random(shape).astype(dtype)
+    for vi in (v, np.asfortranarray(v)):
+        c0 = mat.matvec(vi, np.zeros_like(vi), format='csr', axis=axis)
+        c1 = mat.matvec(vi, np.zeros_like(vi), format='cython', axis=axis)
+        assert np.allclose(c0, c1, rtol=1e-4, atol=1e-4)
+
+    # Threads and broadcasted scale
+    N0 = mat.shape[0]
+    offsets = np.array(sorted(mat.keys()))
+    diags = np.zeros((len(offsets), N0), dtype=dtype)
+    for i, key in enumerate(offsets):
+        diags[i, max(0, -key):N0-max(0, key)] = mat[key]
+    v3 = v.reshape((-1, N, 1) if axis == v.ndim-1 else (1, N, -1))[:, :N0]
+    scale = np.broadcast_to(np.arange(v3.shape[2], dtype=dtype)+1, v3.shape)
+    c2 = np.zeros_like(v3)
+    Matvec.Banded_matvec3D(v3, c2, offsets, diags, scale, 3)
+    c3 = mat.matvec(v3, np.zeros_like(v3), format='csr', axis=1)
+    assert np.allclose(c2, c3*scale, rtol=1e-4, atol=1e-4)
+
+@pytest.mark.parametrize('basis', (cbases.ShenDirichletBasis,
+                                   cbases.ShenNeumannBasis,
+                                   lbases.ShenDirichletBasis))
+def test_linear_combination(basis):
+    from shenfun.spectralbase import inner_product
+    SD = basis(N)
+    A = inner_product((SD, 0), (SD, 2))
+    M = inner_product((SD, 0), (SD, 0))
+    H = 2*A - M
+    assert isinstance(H, shenfun.LinearCombination)
+    D = 2*A.scale*A.diags().toarray() - M.scale*M.diags().toarray()
+
+    # Matvec term by term, without computing the diagonals of the sum
+    H.matvec(b, d, axis=1)
+    assert dict.__len__(H) == 0
+    N0 = H.shape[0]
+    d1[:] = 0
+    d1[:, :N0] = np.einsum('ij,kjl->kil', D, b[:, :N0])
+    if basis is cbases.ShenNeumannBasis:
+        d1[:, 0] = 0
+    assert np.allclose(d, d1)
+
+    # Array coefficients broadcast against the result
+    H.coefficients[0] = 2*A.scale*np.arange(N).reshape((N, 1, 1))
+    H.matvec(b, d)
+    e = A.matvec(b, d1.copy())*2*A.scale*np.arange(N).reshape((N, 1, 1))
+    e -= M.scale*M.matvec(b, d1)
+    assert np.allclose(d, e)
+    H.coefficients[0] = 2*A.scale
+
+    # Diagonals are computed once, and only when needed
+    assert np.allclose(H.diags().toarray(), D)
+    val = H[0]
+    assert H[0] is val
+    solver = H.factorize()
+    u = H.solve(b.copy())
+    assert H.factorize() is solver
+    H.matvec(u, d)
+    if basis is cbases.ShenNeumannBasis:
+        d[0] = b[0]
+    assert np.allclose(d[:N0], b[:N0])
+
+    # New diagonals and solver when the coefficients change
+    H.coefficients[1] = -3*M.scale
+    assert H[0] is not val and H.factorize() is not solver
+    assert np.allclose(H.diags().toarray(),
+                       2*A.scale*A.diags().toarray()-3*M.scale*M.diags().toarray())
+
+    # Diagonals of a single term with unit coefficient are shared
+    G = A/A.scale - M
+    for key in set(A.keys()) - set(M.keys()):
+        assert G[key] is A[key]
+
+    # Nested combinations are flattened
+    K = (H + A) - M
+    assert len(K.matrices) == 4
+    assert np.allclose(K.diags().toarray(),
+                       H.diags().toarray()+A.scale*A.diags().toarray()-M.scale*M.diags().toarray())
+
+def test_linear_combination_tensorproductspace():
+    from mpi4py import MPI
+    from shenfun.fourier.bases import R2CBasis
+    T = shenfun.TensorProductSpace(MPI.COMM_WORLD,
+                                   (cbases.ShenDirichletBasis(8), R2CBasis(8)))
+    u = shenfun.TrialFunction(T)
+    v = shenfun.TestFunction(T)
+    A = shenfun.inner(v, shenfun.div(shenfun.grad(u)))
+    ADD, BDD = A['ADDmat'], A['BDDmat']
+    H = ADD + BDD
+    assert isinstance(H, shenfun.LinearCombination)
+
+    # Dictionary interface over the terms for scale arrays
+    assert len(H) == len(set(ADD) | set(BDD)) and bool(H)
+    assert sorted(H) == sorted(set(ADD) | set(BDD))
+    assert 0 in H and 1 not in H
+    assert 'LinearCombination' in repr(H)
+    for f in (H.diags, H.factorize, H.values, lambda: H[0]):
+        with pytest.raises(ValueError):
+            f()
+
+    f = shenfun.Function(T)
+    f[:] = np.random.random(f.shape)
+    c = H.matvec(f, np.zeros_like(f))
+    c1 = ADD.scale*ADD.matvec(f, np.zeros_like(f))
+    c1 += BDD.scale*BDD.matvec(f, np.zeros_like(f))
+    assert np.allclose(c, c1)
+    T.destroy()
+
 if __name__=='__main__':
     test_isub(*mats_and_quads[0])
@@ -7,7 +7,8 @@ from shenfun.tensorproductspace import TensorProductSpace, VectorTensorProductSp
 from shenfun.fourier.bases import R2CBasis, C2CBasis
 from shenfun.chebyshev import bases as cbases
 from shenfun.legendre import bases as lbases
-from shenfun import inner, div, grad, Function, project, Dx, Array
+from shenfun import inner, div, grad, Function, project, Projector, Dx, Array, \
+    NonlinearProduct
 from sympy import symbols, cos, sin, exp, lambdify
 from itertools import product
 
@@ -81,6 +82,13 @@ def test_transform(typecode, dim):
             V = TT.backward(F, V)
             assert allclose(V, U)
 
+            TB = VectorTensorProductSpace([fft,]*dim, batched=True)
+            Fb = Array(TB)
+            Fb = TB.forward(U, Fb)
+            assert allclose(Fb, F)
+            V = TB.backward(Fb, V)
+            assert allclose(V, U)
+
             TM = MixedTensorProductSpace([fft, fft])
             U = Array(TM, False)
             V = Array(TM, False)
@@ -133,6 +141,99 @@ def test_transform(typecode, dim):
 
             fft.destroy()
 
+def test_wisdom(tmpdir):
+    from shenfun import FFTWWisdom
+    path = comm.bcast(str(tmpdir), root=0)
+    wisdom = FFTWWisdom(path, comm)
+    bases = (C2CBasis(8), R2CBasis(10))
+    T = TensorProductSpace(comm, bases, wisdom=wisdom)
+    n = len(T.axes) # One plan for each group of collapsed axes
+    assert wisdom.loads == n and wisdom.hits == 0
+    U = random_like(T.forward.input_array)
+    F = T.forward(U).copy()
+    T.destroy()
+    bases = (C2CBasis(8), R2CBasis(10))
+    T = TensorProductSpace(comm, bases, wisdom=wisdom)
+    assert wisdom.loads == 2*n and wisdom.hits == n
+    assert allclose(T.forward(U), F)
+    T.destroy()
+
+    # One file for each plan, each holding only wisdom new to FFTW
+    if comm.Get_rank() == 0:
+        import pickle
+        files = tmpdir.listdir()
+        assert len(files) == n
+        entries = []
+        for f in files:
+            with open(str(f), 'rb') as fi:
+                for w in pickle.load(fi):
+                    entries.extend(w.splitlines()[1:-1])
+        assert len(entries) == len(set(entries))
+
+    # Evict all but the most recently saved
+    wisdom.max_size = 1
+    bases = (C2CBasis(6), R2CBasis(6))
+    T = TensorProductSpace(comm, bases, wisdom=wisdom)
+    T.destroy()
+    if comm.Get_rank() == 0:
+        assert len(tmpdir.listdir()) == 1
+    wisdom.clear()
+
+    bases = (C2CBasis(6), R2CBasis(6))
+    T = TensorProductSpace(comm, bases, wisdom=path)
+    assert T.plan_options['wisdom'].loads == n
+    T.destroy()
+
+def test_decomposition(tmpdir, monkeypatch):
+    from shenfun import tensorproductspace
+    filename = comm.bcast(str(tmpdir.join('decomposition.json')), root=0)
+    get_bases = lambda: (cbases.ShenDirichletBasis(12, bc=(1, -1)),
+                         lbases.Basis(10), C2CBasis(8))
+    for decomposition in ('auto', filename):
+        T = TensorProductSpace(comm, get_bases(), decomposition=decomposition)
+        assert T.axes[0] == (0,)
+        assert T.local_slice(True)[0] == slice(0, 12)
+        U = random_like(T.forward.input_array)
+        F = T.forward(U).copy()
+        V = T.backward(F).copy()
+        assert allclose(T.forward(V), F)
+        axes, sizes = T.axes, [c.Get_size() for c in T.subcomm]
+        T.destroy()
+
+    # The stored choice is used without timings
+    monkeypatch.setattr(tensorproductspace, '_decomposition_candidates', None)
+    T = TensorProductSpace(comm, get_bases(), decomposition=filename)
+    assert T.axes == axes
+    assert [c.Get_size() for c in T.subcomm] == sizes
+    T.destroy()
+    if comm.Get_rank() == 0:
+        assert [f.basename for f in tmpdir.listdir()] == ['decomposition.json']
+
+    # Grids with too many processes for some pencil are not candidates
+    bases = (C2CBasis(8), C2CBasis(8), R2CBasis(4))
+    assert tensorproductspace._fits_processes(bases, [0, 1, 2], [1, 3, 1])
+    assert not tensorproductspace._fits_processes(bases, [0, 1, 2], [1, 4, 1])
+
+def test_threads():
+    from shenfun import TestFunction, TrialFunction
+    bases = (C2CBasis(8), lbases.ShenDirichletBasis(10), R2CBasis(12))
+    T1 = TensorProductSpace(comm, bases)
+    U = random_like(T1.forward.input_array)
+    F = T1.forward(U).copy()
+    S = inner(TestFunction(T1), Array(T1, U)).copy()
+    B = inner(TestFunction(T1), TrialFunction(T1))
+    X = B.solve(S.copy())
+    T1.destroy()
+    bases = (C2CBasis(8), lbases.ShenDirichletBasis(10), R2CBasis(12))
+    for threads in (2, (1, 2, 3), 'auto'):
+        T = TensorProductSpace(comm, bases, threads=threads)
+        assert len(T.threads) == 3
+        assert T.bases[1].threads == T.threads[1]
+        assert allclose(T.forward(U), F)
+        S = inner(TestFunction(T), Array(T, U))
+        assert allclose(B.solve(S.copy()), X)
+        T.destroy()
+
 cBasis = (cbases.Basis,
           cbases.ShenDirichletBasis,
           cbases.ShenNeumannBasis,
@@ -179,10 +280,122 @@ def test_shentransform(typecode, dim, ST, quad):
             V = fft.backward(F)
             F = fft.forward(U)
             assert allclose(F, Fc)
+
+            TB = MixedTensorProductSpace([fft, fft], batched=True)
+            Ub = Array(TB, False)
+            Ub[:] = U
+            Fb = TB.forward(Ub, Array(TB))
+            assert allclose(Fb[1], Fc)
             bases.pop(axis)
             fft.destroy()
 #test_shentransform('d', 2, lBasis[0], 'LG')
 
+@pytest.mark.parametrize('typecode', 'dD')
+@pytest.mark.parametrize('ST,quad', all_bases_and_quads)
+def test_padding(typecode, ST, quad):
+    N = 12
+    K = R2CBasis if typecode == 'd' else C2CBasis
+    for axis in range(2):
+        bases = [K(8)]
+        bases.insert(axis, ST(N, quad=quad))
+        T = TensorProductSpace(comm, bases, dtype=typecode)
+        bases = [K(8, padding_factor=1.5)]
+        bases.insert(axis, ST(N, quad=quad, padding_factor=1.5))
+        Tp = TensorProductSpace(comm, bases, dtype=typecode)
+        u = Array(Tp, False)
+        assert u.shape == tuple(Tp.local_slice(False)[i].stop -
+                                Tp.local_slice(False)[i].start for i in range(2))
+        assert Tp.shape()[axis] == 18
+        F = T.forward(random_like(T.forward.input_array))
+        F = T.forward(T.backward(F)).copy()
+        u = Tp.backward(F, u)
+        assert allclose(Tp.forward(u, Function(Tp)), F)
+        T.destroy()
+        Tp.destroy()
+
+@pytest.mark.parametrize('product', ('cross', 'convection', 'mul'))
+def test_nonlinear_product(product):
+    T = TensorProductSpace(comm, (C2CBasis(12), C2CBasis(10), R2CBasis(10)))
+    Tp = T.get_dealiased(1.5)
+    assert Tp.shape() == [18, 15, 15]
+    assert Tp.local_shape(True) == T.local_shape(True)
+    TV = VectorTensorProductSpace([T, T, T])
+    x, y, z = T.local_mesh(True)
+    U = Function(TV, False)
+    U[0] = np.sin(x)*np.cos(y)*np.cos(2*z)
+    U[1] = -np.cos(x)*np.sin(2*y)*np.cos(z)
+    U[2] = np.cos(2*x)*np.sin(z)
+    U_hat = TV.forward(U, Function(TV))
+    D = [[T.backward(project(Dx(Function(T, buffer=U_hat[i]), j, 1), T,
+                             uh_hat=U_hat[i]), Function(T, False))
+          for j in range(3)] for i in range(3)]
+    if product == 'cross':
+        W = np.array([D[2][1]-D[1][2], D[0][2]-D[2][0], D[1][0]-D[0][1]])
+        ref = TV.forward(np.cross(U, W, axis=0), Function(TV))
+        H = NonlinearProduct(TV, product)
+        u_hat = U_hat
+    elif product == 'convection':
+        W = np.array([sum(U[j]*D[i][j] for j in range(3)) for i in range(3)])
+        ref = TV.forward(W, Function(TV))
+        H = NonlinearProduct(TV, product)
+        u_hat = U_hat
+    else:
+        # cos(5x)**2 is aliased to cos(2x) without padding
+        V = Function(T, False)
+        V[:] = np.cos(5*x)
+        ref = T.forward(0.5*np.ones_like(V), Function(T))
+        H = NonlinearProduct(T, product)
+        u_hat = [T.forward(V, Function(T))]*2
+    assert allclose(H(u_hat), ref)
+    assert allclose(H(u_hat, Function(H.T)), ref)
+
+    # The padded space shares the subcommunicators of T
+    assert all(c0 is c1 for c0, c1 in zip(sorted(Tp.subcomm, key=id),
+                                          sorted(T.subcomm, key=id)))
+    Tp.destroy()
+    assert allclose(T.forward(U[0], Function(T)), U_hat[0])
+    T.destroy()
+
+@pytest.mark.parametrize('B', (None, cbases.Basis, lbases.Basis))
+def test_nonlinear_product_2d(B):
+    # Cross product in 2D, also with a Chebyshev or Legendre axis, where
+    # all products are polynomials of low degree in x
+    base = C2CBasis(12) if B is None else B(12)
+    T = TensorProductSpace(comm, (base, R2CBasis(10)))
+    TV = VectorTensorProductSpace([T, T])
+    x, y = T.local_mesh(True)
+    U = Function(TV, False)
+    if B is None:
+        U[0] = np.sin(x)*np.cos(y)
+        U[1] = -np.cos(x)*np.sin(y)
+        W = 2*np.sin(x)*np.sin(y)
+    else:
+        U[0] = (1-x**2)*np.sin(y)
+        U[1] = x*np.cos(y)
+        W = x**2*np.cos(y)
+    U_hat = TV.forward(U, Function(TV))
+    ref = TV.forward(np.array([U[1]*W, -U[0]*W]), Function(TV))
+    H = NonlinearProduct(TV, 'cross')
+    assert allclose(H(U_hat), ref)
+    T.destroy()
+
+@pytest.mark.parametrize('ST,quad', all_bases_and_quads)
+def test_eval(ST, quad):
+    for K in (R2CBasis, C2CBasis):
+        bases = (C2CBasis(8), ST(10, quad=quad), K(9, domain=(-1., 2.)))
+        T = TensorProductSpace(comm, bases)
+        u_hat = Function(T)
+        u_hat = T.forward(random_like(T.forward.input_array), u_hat)
+        u = T.backward(u_hat).copy()
+        u_hat = T.forward(u, u_hat)
+        X = T.mesh()
+        points = np.array([np.broadcast_to(x, T.shape()).ravel() for x in X])
+        s = tuple(T.local_slice(False))
+        for i in range(2):
+            result = u_hat.eval(points).reshape(T.shape())
+            assert allclose(result[s], u)
+        T.destroy()
+
 bases_and_quads = list(product(lBasis[:2], lquads))+list(product(cBasis[:2], cquads))
 
 axes = {2: {0: [0, 1, 2],
@@ -374,6 +587,184 @@ def test_project_2dirichlet(quad):
     dxy = duxyl(*X)
     assert np.allclose(dxy, dudxy)
 
+    # Repeated projections reuse the Projector of the space
+    P = BD._projector
+    dudx_hat2 = project(Dx(uq, 0, 1), BD, output_array=Function(BD))
+    assert BD._projector is P
+    assert np.allclose(dudx_hat2, dudx_hat)
+    P2 = Projector(BD)
+    assert len(P2.transfers) == 1
+    assert np.allclose(P2(Dx(uq, 0, 1)), dudx_hat)
+    P2.destroy()
+
+    # Reused output_array is overwritten
+    dudx_hat2 = project(Dx(uq, 0, 1), BD, output_array=dudx_hat2)
+    assert np.allclose(dudx_hat2, dudx_hat)
+
+    # The Projector of a space is destroyed with the space
+    for T in (DD, BD, DB, BB):
+        T.destroy()
+    assert BD._projector is None
+
+
+@pytest.mark.parametrize('family', ('chebyshev', 'legendre'))
+@pytest.mark.parametrize('solver', ('Helmholtz', 'Biharmonic'))
+def test_single_precision(family, solver):
+    from shenfun import TestFunction, TrialFunction
+    import importlib
+    shen = importlib.import_module('shenfun.'+family)
+    if solver == 'Helmholtz':
+        SD = shen.bases.ShenDirichletBasis
+    else:
+        SD = shen.bases.ShenBiharmonicBasis
+    u_hat = {}
+    for typecode in 'df':
+        T = TensorProductSpace(comm, (R2CBasis(16), SD(24)), axes=(1, 0),
+                               dtype=typecode)
+        u = TrialFunction(T)
+        v = TestFunction(T)
+        X = T.local_mesh(True)
+        fj = Array(T, False)
+        fj[:] = np.sin(2*X[0])*np.cos(2*X[1])
+        f_hat = inner(v, fj)
+        if solver == 'Helmholtz':
+            if family == 'chebyshev':
+                mats = inner(v, div(grad(u)))
+            else:
+                f_hat *= -1
+                mats = inner(grad(v), grad(u))
+        else:
+            if family == 'chebyshev':
+                mats = inner(v, div(grad(div(grad(u)))))
+            else:
+                mats = inner(div(grad(v)), div(grad(u)))
+        H = getattr(shen.la, solver)(**mats)
+        uh = H(Function(T), f_hat)
+        uj = T.backward(uh)
+        assert uh.dtype.char == typecode.upper()
+        assert uj.dtype.char == typecode
+        u_hat[typecode] = uj
+    uj = u_hat['d']
+    assert np.linalg.norm(u_hat['f']-uj) < 1e-5*np.linalg.norm(uj)
+
+def test_single_precision_project_2dirichlet():
+    x, y = symbols("x,y")
+    ue = (cos(4*y)*sin(2*x))*(1-x**2)*(1-y**2)
+    ul = lambdify((x, y), ue, 'numpy')
+    duxl = lambdify((x, y), ue.diff(x, 1), 'numpy')
+    for typecode in 'df':
+        D0 = lbases.ShenDirichletBasis(25, quad='LG')
+        D1 = lbases.ShenDirichletBasis(24, quad='LG')
+        B0 = lbases.Basis(25, quad='LG')
+        DD = TensorProductSpace(comm, (D0, D1), dtype=typecode)
+        BD = TensorProductSpace(comm, (B0, D1), dtype=typecode)
+        X = DD.local_mesh(True)
+        uq = Function(DD, False)
+        uq[:] = ul(*X)
+        dudx = BD.backward(project(Dx(uq, 0, 1), BD))
+        assert dudx.dtype.char == typecode
+        assert np.allclose(dudx, duxl(*X), 0, abstol[typecode])
+
+
+@pytest.mark.parametrize('ST', (cbases.ShenDirichletBasis,
+                                lbases.ShenDirichletBasis))
+@pytest.mark.parametrize('slab', (False, True))
+def test_collapse(ST, slab):
+    for get_bases in (lambda: (ST(12, bc=(1, -1)), C2CBasis(8), R2CBasis(10)),
+                      lambda: (C2CBasis(8), C2CBasis(6), R2CBasis(10))):
+        V = []
+        for collapse in (False, True):
+            T = TensorProductSpace(comm, get_bases(), slab=slab,
+                                   collapse=collapse)
+            if not collapse:
+                assert len(T.axes) == 3
+                U = random_like(T.forward.input_array)
+            elif comm.Get_size() == 1 or slab:
+                assert len(T.axes) < 3
+            F = T.forward(U).copy()
+            V.append(T.backward(F).copy())
+            assert allclose(T.forward(V[-1]), F)
+
+            # Transforms of the bases along each axis. Only the base of the
+            # last axis of a collapsed group is planned
+            for axes in T.axes:
+                base = T.bases[axes[-1]]
+                assert base.forward.input_array.ndim == 3
+                assert base.backward.output_array.ndim == 3
+                for axis in axes[:-1]:
+                    with pytest.raises(AttributeError) as e:
+                        T.bases[axis].forward.input_array
+                    assert 'collapse=False' in str(e.value)
+                    with pytest.raises(RuntimeError):
+                        T.bases[axis].backward()
+            T.destroy()
+        # The distribution of spectral data may differ, but not of physical
+        assert allclose(V[0], V[1])
+
+    # Axes are not collapsed by default
+    T = TensorProductSpace(comm, (C2CBasis(8), R2CBasis(10)), slab=slab)
+    assert len(T.axes) == 2
+    for base in T.bases:
+        assert base.forward.input_array.ndim == 2
+    T.destroy()
+
+
+@pytest.mark.parametrize('ST', (cbases.ShenDirichletBasis,
+                                lbases.ShenNeumannBasis))
+@pytest.mark.parametrize('slab', (False, True))
+def test_pipeline(ST, slab):
+    get_bases = lambda: (C2CBasis(9), ST(12), C2CBasis(7), R2CBasis(10))
+    U = None
+    results = []
+    for chunks in (1, 3):
+        T = TensorProductSpace(comm, get_bases(), slab=slab, chunks=chunks,
+                               collapse=False)
+        if U is None:
+            U = random_like(T.forward.input_array)
+        F = T.forward(U).copy()
+        S = T.scalar_product(U).copy()
+        V = T.backward(F).copy()
+        results.append((F, S, V))
+        T.destroy()
+    for a, b in zip(*results):
+        assert allclose(a, b)
+
+
+@pytest.mark.parametrize('ST', (cbases.ShenDirichletBasis,
+                                lbases.ShenDirichletBasis))
+@pytest.mark.parametrize('slab', (False, True))
+def test_update_bcs(ST, slab):
+    x, y, t = symbols('x,y,t')
+    bc = (sin(x)*cos(t), 1+cos(2*x)*sin(t))
+    T = TensorProductSpace(comm, (C2CBasis(8), ST(12, bc=bc), R2CBasis(10)),
+                           slab=slab)
+    for tn in (0.5, 1.2):
+        T.bases[1].bc.update_bcs({t: tn})
+        bc_t = (bc[0].subs(t, tn), bc[1].subs(t, tn))
+        T0 = TensorProductSpace(comm, (C2CBasis(8), ST(12, bc=bc_t),
+                                       R2CBasis(10)), slab=slab)
+        for a, b in zip(T.bases[1].bc.bcs_final, T0.bases[1].bc.bcs_final):
+            assert allclose(np.asarray(a), np.asarray(b))
+        u = T.backward(Function(T))
+        assert allclose(u, T0.backward(Function(T0)))
+        T0.destroy()
+    T.destroy()
+
+    # Values of all parameters must be given
+    s = symbols('s')
+    T = TensorProductSpace(comm, (C2CBasis(8), ST(12, bc=(s*t, 1)), R2CBasis(10)),
+                           slab=slab)
+    with pytest.raises(KeyError) as e:
+        T.bases[1].bc.update_bcs({t: 0.5})
+    assert "'s'" in str(e.value)
+    T.bases[1].bc.update_bcs({'s': 2})
+    T0 = TensorProductSpace(comm, (C2CBasis(8), ST(12, bc=(1, 1)), R2CBasis(10)),
+                            slab=slab)
+    for a, b in zip(T.bases[1].bc.bcs_final, T0.bases[1].bc.bcs_final):
+        assert allclose(np.asarray(a), np.asarray(b))
+    T0.destroy()
+    T.destroy()
+
 
 if __name__ == '__main__':
     test_transform('f', 4)
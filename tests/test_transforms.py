@@ -174,6 +174,131 @@ def test_axis(ST, quad, axis):
 
 #test_axis(cbases.ShenDirichletBasis, "GC", 1)
 
+@pytest.mark.parametrize('ST,quad', list(product(cBasis, cquads)))
+@pytest.mark.parametrize('axis', (0, 1, -1))
+def test_complex_dct(ST, quad, axis):
+    # Complex data are transformed with one DCT of real views
+    shape = [8, 8]
+    shape[axis] = N
+    bases = []
+    for dtype in (np.float, np.complex):
+        base = ST(N, quad=quad)
+        base.plan(tuple(shape), axis, dtype, {})
+        if hasattr(base, 'bc'):
+            base.bc.set_slices(base)
+        bases.append(base)
+    assert bases[1].axis == axis % 2
+    fj = np.random.random(shape) + 1j*np.random.random(shape)
+    f_hat = bases[1].forward(fj, np.zeros(shape, dtype=np.complex))
+    for part in (np.real, np.imag):
+        f_r = bases[0].forward(part(fj).copy(), np.zeros(shape))
+        assert np.allclose(part(f_hat), f_r)
+    u = bases[1].backward(f_hat, np.zeros(shape, dtype=np.complex))
+    for part in (np.real, np.imag):
+        u_r = bases[0].backward(part(f_hat).copy(), np.zeros(shape))
+        assert np.allclose(part(u), u_r)
+
+@pytest.mark.parametrize('ST,quad', list(product(lBasis+(lbases.SecondNeumannBasis,), lquads)))
+@pytest.mark.parametrize('axis', (0,1))
+@pytest.mark.parametrize('dtype', ('d', 'D'))
+@pytest.mark.parametrize('M', (100, 300))
+def test_fast_legendre(ST, quad, axis, dtype, M):
+    # M >= 256 uses the low rank connection matrix of Leg2Cheb
+    ST = ST(M, quad=quad)
+    shape = [4, 4]
+    shape[axis] = M
+    ST.plan(tuple(shape), axis, dtype, {})
+    if hasattr(ST, 'bc'):
+        ST.bc.set_slices(ST)
+    fj = np.random.random(shape).astype(dtype)
+    fk = np.zeros(shape, dtype=dtype)
+    f0 = ST.scalar_product(fj, fk.copy(), fast_transform=False)
+    f1 = ST.scalar_product(fj, fk.copy(), fast_transform=True)
+    assert np.allclose(f0, f1)
+    fk = ST.forward(fj, fk)
+    u0 = ST.backward(fk, fj.copy(), fast_transform=False)
+    u1 = ST.backward(fk, fj.copy(), fast_transform=True)
+    assert np.allclose(u0, u1)
+    assert (ST.get_dlt().leg2cheb.M is None) == (M >= 256)
+
+@pytest.mark.parametrize('ST,quad', all_bases_and_quads)
+def test_padding(ST, quad):
+    """Test padded backward and truncated forward transforms"""
+    ST0 = ST(N, quad=quad, plan=True)
+    ST1 = ST(N, quad=quad, plan=True, padding_factor=1.5)
+    M = 3*N//2
+    assert ST1.forward.input_array.shape == (M,)
+    assert ST1.forward.output_array.shape == (N,)
+    fk = ST0.forward(np.random.random(N)).copy()
+    fk = ST0.forward(ST0.backward(fk)).copy()
+    fj = ST1.backward(fk).copy()
+    points = ST1.points_and_weights(M)[0]
+    assert np.allclose(fj, ST0.eval(points, fk.copy()))
+    assert np.allclose(ST1.forward(fj), fk)
+
+    # Scalar product of nonlinear term is exact on the padded mesh
+    ST2 = ST(4*N, quad=quad, plan=True)
+    gk = np.zeros(4*N)
+    s = ST0.slice()
+    gk[s] = fk[s]
+    if s.stop < N:
+        gk[s.stop-N:] = fk[s.stop:]
+    gj = ST2.backward(gk).copy()
+    s0 = ST1.scalar_product(fj*fj).copy()
+    s1 = ST2.scalar_product(gj*gj)
+    assert np.allclose(s0[s], s1[s])
+
+def test_cache():
+    cache = shenfun.LRUCache(1000)
+    a = cache.get('a', lambda: np.ones(100))
+    assert cache.misses == 1 and a.flags.writeable is False
+    b = cache.get('a', lambda: np.zeros(100))
+    assert b is a and cache.hits == 1
+    cache.get('b', lambda: np.ones(100))
+    assert 'a' not in cache and 'b' in cache and cache.nbytes == 800
+
+    ST = lbases.ShenDirichletBasis(N, plan=True)
+    fj = np.random.random(N)
+    fk = ST.forward(fj, fast_transform=False)
+    hits = ST.cache.hits
+    P = ST.cached_vandermonde_basis_derivative(0)
+    fk = ST.forward(fj, fast_transform=False)
+    assert ST.cache.hits > hits
+    assert P is ST.cached_vandermonde_basis_derivative(0)
+    assert P is not lbases.ShenDirichletBasis(N, scaled=True).cached_vandermonde_basis_derivative(0)
+
+@pytest.mark.parametrize('M', (5, 6, 150, 151))
+def test_legendre_nodes(M):
+    from shenfun.legendre.lobatto import legendre_gauss_nodes_and_weights, \
+        legendre_lobatto_nodes_and_weights
+    x, w = legendre_gauss_nodes_and_weights(M)
+    xn, wn = np.polynomial.legendre.leggauss(M)
+    assert np.allclose(x, xn, rtol=0, atol=1e-14)
+    assert np.allclose(w, wn, rtol=1e-10, atol=0)
+    # Exact for polynomials of order 2M-1
+    c = np.random.random(2*M)
+    assert abs(np.dot(w, np.polynomial.legendre.legval(x, c)) - 2*c[0]) < 1e-12*M
+    x, w = legendre_lobatto_nodes_and_weights(M)
+    assert np.allclose(np.polynomial.legendre.legval(x[1:-1], np.polynomial.legendre.legder([0]*(M-1)+[1])), 0, atol=1e-8*M**2)
+    # Exact for polynomials of order 2M-3
+    c = np.random.random(2*M-2)
+    assert abs(np.dot(w, np.polynomial.legendre.legval(x, c)) - 2*c[0]) < 1e-12*M
+
+def test_leg2cheb():
+    from shenfun.legendre.dlt import Leg2Cheb
+    M = 100
+    L0 = Leg2Cheb(M)
+    L1 = Leg2Cheb(M, threshold=0)
+    a = np.random.random((M, 3))
+    for transpose in (False, True):
+        c0 = L0(a, np.zeros_like(a), 0, transpose)
+        c1 = L1(a, np.zeros_like(a), 0, transpose)
+        assert np.allclose(c0, c1)
+    x = np.cos(np.linspace(0, np.pi, M))
+    c0 = L0(a, np.zeros_like(a))
+    assert np.allclose(np.polynomial.chebyshev.chebval(x, c0),
+                       np.polynomial.legendre.legval(x, a))
+
 @pytest.mark.parametrize('quad', cquads)
 def test_CDDmat(quad):
     M = 128